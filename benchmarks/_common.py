@@ -0,0 +1,55 @@
+"""
+Helpers shared by the benchmark scripts.
+They aren't part of the package, so run them from the repository root, for example:
+
+    python benchmarks/renderer_throughput.py --template default
+"""
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from pycaps.common import Document, Line, Segment, TimeFragment, Word
+from pycaps.tag import StructureTagger
+from pycaps.template import TemplateFactory
+
+SAMPLE_WORDS = (
+    "the and you that was for are with his they this have from one had word but not what all were when "
+    "your can said there use each which she how their will other about out many then them these some "
+    "her would make like him into time has look two more write see number way could people than first"
+).split()
+
+def load_template(template_name: str) -> Tuple[str, Optional[Path]]:
+    """Returns the CSS and the resources dir of a template."""
+    template_dir = TemplateFactory().create(template_name).get_folder_path()
+    with open(os.path.join(template_dir, "pycaps.template.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    css = Path(template_dir, config["css"]).read_text(encoding="utf-8")
+    resources = Path(template_dir, config["resources"]) if config.get("resources") else None
+    return css, resources
+
+def build_document(lines: int, words_per_line: int = 4, seed: int = 0) -> Document:
+    """Builds a document with random words, one line per segment, tagged as the pipeline would do."""
+    rng = random.Random(seed)
+    document = Document()
+    for line_index in range(lines):
+        start = line_index * 2.0
+        segment = Segment(time=TimeFragment(start, start + 2.0))
+        line = Line(time=TimeFragment(start, start + 2.0))
+        for word_index in range(words_per_line):
+            word_start = start + word_index * 2.0 / words_per_line
+            line.words.add(Word(text=rng.choice(SAMPLE_WORDS), time=TimeFragment(word_start, word_start + 2.0 / words_per_line)))
+        segment.lines.add(line)
+        document.segments.add(segment)
+    StructureTagger().tag(document)
+    return document
+
+@contextmanager
+def measure(label: str, units: int, unit_name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.3f}s  {units / elapsed if elapsed else float('inf'):10.1f} {unit_name}/s")
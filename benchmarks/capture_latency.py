@@ -0,0 +1,58 @@
+"""
+Measures the per-word latency of CssSubtitleRenderer from the capture to the movielite clip:
+PNG screenshot + PIL decode + ImageClip(np.array(image)) against render_word_array() + ImageClipFactory.from_bgra().
+The cache is disabled, so every word is captured by the browser.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from _common import build_document, load_template
+from pycaps.common import CacheStrategy, ElementState
+from pycaps.renderer import CssSubtitleRenderer
+
+def create_clip_from_image(renderer, index, word):
+    import numpy as np
+    from movielite import ImageClip
+
+    image = renderer.render_word(index, word, ElementState.WORD_BEING_NARRATED)
+    return ImageClip(np.array(image), 0, 1) if image else None
+
+def create_clip_from_array(renderer, index, word):
+    from pycaps.video import ImageClipFactory
+
+    image = renderer.render_word_array(index, word, ElementState.WORD_BEING_NARRATED)
+    return ImageClipFactory.from_bgra(image, 0, 1) if image is not None else None
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--template", default="default")
+    parser.add_argument("--lines", type=int, default=50)
+    args = parser.parse_args()
+
+    css, resources = load_template(args.template)
+    document = build_document(args.lines)
+    renderer = CssSubtitleRenderer()
+    renderer.append_css(css)
+    renderer.open(720, 1280, resources, CacheStrategy.NONE)
+    try:
+        for label, create_clip in (("PNG + PIL + ImageClip", create_clip_from_image), ("render_word_array + from_bgra", create_clip_from_array)):
+            latencies = []
+            for line in document.get_lines():
+                renderer.open_line(line, ElementState.LINE_BEING_NARRATED)
+                for index, word in enumerate(line.words):
+                    start = time.perf_counter()
+                    create_clip(renderer, index, word)
+                    latencies.append(time.perf_counter() - start)
+                renderer.close_line()
+            latencies.sort()
+            mean = sum(latencies) / len(latencies)
+            print(f"{label:<32} mean {mean * 1000:7.2f}ms  p50 {latencies[len(latencies) // 2] * 1000:7.2f}ms  p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.2f}ms")
+    finally:
+        renderer.close()
+
+if __name__ == "__main__":
+    main()
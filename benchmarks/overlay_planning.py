@@ -0,0 +1,85 @@
+"""
+Measures the compositing fps of a caption-dense video with and without the overlay planner (the encoding isn't included).
+The subtitles are synthetic: segments of several lines visible at the same time, with a clip per word state (like SubtitleClipsGenerator), and optionally a pop-in
+animation (scale) at the start of each word. Each frame composites the active clips over a video-sized background, like movielite's VideoWriter.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+from pycaps.video import ImageClipFactory, OverlayPlanner
+
+WIDTH, HEIGHT, FPS = 1080, 1920, 30
+
+def build_clips(segments: int, lines_per_segment: int, words_per_line: int, animated: bool, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    clips = []
+    line_duration = 2.0
+    for segment_index in range(segments):
+        segment_start = segment_index * lines_per_segment * line_duration
+        segment_end = segment_start + lines_per_segment * line_duration
+        for line_index in range(lines_per_segment):
+            line_start = segment_start + line_index * line_duration
+            line_end = line_start + line_duration
+            x, y = 60, int(HEIGHT * 0.6) + line_index * 110
+            for word_index in range(words_per_line):
+                word_start = line_start + word_index * line_duration / words_per_line
+                word_end = word_start + line_duration / words_per_line
+                width, height = int(rng.integers(100, 160)), 90
+                # the clip of each state, like SubtitleClipsGenerator.LINE_PASSES
+                intervals = [(segment_start, line_start), (line_start, word_start), (word_start, word_end), (word_end, line_end), (line_end, segment_end)]
+                for state_index, (start, end) in enumerate(intervals):
+                    if end <= start:
+                        continue
+                    image = np.zeros((height, width, 4), dtype=np.uint8)
+                    image[10:-10, 10:-10] = (40 * state_index, 255, 255 - 40 * state_index, 255)
+                    clip = ImageClipFactory.from_bgra(image, start, end - start).set_position((x, y))
+                    if animated and state_index == 2:
+                        clip.set_scale(lambda t: min(1.0, 0.6 + t * 2))
+                    clips.append(clip)
+                x += width + 10
+    return clips
+
+def composite(clips, frames: int):
+    start = time.perf_counter()
+    remaining = list(clips)
+    for frame_index in range(frames):
+        current_time = frame_index / FPS
+        frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+        for clip in [clip for clip in remaining if 0 <= (current_time - clip.start) < clip.duration]:
+            frame = clip.render(frame, current_time)
+        remaining = [clip for clip in remaining if current_time < clip.end]
+    return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=10)
+    parser.add_argument("--lines-per-segment", type=int, default=3, help="Lines of 2 seconds, all visible during the segment")
+    parser.add_argument("--words-per-line", type=int, default=6)
+    parser.add_argument("--animated", action="store_true", help="Add a pop-in animation to the words being narrated")
+    args = parser.parse_args()
+
+    duration = args.segments * args.lines_per_segment * 2.0
+    frames = int(duration * FPS)
+    # warm up the numba compiled blending functions
+    composite(build_clips(1, 1, 1, args.animated), 2)
+
+    clips = build_clips(args.segments, args.lines_per_segment, args.words_per_line, args.animated)
+    elapsed = composite(clips, frames)
+    print(f"{'per-clip compositing':<28} {len(clips):6d} clips  {elapsed:7.3f}s  {frames / elapsed:7.1f} fps")
+
+    clips = build_clips(args.segments, args.lines_per_segment, args.words_per_line, args.animated)
+    planning_start = time.perf_counter()
+    planner = OverlayPlanner(FPS, duration)
+    planned = planner.plan(clips)
+    planning = time.perf_counter() - planning_start
+    elapsed = composite(planned, frames)
+    stats = planner.get_stats()
+    print(f"{'overlay planning':<28} {len(planned):6d} clips  {elapsed:7.3f}s  {frames / elapsed:7.1f} fps  (planning: {planning:.3f}s, {stats['intervals']} intervals)")
+
+if __name__ == "__main__":
+    main()
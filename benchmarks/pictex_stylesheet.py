@@ -0,0 +1,58 @@
+"""
+Measures the cost per word of rendering with html2pic, parsing the whole CSS for each word (Html2Pic, as PictexSubtitleRenderer did)
+against the CSS compiled once (PictexStylesheet). It also checks that both produce the same pixels.
+It needs the `fast` install profile (html2pic).
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+from _common import load_template, build_document, measure
+from pycaps.common import ElementState
+from pycaps.renderer import PictexSubtitleRenderer
+from pycaps.renderer.pictex_render_worker import resolve_css_urls
+from pycaps.renderer.pictex_stylesheet import PictexStylesheet
+
+def render_with_html2pic(html: str, css: str, scale_factor: float):
+    from pictex import CropMode
+    from html2pic import Html2Pic
+
+    renderer = Html2Pic(html, css)
+    canvas, root_element = renderer._translator.translate(renderer.styled_tree, renderer.font_registry)
+    return canvas.render(root_element, crop_mode=CropMode.CONTENT_BOX, scale_factor=scale_factor)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--templates", nargs="+", default=["default", "retro-gaming"])
+    parser.add_argument("--words", type=int, default=300)
+    args = parser.parse_args()
+
+    renderer = PictexSubtitleRenderer()
+    for template in args.templates:
+        css, resources = load_template(template)
+        css = resolve_css_urls(css, resources)
+        words = build_document(args.words // 4, 4).get_words()
+        htmls = [
+            renderer.get_html(
+                renderer.get_line_css_classes(word.get_segment().get_tags(), word.get_line().get_tags(), ElementState.LINE_BEING_NARRATED),
+                renderer.get_word_css_classes(word.get_tags(), word_state=ElementState.WORD_BEING_NARRATED),
+                word.text,
+            )
+            for word in words
+        ]
+
+        print(f"\n{template} ({len(htmls)} words)")
+        with measure("Html2Pic (CSS parsed for each word)", len(htmls), "words"):
+            html2pic_images = [render_with_html2pic(html, css, PictexSubtitleRenderer.BASE_SCALE_FACTOR) for html in htmls]
+        with measure("PictexStylesheet (CSS parsed once)", len(htmls), "words"):
+            stylesheet = PictexStylesheet(css)
+            stylesheet_images = [stylesheet.render(html, PictexSubtitleRenderer.BASE_SCALE_FACTOR) for html in htmls]
+
+        identical = all(np.array_equal(a.to_numpy(), b.to_numpy()) for a, b in zip(html2pic_images, stylesheet_images))
+        print(f"identical images: {identical}")
+
+if __name__ == "__main__":
+    main()
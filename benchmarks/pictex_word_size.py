@@ -0,0 +1,49 @@
+"""
+Measures the cost per word of PictexSubtitleRenderer.get_word_size(): rendering the image to read its size (as it did before)
+against running only the layout (PictexStylesheet.measure()). It also checks that both return the same sizes.
+It needs the `fast` install profile (html2pic).
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from _common import load_template, build_document, measure
+from pycaps.common import ElementState
+from pycaps.renderer import PictexSubtitleRenderer
+from pycaps.renderer.pictex_render_worker import resolve_css_urls
+from pycaps.renderer.pictex_stylesheet import PictexStylesheet
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--templates", nargs="+", default=["default", "retro-gaming"])
+    parser.add_argument("--words", type=int, default=300)
+    args = parser.parse_args()
+
+    renderer = PictexSubtitleRenderer()
+    for template in args.templates:
+        css, resources = load_template(template)
+        stylesheet = PictexStylesheet(resolve_css_urls(css, resources))
+        words = build_document(args.words // 4, 4).get_words()
+        htmls = [
+            renderer.get_html(
+                renderer.get_line_css_classes(word.get_segment().get_tags(), word.get_line().get_tags(), line_state),
+                renderer.get_word_css_classes(word.get_tags(), word_state=word_state),
+                word.text,
+            )
+            for word in words
+            for line_state, word_state in ElementState.get_all_valid_states_combinations()
+        ]
+
+        print(f"\n{template} ({len(htmls)} word states)")
+        with measure("render + to_pillow()", len(htmls), "sizes"):
+            images = [stylesheet.render(html, PictexSubtitleRenderer.BASE_SCALE_FACTOR) for html in htmls]
+            rendered_sizes = [(image.width, image.height) if image else None for image in (image.to_pillow() if image else None for image in images)]
+        with measure("measure (layout only)", len(htmls), "sizes"):
+            measured_sizes = [stylesheet.measure(html, PictexSubtitleRenderer.BASE_SCALE_FACTOR) for html in htmls]
+
+        print(f"identical sizes: {rendered_sizes == measured_sizes}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compares PillowSubtitleRenderer against PictexSubtitleRenderer on the plain templates: the time to open the renderer,
+and the words/sec measuring and rendering every word in every state (the cache is disabled).
+PictexSubtitleRenderer needs the `fast` install profile (html2pic); it's skipped if it's not installed.
+"""
+import argparse
+import importlib.util
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from _common import build_document, load_template, measure
+from pycaps.common import CacheStrategy, ElementState
+from pycaps.renderer import SubtitleRenderer, PillowSubtitleRenderer, PictexSubtitleRenderer
+
+def measure_and_render_document(renderer: SubtitleRenderer, document) -> None:
+    for word in document.get_words():
+        for line_state, word_state in ElementState.get_all_valid_states_combinations():
+            renderer.get_word_size(word, line_state, word_state)
+    for line in document.get_lines():
+        for line_state, word_state in ElementState.get_all_valid_states_combinations():
+            renderer.open_line(line, line_state)
+            for index, word in enumerate(line.words):
+                renderer.render_word(index, word, word_state)
+            renderer.close_line()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--templates", nargs="+", default=["minimalist", "classic", "neo-minimal"])
+    parser.add_argument("--lines", type=int, default=25)
+    args = parser.parse_args()
+
+    renderer_types = [PillowSubtitleRenderer]
+    if importlib.util.find_spec("html2pic"):
+        renderer_types.append(PictexSubtitleRenderer)
+
+    document = build_document(args.lines)
+    words = len(document.get_words()) * len(ElementState.get_all_valid_states_combinations())
+    for template in args.templates:
+        css, resources = load_template(template)
+        print(f"\n{template} ({words} word states)")
+        for renderer_type in renderer_types:
+            renderer = renderer_type()
+            renderer.append_css(css)
+            start = time.perf_counter()
+            renderer.open(720, 1280, resources, CacheStrategy.NONE)
+            print(f"{renderer_type.__name__ + ' open()':<40} {time.perf_counter() - start:8.3f}s")
+            try:
+                with measure(f"{renderer_type.__name__} (size + render)", words, "words"):
+                    measure_and_render_document(renderer, document)
+            finally:
+                renderer.close()
+
+if __name__ == "__main__":
+    main()
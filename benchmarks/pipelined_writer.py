@@ -0,0 +1,85 @@
+"""
+Measures the fps of writing a subtitled video with movielite's sequential writer and with PipelinedVideoWriter.
+The input is a synthetic 1080x1920 video (written with OpenCV), with a caption-dense set of word clips over it. The encoder
+is simulated by compressing each raw frame with zlib (it releases the GIL, like the writes to FFmpeg's pipe), so the numbers
+show the overlap of the stages but not the cost of a real libx264 encoding.
+"""
+import argparse
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import cv2
+import numpy as np
+from overlay_planning import build_clips, FPS, HEIGHT, WIDTH
+from pycaps.video import PipelinedVideoWriter
+
+class _SimulatedEncoder:
+    def __init__(self, level: int):
+        self._level = level
+        self.stdin = self
+
+    def write(self, data) -> None:
+        zlib.compress(data, self._level)
+
+    def close(self) -> None:
+        pass
+
+    def wait(self) -> int:
+        return 0
+
+def write_input_video(path: str, frames: int) -> None:
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (WIDTH, HEIGHT))
+    gradient = np.tile(np.linspace(0, 255, WIDTH, dtype=np.uint8)[None, :, None], (HEIGHT, 1, 3))
+    for frame_index in range(frames):
+        writer.write(np.roll(gradient, frame_index * 8, axis=1))
+    writer.release()
+
+def build_writer(video_path: str, duration: float, segments: int, animated: bool):
+    from movielite import VideoClip, VideoWriter
+
+    writer = VideoWriter("unused.mp4", fps=FPS, size=(WIDTH, HEIGHT), duration=duration)
+    writer.add_clip(VideoClip(video_path))
+    writer.add_clips(build_clips(segments, 3, 6, animated))
+    return writer
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=2, help="Segments of 6 seconds, with 3 lines of 6 words")
+    parser.add_argument("--animated", action="store_true", help="Add a pop-in animation to the words being narrated")
+    parser.add_argument("--compression-level", type=int, default=1, help="zlib level of the simulated encoder (higher is slower)")
+    parser.add_argument("--queue-size", type=int, default=8)
+    args = parser.parse_args()
+
+    duration = args.segments * 6.0
+    frames = int(duration * FPS)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = str(Path(temp_dir) / "input.mp4")
+        write_input_video(video_path, frames)
+
+        encoder = _SimulatedEncoder(args.compression_level)
+        # warms up the numba compiled blending functions
+        warm_up_writer = build_writer(video_path, 1.0, 1, args.animated)
+        sequential_writer = build_writer(video_path, duration, args.segments, args.animated)
+        # the writers are built before patching Popen, since the video clip probes its audio with FFmpeg
+        with mock.patch("movielite.core.video_writer.subprocess.Popen", return_value=encoder):
+            warm_up_writer._render_range(0, 2, "unused.mp4", None, False)
+
+            start = time.perf_counter()
+            sequential_writer._render_range(0, frames, "unused.mp4", None, False)
+            elapsed = time.perf_counter() - start
+        print(f"{'sequential (VideoWriter)':<28} {elapsed:7.3f}s  {frames / elapsed:7.1f} fps")
+
+        pipelined = PipelinedVideoWriter(build_writer(video_path, duration, args.segments, args.animated), args.queue_size)
+        pipelined.render_frames(0, frames, lambda frame: encoder.write(np.ascontiguousarray(frame).data))
+        stats = pipelined.get_stats()
+        utilization = ", ".join(f"{stage} {stats[f'{stage}_utilization']:.0%}" for stage in PipelinedVideoWriter.STAGES)
+        print(f"{'pipelined':<28} {stats['seconds']:7.3f}s  {stats['fps']:7.1f} fps  ({utilization})")
+
+if __name__ == "__main__":
+    main()
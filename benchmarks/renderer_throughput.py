@@ -0,0 +1,50 @@
+"""
+Compares the words/sec of CssSubtitleRenderer (sync Playwright) against AsyncCssSubtitleRenderer (async Playwright, several pages in flight).
+The cache is disabled, so every word of every state is rendered by the browser.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from _common import build_document, load_template, measure
+from pycaps.common import CacheStrategy, ElementState
+from pycaps.renderer import SubtitleRenderer, CssSubtitleRenderer, AsyncCssSubtitleRenderer, AsyncSubtitleRendererAdapter
+
+def render_document(renderer: SubtitleRenderer, document) -> None:
+    def render_line(line_renderer: SubtitleRenderer, line) -> None:
+        for line_state, word_state in ElementState.get_all_valid_states_combinations():
+            line_renderer.open_line(line, line_state)
+            for index, word in enumerate(line.words):
+                line_renderer.render_word(index, word, word_state)
+            line_renderer.close_line()
+
+    renderer.render_lines(document.get_lines(), render_line)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--template", default="default")
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=AsyncCssSubtitleRenderer.DEFAULT_PAGES)
+    args = parser.parse_args()
+
+    css, resources = load_template(args.template)
+    document = build_document(args.lines)
+    rendered_words = len(document.get_words()) * len(ElementState.get_all_valid_states_combinations())
+
+    renderers = {
+        "CssSubtitleRenderer": CssSubtitleRenderer(),
+        f"AsyncCssSubtitleRenderer ({args.pages} pages)": AsyncSubtitleRendererAdapter(AsyncCssSubtitleRenderer(args.pages)),
+    }
+    for label, renderer in renderers.items():
+        renderer.append_css(css)
+        renderer.open(720, 1280, resources, CacheStrategy.NONE)
+        try:
+            with measure(label, rendered_words, "words"):
+                render_document(renderer, document)
+        finally:
+            renderer.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares memory and compositing time of trimmed and untrimmed word images.
+The images are synthetic: a visible word surrounded by transparent padding, like the one left by text-shadow or padding CSS.
+It also checks that both runs produce exactly the same frames.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+from pycaps.common import WordClip
+from pycaps.video import ImageClipFactory, SpriteTrimmer
+
+def build_word_images(words: int, padding: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(words):
+        width, height = int(rng.integers(60, 240)), int(rng.integers(50, 80))
+        image = np.zeros((height + padding * 2, width + padding * 2, 4), dtype=np.uint8)
+        image[padding:padding + height, padding:padding + width] = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+        images.append(image)
+    return images
+
+def build_clips(images, trim: bool):
+    clips = []
+    for index, image in enumerate(images):
+        word_clip = WordClip()
+        if trim:
+            image, word_clip.media_offset.x, word_clip.media_offset.y = SpriteTrimmer.trim(image)
+        word_clip.media_clip = ImageClipFactory.from_bgra(image, 0, 10)
+        x, y = (index % 4) * 250, (index // 4) % 10 * 100
+        word_clip.media_clip.set_position(word_clip.get_media_position(x, y))
+        clips.append(word_clip.media_clip)
+    return clips
+
+def composite(clips, frames: int, width: int, height: int):
+    output = None
+    start = time.perf_counter()
+    for frame in range(frames):
+        background = np.zeros((height, width, 3), dtype=np.float32)
+        for clip in clips:
+            clip.render(background, frame / 30)
+        output = background
+    return time.perf_counter() - start, output
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=40)
+    parser.add_argument("--padding", type=int, default=20, help="Transparent pixels around each word")
+    parser.add_argument("--frames", type=int, default=60)
+    args = parser.parse_args()
+
+    images = build_word_images(args.words, args.padding)
+    # warm up the numba compiled blending functions
+    composite(build_clips(images[:1], False), 1, 1080, 1920)
+    results = {}
+    for label, trim in (("untrimmed", False), ("trimmed", True)):
+        clips = build_clips(images, trim)
+        pixels_bytes = sum(clip.get_frame(0).nbytes for clip in clips)
+        elapsed, frame = composite(clips, args.frames, 1080, 1920)
+        results[label] = frame
+        print(f"{label:<10} {pixels_bytes / 1024 / 1024:8.2f} MB  {elapsed:7.3f}s  {args.frames / elapsed:7.1f} fps")
+
+    print("identical frames:", np.array_equal(results["untrimmed"], results["trimmed"]))
+
+if __name__ == "__main__":
+    main()
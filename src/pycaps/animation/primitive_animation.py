@@ -38,7 +38,9 @@ class PrimitiveAnimation(Animation):
                 if t + offset < 0 or t + offset > self._duration:
                     return old_position_transform(t)
                 
-                return get_position_fn(self._normalice_time(t + offset))
+                # get_position_fn returns the position of the layout box, the media clip can be inside it (trimmed images)
+                x, y = get_position_fn(self._normalice_time(t + offset))
+                return clip.get_media_position(x, y, clip.media_clip.scale(t))
 
             clip.media_clip.set_position(new_position_transform)
         
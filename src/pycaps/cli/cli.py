@@ -3,6 +3,7 @@ from .template_cli import template_app
 from .config_cli import config_app
 from .render_cli import render_app
 from .preview_styles_cli import preview_app
+from .renderer_daemon_cli import renderer_daemon_app
 
 app = typer.Typer(
     help="Pycaps, a tool for adding CSS-styled subtitles to videos",
@@ -13,6 +14,7 @@ app.add_typer(render_app)
 app.add_typer(preview_app)
 app.add_typer(template_app, name="template")
 app.add_typer(config_app)
+app.add_typer(renderer_daemon_app)
 
 @app.callback()
 def main(ctx: typer.Context):
@@ -60,6 +60,19 @@ def render(
 
     video_quality: Optional[VideoQuality] = typer.Option(None, "--video-quality", help="Final video quality", rich_help_panel="Video", show_default=False),
 
+    render_workers: Optional[int] = typer.Option(None, "--render-workers", min=1, help="Number of browser pages used in parallel to generate the subtitle images", rich_help_panel="Performance", show_default=False),
+    line_strip: bool = typer.Option(False, "--line-strip", help="Capture each line once per word state and slice the word images from it", rich_help_panel="Performance"),
+    tile_lines: Optional[int] = typer.Option(None, "--tile-lines", min=1, help="Capture groups of this many lines, with all their states, in a single screenshot", rich_help_panel="Performance", show_default=False),
+    trim_images: bool = typer.Option(False, "--trim-images", help="Remove the transparent borders of the word images to composite the video faster", rich_help_panel="Performance"),
+    sprite_atlas: bool = typer.Option(False, "--sprite-atlas", help="Pack the word images in a few large pages, saved next to the subtitle data to reuse them with --subtitle-data", rich_help_panel="Performance"),
+    line_compositing: bool = typer.Option(False, "--line-compositing", help="Composite a single image per line state when the words don't change inside it (no word state styles, animations or clip effects)", rich_help_panel="Performance"),
+    overlay_planning: bool = typer.Option(False, "--overlay-planning", help="Pre-composite the static subtitle clips in an overlay per interval, so only animations are composited on each frame", rich_help_panel="Performance"),
+    pipelined_writer: bool = typer.Option(False, "--pipelined-writer", help="Decode, composite and encode the video frames in parallel threads", rich_help_panel="Performance"),
+    chunks: Optional[int] = typer.Option(None, "--chunks", min=1, help="Split the video in chunks rendered in parallel processes, joined without re-encoding", rich_help_panel="Performance", show_default=False),
+    jobs: Optional[int] = typer.Option(None, "--jobs", min=1, help="Max chunks rendered at the same time (default: the number of chunks, up to the number of CPUs)", rich_help_panel="Performance", show_default=False),
+    persistent_cache: bool = typer.Option(False, "--persistent-cache", help="Store the rendered word images on disk to reuse them in the next runs", rich_help_panel="Performance"),
+    render_cache_budget: Optional[str] = typer.Option(None, "--render-cache-budget", help="Max memory of each render cache, e.g. 512MB. Least recently used images are evicted", rich_help_panel="Performance", show_default=False),
+
     preview: bool = typer.Option(False, "--preview", help="Generate a low quality preview of the rendered video", rich_help_panel="Utils"),
     preview_time: Optional[str] = typer.Option(None, "--preview-time", help="Generate a low quality preview of the rendered video at the given time, example: --preview-time=10,15", rich_help_panel="Utils", show_default=False),
     subtitle_data: Optional[str] = typer.Option(None, "--subtitle-data", help="Subtitle data file path. If provided, the rendering process will skip the transcription and tagging steps", rich_help_panel="Utils", show_default=False),
@@ -97,6 +110,17 @@ def render(
     if transcript: builder.with_transcription_file(transcript, transcript_format)
     if transcription_preview: builder.should_preview_transcription(True)
     if video_quality: builder.with_video_quality(video_quality)
+    if render_workers: builder.with_render_workers(render_workers)
+    if line_strip: builder.with_line_strip()
+    if tile_lines: builder.with_tile_lines(tile_lines)
+    if trim_images: builder.with_image_trimming()
+    if sprite_atlas: builder.with_sprite_atlas()
+    if line_compositing: builder.with_line_compositing()
+    if overlay_planning: builder.with_overlay_planning()
+    if pipelined_writer: builder.with_pipelined_writer()
+    if chunks or jobs: builder.with_chunked_rendering(chunks or jobs, jobs)
+    if persistent_cache: builder.with_persistent_cache()
+    if render_cache_budget: builder.with_render_cache_budget(render_cache_budget)
     if layout_align or layout_align_offset: builder.with_layout_options(_build_layout_options(builder, layout_align, layout_align_offset))
 
     pipeline = builder.build(preview_time=_parse_preview(preview, preview_time))
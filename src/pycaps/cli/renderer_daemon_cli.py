@@ -0,0 +1,19 @@
+import typer
+import logging
+from pycaps.logger import set_logging_level
+from pycaps.renderer import RendererDaemon
+
+renderer_daemon_app = typer.Typer()
+
+@renderer_daemon_app.command("renderer-daemon", help="Keep a headless browser running, so the next renders don't launch one and reuse the loaded templates")
+def renderer_daemon(
+    port: int = typer.Option(RendererDaemon.DEFAULT_PORT, "--port", help="Local port of the browser CDP endpoint"),
+    max_pages: int = typer.Option(RendererDaemon.DEFAULT_MAX_PAGES, "--max-pages", min=1, help="Max number of template pages kept loaded in the browser"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Verbose mode"),
+):
+    set_logging_level(logging.DEBUG if verbose else logging.INFO)
+    try:
+        RendererDaemon(port, max_pages).run()
+    except RuntimeError as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(1)
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import List, Optional, Set, TYPE_CHECKING
+from typing import List, Optional, Set, Tuple, TYPE_CHECKING
 from .types import ElementState
 
 if TYPE_CHECKING:
@@ -75,8 +75,11 @@ class ElementLayout:
 class WordClip:
     _parent: Optional['Word'] = None
     states: List[ElementState] = field(default_factory=list)
+    # it's None when the image was composited in a clip of the line (see LineClipsCompositor)
     media_clip: Optional['GraphicClip'] = None
     layout: ElementLayout = field(default_factory=ElementLayout)
+    # position of the media clip inside the layout box (it's not zero when the transparent borders of the image were trimmed)
+    media_offset: Position = field(default_factory=Position)
 
     def to_dict(self) -> dict:
         return {"states": [state.value for state in self.states], "layout": self.layout.to_dict()}
@@ -88,6 +91,10 @@ class WordClip:
     def has_state(self, state: ElementState) -> bool:
         return state in self.states
 
+    def get_media_position(self, x: float, y: float, scale: float = 1.0) -> Tuple[float, float]:
+        '''Returns the position of the media clip when the layout box is located at (x, y) and scaled by the scale received.'''
+        return x + self.media_offset.x * scale, y + self.media_offset.y * scale
+
     def get_word(self) -> 'Word':
         return self._parent
 
@@ -144,7 +151,7 @@ class Word:
         return self.structure_tags | self.semantic_tags
 
     def get_media_clips(self) -> List['GraphicClip']:
-        return [clip.media_clip for clip in self.clips]
+        return [clip.media_clip for clip in self.clips if clip.media_clip is not None]
 
     def get_line(self) -> 'Line':
         return self._parent
@@ -165,6 +172,8 @@ class Line:
     structure_tags: Set[Tag] = field(default_factory=set)
     max_layout: ElementLayout = field(default_factory=ElementLayout)
     time: TimeFragment = field(default_factory=TimeFragment) # TODO: We could calculate it using the words (same for segment)
+    # line-wide clips replacing the word clips images (see LineClipsCompositor). They are not saved.
+    media_clips: List['GraphicClip'] = field(default_factory=list)
 
     def __post_init__(self):
         self._words = ElementContainer(self)
@@ -197,7 +206,7 @@ class Line:
         return self.structure_tags
 
     def get_media_clips(self) -> List['GraphicClip']:
-        return [clip for word in self.words for clip in word.get_media_clips()]
+        return self.media_clips + [clip for word in self.words for clip in word.get_media_clips()]
     
     def get_word_clips(self) -> List[WordClip]:
         return [clip for word in self.words for clip in word.clips]
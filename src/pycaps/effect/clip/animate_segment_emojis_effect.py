@@ -1,5 +1,5 @@
 from .clip_effect import ClipEffect
-from pycaps.common import Document, WordClip
+from pycaps.common import Document, WordClip, Position
 from pycaps.tag import TagConditionFactory, BuiltinTag
 from pycaps.logger import logger
 import os
@@ -97,6 +97,7 @@ class AnimateSegmentEmojisEffect(ClipEffect):
             return
     
         clip.media_clip = AlphaVideoClip(str(animated_emoji_gif), clip.media_clip.start, clip.media_clip.duration)
+        clip.media_offset = Position()
         clip.media_clip.set_position((clip.layout.position.x, clip.layout.position.y))
         clip.media_clip.set_size(height=clip.layout.size.height)
 
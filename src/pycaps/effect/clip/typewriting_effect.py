@@ -1,5 +1,5 @@
 from .clip_effect import ClipEffect
-from pycaps.common import Document, WordClip, ElementState
+from pycaps.common import Document, WordClip, ElementState, Position
 from pycaps.tag import TagCondition
 from typing import Optional
 from pycaps.logger import logger
@@ -23,8 +23,8 @@ class TypewritingEffect(ClipEffect):
             self._renderer.close_line()
 
     def _apply_typewriting(self, word_index: int, clip: WordClip) -> None:
-        from movielite import ImageClip, AlphaCompositeClip
-        import numpy as np
+        from movielite import AlphaCompositeClip
+        from pycaps.video import ImageClipFactory
 
         if not clip.has_state(ElementState.WORD_BEING_NARRATED):
             return
@@ -34,21 +34,23 @@ class TypewritingEffect(ClipEffect):
         letter_duration = word_duration / number_of_letters
         new_clips = []
         for i in range(number_of_letters):
-            image = self._renderer.render_word(word_index, word, ElementState.WORD_BEING_NARRATED, i+1)
-            if not image:
+            image = self._renderer.render_word_array(word_index, word, ElementState.WORD_BEING_NARRATED, i+1)
+            if image is None:
                 continue
+            image_height = image.shape[0]
             y_position = 0
-            if clip.layout.size.height != image.height:
+            if clip.layout.size.height != image_height:
                 logger().warning("The fragment height is not equal to the whole word height. This could cause the text to be misaligned.")
-                logger().warning(f"Word height: {clip.layout.size.height} | Fragment height: {image.height}")
+                logger().warning(f"Word height: {clip.layout.size.height} | Fragment height: {image_height}")
                 logger().warning("If this is unexpected, report this issue")
                 logger().warning("As quick fix, try to use another font family or force a line-height/height for each word.")
-                y_position = (clip.layout.size.height - image.height) / 2
+                y_position = (clip.layout.size.height - image_height) / 2
             
-            image_element = ImageClip(np.array(image), i * letter_duration, letter_duration)
+            image_element = ImageClipFactory.from_bgra(image, i * letter_duration, letter_duration)
             image_element.set_position((0, y_position))
             new_clips.append(image_element)
 
         if len(new_clips) > 0:
             clip.media_clip = AlphaCompositeClip(new_clips, word.time.start, duration=word_duration, size=(clip.layout.size.width, clip.layout.size.height))
+            clip.media_offset = Position()
             clip.media_clip.set_position((clip.layout.position.x, clip.layout.position.y))
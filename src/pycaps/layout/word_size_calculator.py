@@ -6,7 +6,9 @@ class WordSizeCalculator:
         self._renderer = renderer
 
     def calculate(self, document: Document) -> None:
-        for word in document.get_words():
+        words = document.get_words()
+        self._renderer.preload_word_sizes(words)
+        for word in words:
             max_width = 0
             max_height = 0
             for line_state, word_state in ElementState.get_all_valid_states_combinations():
@@ -1,8 +1,10 @@
 import time
 import os
+import hashlib
 from pycaps.transcriber import AudioTranscriber, WhisperAudioTranscriber, BaseSegmentSplitter
-from pycaps.renderer import SubtitleRenderer, CssSubtitleRenderer, PictexSubtitleRenderer
-from pycaps.video import SubtitleClipsGenerator, VideoGenerator
+from pycaps.renderer import SubtitleRenderer, CssSubtitleRenderer, PictexSubtitleRenderer, SubtitleRendererPool, PersistentImageCache
+from pycaps.video import SubtitleClipsGenerator, VideoGenerator, SpriteAtlas, LineClipsCompositor
+from pycaps.renderer.css_class_analyzer import CssClassAnalyzer
 from pycaps.layout import WordSizeCalculator, PositionsCalculator, LineSplitter, LayoutUpdater
 from pycaps.tag import SemanticTagger, StructureTagger
 from pycaps.animation import ElementAnimator
@@ -14,7 +16,7 @@ from pathlib import Path
 from .subtitle_data_service import SubtitleDataService
 from pycaps.transcriber import TranscriptionEditor
 from pycaps.logger import logger
-from pycaps.utils import time_utils
+from pycaps.utils import time_utils, update_hash_with_files
 from pycaps.bootstrap import check_dependencies
 import pycaps.api.api_sender as ApiSender
 
@@ -40,10 +42,21 @@ class CapsPipeline:
         self._output_video_path: Optional[str] = None
         self._resources_dir: Optional[str] = None
         self._cache_strategy: CacheStrategy = CacheStrategy.CSS_CLASSES_AWARE
+        self._render_workers: int = 1
+        self._line_strip: bool = False
+        self._tile_lines: int = 0
+        self._trim_images: bool = False
+        self._persistent_cache: Optional[PersistentImageCache] = None
+        self._render_cache_budget: Optional[int] = None
+        self._sprite_atlas_page_size: Optional[int] = None
+        self._line_compositing: bool = False
+        self._css_content: str = ""
 
         # Internal state attributes
         self._video_generator: VideoGenerator = VideoGenerator()
+        self._is_renderer_open: bool = False
         self._clips_generator: Optional[SubtitleClipsGenerator] = None
+        self._sprite_atlas: Optional[SpriteAtlas] = None
         self._word_size_calculator: Optional[WordSizeCalculator] = None
         self._positions_calculator: Optional[PositionsCalculator] = None
         self._line_splitter: Optional[LineSplitter] = None
@@ -51,6 +64,8 @@ class CapsPipeline:
         self._video_width: Optional[int] = None
         self._video_height: Optional[int] = None
         self._is_prepared: bool = False
+        # text of the subtitle data loaded by run(): it's final, so the renderer can prepare its fonts for it
+        self._rendered_text: Optional[str] = None
 
         check_dependencies()
 
@@ -74,13 +89,47 @@ class CapsPipeline:
         self._preview_time = self._video_generator.get_sanitized_fragment_time()
         self._video_width, self._video_height = self._video_generator.get_video_size()
 
+        if self._persistent_cache:
+            logger().debug(f"Using persistent render cache: {self._persistent_cache.cache_dir}")
+            self._renderer.set_persistent_cache(self._persistent_cache)
+
+        if self._render_cache_budget:
+            logger().debug(f"Using render cache budget: {self._render_cache_budget} bytes per cache.")
+            self._renderer.set_cache_budget(self._render_cache_budget)
+
+        if self._rendered_text is not None:
+            self._renderer.set_rendered_text(self._rendered_text)
+
+        if self._line_strip or self._tile_lines:
+            if isinstance(self._renderer, CssSubtitleRenderer):
+                logger().debug(f"Using line strips: {self._line_strip}, tile lines: {self._tile_lines}.")
+                if self._line_strip:
+                    self._renderer.set_line_strip(True)
+                if self._tile_lines:
+                    self._renderer.set_tile_lines(self._tile_lines)
+            else:
+                logger().warning(f"The line strips and the tiles are only supported by CssSubtitleRenderer: ignoring them for {type(self._renderer).__name__}.")
+
+        if self._render_workers > 1 and isinstance(self._renderer, PictexSubtitleRenderer):
+            # it doesn't use a browser: the images are rendered by worker processes
+            logger().debug(f"Using {self._render_workers} render worker processes.")
+            self._renderer.set_processes(self._render_workers)
+        elif self._render_workers > 1 and not isinstance(self._renderer, SubtitleRendererPool):
+            logger().debug(f"Using {self._render_workers} render workers.")
+            self._renderer = SubtitleRendererPool(self._renderer, self._render_workers)
+
         resources_dir = Path(self._resources_dir) if self._resources_dir else None
+        # set before opening it, so what a failed open() leaves behind is cleaned up by close()
+        self._is_renderer_open = True
         self._renderer.open(self._video_width, self._video_height, resources_dir, self._cache_strategy)
 
         ApiSender.start()
         
+        if self._sprite_atlas_page_size:
+            self._sprite_atlas = self._load_or_create_sprite_atlas(resources_dir)
+
         # Initialize components that depend on the renderer and layout options
-        self._clips_generator = SubtitleClipsGenerator(self._renderer)
+        self._clips_generator = SubtitleClipsGenerator(self._renderer, self._trim_images, self._sprite_atlas)
         self._word_size_calculator = WordSizeCalculator(self._renderer)
         self._positions_calculator = PositionsCalculator(self._layout_options)
         self._line_splitter = LineSplitter(self._layout_options)
@@ -199,12 +248,20 @@ class CapsPipeline:
 
             logger().info("Generating subtitle clips...")
             self._clips_generator.generate(document)
+            if self._sprite_atlas and self._should_save_subtitle_data:
+                sprite_atlas_path = self._output_video_path.replace(".mp4", SpriteAtlas.FILE_SUFFIX)
+                logger().debug(f"Saving sprite atlas to {sprite_atlas_path}")
+                self._sprite_atlas.save(sprite_atlas_path)
 
             logger().debug("Updating layout sizes and positions...")
             self._layout_updater.update_max_sizes(document)
             self._positions_calculator.calculate(document, self._video_width, self._video_height)
             self._layout_updater.update_max_positions(document)
 
+            if self._line_compositing and self._can_composite_lines():
+                logger().debug("Compositing the words of each line state...")
+                LineClipsCompositor().composite(document)
+
             logger().info("Applying clip and sound effects...")
             for effect in self._clip_effects:
                 effect.set_renderer(self._renderer)
@@ -216,6 +273,10 @@ class CapsPipeline:
             for animator in self._animators:
                 animator.run(document)
 
+            # everything is rendered already: the renderer is closed before writing the video, since the chunked
+            # writer forks processes, which must not inherit the browser connection and the render worker threads
+            self._close_renderer()
+
             logger().info("Generating final video file...")
             self._video_generator.generate(document)
 
@@ -235,10 +296,17 @@ class CapsPipeline:
         """
         logger().debug("Cleaning up pipeline resources...")
         self._video_generator.close()
-        self._renderer.close()
+        self._close_renderer()
+        if self._persistent_cache:
+            self._persistent_cache.close()
         ApiSender.close()
         self._is_prepared = False
 
+    def _close_renderer(self) -> None:
+        if self._is_renderer_open:
+            self._renderer.close()
+            self._is_renderer_open = False
+
     def run(self) -> None:
         """
         Runs the entire pipeline from start to finish.
@@ -248,12 +316,17 @@ class CapsPipeline:
         """
         start_time = time.time()
         try:
-            self.prepare()
-            
             # If a subtitle data file is provided, load it and skip transcription/processing.
+            # It's loaded before preparing the pipeline, since its text is all the renderer will render.
+            document = None
             if self._subtitle_data_path_for_loading:
                 logger().info(f"Loading subtitle data from: {self._subtitle_data_path_for_loading}")
                 document = SubtitleDataService(self._subtitle_data_path_for_loading).load()
+                self._rendered_text = document.get_text()
+
+            self.prepare()
+
+            if document is not None:
                 self._cut_document_for_preview_time(document)
             elif self._transcription_for_loading:
                 logger().info("Using external transcription input.")
@@ -267,6 +340,45 @@ class CapsPipeline:
         finally:
             logger().info(f"Total pipeline execution time: {time.time() - start_time:.2f} seconds")
 
+    def _can_composite_lines(self) -> bool:
+        '''The line clips replace the word images, so nothing can change the words inside a line state.'''
+        if self._clip_effects or self._animators:
+            logger().info("Line compositing is disabled: the animations and clip effects need the word clips.")
+            return False
+        # the CSS of the renderer includes the CSS given to it directly (e.g. a custom renderer)
+        css = self._renderer.get_css()
+        if css is None:
+            logger().info("Line compositing is disabled: the CSS of the renderer is unknown.")
+            return False
+        if not CssClassAnalyzer.get(css).has_equivalent_word_states():
+            logger().info("Line compositing is disabled: the CSS styles the word states differently.")
+            return False
+        return True
+
+    def _load_or_create_sprite_atlas(self, resources_dir: Optional[Path]) -> SpriteAtlas:
+        '''
+        When the subtitle data is loaded from a file, the atlas saved next to it is reused if it was generated with the same settings.
+        '''
+        fingerprint = self._get_sprite_atlas_fingerprint(resources_dir)
+        if self._cache_strategy == CacheStrategy.NONE:
+            # without cache, each word is rendered in its line, and the atlas keys don't include the rest of the line
+            logger().debug("The saved sprite atlas is not reused: the cache strategy is NONE.")
+        elif self._subtitle_data_path_for_loading:
+            sprite_atlas_path = os.path.splitext(self._subtitle_data_path_for_loading)[0] + SpriteAtlas.FILE_SUFFIX
+            sprite_atlas = SpriteAtlas.load(sprite_atlas_path, fingerprint)
+            if sprite_atlas:
+                logger().info(f"Reusing sprite atlas: {sprite_atlas_path}")
+                return sprite_atlas
+        return SpriteAtlas(self._sprite_atlas_page_size, fingerprint)
+
+    def _get_sprite_atlas_fingerprint(self, resources_dir: Optional[Path]) -> str:
+        '''Hash of everything that changes the word images and is not part of the atlas entry keys.'''
+        digest = hashlib.sha256()
+        digest.update(f"{type(self._renderer).__name__}|{self._video_width}x{self._video_height}|{self._trim_images}|{self._cache_strategy.value}|".encode("utf-8"))
+        digest.update(self._css_content.encode("utf-8"))
+        update_hash_with_files(digest, resources_dir)
+        return digest.hexdigest()
+
     def _cut_document_for_preview_time(self, document: Document):
         if not self._preview_time:
             return
@@ -4,13 +4,16 @@ from pycaps.layout import SubtitleLayoutOptions, LineSplitter, LayoutUpdater, Po
 from pycaps.transcriber import AudioTranscriber, BaseSegmentSplitter, WhisperAudioTranscriber, PreviewTranscriber
 from pycaps.transcriber import TranscriptFormat, load_transcription
 from pycaps.common import Document
-from typing import Optional
+from typing import Optional, Union
+from pathlib import Path
 from pycaps.animation import Animation, ElementAnimator
 from pycaps.common import ElementType, EventType, VideoQuality, CacheStrategy
 from pycaps.tag import TagCondition, SemanticTagger, StructureTagger
 from pycaps.effect import TextEffect, ClipEffect, SoundEffect, Effect
 from pycaps.logger import logger
-from pycaps.renderer import SubtitleRenderer
+from pycaps.renderer import SubtitleRenderer, PersistentImageCache
+from pycaps.utils import parse_size
+from pycaps.video import SpriteAtlas
 
 class CapsPipelineBuilder:
 
@@ -49,11 +52,11 @@ class CapsPipelineBuilder:
         if not os.path.exists(css_file_path):
             raise ValueError(f"CSS file not found: {css_file_path}")
         css_content = open(css_file_path, "r", encoding="utf-8").read()
-        self._caps_pipeline._renderer.append_css(css_content)
-        return self
+        return self.add_css_content(css_content)
     
     def add_css_content(self, css_content: str) -> "CapsPipelineBuilder":
         self._caps_pipeline._renderer.append_css(css_content)
+        self._caps_pipeline._css_content += css_content
         return self
 
     def with_custom_subtitle_renderer(self, subtitle_renderer: SubtitleRenderer) -> "CapsPipelineBuilder":
@@ -72,6 +75,127 @@ class CapsPipelineBuilder:
         self._caps_pipeline._cache_strategy = cache_strategy
         return self
 
+    def with_render_workers(self, workers: int) -> "CapsPipelineBuilder":
+        """
+        Renders the lines with several copies of the renderer (each one with its own browser page), in parallel threads.
+        The lines are split in contiguous batches, one per worker.
+
+        Args:
+            workers: Number of renderers (1 renders everything with the main renderer).
+        """
+        if workers < 1:
+            raise ValueError(f"Render workers must be greater than 0: {workers}")
+        self._caps_pipeline._render_workers = workers
+        return self
+
+    def with_line_strip(self, enabled: bool = True) -> "CapsPipelineBuilder":
+        """
+        Captures each line once per word state and slices the word images from it (only with CssSubtitleRenderer).
+        All the words of the line share the state while being captured, so it shouldn't be used if the word images
+        depend on the size of the other words.
+        """
+        self._caps_pipeline._line_strip = enabled
+        return self
+
+    def with_tile_lines(self, lines: int) -> "CapsPipelineBuilder":
+        """
+        Stacks groups of lines, with all their states, in a tall page and captures each group in a single screenshot
+        (only with CssSubtitleRenderer). Templates sized with vh units shouldn't use it, since the viewport grows as needed.
+
+        Args:
+            lines: Number of lines of each group.
+        """
+        if lines < 1:
+            raise ValueError(f"Tile lines must be greater than 0: {lines}")
+        self._caps_pipeline._tile_lines = lines
+        return self
+
+    def with_image_trimming(self, enabled: bool = True) -> "CapsPipelineBuilder":
+        """
+        Removes the fully transparent borders (paddings, text-shadow space, etc) of the word images.
+        The subtitles look the same, but less memory is used and the video is composited faster.
+        """
+        self._caps_pipeline._trim_images = enabled
+        return self
+
+    def with_sprite_atlas(self, enabled: bool = True, page_size: int = SpriteAtlas.DEFAULT_PAGE_SIZE) -> "CapsPipelineBuilder":
+        """
+        Packs the unique word images in a few large pages, and the clips use views of them.
+        The atlas is saved next to the subtitle data file, so rendering that file again reuses the images instead of rendering them.
+
+        Args:
+            enabled: (Optional) Whether to use the sprite atlas.
+            page_size: (Optional) Width and height of each atlas page, in pixels.
+        """
+        if page_size < 1:
+            raise ValueError(f"Sprite atlas page size must be greater than 0: {page_size}")
+        self._caps_pipeline._sprite_atlas_page_size = page_size if enabled else None
+        return self
+
+    def with_line_compositing(self, enabled: bool = True) -> "CapsPipelineBuilder":
+        """
+        Composites the words of each line in a single clip per line state, instead of one clip per word and state.
+        It's only applied when the words don't change inside a line state: the word states are styled identically,
+        and there are no animations or clip effects (they need the word clips).
+        """
+        self._caps_pipeline._line_compositing = enabled
+        return self
+
+    def with_overlay_planning(self, enabled: bool = True) -> "CapsPipelineBuilder":
+        """
+        Pre-composites the static subtitle clips of each interval of the video in a single overlay, so most frames blend
+        a few overlays instead of every clip. The animated clips are still composited on each frame.
+        """
+        self._caps_pipeline._video_generator.set_overlay_planning(enabled)
+        return self
+
+    def with_pipelined_writer(self, enabled: bool = True) -> "CapsPipelineBuilder":
+        """
+        Writes the video with the decoding of the input video, the compositing of the subtitles and the encoding in parallel
+        threads, connected by bounded queues. The video is the same, and it's usually written faster on multi-core machines.
+        """
+        self._caps_pipeline._video_generator.set_pipelined_writing(enabled)
+        return self
+
+    def with_chunked_rendering(self, chunks: int, jobs: Optional[int] = None) -> "CapsPipelineBuilder":
+        """
+        Splits the video in chunks (cut at keyframes, preferably without subtitles on screen) rendered in parallel processes,
+        each one with its own encoder. The chunks are joined without re-encoding, and the audio is added once for the whole video.
+
+        Args:
+            chunks: Number of chunks of the video.
+            jobs: (Optional) Max chunks rendered at the same time. By default, the number of chunks (up to the number of CPUs).
+        """
+        if chunks < 1:
+            raise ValueError(f"Chunks must be greater than 0: {chunks}")
+        if jobs is not None and jobs < 1:
+            raise ValueError(f"Jobs must be greater than 0: {jobs}")
+        self._caps_pipeline._video_generator.set_chunked_rendering(chunks, jobs)
+        return self
+
+    def with_render_cache_budget(self, budget: Union[str, int]) -> "CapsPipelineBuilder":
+        """
+        Limits the memory used by each in-memory cache of the renderer (rendered images and letter sizes).
+        When a cache exceeds it, the least recently used entries are evicted (and rendered again if they are needed later).
+        By default, the caches are unbounded.
+
+        Args:
+            budget: Max size of each cache, in bytes or as a string like "512MB" or "2GB".
+        """
+        self._caps_pipeline._render_cache_budget = parse_size(budget)
+        return self
+
+    def with_persistent_cache(self, cache_dir: Optional[str] = None, max_size: int = PersistentImageCache.DEFAULT_MAX_SIZE) -> "CapsPipelineBuilder":
+        """
+        Stores the rendered word images on disk, so they are reused by the next runs with the same CSS and resources.
+
+        Args:
+            cache_dir: (Optional) Cache directory. By default, a folder in the user cache dir.
+            max_size: (Optional) Max size of the cache in bytes. The least recently used images are removed when it's exceeded.
+        """
+        self._caps_pipeline._persistent_cache = PersistentImageCache(Path(cache_dir) if cache_dir else None, max_size)
+        return self
+
     def with_subtitle_data_path(self, subtitle_data_path: str) -> "CapsPipelineBuilder":
         if subtitle_data_path and not os.path.exists(subtitle_data_path):
             raise ValueError(f"Subtitle data file not found: {subtitle_data_path}")
@@ -3,11 +3,27 @@ from .css_subtitle_renderer import CssSubtitleRenderer
 from .previewer import CssSubtitlePreviewer
 from .subtitle_renderer import SubtitleRenderer
 from .pictex_subtitle_renderer import PictexSubtitleRenderer
+from .pillow_subtitle_renderer import PillowSubtitleRenderer
+from .subtitle_renderer_pool import SubtitleRendererPool
+from .async_css_subtitle_renderer import AsyncCssSubtitleRenderer
+from .async_subtitle_renderer_adapter import AsyncSubtitleRendererAdapter
+from .persistent_image_cache import PersistentImageCache
+from .image_array_converter import ImageArrayConverter
+from .renderer_daemon import RendererDaemon
+from .font_subsetter import FontSubsetter
 
 __all__ = [
     "CssSubtitleRenderer",
     "CssSubtitlePreviewer",
     "SubtitleRenderer",
     "PictexSubtitleRenderer",
+    "PillowSubtitleRenderer",
+    "SubtitleRendererPool",
+    "AsyncCssSubtitleRenderer",
+    "AsyncSubtitleRendererAdapter",
+    "PersistentImageCache",
+    "ImageArrayConverter",
+    "RendererDaemon",
+    "FontSubsetter",
 ]
 
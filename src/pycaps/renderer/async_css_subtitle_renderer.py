@@ -0,0 +1,238 @@
+import asyncio
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Optional, TYPE_CHECKING, Tuple, Dict, List
+from pycaps.common import Word, ElementState, Line, Size, CacheStrategy
+from .rendered_image_cache import RenderedImageCache
+from .playwright_screenshot_capturer import PlaywrightScreenshotCapturer
+from .renderer_page import RendererPage
+from .letter_size_cache import LetterSizeCache
+from .css_subtitle_renderer import CssSubtitleRenderer
+from pycaps.logger import logger
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page, Browser, Playwright
+    from PIL.Image import Image
+    from .persistent_image_cache import PersistentImageCache
+
+class AsyncCssSubtitleRenderer:
+    """
+    Renders subtitles using HTML and CSS via the async API of Playwright.
+
+    Unlike CssSubtitleRenderer, it opens several pages in the same browser, so several lines can be rendered at the same time:
+    while a page is waiting for Chromium (DOM updates, screenshots), the others keep sending requests.
+    The PNG decoding is done in a thread executor, so it doesn't block the event loop either.
+
+    All the methods must be called from the same event loop. Use AsyncSubtitleRendererAdapter to use it as a SubtitleRenderer.
+    """
+
+    DEFAULT_PAGES: int = 4
+
+    def __init__(self, pages: int = DEFAULT_PAGES):
+        """
+        Args:
+            pages: Number of pages (lines rendered at the same time).
+        """
+        if pages < 1:
+            raise ValueError(f"Invalid number of pages: {pages}")
+
+        self._pages_count: int = pages
+        self._playwright_context: Optional['Playwright'] = None
+        self._browser: Optional['Browser'] = None
+        self._pages: List['Page'] = []
+        self._free_pages: Optional[asyncio.Queue] = None
+        self._tempdir: Optional[tempfile.TemporaryDirectory] = None
+        self._custom_css: str = ""
+        self._image_cache: RenderedImageCache = None
+        self._persistent_cache: Optional['PersistentImageCache'] = None
+        self._cache_budget: Optional[int] = None
+        self._letter_size_cache: LetterSizeCache = None
+        self._renderer_page: RendererPage = RendererPage()
+        self._device_scale_factor: float = CssSubtitleRenderer.BASE_DEVICE_SCALE_FACTOR
+        # changes of the last call to the page runtime of each page (by page id), undone by the next call (see CssSubtitleRenderer)
+        self._pending_line_changes: Dict[int, List] = {}
+
+    @property
+    def pages_count(self) -> int:
+        return self._pages_count
+
+    def append_css(self, css: str):
+        self._custom_css += css
+
+    def get_css(self) -> str:
+        return self._custom_css
+
+    def set_persistent_cache(self, persistent_cache: Optional['PersistentImageCache']) -> None:
+        self._persistent_cache = persistent_cache
+
+    def set_cache_budget(self, max_bytes: Optional[int]) -> None:
+        self._cache_budget = max_bytes
+
+    def copy(self) -> 'AsyncCssSubtitleRenderer':
+        renderer = AsyncCssSubtitleRenderer(self._pages_count)
+        renderer.append_css(self._custom_css)
+        renderer.set_persistent_cache(self._persistent_cache)
+        renderer.set_cache_budget(self._cache_budget)
+        return renderer
+
+    async def open(self, video_width: int, video_height: int, resources_dir: Optional[Path] = None, cache_strategy: CacheStrategy = CacheStrategy.CSS_CLASSES_AWARE):
+        """Launches the browser and loads the base HTML page in each page."""
+        from playwright.async_api import async_playwright
+
+        if self._pages:
+            raise RuntimeError("Renderer is already open. Call close() first.")
+
+        scale_modifier = video_height / CssSubtitleRenderer.REFERENCE_VIDEO_HEIGHT
+        scale_modifier = max(CssSubtitleRenderer.MIN_SCALE_MODIFIER, min(CssSubtitleRenderer.MAX_SCALE_MODIFIER, scale_modifier))
+        self._device_scale_factor = CssSubtitleRenderer.BASE_DEVICE_SCALE_FACTOR * scale_modifier
+        calculated_vp_height = max(CssSubtitleRenderer.DEFAULT_MIN_VIEWPORT_HEIGHT, int(video_height * CssSubtitleRenderer.DEFAULT_VIEWPORT_HEIGHT_RATIO))
+
+        if cache_strategy == CacheStrategy.AUTO:
+            # the pages render several lines at the same time, so there is no page free to probe: the position is always part of the key
+            logger().debug("The async renderer doesn't probe the cache strategy: using the position aware cache strategy.")
+        self._letter_size_cache = LetterSizeCache(self._custom_css, self._cache_budget)
+        self._tempdir = tempfile.TemporaryDirectory()
+        if resources_dir:
+            if not resources_dir.is_dir():
+                raise RuntimeError(f"Resources path is not a directory: {resources_dir}")
+            shutil.copytree(resources_dir, Path(self._tempdir.name), dirs_exist_ok=True)
+        html_path = Path(self._tempdir.name) / "renderer_base.html"
+        html_path.write_text(self._renderer_page.get_html(custom_css=self._custom_css), encoding="utf-8")
+
+        self._playwright_context = await async_playwright().start()
+        try:
+            self._browser = await self._playwright_context.chromium.launch()
+        except Exception as e:
+            raise RuntimeError(
+                "Playwright Chromium browser is not installed or failed to launch.\n"
+                "You can install it by running:\n\n"
+                "    playwright install chromium\n\n"
+                f"Full error:\n{str(e)}"
+            ) from e
+
+        # same browser and page as CssSubtitleRenderer, so the images are the same
+        persistent_namespace = None
+        if self._persistent_cache:
+            engine_version = f"chromium={self._browser.version}"
+            persistent_namespace = self._persistent_cache.get_namespace(CssSubtitleRenderer.PERSISTENT_CACHE_BACKEND, self._custom_css, resources_dir, self._device_scale_factor, engine_version)
+        self._image_cache = RenderedImageCache(self._custom_css, cache_strategy, self._persistent_cache, persistent_namespace, self._cache_budget)
+
+        context = await self._browser.new_context(device_scale_factor=self._device_scale_factor, viewport={"width": video_width, "height": calculated_vp_height})
+        self._pages = await asyncio.gather(*[context.new_page() for _ in range(self._pages_count)])
+        await asyncio.gather(*[self._load_page(page, html_path) for page in self._pages])
+        self._free_pages = asyncio.Queue()
+        for page in self._pages:
+            self._free_pages.put_nowait(page)
+
+    async def _load_page(self, page: 'Page', html_path: Path) -> None:
+        await page.goto(html_path.as_uri())
+        await page.wait_for_load_state('networkidle')
+
+    async def acquire_page(self) -> 'Page':
+        """Waits until a page is free and reserves it. The page must be returned with release_page()."""
+        if not self._free_pages:
+            raise RuntimeError("Renderer is not open. Call open() first.")
+        return await self._free_pages.get()
+
+    def release_page(self, page: 'Page') -> None:
+        """Returns a page reserved with acquire_page(). It must be called from the event loop thread."""
+        self._free_pages.put_nowait(page)
+
+    async def _call_runtime(self, page: 'Page', name: str, *args: Any) -> Any:
+        """Calls a function of the page runtime (see RendererPage.RUNTIME_SCRIPT)."""
+        return await page.evaluate(RendererPage.RUNTIME_CALL_SCRIPT, [name, list(args)])
+
+    async def open_line(self, page: 'Page', line: Line, line_state: ElementState) -> None:
+        line_css_classes = self._renderer_page.get_line_css_classes(line.get_segment().get_tags(), line.get_tags())
+        words_css_classes = [self._renderer_page.get_word_css_classes(word.get_tags(), index) for index, word in enumerate(line.words)]
+        # the line is built again, so the changes of the previous calls are gone
+        self._pending_line_changes.pop(id(page), None)
+        await self._call_runtime(page, "openLineWords", [word.text for word in line.words], line_css_classes, words_css_classes, RendererPage.get_state_index(line_state))
+
+    async def render_word(self, page: 'Page', line: Line, line_state: ElementState, index: int, word: Word, state: ElementState, first_n_letters: Optional[int] = None) -> Optional['Image']:
+        line_css_classes = self._renderer_page.get_line_css_classes(line.get_segment().get_tags(), line.get_tags(), line_state)
+        word_css_classes = self._renderer_page.get_word_css_classes(word.get_tags(), index, state)
+        all_css_classes = line_css_classes + " " + word_css_classes
+        if self._image_cache.has(index, word.text, all_css_classes, first_n_letters):
+            return self._image_cache.get(index, word.text, all_css_classes, first_n_letters)
+
+        state_index = RendererPage.get_state_index(state)
+        pending_line_changes = self._pending_line_changes.pop(id(page), RendererPage.get_empty_line_changes())
+        word_bounding_box = await self._call_runtime(page, "renderWord", pending_line_changes, index, state_index, first_n_letters if first_n_letters else None)
+        # the state (and the letters) of the word are undone with the next call
+        self._pending_line_changes[id(page)] = [None, [index, state_index], None]
+        try:
+            if word_bounding_box["width"] <= 0 or word_bounding_box["height"] <= 0:
+                # HTML element is not visible (probably hidden by CSS).
+                self._image_cache.set(index, word.text, all_css_classes, first_n_letters, None)
+                return None
+
+            clip = PlaywrightScreenshotCapturer.get_clip(word_bounding_box)
+            png_bytes = await page.screenshot(**PlaywrightScreenshotCapturer.get_screenshot_options(clip))
+        except Exception as e:
+            raise RuntimeError(f"Error rendering word '{word.text}': {e}")
+
+        # the page is not needed to decode the image, so the next request can be sent meanwhile
+        image = await asyncio.get_running_loop().run_in_executor(None, PlaywrightScreenshotCapturer.decode, png_bytes)
+        self._image_cache.set(index, word.text, all_css_classes, first_n_letters, image)
+        return image
+
+    async def preload_word_sizes(self, words: List[Word]) -> None:
+        groups = self._renderer_page.get_letters_to_measure(words, self._letter_size_cache)
+        if not groups:
+            return
+
+        page = await self.acquire_page()
+        try:
+            for start in range(0, len(groups), RendererPage.MEASURE_LETTERS_BATCH_SIZE):
+                batch = groups[start:start + RendererPage.MEASURE_LETTERS_BATCH_SIZE]
+                batch_letters_size: List[Dict] = await page.evaluate(RendererPage.MEASURE_LETTERS_SCRIPT, batch)
+                for (_, line_css_classes, word_css_classes), letters_size in zip(batch, batch_letters_size):
+                    self._letter_size_cache.set_all({letter: Size(size['width'], size['height']) for letter, size in letters_size.items()}, line_css_classes + " " + word_css_classes)
+        finally:
+            self.release_page(page)
+
+    async def get_word_size(self, word: Word, line_state: ElementState, word_state: ElementState) -> Tuple[int, int]:
+        line_css_classes = self._renderer_page.get_line_css_classes(word.get_segment().get_tags(), word.get_line().get_tags(), line_state)
+        word_css_classes = self._renderer_page.get_word_css_classes(word.get_tags(), word_state=word_state)
+        all_css_classes = line_css_classes + " " + word_css_classes
+
+        letters = list(word.text) + [RendererPage.NON_CONTENT_WIDTH_LETTER]
+        not_cached_letters = [letter for letter in letters if not self._letter_size_cache.has(letter, all_css_classes)]
+        if not_cached_letters:
+            page = await self.acquire_page()
+            try:
+                new_letters_size: Dict = (await page.evaluate(RendererPage.MEASURE_LETTERS_SCRIPT, [[not_cached_letters, line_css_classes, word_css_classes]]))[0]
+            finally:
+                self.release_page(page)
+            new_letters_size = {letter: Size(size['width'], size['height']) for letter, size in new_letters_size.items()}
+            self._letter_size_cache.set_all(new_letters_size, all_css_classes)
+        else:
+            new_letters_size = {}
+
+        # the new letters aren't read from the cache, since they could be evicted already (cache budget)
+        letters_size = {letter: new_letters_size[letter] if letter in new_letters_size else self._letter_size_cache.get(letter, all_css_classes) for letter in letters}
+        width = sum(s.width for s in letters_size.values())
+        height = max(s.height for s in letters_size.values())
+
+        # This is not precise, but it is enough to create the basic structure
+        return int(width * self._device_scale_factor), int(height * self._device_scale_factor)
+
+    async def close(self) -> None:
+        """Closes Playwright and cleans up resources."""
+        if self._cache_budget and self._pages:
+            self._image_cache.log_stats()
+            self._letter_size_cache.log_stats()
+        if self._browser:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright_context:
+            await self._playwright_context.stop()
+            self._playwright_context = None
+        if self._tempdir:
+            self._tempdir.cleanup()
+            self._tempdir = None
+        self._pages = []
+        self._free_pages = None
+        self._pending_line_changes = {}
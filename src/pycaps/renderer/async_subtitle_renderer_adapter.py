@@ -0,0 +1,158 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple, TYPE_CHECKING, Callable, List, Coroutine, Any
+from pycaps.common import Word, ElementState, Line, CacheStrategy
+from .subtitle_renderer import SubtitleRenderer, T
+from .async_css_subtitle_renderer import AsyncCssSubtitleRenderer
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+    from playwright.async_api import Page
+    from .persistent_image_cache import PersistentImageCache
+
+class AsyncSubtitleRendererAdapter(SubtitleRenderer):
+    """
+    Exposes an AsyncCssSubtitleRenderer through the (blocking) SubtitleRenderer interface.
+
+    The async renderer lives in an event loop running in a background thread, and each blocking call is sent to that loop.
+    render_lines() runs each line in its own thread, so the requests of several lines are in flight at the same time.
+    The requests only overlap across lines: inside a line, the words are rendered one after the other, since the callers
+    of the SubtitleRenderer interface wait for each render_word() result before requesting the next one.
+    """
+
+    def __init__(self, renderer: Optional[AsyncCssSubtitleRenderer] = None):
+        self._renderer: AsyncCssSubtitleRenderer = renderer if renderer else AsyncCssSubtitleRenderer()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._main_session: _AsyncLineSession = _AsyncLineSession(self)
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Runs the coroutine in the renderer event loop and waits for its result."""
+        if not self._loop:
+            coroutine.close()
+            raise RuntimeError("Renderer is not open. Call open() first.")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def call_soon(self, callback: Callable[..., Any], *args: Any) -> None:
+        """Schedules a (non async) callback in the renderer event loop."""
+        if not self._loop:
+            raise RuntimeError("Renderer is not open. Call open() first.")
+        self._loop.call_soon_threadsafe(callback, *args)
+
+    @property
+    def async_renderer(self) -> AsyncCssSubtitleRenderer:
+        return self._renderer
+
+    def append_css(self, css: str):
+        self._renderer.append_css(css)
+
+    def get_css(self) -> Optional[str]:
+        return self._renderer.get_css()
+
+    def open(self, video_width: int, video_height: int, resources_dir: Optional[Path] = None, cache_strategy: CacheStrategy = CacheStrategy.CSS_CLASSES_AWARE):
+        if self._loop:
+            raise RuntimeError("Renderer is already open. Call close() first.")
+
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="pycaps-async-renderer", daemon=True)
+        self._loop_thread.start()
+        self.run(self._renderer.open(video_width, video_height, resources_dir, cache_strategy))
+
+    def open_line(self, line: Line, line_state: ElementState):
+        self._main_session.open_line(line, line_state)
+
+    def render_word(self, index: int, word: Word, state: ElementState, first_n_letters: Optional[int] = None) -> Optional['Image']:
+        return self._main_session.render_word(index, word, state, first_n_letters)
+
+    def close_line(self):
+        self._main_session.close_line()
+
+    def get_word_size(self, word: Word, line_state: ElementState, word_state: ElementState) -> Tuple[int, int]:
+        return self.run(self._renderer.get_word_size(word, line_state, word_state))
+
+    def preload_word_sizes(self, words: List[Word]) -> None:
+        self.run(self._renderer.preload_word_sizes(words))
+
+    def render_lines(self, lines: List[Line], render_line_fn: Callable[[SubtitleRenderer, Line], T]) -> List[T]:
+        with ThreadPoolExecutor(max_workers=self._renderer.pages_count, thread_name_prefix="pycaps-async-line") as executor:
+            return list(executor.map(lambda line: render_line_fn(_AsyncLineSession(self), line), lines))
+
+    def set_persistent_cache(self, persistent_cache: Optional['PersistentImageCache']) -> None:
+        self._renderer.set_persistent_cache(persistent_cache)
+
+    def set_cache_budget(self, max_bytes: Optional[int]) -> None:
+        self._renderer.set_cache_budget(max_bytes)
+
+    def copy(self) -> 'AsyncSubtitleRendererAdapter':
+        return AsyncSubtitleRendererAdapter(self._renderer.copy())
+
+    def close(self):
+        if not self._loop:
+            return
+        try:
+            self.run(self._renderer.close())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+            self._loop_thread = None
+
+class _AsyncLineSession(SubtitleRenderer):
+    """
+    A line session over one page of the async renderer.
+    The page is reserved in open_line() and released in close_line().
+    """
+
+    def __init__(self, adapter: AsyncSubtitleRendererAdapter):
+        self._adapter: AsyncSubtitleRendererAdapter = adapter
+        self._page: Optional['Page'] = None
+        self._current_line: Optional[Line] = None
+        self._current_line_state: Optional[ElementState] = None
+
+    def append_css(self, css: str):
+        raise RuntimeError("CSS can't be appended to a line session.")
+
+    def open(self, video_width: int, video_height: int, resources_dir: Optional[Path] = None, cache_strategy: CacheStrategy = CacheStrategy.CSS_CLASSES_AWARE):
+        raise RuntimeError("A line session can't be opened, it's opened by its renderer.")
+
+    def open_line(self, line: Line, line_state: ElementState):
+        if self._current_line:
+            raise RuntimeError("A line is already open. Call close_line() first.")
+
+        renderer = self._adapter.async_renderer
+        page = self._adapter.run(renderer.acquire_page())
+        try:
+            self._adapter.run(renderer.open_line(page, line, line_state))
+        except BaseException:
+            # the line can't be closed, so the page is released here (otherwise no other line could use it)
+            self._adapter.call_soon(renderer.release_page, page)
+            raise
+        self._page = page
+        self._current_line = line
+        self._current_line_state = line_state
+
+    def render_word(self, index: int, word: Word, state: ElementState, first_n_letters: Optional[int] = None) -> Optional['Image']:
+        if not self._current_line:
+            raise RuntimeError("No line is open. Call open_line() first.")
+
+        renderer = self._adapter.async_renderer
+        return self._adapter.run(renderer.render_word(self._page, self._current_line, self._current_line_state, index, word, state, first_n_letters))
+
+    def close_line(self):
+        if not self._current_line:
+            raise RuntimeError("No line is open. Call open_line() first.")
+
+        page = self._page
+        self._page = None
+        self._current_line = None
+        self._current_line_state = None
+        self._adapter.call_soon(self._adapter.async_renderer.release_page, page)
+
+    def get_word_size(self, word: Word, line_state: ElementState, word_state: ElementState) -> Tuple[int, int]:
+        return self._adapter.get_word_size(word, line_state, word_state)
+
+    def close(self):
+        pass
@@ -0,0 +1,61 @@
+import re
+import threading
+from typing import Dict, List, Optional, TYPE_CHECKING
+from pycaps.logger import logger
+from .css_class_analyzer import CssClassAnalyzer
+
+if TYPE_CHECKING:
+    import numpy as np
+
+class CacheStrategyProber:
+    """
+    Decides the cache strategy of CacheStrategy.AUTO, for each combination of CSS classes.
+
+    The renderer renders a sample word at different positions of a line, and the prober compares the pixels:
+    if all the images are identical, the position is ignored in the cache keys of that classes (like CSS_CLASSES_AWARE),
+    otherwise the position is part of the keys (like POSITION_AWARE). Classes without a decision are position aware.
+    """
+
+    # words of the line rendered by the renderers to probe a classes combination (the sample word is rendered in all of them)
+    PROBE_LINE_WORDS: int = 3
+    _WORD_INDEX_CSS_CLASS_PATTERN = re.compile(r"(?<!\S)word-\d+-in-line(?!\S)")
+
+    def __init__(self, css_content: str):
+        self._css_class_analyzer = CssClassAnalyzer.get(css_content)
+        self._position_sensitivity: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def is_decided(self, css_classes: str) -> bool:
+        return self._get_key(css_classes) in self._position_sensitivity
+
+    def is_position_sensitive(self, css_classes: str) -> bool:
+        return self._position_sensitivity.get(self._get_key(css_classes), True)
+
+    def decide(self, css_classes: str, images: List[Optional['np.ndarray']]) -> bool:
+        """
+        Receives the images of the same word rendered at different positions, and returns True if the position changes the pixels.
+        The decision is stored and logged.
+        """
+        import numpy as np
+
+        first_image = images[0]
+        is_position_sensitive = any(
+            (image is None) != (first_image is None) or (image is not None and not np.array_equal(image, first_image))
+            for image in images[1:]
+        )
+
+        key = self._get_key(css_classes)
+        with self._lock:
+            self._position_sensitivity[key] = is_position_sensitive
+        strategy = "position-aware" if is_position_sensitive else "css-classes-aware"
+        logger().info(f"Cache strategy for CSS classes [{key}]: {strategy} (images at {len(images)} line positions are {'different' if is_position_sensitive else 'pixel-identical'}).")
+        return is_position_sensitive
+
+    def get_decisions(self) -> Dict[str, bool]:
+        """Returns the decisions made: the CSS classes key, and if the position is part of the cache keys."""
+        with self._lock:
+            return dict(self._position_sensitivity)
+
+    def _get_key(self, css_classes: str) -> str:
+        # the word position is what is being probed, so its class is not part of the key
+        return self._css_class_analyzer.get_key(self._WORD_INDEX_CSS_CLASS_PATTERN.sub("", css_classes))
@@ -0,0 +1,191 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+from pycaps.common import ElementState
+from pycaps.logger import logger
+
+class CssClassAnalyzer:
+    """
+    Static analysis of a stylesheet, used to build the cache keys of the rendered images and letter sizes.
+
+    It parses the CSS once and finds:
+     - The classes used by the selectors: the other classes can't change the style, so they are ignored in the keys.
+     - The equivalent states: two word (or line) states are equivalent when they appear in exactly the same rules, in the same
+       position of the same selectors (e.g. `.word-not-narrated-yet, .word-already-narrated { ... }` or when none of them is used).
+       Equivalent states are replaced by the same one in the keys, so they share the render.
+
+    The analysis is conservative: if the stylesheet can't be parsed, or it selects classes by attribute (`[class*=...]`),
+    all the classes are considered used and no states are merged.
+    """
+
+    # at-rules whose block contains style rules
+    NESTED_AT_RULES: Tuple[str, ...] = ("@media", "@supports", "@container", "@layer", "@document")
+    _COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.DOTALL)
+    _CLASS_PATTERN = re.compile(r"\.(-?[_a-zA-Z][_a-zA-Z0-9-]*)")
+    _CLASS_ATTRIBUTE_PATTERN = re.compile(r"\[\s*class\b")
+    _PLACEHOLDER: str = "\0"
+
+    def __init__(self, css_content: str):
+        self._is_conservative: bool = False
+        self._used_classes: Set[str] = set()
+        self._canonical_states: Dict[str, str] = {}
+        self._keys: Dict[str, str] = {}
+
+        try:
+            rules = self._parse_rules(self._COMMENT_PATTERN.sub("", css_content))
+        except ValueError as e:
+            logger().warning(f"The CSS can't be analyzed, so the render cache won't merge equivalent states: {e}")
+            self._is_conservative = True
+            return
+
+        if any(self._CLASS_ATTRIBUTE_PATTERN.search(selector) for selector, _ in rules):
+            self._is_conservative = True
+            return
+
+        for selector, _ in rules:
+            self._used_classes.update(self._CLASS_PATTERN.findall(selector))
+        self._canonical_states = self._find_canonical_states(rules)
+
+    @staticmethod
+    @lru_cache(maxsize=16)
+    def get(css_content: str) -> 'CssClassAnalyzer':
+        """Returns the (shared) analyzer of a stylesheet, so each stylesheet is parsed only once."""
+        return CssClassAnalyzer(css_content)
+
+    def is_used(self, css_class: str) -> bool:
+        return self._is_conservative or css_class in self._used_classes
+
+    def get_canonical_class(self, css_class: str) -> str:
+        return self._canonical_states.get(css_class, css_class)
+
+    def has_equivalent_word_states(self) -> bool:
+        """Returns True if all the word states get the same style, so a word looks the same during the whole line state."""
+        if self._is_conservative:
+            return False
+        return len({self.get_canonical_class(state.value) for state in ElementState.get_all_word_states()}) == 1
+
+    def get_key(self, css_classes: str) -> str:
+        """
+        Returns a canonical key of a set of CSS classes: two class sets with the same key get the same style.
+        Unused classes are removed and equivalent states are replaced by a single one.
+        """
+        key = self._keys.get(css_classes)
+        if key is None:
+            canonical_classes: List[str] = []
+            for css_class in css_classes.split():
+                if not self.is_used(css_class):
+                    continue
+                canonical_class = self.get_canonical_class(css_class)
+                if canonical_class not in canonical_classes:
+                    canonical_classes.append(canonical_class)
+            key = ','.join(canonical_classes)
+            self._keys[css_classes] = key
+        return key
+
+    def _find_canonical_states(self, rules: List[Tuple[str, str]]) -> Dict[str, str]:
+        canonical_states: Dict[str, str] = {}
+        for states in [ElementState.get_all_word_states(), ElementState.get_all_line_states()]:
+            signatures: Dict[Tuple, str] = {}
+            for state in states:
+                signature = self._get_class_signature(state.value, rules)
+                if signature in signatures:
+                    canonical_states[state.value] = signatures[signature]
+                else:
+                    signatures[signature] = state.value
+
+        merged = [f"{state} -> {canonical}" for state, canonical in canonical_states.items()]
+        if merged:
+            logger().debug(f"Equivalent render states found in CSS: {', '.join(merged)}")
+        return canonical_states
+
+    def _get_class_signature(self, css_class: str, rules: List[Tuple[str, str]]) -> Tuple:
+        """
+        Returns the rules where the class is used, with the class replaced by a placeholder.
+        The rule position is included, so the cascade order is taken into account too.
+        """
+        class_pattern = re.compile(r"\." + re.escape(css_class) + r"(?![_a-zA-Z0-9-])")
+        signature = []
+        for position, (selector, declarations) in enumerate(rules):
+            for single_selector in self._split_selector_list(selector):
+                if class_pattern.search(single_selector):
+                    signature.append((position, class_pattern.sub(self._PLACEHOLDER, single_selector), declarations))
+        return tuple(signature)
+
+    def _parse_rules(self, css: str, prefix: str = "") -> List[Tuple[str, str]]:
+        """Returns the (selector, declarations) style rules, including the ones nested in @media, @supports, etc."""
+        rules: List[Tuple[str, str]] = []
+        position = 0
+        while position < len(css):
+            block_start = self._find_unquoted(css, "{;", position)
+            if block_start is None:
+                if css[position:].strip():
+                    raise ValueError(f"unexpected content at the end: '{css[position:].strip()[:50]}'")
+                break
+
+            prelude = " ".join(css[position:block_start].split())
+            if css[block_start] == ";":
+                # at-rules without block, like @import or @charset
+                if not prelude.startswith("@"):
+                    raise ValueError(f"unexpected declaration outside a rule: '{prelude[:50]}'")
+                position = block_start + 1
+                continue
+
+            block_end = self._find_block_end(css, block_start)
+            block = css[block_start + 1:block_end]
+            if prelude.startswith("@"):
+                if prelude.lower().startswith(self.NESTED_AT_RULES):
+                    # the at-rule prelude is part of the selector, since the same selector inside a @media is a different rule
+                    rules.extend(self._parse_rules(block, f"{prefix}{prelude} "))
+            elif self._find_unquoted(block, "{", 0) is not None:
+                raise ValueError(f"nested rules are not supported: '{prelude[:50]}'")
+            else:
+                rules.append((prefix + prelude, " ".join(block.split())))
+            position = block_end + 1
+        return rules
+
+    def _find_block_end(self, css: str, block_start: int) -> int:
+        depth = 0
+        position = block_start
+        while True:
+            position = self._find_unquoted(css, "{}", position)
+            if position is None:
+                raise ValueError("unbalanced braces")
+            depth += 1 if css[position] == "{" else -1
+            if depth == 0:
+                return position
+            position += 1
+
+    def _find_unquoted(self, css: str, characters: str, start: int) -> Optional[int]:
+        quote: Optional[str] = None
+        position = start
+        while position < len(css):
+            character = css[position]
+            if quote:
+                if character == "\\":
+                    position += 1
+                elif character == quote:
+                    quote = None
+            elif character in "\"'":
+                quote = character
+            elif character in characters:
+                return position
+            position += 1
+        return None
+
+    def _split_selector_list(self, selector: str) -> List[str]:
+        # commas inside parentheses (like in ":is(.a, .b)") don't split the list
+        selectors = []
+        depth = 0
+        current = ""
+        for character in selector:
+            if character == "(":
+                depth += 1
+            elif character == ")":
+                depth -= 1
+            if character == "," and depth == 0:
+                selectors.append(current.strip())
+                current = ""
+            else:
+                current += character
+        selectors.append(current.strip())
+        return selectors
@@ -1,17 +1,25 @@
 from pathlib import Path
+import math
 import tempfile
-from typing import Optional, TYPE_CHECKING, Tuple, Dict
+from typing import Any, Callable, Optional, TYPE_CHECKING, Tuple, Dict, List
 from pycaps.common import Word, ElementState, Line, Size, CacheStrategy
 import shutil
 from .rendered_image_cache import RenderedImageCache
 from .playwright_screenshot_capturer import PlaywrightScreenshotCapturer
 from .renderer_page import RendererPage
 from .letter_size_cache import LetterSizeCache
-from .subtitle_renderer import SubtitleRenderer
+from .subtitle_renderer import SubtitleRenderer, T
+from .image_array_converter import ImageArrayConverter
+from .cache_strategy_prober import CacheStrategyProber
+from .renderer_daemon import RendererDaemon
+from .font_subsetter import FontSubsetter
+from pycaps.logger import logger
 
 if TYPE_CHECKING:
-    from playwright.sync_api import Page, Browser, Playwright
+    import numpy as np
+    from playwright.sync_api import Page, Browser, Playwright, CDPSession
     from PIL.Image import Image
+    from .persistent_image_cache import PersistentImageCache
 
 class CssSubtitleRenderer(SubtitleRenderer):
 
@@ -21,27 +29,73 @@ class CssSubtitleRenderer(SubtitleRenderer):
     MAX_SCALE_MODIFIER: float = 5.0
     DEFAULT_VIEWPORT_HEIGHT_RATIO: float = 0.25
     DEFAULT_MIN_VIEWPORT_HEIGHT: int = 150
+    PERSISTENT_CACHE_BACKEND: str = "playwright-chromium"
+    # Max height (in device pixels) of the tall viewport used by the tiles
+    MAX_TILES_CAPTURE_HEIGHT: int = 16384
 
-    def __init__(self, browser: Optional['Browser'] = None):
+    def __init__(self, browser: Optional['Browser'] = None, line_strip: bool = False, use_renderer_daemon: bool = True, tile_lines: int = 0):
         """
         Renders subtitles using HTML and CSS via Playwright.
 
         Args:
             browser: (Optional) A pre-launched Playwright browser instance.
+            line_strip: (Optional) If True, the whole line is captured in a single screenshot for each word state,
+                and the word images are sliced from it. It's faster, but all the words of the line share the state
+                while being captured, so it shouldn't be used if the word images depend on the size of the other words.
+            use_renderer_daemon: (Optional) If True and there is a renderer daemon running (`pycaps renderer-daemon`),
+                its browser and its loaded template pages are used instead of launching a new browser.
+            tile_lines: (Optional) If greater than 0, render_lines() stacks groups of this many lines, with all their states,
+                in a tall page, and captures each group in a single screenshot that is sliced into the word images.
+                Like line_strip, all the words of a line share the state while being captured. The tiles are used by
+                render_word_array() (the video clips), and the viewport grows as needed, so templates sized with vh units shouldn't use it.
         """
 
         self._playwright_context: Optional[Playwright] = None
         self._browser: Optional['Browser'] = browser
         self._page: Optional[Page] = None
+        self._cdp_session: Optional['CDPSession'] = None
+        # page.screenshot(omit_background=True) resets the background when it finishes, so the array captures need to set it again
+        self._is_cdp_background_transparent: bool = False
         self._tempdir: Optional[tempfile.TemporaryDirectory] = None
         self._custom_css: str = ""
         self._cache_strategy = CacheStrategy.CSS_CLASSES_AWARE
         self._image_cache: RenderedImageCache = None
+        self._image_array_cache: RenderedImageCache = None
+        self._cache_strategy_prober: Optional[CacheStrategyProber] = None
+        self._persistent_cache: Optional['PersistentImageCache'] = None
+        self._cache_budget: Optional[int] = None
+        self._rendered_text: Optional[str] = None
+        # fonts of the resources used by the CSS (relative paths), preloaded by the page
+        self._preload_fonts: List[str] = []
         self._letter_size_cache: LetterSizeCache = None
         self._current_line: Optional[Line] = None
         self._current_line_state: Optional[ElementState] = None
         self._renderer_page: RendererPage = RendererPage()
         self._device_scale_factor: float = self.BASE_DEVICE_SCALE_FACTOR
+        self._line_strip: bool = line_strip
+        self._use_renderer_daemon: bool = use_renderer_daemon
+        # token of the lease of the renderer daemon page (None if the page isn't a daemon page)
+        self._daemon_lease_token: Optional[str] = None
+        self._line_strip_images: Dict[ElementState, List[Optional['Image']]] = {}
+        self._line_strip_arrays: Dict[ElementState, List[Optional['np.ndarray']]] = {}
+        if tile_lines < 0:
+            raise ValueError(f"Invalid tile lines: {tile_lines}")
+        self._tile_lines: int = tile_lines
+        # word images of the current group of tiles, by (line id, line state, word state)
+        self._tile_arrays: Dict[Tuple[int, ElementState, ElementState], List[Optional['np.ndarray']]] = {}
+        self._viewport_width: int = 0
+        self._viewport_height: int = 0
+        # the line built in the page (text, line CSS classes and words CSS classes): it's kept between the line states, only the classes change
+        self._loaded_line: Optional[Tuple[str, str, Tuple[str, ...]]] = None
+        # changes sent with the next runtime call on the line (see RendererPage.RUNTIME_SCRIPT)
+        self._pending_line_changes: List = RendererPage.get_empty_line_changes()
+        # lines uploaded to the page runtime (kept so their ids aren't reused), and their index there by id
+        self._uploaded_lines: List[Line] = []
+        self._uploaded_line_ids: Dict[int, int] = {}
+        # browser round-trips (scripts evaluated, screenshots, CDP commands) and open_line() calls, to measure the render cost
+        self._round_trips: int = 0
+        self._line_opens: int = 0
+        self._line_loads: int = 0
 
     def _calculate_scale_modifier(self, video_height: int) -> float:
         """Calculates a scale modifier based on video height relative to reference."""
@@ -51,6 +105,36 @@ class CssSubtitleRenderer(SubtitleRenderer):
     def append_css(self, css: str):
         self._custom_css += css
 
+    def get_css(self) -> Optional[str]:
+        return self._custom_css
+
+    def set_persistent_cache(self, persistent_cache: Optional['PersistentImageCache']) -> None:
+        self._persistent_cache = persistent_cache
+
+    def set_cache_budget(self, max_bytes: Optional[int]) -> None:
+        self._cache_budget = max_bytes
+
+    def set_rendered_text(self, text: Optional[str]) -> None:
+        self._rendered_text = text
+
+    def set_line_strip(self, enabled: bool) -> None:
+        """Enables or disables the line strips (see the constructor). It must be called before open()."""
+        self._line_strip = enabled
+
+    def set_tile_lines(self, tile_lines: int) -> None:
+        """Sets the number of lines of each group of tiles, 0 to disable them (see the constructor). It must be called before open()."""
+        if tile_lines < 0:
+            raise ValueError(f"Invalid tile lines: {tile_lines}")
+        self._tile_lines = tile_lines
+
+    def copy(self) -> 'CssSubtitleRenderer':
+        renderer = CssSubtitleRenderer(line_strip=self._line_strip, use_renderer_daemon=self._use_renderer_daemon, tile_lines=self._tile_lines)
+        renderer.append_css(self._custom_css)
+        renderer.set_persistent_cache(self._persistent_cache)
+        renderer.set_cache_budget(self._cache_budget)
+        renderer.set_rendered_text(self._rendered_text)
+        return renderer
+
     def open(self, video_width: int, video_height: int, resources_dir: Optional[Path] = None, cache_strategy: CacheStrategy = CacheStrategy.CSS_CLASSES_AWARE):
         """Initializes Playwright and loads the base HTML page."""
         from playwright.sync_api import sync_playwright
@@ -63,11 +147,21 @@ class CssSubtitleRenderer(SubtitleRenderer):
         calculated_vp_height = max(self.DEFAULT_MIN_VIEWPORT_HEIGHT, int(video_height * self.DEFAULT_VIEWPORT_HEIGHT_RATIO))
 
         self._cache_strategy = cache_strategy
-        self._image_cache = RenderedImageCache(self._custom_css, self._cache_strategy)
-        self._letter_size_cache = LetterSizeCache(self._custom_css)
-        self._tempdir = tempfile.TemporaryDirectory()
+        self._cache_strategy_prober = CacheStrategyProber(self._custom_css) if cache_strategy == CacheStrategy.AUTO else None
+        self._letter_size_cache = LetterSizeCache(self._custom_css, self._cache_budget)
+        self._is_cdp_background_transparent = False
+        self._reset_loaded_line()
+        self._round_trips = self._line_opens = self._line_loads = 0
+        self._tile_arrays = {}
+        self._uploaded_lines = []
+        self._uploaded_line_ids = {}
+        self._viewport_width = video_width
+        self._viewport_height = calculated_vp_height
         if not self._browser:
             self._playwright_context = sync_playwright().start()
+            if self._use_renderer_daemon and self._open_renderer_daemon_page(video_width, calculated_vp_height, resources_dir):
+                self._create_image_cache(resources_dir)
+                return
             try:
                 self._browser = self._playwright_context.chromium.launch()
             except Exception as e:
@@ -77,18 +171,63 @@ class CssSubtitleRenderer(SubtitleRenderer):
                     "    playwright install chromium\n\n"
                     f"Full error:\n{str(e)}"
                 ) from e
+        self._create_image_cache(resources_dir)
         context = self._browser.new_context(device_scale_factor=self._device_scale_factor, viewport={"width": video_width, "height": calculated_vp_height})
         self._page = context.new_page()
+        self._cdp_session = context.new_cdp_session(self._page)
+        self._tempdir = tempfile.TemporaryDirectory()
         self._copy_resources_to_tempdir(resources_dir)
         path = self._create_html_page()
         self._page.goto(path.as_uri())
         self._page.wait_for_load_state('networkidle')
 
+    def _create_image_cache(self, resources_dir: Optional[Path]) -> None:
+        """Creates the image cache once the browser is known, since its version is part of the persistent cache namespace."""
+        persistent_namespace = None
+        if self._persistent_cache:
+            engine_version = f"chromium={self._browser.version}"
+            persistent_namespace = self._persistent_cache.get_namespace(self.PERSISTENT_CACHE_BACKEND, self._custom_css, resources_dir, self._device_scale_factor, engine_version)
+        self._image_cache = RenderedImageCache(self._custom_css, self._cache_strategy, self._persistent_cache, persistent_namespace, self._cache_budget, self._cache_strategy_prober)
+        # the arrays share the persistent cache entries with the images: they are decoded and encoded without PIL
+        self._image_array_cache = RenderedImageCache(self._custom_css, self._cache_strategy, self._persistent_cache, persistent_namespace, self._cache_budget, self._cache_strategy_prober, array_images=True)
+
+    def _open_renderer_daemon_page(self, video_width: int, viewport_height: int, resources_dir: Optional[Path]) -> bool:
+        """
+        Connects to the renderer daemon, if it's running, and leases a page with the template already loaded.
+        Returns False if there is no daemon available, so the browser must be launched.
+        """
+        daemon = RendererDaemon.find()
+        if not daemon:
+            return False
+
+        try:
+            browser = self._playwright_context.chromium.connect_over_cdp(daemon["endpoint"])
+        except Exception as e:
+            logger().debug(f"Can't connect to the renderer daemon ({daemon['endpoint']}), launching a browser: {e}")
+            return False
+
+        if resources_dir and not resources_dir.is_dir():
+            raise RuntimeError(f"Resources directory does not exist: {resources_dir}")
+        # the fonts are preloaded, but not subsetted: a page per text wouldn't be reused by the next runs (and its fonts are already loaded)
+        base_dir = resources_dir.resolve() if resources_dir else None
+        self._preload_fonts = [font.relative_to(base_dir).as_posix() for font in FontSubsetter.get_css_fonts(self._custom_css, resources_dir)]
+        if self._preload_fonts and self._rendered_text is not None:
+            logger().debug("The fonts aren't subsetted for the renderer daemon pages: their fonts stay loaded between runs.")
+        html = self._renderer_page.get_html(custom_css=self._custom_css, preload_fonts=self._preload_fonts)
+        page_dir = RendererDaemon.get_page_dir(html, resources_dir)
+        self._browser = browser
+        self._page, self._daemon_lease_token = RendererDaemon.lease_page(browser.contexts[0], page_dir, daemon.get("max_pages", RendererDaemon.DEFAULT_MAX_PAGES))
+        self._cdp_session = self._page.context.new_cdp_session(self._page)
+        # the pages of the daemon are shared by all the renderers, so the viewport and scale factor are set for this session only
+        self._set_viewport_size(video_width, viewport_height)
+        logger().debug(f"Using the renderer daemon browser: {daemon['endpoint']}")
+        return True
+
     def _create_html_page(self) -> Path:
         if not self._tempdir:
             raise RuntimeError("self.tempdir is not defined. Do you call open() first?")
         
-        html_template = self._renderer_page.get_html(custom_css=self._custom_css)
+        html_template = self._renderer_page.get_html(custom_css=self._custom_css, preload_fonts=self._preload_fonts)
         html_path = Path(self._tempdir.name) / "renderer_base.html"
         html_path.write_text(html_template, encoding="utf-8")
         return html_path
@@ -96,6 +235,7 @@ class CssSubtitleRenderer(SubtitleRenderer):
     def _copy_resources_to_tempdir(self, resources_dir: Optional[Path] = None) -> None:
         if not self._tempdir:
             raise RuntimeError("Temp directory must be initialized before copying resources.")
+        self._preload_fonts = []
         if not resources_dir:
             return
         if not resources_dir.exists():
@@ -106,6 +246,16 @@ class CssSubtitleRenderer(SubtitleRenderer):
         destination = Path(self._tempdir.name)
         shutil.copytree(resources_dir, destination, dirs_exist_ok=True)
 
+        # when the text is known, the copies of the fonts are replaced with their subsets
+        fonts = FontSubsetter.get_css_fonts(self._custom_css, resources_dir)
+        subsets = FontSubsetter().subset_fonts(fonts, self._rendered_text, self._custom_css) if self._rendered_text is not None else {}
+        base_dir = resources_dir.resolve()
+        for font in fonts:
+            relative_path = font.relative_to(base_dir)
+            if font in subsets:
+                shutil.copyfile(subsets[font], destination / relative_path)
+            self._preload_fonts.append(relative_path.as_posix())
+
     def open_line(self, line: Line, line_state: ElementState):
         if not self._page:
             raise RuntimeError("Renderer is not open. Call open() first.")
@@ -114,25 +264,104 @@ class CssSubtitleRenderer(SubtitleRenderer):
         
         self._current_line = line
         self._current_line_state = line_state
+        self._line_strip_images = {}
+        self._line_strip_arrays = {}
+        self._line_opens += 1
+        self._load_current_line()
 
-        script = f"""
-        ([text, cssClassesForLine, cssClassesForWords]) => {{
-            const line = document.querySelector('.{RendererPage.DEFAULT_CSS_CLASS_FOR_EACH_LINE}');
-            line.innerHTML = '';
-            line.className = cssClassesForLine;
-            const words = text.split(' ');
-            words.forEach((word, index) => {{
-                const wordElement = document.createElement('span');
-                const cssClassesForWord = cssClassesForWords[index];
-                wordElement.textContent = word;
-                wordElement.className = cssClassesForWord;
-                line.appendChild(wordElement);
-            }});
-        }}
-        """
-        line_css_classes = self._renderer_page.get_line_css_classes(line.get_segment().get_tags(), line.get_tags(), line_state)
+    def _load_current_line(self) -> None:
+        line = self._current_line
+        line_state = RendererPage.get_state_index(self._current_line_state)
+        line_css_classes = self._renderer_page.get_line_css_classes(line.get_segment().get_tags(), line.get_tags())
         words_css_classes = [self._renderer_page.get_word_css_classes(word.get_tags(), index) for index, word in enumerate(line.words)]
-        self._page.evaluate(script, [line.get_text(), line_css_classes, words_css_classes])
+        # the line classes are part of the key: lines with the same text and words can have other segment or line tags
+        loaded_line = (line.get_text(), line_css_classes, tuple(words_css_classes))
+        if loaded_line == self._loaded_line:
+            # the words are already in the page (previous state of the same line): only the line classes are updated, with the next call
+            self._pending_line_changes[0] = line_state
+            return
+
+        line_id = self._uploaded_line_ids.get(id(line))
+        if line_id is not None:
+            self._call_runtime("openLine", line_id, line_state)
+        else:
+            self._call_runtime("openLineWords", [word.text for word in line.words], line_css_classes, words_css_classes, line_state)
+        self._loaded_line = loaded_line
+        self._pending_line_changes = RendererPage.get_empty_line_changes()
+        self._line_loads += 1
+
+    def _upload_lines(self, lines: List[Line]) -> None:
+        """Sends the lines (words and CSS classes) to the page runtime, so the next calls only reference them by index."""
+        uploaded_lines = [
+            [
+                [word.text for word in line.words],
+                self._renderer_page.get_line_css_classes(line.get_segment().get_tags(), line.get_tags()),
+                [self._renderer_page.get_word_css_classes(word.get_tags(), index) for index, word in enumerate(line.words)],
+            ]
+            for line in lines
+        ]
+        self._call_runtime("loadLines", uploaded_lines)
+        self._uploaded_lines = list(lines)
+        self._uploaded_line_ids = {id(line): index for index, line in enumerate(lines)}
+
+    def _reset_loaded_line(self) -> None:
+        """Called when the line of the page is replaced (or left in an unknown state), so the next line is built again."""
+        self._loaded_line = None
+        self._pending_line_changes = RendererPage.get_empty_line_changes()
+
+    def _evaluate(self, script: str, arg: Any) -> Any:
+        self._round_trips += 1
+        if self._daemon_lease_token:
+            # each call checks and renews the lease, so the page is never leased to another renderer while this one uses it
+            return self._page.evaluate(RendererDaemon.get_leased_script(script), [self._daemon_lease_token, arg])
+        return self._page.evaluate(script, arg)
+
+    def _call_runtime(self, name: str, *args: Any) -> Any:
+        """Calls a function of the page runtime (see RendererPage.RUNTIME_SCRIPT)."""
+        return self._evaluate(RendererPage.RUNTIME_CALL_SCRIPT, [name, list(args)])
+
+    def _call_runtime_with_pending_line_changes(self, name: str, *args: Any) -> Any:
+        """Calls a runtime function that receives the pending line changes as first argument (they are applied before the call)."""
+        pending_line_changes = self._pending_line_changes
+        self._pending_line_changes = RendererPage.get_empty_line_changes()
+        try:
+            return self._call_runtime(name, pending_line_changes, *args)
+        except Exception:
+            self._reset_loaded_line()
+            raise
+
+    def _set_viewport_size(self, width: int, height: int) -> None:
+        """Overrides the viewport (and the scale factor) of the page for the CDP session of this renderer."""
+        self._round_trips += 1
+        self._cdp_session.send("Emulation.setDeviceMetricsOverride", {
+            "width": width,
+            "height": height,
+            "deviceScaleFactor": self._device_scale_factor,
+            "mobile": False,
+        })
+        self._viewport_width = width
+        self._viewport_height = height
+
+    def get_round_trip_stats(self) -> Dict[str, int]:
+        """Browser round-trips since open(), and the open_line() calls and line builds (the other calls reuse the line in the page)."""
+        return {"round_trips": self._round_trips, "line_opens": self._line_opens, "line_loads": self._line_loads}
+
+    def _probe_cache_strategy(self, word: Word, state: ElementState, all_css_classes: str) -> None:
+        """
+        Used by CacheStrategy.AUTO: renders the word at several positions of a line with the same CSS classes,
+        so the prober can decide if the position must be part of the cache key. The current line is loaded again after it.
+        """
+        words_count = CacheStrategyProber.PROBE_LINE_WORDS
+        line_css_classes = self._renderer_page.get_line_css_classes(self._current_line.get_segment().get_tags(), self._current_line.get_tags())
+        words_css_classes = [self._renderer_page.get_word_css_classes(word.get_tags(), index) for index in range(words_count)]
+        self._call_runtime("openLineWords", [word.text] * words_count, line_css_classes, words_css_classes, RendererPage.get_state_index(self._current_line_state))
+        self._reset_loaded_line()
+        try:
+            images = [self._capture_word_array(index, word, state, None) for index in range(words_count)]
+        finally:
+            self._reset_loaded_line()
+            self._load_current_line()
+        self._cache_strategy_prober.decide(all_css_classes, images)
    
     def render_word(self, index: int, word: Word, state: ElementState, first_n_letters: Optional[int] = None) -> Optional['Image']:
         if not self._page:
@@ -143,64 +372,197 @@ class CssSubtitleRenderer(SubtitleRenderer):
         line_css_classes = self._renderer_page.get_line_css_classes(self._current_line.get_segment().get_tags(), self._current_line.get_tags(), self._current_line_state)
         word_css_classes = self._renderer_page.get_word_css_classes(word.get_tags(), index, state)
         all_css_classes = line_css_classes + " " + word_css_classes
+        if self._cache_strategy_prober and not self._cache_strategy_prober.is_decided(all_css_classes):
+            self._probe_cache_strategy(word, state, all_css_classes)
         if self._image_cache.has(index, word.text, all_css_classes, first_n_letters):
             return self._image_cache.get(index, word.text, all_css_classes, first_n_letters)
 
-        # Why are we doing this?
-        # When the typewriting effect is applied, we need to render the word partially (first n letters).
-        # However, if we have some line background that depends on the size (like a gradient),
-        # since the word was cropped, the background will be incorrect.
-        # It can be specially noticeable in the last word of the line.
-        # The same would happen if we use border-radius, since we crop the word,
-        # it will show the rounded corners in each word fragment of the last word
-        # To fix this, we create a new span with the remaining part of the word and make it invisible.
-        # This way, the line is rendered with the final width it will have, and the background will be correct.
-
-        script = f"""
-        ([index, state, wordText, first_n_letters]) => {{
-            const word = document.querySelector(`.word-${{index}}-in-line`);
-            const wordCodePoints = Array.from(wordText); // to avoid issues with multibyte characters
-            word.textContent = wordCodePoints.slice(0, first_n_letters).join('');
-            word.classList.add(state);
-
-            // the rest remains there but invisible
-            if (first_n_letters < wordCodePoints.length) {{
-                remaining_word = word.dataset.isNextNodeRemaining ? word.nextSibling : document.createElement('span');
-                remaining_word.textContent = wordCodePoints.slice(first_n_letters).join('');
-                remaining_word.className = word.className;
-                remaining_word.style.visibility = 'hidden';
-                if (!word.dataset.isNextNodeRemaining) {{
-                    word.parentNode.insertBefore(remaining_word, word.nextSibling);
-                    word.dataset.isNextNodeRemaining = true;
-                }}
-            }} else if (word.dataset.isNextNodeRemaining) {{
-                word.parentNode.removeChild(word.nextSibling);
-                delete word.dataset.isNextNodeRemaining;
-            }}
-
-            return word.getBoundingClientRect();
-        }}
-        """
-        word_bounding_box = self._page.evaluate(script, [index, state.value, word.text, first_n_letters if first_n_letters else len(word.text)])
+        if self._line_strip and first_n_letters is None:
+            image = self._render_word_from_line_strip(index, state)
+            self._image_cache.set(index, word.text, all_css_classes, first_n_letters, image)
+            return image
+
+        word_bounding_box = self._render_word_in_line(index, word, state, first_n_letters)
         try:
             if word_bounding_box["width"] <= 0 or word_bounding_box["height"] <= 0:
                 # HTML element is not visible (probably hidden by CSS).
                 self._image_cache.set(index, word.text, all_css_classes, first_n_letters, None)
                 return None
 
+            self._round_trips += 1
             image = PlaywrightScreenshotCapturer.capture(self._page, word_bounding_box)
+            self._is_cdp_background_transparent = False
             self._image_cache.set(index, word.text, all_css_classes, first_n_letters, image)
             return image
         except Exception as e:
             raise RuntimeError(f"Error rendering word '{word.text}': {e}")
-        finally:
-            self._page.evaluate(f"""
-            ([index, state]) => {{
-                const word = document.querySelector(`.word-${{index}}-in-line`);
-                word.classList.remove(state);
-            }}
-            """, [index, state.value])
+
+    def _render_word_in_line(self, index: int, word: Word, state: ElementState, first_n_letters: Optional[int]) -> Dict:
+        """Applies the state (and the partial text) to the word and returns its bounding box. They are undone with the next call."""
+        state_index = RendererPage.get_state_index(state)
+        word_bounding_box = self._call_runtime_with_pending_line_changes("renderWord", index, state_index, first_n_letters if first_n_letters else None)
+        self._pending_line_changes[1] = [index, state_index]
+        return word_bounding_box
+
+    def _add_state_to_line_words(self, state: ElementState) -> List[Dict]:
+        """Applies the state to all the words of the line and returns their bounding boxes. It's undone with the next call."""
+        state_index = RendererPage.get_state_index(state)
+        words_bounding_boxes = self._call_runtime_with_pending_line_changes("addStateToLineWords", state_index)
+        self._pending_line_changes[2] = state_index
+        return words_bounding_boxes
     
+    def _render_word_from_line_strip(self, index: int, state: ElementState) -> Optional['Image']:
+        if state not in self._line_strip_images:
+            self._line_strip_images[state] = self._render_line_strip(state)
+        return self._line_strip_images[state][index]
+
+    def _render_line_strip(self, state: ElementState) -> List[Optional['Image']]:
+        """
+        Applies the state to every word of the current line, captures the line once, and slices an image for each word.
+        Words that are not visible (probably hidden by CSS) get None.
+        """
+        words_bounding_boxes = self._add_state_to_line_words(state)
+        try:
+            self._round_trips += 1
+            images = PlaywrightScreenshotCapturer.capture_many(self._page, words_bounding_boxes, self._device_scale_factor)
+            self._is_cdp_background_transparent = False
+            return images
+        except Exception as e:
+            raise RuntimeError(f"Error rendering line '{self._current_line.get_text()}': {e}")
+
+    def render_word_array(self, index: int, word: Word, state: ElementState, first_n_letters: Optional[int] = None) -> Optional['np.ndarray']:
+        if not self._page:
+            raise RuntimeError("Renderer is not open. Call open() first.")
+        if not self._current_line:
+            raise RuntimeError("No line is open. Call open_line() first.")
+
+        line_css_classes = self._renderer_page.get_line_css_classes(self._current_line.get_segment().get_tags(), self._current_line.get_tags(), self._current_line_state)
+        word_css_classes = self._renderer_page.get_word_css_classes(word.get_tags(), index, state)
+        all_css_classes = line_css_classes + " " + word_css_classes
+        if self._cache_strategy_prober and not self._cache_strategy_prober.is_decided(all_css_classes):
+            self._probe_cache_strategy(word, state, all_css_classes)
+        if self._image_array_cache.has(index, word.text, all_css_classes, first_n_letters):
+            return self._image_array_cache.get(index, word.text, all_css_classes, first_n_letters)
+
+        if self._image_cache.is_in_memory(index, word.text, all_css_classes, first_n_letters):
+            # rendered by render_word() (the persistent cache was already checked by the array cache)
+            image = self._image_cache.get(index, word.text, all_css_classes, first_n_letters)
+            array = ImageArrayConverter.from_pil(image) if image else None
+        else:
+            tile_arrays = self._tile_arrays.get((id(self._current_line), self._current_line_state, state)) if first_n_letters is None else None
+            if tile_arrays is not None:
+                array = tile_arrays[index]
+            elif self._line_strip and first_n_letters is None:
+                array = self._render_word_array_from_line_strip(index, state)
+            else:
+                array = self._capture_word_array(index, word, state, first_n_letters)
+
+        self._image_array_cache.set(index, word.text, all_css_classes, first_n_letters, array)
+        return array
+
+    def _capture_word_array(self, index: int, word: Word, state: ElementState, first_n_letters: Optional[int]) -> Optional['np.ndarray']:
+        word_bounding_box = self._render_word_in_line(index, word, state, first_n_letters)
+        try:
+            if word_bounding_box["width"] <= 0 or word_bounding_box["height"] <= 0:
+                # HTML element is not visible (probably hidden by CSS).
+                return None
+
+            cdp_session = self._get_cdp_session()
+            self._round_trips += 1
+            return PlaywrightScreenshotCapturer.capture_array(cdp_session, word_bounding_box)
+        except Exception as e:
+            raise RuntimeError(f"Error rendering word '{word.text}': {e}")
+
+    def _render_word_array_from_line_strip(self, index: int, state: ElementState) -> Optional['np.ndarray']:
+        if state not in self._line_strip_arrays:
+            words_bounding_boxes = self._add_state_to_line_words(state)
+            try:
+                cdp_session = self._get_cdp_session()
+                self._round_trips += 1
+                self._line_strip_arrays[state] = PlaywrightScreenshotCapturer.capture_many_arrays(cdp_session, words_bounding_boxes, self._device_scale_factor)
+            except Exception as e:
+                raise RuntimeError(f"Error rendering line '{self._current_line.get_text()}': {e}")
+        return self._line_strip_arrays[state][index]
+
+    def render_lines(self, lines: List[Line], render_line_fn: Callable[['SubtitleRenderer', Line], T]) -> List[T]:
+        if not self._page:
+            raise RuntimeError("Renderer is not open. Call open() first.")
+
+        self._upload_lines(lines)
+        if not self._tile_lines:
+            return super().render_lines(lines, render_line_fn)
+
+        results = []
+        # the tiles can grow the viewport, it's restored when they are removed
+        viewport_height = self._viewport_height
+        try:
+            for start in range(0, len(lines), self._tile_lines):
+                group = lines[start:start + self._tile_lines]
+                self._render_tiles(group)
+                results.extend(render_line_fn(self, line) for line in group)
+                self._tile_arrays = {}
+        finally:
+            self._tile_arrays = {}
+            self._call_runtime("removeTiles")
+            if self._viewport_height != viewport_height:
+                self._set_viewport_size(self._viewport_width, viewport_height)
+        return results
+
+    def _render_tiles(self, lines: List[Line]) -> None:
+        """
+        Stacks every state of the lines received (except the ones with all their words cached) as tiles,
+        and captures them in a single screenshot. The word images are kept for render_word_array().
+        If the tiles don't fit in the max viewport height, the lines are split in smaller groups.
+        """
+        tiles = []
+        tile_keys = []
+        for line in lines:
+            for line_state, word_state in ElementState.get_all_valid_states_combinations():
+                line_css_classes = self._renderer_page.get_line_css_classes(line.get_segment().get_tags(), line.get_tags(), line_state)
+                words_css_classes = [self._renderer_page.get_word_css_classes(word.get_tags(), index, word_state) for index, word in enumerate(line.words)]
+                is_cached = lambda index, word: self._image_array_cache.has(index, word.text, line_css_classes + " " + words_css_classes[index], None) or self._image_cache.is_in_memory(index, word.text, line_css_classes + " " + words_css_classes[index], None)
+                if all(is_cached(index, word) for index, word in enumerate(line.words)):
+                    continue
+                tiles.append([self._uploaded_line_ids[id(line)], RendererPage.get_state_index(line_state), RendererPage.get_state_index(word_state)])
+                tile_keys.append((id(line), line_state, word_state))
+        if not tiles:
+            return
+
+        tiles_layout = self._call_runtime("tileLines", tiles)
+        if tiles_layout["height"] > self._viewport_height:
+            # the page is centered, so the first tiles would be above the viewport
+            if tiles_layout["height"] * self._device_scale_factor > self.MAX_TILES_CAPTURE_HEIGHT:
+                if len(lines) == 1:
+                    logger().debug(f"The states of the line '{lines[0].get_text()}' don't fit in a single capture, its words are rendered one by one.")
+                    # the tiles would cover the words rendered one by one
+                    self._call_runtime("removeTiles")
+                    return
+                self._render_tiles(lines[:len(lines) // 2])
+                self._render_tiles(lines[len(lines) // 2:])
+                return
+            self._set_viewport_size(self._viewport_width, math.ceil(tiles_layout["height"]))
+            tiles_layout = self._call_runtime("tileLines", tiles)
+
+        words_bounding_boxes = [box for tile_boxes in tiles_layout["boxes"] for box in tile_boxes]
+        try:
+            cdp_session = self._get_cdp_session()
+            self._round_trips += 1
+            arrays = PlaywrightScreenshotCapturer.capture_many_arrays(cdp_session, words_bounding_boxes, self._device_scale_factor)
+        except Exception as e:
+            raise RuntimeError(f"Error rendering the tiles of {len(lines)} lines: {e}")
+
+        position = 0
+        for key, tile_boxes in zip(tile_keys, tiles_layout["boxes"]):
+            self._tile_arrays[key] = arrays[position:position + len(tile_boxes)]
+            position += len(tile_boxes)
+
+    def _get_cdp_session(self) -> 'CDPSession':
+        if not self._is_cdp_background_transparent:
+            self._round_trips += 1
+            PlaywrightScreenshotCapturer.enable_transparent_background(self._cdp_session)
+            self._is_cdp_background_transparent = True
+        return self._cdp_session
+
     def close_line(self):
         if not self._page:
             raise RuntimeError("Renderer is not open. Call open() first.")
@@ -209,7 +571,23 @@ class CssSubtitleRenderer(SubtitleRenderer):
         
         self._current_line = None
         self._current_line_state = None
+        self._line_strip_images = {}
+        self._line_strip_arrays = {}
         
+    def preload_word_sizes(self, words: List[Word]) -> None:
+        if not self._page:
+            raise RuntimeError("Renderer is not open. Call open() first.")
+        if self._current_line:
+            raise RuntimeError("A line process is in progress. Call close_line() first.")
+
+        groups = self._renderer_page.get_letters_to_measure(words, self._letter_size_cache)
+        for start in range(0, len(groups), RendererPage.MEASURE_LETTERS_BATCH_SIZE):
+            batch = groups[start:start + RendererPage.MEASURE_LETTERS_BATCH_SIZE]
+            batch_letters_size: List[Dict] = self._evaluate(RendererPage.MEASURE_LETTERS_SCRIPT, batch)
+            self._reset_loaded_line()
+            for (_, line_css_classes, word_css_classes), letters_size in zip(batch, batch_letters_size):
+                self._letter_size_cache.set_all({letter: Size(size['width'], size['height']) for letter, size in letters_size.items()}, line_css_classes + " " + word_css_classes)
+
     def get_word_size(self, word: Word, line_state: ElementState, word_state: ElementState) -> Tuple[int, int]:
         if not self._page:
             raise RuntimeError("Renderer is not open. Call open() first.")
@@ -222,9 +600,7 @@ class CssSubtitleRenderer(SubtitleRenderer):
 
         cached_letters_size = {}
         not_cached_letters_size = []
-        # All letters are measured without padding/borders/etc, the "NON_CONTENT_WIDTH" is used to measure the paddings/borders/etc
-        # So, each word must have the "NON_CONTENT_WIDTH" to include its padding/border/etc 
-        letters = list(word.text) + ["NON_CONTENT_WIDTH"]
+        letters = list(word.text) + [RendererPage.NON_CONTENT_WIDTH_LETTER]
         for letter in letters:
             if self._letter_size_cache.has(letter, all_css_classes):
                 cached_letters_size[letter] = self._letter_size_cache.get(letter, all_css_classes)
@@ -236,29 +612,8 @@ class CssSubtitleRenderer(SubtitleRenderer):
         if len(not_cached_letters_size) == 0:
             return int(cached_width * self._device_scale_factor), int(cached_height * self._device_scale_factor)
 
-        script = f"""
-        ([letters, lineCssClasses, wordCssClasses]) => {{
-            const line = document.querySelector('.{RendererPage.DEFAULT_CSS_CLASS_FOR_EACH_LINE}');
-            line.innerHTML = '';
-            line.className = lineCssClasses;
-            const wordElement = document.createElement('span');
-            wordElement.textContent = '';
-            wordElement.className = wordCssClasses;
-            line.appendChild(wordElement);
-            const emptyWidth = wordElement.getBoundingClientRect().width;
-            letters_size = {{}}
-            for (const letter of letters) {{
-                wordElement.textContent = letter === "NON_CONTENT_WIDTH" ? "" : letter;
-                const box = wordElement.getBoundingClientRect();
-                // we exclude the extra width (paddings, borders, etc) for each letter
-                // it is only taken into account when we want to measure the "NON_CONTENT_WIDTH"
-                const width = letter === "NON_CONTENT_WIDTH" ? box.width : box.width - emptyWidth
-                letters_size[letter] = {{width: width, height: box.height}};
-            }}
-            return letters_size;
-        }}
-        """
-        new_letters_size: Dict = self._page.evaluate(script, [not_cached_letters_size, line_css_classes, word_css_classes])
+        new_letters_size: Dict = self._evaluate(RendererPage.MEASURE_LETTERS_SCRIPT, [[not_cached_letters_size, line_css_classes, word_css_classes]])[0]
+        self._reset_loaded_line()
         for letter, size in new_letters_size.items():
             new_letters_size[letter] = Size(size['width'], size['height'])
 
@@ -271,16 +626,31 @@ class CssSubtitleRenderer(SubtitleRenderer):
 
     def close(self):
         """Closes Playwright and cleans up resources."""
+        if self._cache_budget and self._page:
+            # stats to tune the budget
+            self._image_array_cache.log_stats()
+            self._letter_size_cache.log_stats()
+        if self._line_opens:
+            logger().debug(f"CssSubtitleRenderer: {self._round_trips} browser round-trips for {self._line_opens} open_line() calls ({self._round_trips / self._line_opens:.2f} per call), the line was built {self._line_loads} times.")
         if self._playwright_context:
-            if self._browser:
+            if self._daemon_lease_token:
+                # the browser and the page are kept alive for the next renderers
+                try:
+                    self._cdp_session.detach()
+                    RendererDaemon.release_page(self._page, self._daemon_lease_token)
+                except Exception as e:
+                    logger().debug(f"Can't release the renderer daemon page: {e}")
+                self._daemon_lease_token = None
+            elif self._browser:
                 self._browser.close()
-                self._browser = None
+            self._browser = None
             self._playwright_context.stop()
             self._playwright_context = None
         if self._tempdir:
             self._tempdir.cleanup()
             self._tempdir = None
         self._page = None
+        self._cdp_session = None
 
     def __enter__(self):
         # Video dimensions are expected to be provided via an explicit call to open().
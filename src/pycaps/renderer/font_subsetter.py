@@ -0,0 +1,231 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from pycaps.logger import logger
+
+class FontSubsetter:
+    """
+    Subsets the fonts of a template to the characters that will be rendered, so the renderers load much smaller files.
+
+    The characters are the text of the document (with its upper and lower case variants, for text-transform) and all the
+    characters of the CSS (for the content properties). The subsets are cached on disk by the hash of the font and of the characters.
+
+    A subset is only used when it maps exactly the same characters as the original font (among the requested ones), to the
+    same advance widths: otherwise, or if fontTools isn't installed, the original font is kept.
+
+    The cache has a size budget: when it's exceeded, the least recently used subsets are removed (a hit refreshes the file mtime).
+    """
+
+    FORMAT_VERSION: int = 1
+    FONT_EXTENSIONS = (".ttf", ".otf", ".woff", ".woff2")
+    # marks the (font, characters) pairs whose subset was rejected, so they aren't subsetted again
+    REJECTED_EXTENSION: str = ".rejected"
+    TEMP_EXTENSION: str = ".tmp"
+    DEFAULT_MAX_SIZE: int = 256 * 1024 * 1024
+    EVICTION_TARGET_RATIO: float = 0.9
+    STALE_TEMP_FILE_SECONDS: int = 60 * 60
+
+    _URL_PATTERN = re.compile(r"url\(\s*(['\"]?)(.*?)\1\s*\)")
+    _CSS_ESCAPE_PATTERN = re.compile(r"\\([0-9a-fA-F]{1,6})\s?")
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Args:
+            cache_dir: (Optional) Directory where the subsets are stored. By default, a folder in the user cache dir.
+            max_size: (Optional) Max size of the cache in bytes.
+        """
+        if max_size <= 0:
+            raise ValueError(f"Invalid cache size: {max_size}")
+
+        self._cache_dir: Path = Path(cache_dir) if cache_dir else self.get_default_dir()
+        self._max_size: int = max_size
+
+    @staticmethod
+    def get_default_dir() -> Path:
+        from platformdirs import user_cache_dir
+        return Path(user_cache_dir("pycaps")) / "font-subsets"
+
+    @property
+    def cache_dir(self) -> Path:
+        return self._cache_dir
+
+    @staticmethod
+    def get_css_fonts(css: str, resources_dir: Optional[Path]) -> List[Path]:
+        """Returns the (resolved) font files of the resources dir referenced by the CSS, in order of appearance."""
+        if not resources_dir:
+            return []
+
+        base_dir = Path(resources_dir).resolve()
+        fonts: List[Path] = []
+        for match in FontSubsetter._URL_PATTERN.finditer(css):
+            url = match.group(2).strip()
+            if not url.lower().endswith(FontSubsetter.FONT_EXTENSIONS) or url.startswith("/") or ":" in url:
+                continue
+            path = (base_dir / url).resolve()
+            if path not in fonts and path.is_file() and path.is_relative_to(base_dir):
+                fonts.append(path)
+        return fonts
+
+    @staticmethod
+    def get_characters(text: str, css: str = "") -> str:
+        """Returns the sorted characters that can be rendered for the text with the CSS."""
+        unescaped_css = FontSubsetter._CSS_ESCAPE_PATTERN.sub(
+            lambda match: chr(int(match.group(1), 16)) if int(match.group(1), 16) <= 0x10FFFF else match.group(0),
+            css
+        )
+        characters = set(text) | set(text.upper()) | set(text.lower()) | set(css) | set(unescaped_css) | {" ", "\u00a0"}
+        return "".join(sorted(characters))
+
+    def subset_fonts(self, fonts: List[Path], text: str, css: str = "") -> Dict[Path, Path]:
+        """Subsets each font for the text, and returns the subset of each one. The fonts that can't be subsetted are not included."""
+        characters = self.get_characters(text, css)
+        subsets: Dict[Path, Path] = {}
+        for font in fonts:
+            subset = self.subset(font, characters)
+            if subset:
+                subsets[font] = subset
+                logger().debug(f"Font subset for {font.name}: {subset.stat().st_size} bytes (original: {font.stat().st_size} bytes).")
+        self.evict()
+        return subsets
+
+    def subset(self, font_path: Path, characters: str) -> Optional[Path]:
+        """
+        Returns the path of the subset of the font with the characters, creating it if it isn't cached.
+        Returns None if it can't be created or it doesn't cover the characters exactly as the original font.
+        """
+        font_path = Path(font_path)
+        try:
+            font_data = font_path.read_bytes()
+        except OSError as e:
+            logger().debug(f"Can't read the font {font_path}: {e}")
+            return None
+
+        subset_path = self._get_subset_path(font_data, characters, font_path.suffix.lower())
+        if self._touch(subset_path):
+            return subset_path
+        rejected_path = subset_path.with_suffix(self.REJECTED_EXTENSION)
+        if self._touch(rejected_path):
+            return None
+
+        try:
+            from fontTools.subset import Options, Subsetter
+            from fontTools.ttLib import TTFont
+        except ImportError:
+            logger().debug("fontTools is not installed: the fonts are not subsetted.")
+            return None
+
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                temp_path = Path(temp_dir) / f"subset{subset_path.suffix}"
+                original = TTFont(font_path)
+                options = Options()
+                # all the features, names and hinting are kept, so the glyphs are rendered exactly as with the original font
+                options.layout_features = ["*"]
+                options.name_IDs = ["*"]
+                options.name_languages = ["*"]
+                options.notdef_outline = True
+                options.flavor = original.flavor
+                subset = TTFont(font_path)
+                subsetter = Subsetter(options=options)
+                subsetter.populate(unicodes=[ord(character) for character in characters])
+                subsetter.subset(subset)
+                subset.save(str(temp_path))
+
+                if not self._covers_same_characters(original, TTFont(temp_path), characters):
+                    logger().debug(f"The subset of {font_path.name} doesn't cover the same characters: using the original font.")
+                    self._write_atomically(rejected_path, b"")
+                    return None
+                self._write_atomically(subset_path, temp_path.read_bytes())
+        except Exception as e:
+            logger().debug(f"Can't subset the font {font_path}: {e}")
+            return None
+
+        return subset_path
+
+    def evict(self) -> int:
+        """
+        Removes the least recently used subsets until the cache is under its size budget.
+        Files removed at the same time by another process are ignored.
+        Returns the number of removed files.
+        """
+        if not self._cache_dir.exists():
+            return 0
+
+        now = time.time()
+        entries = []
+        total_size = 0
+        for path in self._cache_dir.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if not path.is_file():
+                continue
+            if path.suffix == self.TEMP_EXTENSION:
+                # it can be a write in progress of another process, so only old ones are removed
+                if now - stat.st_mtime > self.STALE_TEMP_FILE_SECONDS:
+                    self._remove(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        if total_size <= self._max_size:
+            return 0
+
+        removed = 0
+        target_size = self._max_size * self.EVICTION_TARGET_RATIO
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= target_size:
+                break
+            if self._remove(path):
+                removed += 1
+            total_size -= size
+        logger().debug(f"Removed {removed} font subsets from the cache.")
+        return removed
+
+    def _covers_same_characters(self, original, subset, characters: str) -> bool:
+        original_cmap = original.getBestCmap() or {}
+        subset_cmap = subset.getBestCmap() or {}
+        for character in characters:
+            codepoint = ord(character)
+            original_glyph, subset_glyph = original_cmap.get(codepoint), subset_cmap.get(codepoint)
+            if (original_glyph is None) != (subset_glyph is None):
+                return False
+            if original_glyph is not None and original["hmtx"][original_glyph][0] != subset["hmtx"][subset_glyph][0]:
+                return False
+        return True
+
+    def _get_subset_path(self, font_data: bytes, characters: str, suffix: str) -> Path:
+        font_hash = hashlib.sha256(f"{self.FORMAT_VERSION}|".encode("utf-8") + font_data).hexdigest()[:32]
+        characters_hash = hashlib.sha256(characters.encode("utf-8")).hexdigest()[:32]
+        return self._cache_dir / f"{font_hash}-{characters_hash}{suffix}"
+
+    def _write_atomically(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=self.TEMP_EXTENSION)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            self._remove(Path(temp_path))
+            raise
+
+    def _touch(self, path: Path) -> bool:
+        """Refreshes the mtime of the cached file. Returns False if it doesn't exist."""
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _remove(self, path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
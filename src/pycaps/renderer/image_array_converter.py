@@ -0,0 +1,52 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL.Image import Image
+
+class ImageArrayConverter:
+    '''
+    Conversions between the images returned by the renderers and the arrays used by the video clips.
+    The arrays are BGRA (uint8), since it's the format used internally by movielite: clips created from them don't need any conversion.
+    '''
+
+    @staticmethod
+    def decode_png(png_bytes: bytes) -> 'np.ndarray':
+        import cv2
+        import numpy as np
+
+        # OpenCV decodes straight into BGRA, so no other copy is needed
+        array = cv2.imdecode(np.frombuffer(png_bytes, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if array is None:
+            raise RuntimeError("Invalid PNG image received")
+        if array.ndim == 2:
+            return cv2.cvtColor(array, cv2.COLOR_GRAY2BGRA)
+        if array.shape[2] == 3:
+            return cv2.cvtColor(array, cv2.COLOR_BGR2BGRA)
+        return array
+
+    @staticmethod
+    def encode_png(array: 'np.ndarray') -> bytes:
+        import cv2
+
+        # OpenCV encodes BGRA arrays as RGBA PNG files, so no conversion is needed
+        success, png = cv2.imencode(".png", array)
+        if not success:
+            raise RuntimeError("The image can't be encoded as PNG")
+        return png.tobytes()
+
+    @staticmethod
+    def from_pil(image: 'Image') -> 'np.ndarray':
+        import cv2
+        import numpy as np
+
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGBA2BGRA)
+
+    @staticmethod
+    def to_pil(array: 'np.ndarray') -> 'Image':
+        import cv2
+        from PIL import Image
+
+        return Image.fromarray(cv2.cvtColor(array, cv2.COLOR_BGRA2RGBA), "RGBA")
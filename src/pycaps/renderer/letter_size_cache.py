@@ -1,16 +1,24 @@
-from typing import Dict
+import sys
+from typing import Dict, Optional
 from pycaps.common import Size
+from .lru_byte_cache import LruByteCache
+from .css_class_analyzer import CssClassAnalyzer
+from pycaps.logger import logger
 
 class LetterSizeCache:
-    def __init__(self, css_content: str):
-        self._css_content = css_content
-        self._cache: Dict[str, Size] = {}
+
+    # approximate memory used by each entry, besides its key (Size object + dict slots)
+    ENTRY_SIZE: int = 150
+
+    def __init__(self, css_content: str, max_bytes: Optional[int] = None):
+        self._css_class_analyzer = CssClassAnalyzer.get(css_content)
+        self._cache = LruByteCache(lambda key, size: sys.getsizeof(key) + self.ENTRY_SIZE, max_bytes)
 
     def get(self, letter, css_classes: str) -> Size:
         key = self.__build_key(letter, css_classes)
         if key not in self._cache:
             raise RuntimeError(f"{letter} with classes {css_classes} is not cached")
-        return self._cache[key]
+        return self._cache.get(key)
     
     def has(self, letter, css_classes: str) -> bool:
         key = self.__build_key(letter, css_classes)
@@ -19,8 +27,21 @@ class LetterSizeCache:
     def set_all(self, data: Dict[str, Size], css_classes: str) -> None:
         for letter, size in data.items():
             key = self.__build_key(letter, css_classes)
-            self._cache[key] = size
+            self._cache.set(key, size)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns the entries, bytes, evictions and re-measures (letters measured again after being evicted) of the cache."""
+        stats = self._cache.get_stats()
+        stats["re_measures"] = stats.pop("re_sets")
+        return stats
+
+    def log_stats(self) -> None:
+        stats = self.get_stats()
+        logger().info(f"Letter sizes cache: {stats['entries']} letters, {stats['bytes'] / 1024:.1f} KB, {stats['evictions']} evictions, {stats['re_measures']} re-measures.")
+
+    def get_css_classes_key(self, css_classes: str) -> str:
+        """Returns the part of the key built from the CSS classes: two class sets with the same value share the letter sizes."""
+        return self._css_class_analyzer.get_key(css_classes)
 
     def __build_key(self, letter: str, css_classes: str) -> str:
-        used_css_classes = [c for c in css_classes.split() if c in self._css_content]
-        return f"letter:{letter}|css_classes:{','.join(used_css_classes)}"
+        return f"letter:{letter}|css_classes:{self.get_css_classes_key(css_classes)}"
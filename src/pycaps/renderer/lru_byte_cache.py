@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+class LruByteCache:
+    """
+    Dict-like cache with an optional memory budget in bytes.
+    When the budget is exceeded, the least recently used entries are evicted.
+    Entries with size 0 (like the None images of hidden elements) are never evicted, since they don't use the budget.
+
+    It counts the evictions and the "re-sets" (entries set again after being evicted, which usually means that something was rendered twice).
+    """
+
+    def __init__(self, get_size: Callable[[Hashable, Any], int], max_bytes: Optional[int] = None):
+        """
+        Args:
+            get_size: Function returning the bytes used by an entry, receiving its key and value.
+            max_bytes: (Optional) Memory budget. Without it, nothing is evicted.
+        """
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError(f"Invalid cache budget: {max_bytes}")
+
+        self._get_size = get_size
+        self._max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes: int = 0
+        self._evicted_keys: Set[Hashable] = set()
+        self._evictions: int = 0
+        self._re_sets: int = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Any:
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if key in self._entries:
+            self._bytes -= self._sizes[key]
+        elif key in self._evicted_keys:
+            self._evicted_keys.discard(key)
+            self._re_sets += 1
+
+        size = self._get_size(key, value)
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self._bytes += size
+        self._evict()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "evictions": self._evictions,
+            "re_sets": self._re_sets,
+        }
+
+    def _evict(self) -> None:
+        if self._max_bytes is None or self._bytes <= self._max_bytes:
+            return
+
+        # the last entry is the one just set, so it's kept even when it's bigger than the whole budget
+        last_key = next(reversed(self._entries))
+        bytes_to_free = self._bytes - self._max_bytes
+        keys_to_evict = []
+        for key in self._entries:
+            if bytes_to_free <= 0 or key == last_key:
+                break
+            size = self._sizes[key]
+            if size == 0:
+                continue
+            keys_to_evict.append(key)
+            bytes_to_free -= size
+
+        for key in keys_to_evict:
+            del self._entries[key]
+            self._bytes -= self._sizes.pop(key)
+            self._evicted_keys.add(key)
+        self._evictions += len(keys_to_evict)
@@ -0,0 +1,233 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple, TYPE_CHECKING, Dict
+from pycaps.logger import logger
+from pycaps.utils import update_hash_with_files
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL.Image import Image
+
+class PersistentImageCache:
+    """
+    On-disk cache of rendered word images, shared between runs (and between processes rendering at the same time).
+
+    Entries are content-addressed: the file name is a hash of the namespace (CSS, resources, scale factor and renderer backend)
+    and the key built by RenderedImageCache. Each image is a PNG file, and words that can't be rendered (hidden by CSS) are stored as empty ".none" files.
+
+    Writes are atomic (temp file + rename), so concurrent processes never see partial files.
+    The cache has a size budget: when it's exceeded, the least recently used entries are removed (a hit refreshes the file mtime).
+    """
+
+    FORMAT_VERSION: int = 1
+    DEFAULT_MAX_SIZE: int = 1024 * 1024 * 1024
+    EVICTION_TARGET_RATIO: float = 0.9
+    STALE_TEMP_FILE_SECONDS: int = 60 * 60
+    IMAGE_EXTENSION: str = ".png"
+    NONE_EXTENSION: str = ".none"
+    TEMP_EXTENSION: str = ".tmp"
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Args:
+            cache_dir: (Optional) Directory where the images are stored. By default, a folder in the user cache dir.
+            max_size: (Optional) Max size of the cache in bytes.
+        """
+        if max_size <= 0:
+            raise ValueError(f"Invalid cache size: {max_size}")
+
+        self._cache_dir: Path = Path(cache_dir) if cache_dir else self.get_default_dir()
+        self._max_size: int = max_size
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    @staticmethod
+    def get_default_dir() -> Path:
+        from platformdirs import user_cache_dir
+        return Path(user_cache_dir("pycaps")) / "rendered-images"
+
+    @property
+    def cache_dir(self) -> Path:
+        return self._cache_dir
+
+    def get_namespace(self, backend: str, css: str, resources_dir: Optional[Path], scale_factor: float, engine_version: str = "") -> str:
+        """
+        Returns a hash of everything that changes the rendered images, except the fields of the RenderedImageCache key.
+        The resources are hashed by content (fonts, images, etc), so editing a file in place invalidates the entries.
+        The engine version (browser version, rendering libraries versions) is included, so upgrading it invalidates them too.
+        """
+        digest = hashlib.sha256()
+        digest.update(f"v{self.FORMAT_VERSION}|{backend}|{engine_version}|{scale_factor:.6f}|".encode("utf-8"))
+        digest.update(css.encode("utf-8"))
+        update_hash_with_files(digest, resources_dir)
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_package_versions(*packages: str) -> str:
+        """Returns the installed versions of the packages (e.g. "pictex=1.0|html2pic=0.2"), to be used as engine version."""
+        from importlib import metadata
+
+        versions = []
+        for package in packages:
+            try:
+                versions.append(f"{package}={metadata.version(package)}")
+            except metadata.PackageNotFoundError:
+                versions.append(f"{package}=unknown")
+        return "|".join(versions)
+
+    def get(self, namespace: str, key: str) -> Tuple[bool, Optional['Image']]:
+        """
+        Returns (True, image) if the entry exists, (False, None) otherwise.
+        Keep in mind that None is a valid cached image: it means that the image can't be generated (element probably hidden).
+        """
+        from PIL import Image
+
+        def decode(png_bytes: bytes) -> 'Image':
+            image = Image.open(io.BytesIO(png_bytes))
+            image.load()
+            return image
+
+        return self._get(namespace, key, decode)
+
+    def get_array(self, namespace: str, key: str) -> Tuple[bool, Optional['np.ndarray']]:
+        """Like get(), but the image is decoded straight into a BGRA array (see ImageArrayConverter)."""
+        from .image_array_converter import ImageArrayConverter
+        return self._get(namespace, key, ImageArrayConverter.decode_png)
+
+    def set(self, namespace: str, key: str, image: Optional['Image']) -> None:
+        image_path, none_path = self._get_paths(namespace, key)
+        if image is None:
+            self._write_atomically(none_path, b"")
+        else:
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            self._write_atomically(image_path, buffer.getvalue())
+        self._count("writes")
+
+    def set_array(self, namespace: str, key: str, array: Optional['np.ndarray']) -> None:
+        """Like set(), but the image is a BGRA array: it's encoded as PNG without converting it to a PIL image."""
+        from .image_array_converter import ImageArrayConverter
+
+        image_path, none_path = self._get_paths(namespace, key)
+        if array is None:
+            self._write_atomically(none_path, b"")
+        else:
+            self._write_atomically(image_path, ImageArrayConverter.encode_png(array))
+        self._count("writes")
+
+    def evict(self) -> int:
+        """
+        Removes the least recently used entries until the cache is under its size budget.
+        Files removed at the same time by another process are ignored.
+        Returns the number of removed entries.
+        """
+        if not self._cache_dir.exists():
+            return 0
+
+        now = time.time()
+        entries = []
+        total_size = 0
+        for path in self._cache_dir.rglob("*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if not path.is_file():
+                continue
+            if path.suffix == self.TEMP_EXTENSION:
+                # it can be a write in progress of another process, so only old ones are removed
+                if now - stat.st_mtime > self.STALE_TEMP_FILE_SECONDS:
+                    self._remove(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        if total_size <= self._max_size:
+            return 0
+
+        removed = 0
+        target_size = self._max_size * self.EVICTION_TARGET_RATIO
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= target_size:
+                break
+            if self._remove(path):
+                removed += 1
+            total_size -= size
+
+        self._count("evictions", removed)
+        return removed
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self) -> None:
+        """Applies the size budget and logs the stats of the run."""
+        self.evict()
+        stats = self.get_stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups * 100 if lookups else 0
+        logger().info(
+            f"Persistent render cache: {stats['hits']} hits, {stats['misses']} misses ({hit_rate:.1f}% hit rate), "
+            f"{stats['writes']} writes, {stats['evictions']} evictions."
+        )
+
+    def _get(self, namespace: str, key: str, decode: Callable[[bytes], Any]) -> Tuple[bool, Any]:
+        image_path, none_path = self._get_paths(namespace, key)
+        try:
+            with open(image_path, "rb") as f:
+                image = decode(f.read())
+            self._touch(image_path)
+            self._count("hits")
+            return True, image
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # corrupted file (or removed while reading): it's ignored and overwritten later
+            logger().debug(f"Ignoring invalid cached image {image_path}: {e}")
+
+        if none_path.exists():
+            self._touch(none_path)
+            self._count("hits")
+            return True, None
+
+        self._count("misses")
+        return False, None
+
+    def _get_paths(self, namespace: str, key: str) -> Tuple[Path, Path]:
+        entry_hash = hashlib.sha256(f"{namespace}|{key}".encode("utf-8")).hexdigest()
+        base_path = self._cache_dir / entry_hash[:2] / entry_hash
+        return base_path.with_suffix(self.IMAGE_EXTENSION), base_path.with_suffix(self.NONE_EXTENSION)
+
+    def _write_atomically(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=path.parent, suffix=self.TEMP_EXTENSION)
+        try:
+            with os.fdopen(file_descriptor, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            self._remove(Path(temp_path))
+            raise
+
+    def _touch(self, path: Path) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _remove(self, path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[stat] += amount
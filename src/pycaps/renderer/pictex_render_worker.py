@@ -0,0 +1,75 @@
+import re
+from pathlib import Path
+from typing import Dict, Optional, Tuple, TYPE_CHECKING
+from .pictex_stylesheet import PictexStylesheet
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+# (html, css, scale factor): everything a worker process needs to render a word
+PictexRenderJob = Tuple[str, str, float]
+# (shared memory name, width, height) of a BGRA image
+SharedImage = Tuple[str, int, int]
+
+_URL_PATTERN = re.compile(r"url\(\s*(['\"]?)(.*?)\1\s*\)")
+_URL_SCHEME_PATTERN = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+def resolve_css_urls(css: str, resources_dir: Optional[Path], replacements: Optional[Dict[Path, Path]] = None) -> str:
+    """
+    Replaces the relative URLs of the CSS (fonts, images) with absolute paths inside the resources dir.
+    This way, the CSS can be rendered from any working directory (and from any process) without calling os.chdir().
+    The files found in replacements (by resolved path) are replaced with their value, like the font subsets (see FontSubsetter).
+    """
+    if not resources_dir:
+        return css
+
+    base_dir = Path(resources_dir).resolve()
+    def resolve(match: re.Match) -> str:
+        quote, url = match.group(1), match.group(2).strip()
+        if not url or url.startswith(("/", "#")) or _URL_SCHEME_PATTERN.match(url):
+            return match.group(0)
+        path = base_dir / url
+        if replacements:
+            path = replacements.get(path.resolve(), path)
+        return f"url({quote}{path.as_posix()}{quote})"
+
+    return _URL_PATTERN.sub(resolve, css)
+
+def render_to_shared_memory(job: PictexRenderJob) -> Optional[SharedImage]:
+    """
+    Runs in the worker processes: renders the job and writes the BGRA pixels in a new shared memory block,
+    so the image doesn't need to be pickled. The block is owned (and unlinked) by the process reading it.
+    """
+    from multiprocessing import shared_memory, resource_tracker
+
+    html, css, scale_factor = job
+    # the stylesheet is compiled once per worker process
+    image = PictexStylesheet.get(css).render(html, scale_factor)
+    if image is None or image.width <= 0 or image.height <= 0:
+        return None
+
+    data = image.to_bytes()
+    block = shared_memory.SharedMemory(create=True, size=len(data))
+    block.buf[:len(data)] = data
+    # the reader unlinks it, so this process must not track it
+    resource_tracker.unregister(block._name, "shared_memory")
+    block.close()
+    return block.name, image.width, image.height
+
+def measure(job: PictexRenderJob) -> Optional[Tuple[int, int]]:
+    """Runs in the worker processes: returns the size of the image of the job, without rendering it."""
+    html, css, scale_factor = job
+    return PictexStylesheet.get(css).measure(html, scale_factor)
+
+def read_shared_memory(shared_image: SharedImage) -> 'Image':
+    """Returns the image written by render_to_shared_memory() as an RGBA PIL image, and frees the shared memory block."""
+    from multiprocessing import shared_memory
+    from PIL import Image
+
+    name, width, height = shared_image
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return Image.frombuffer("RGBA", (width, height), bytes(block.buf[:width * height * 4]), "raw", "BGRA", 0, 1)
+    finally:
+        block.close()
+        block.unlink()
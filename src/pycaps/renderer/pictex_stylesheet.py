@@ -0,0 +1,72 @@
+from functools import lru_cache
+from typing import Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pictex import BitmapImage
+
+class PictexStylesheet:
+    """
+    CSS compiled once for html2pic: the rules and the @font-face registry are parsed when it's created,
+    and each render only parses and styles the (small) HTML of the word.
+
+    It's the same pipeline that Html2Pic runs, but Html2Pic parses the whole CSS again for each instance.
+    """
+
+    def __init__(self, css: str):
+        from html2pic.parsing import CssParser, HtmlParser
+        from html2pic.styling import StyleEngine
+        from html2pic.translation import PicTexTranslator
+
+        self._style_rules, self._font_registry = CssParser().parse(css)
+        self._html_parser = HtmlParser()
+        self._style_engine = StyleEngine()
+        self._translator = PicTexTranslator()
+
+    @staticmethod
+    @lru_cache(maxsize=4)
+    def get(css: str) -> 'PictexStylesheet':
+        """Returns the (shared) compiled stylesheet of the CSS. It's used by the worker processes, which receive the CSS in each job."""
+        return PictexStylesheet(css)
+
+    def render(self, html: str, scale_factor: float) -> Optional['BitmapImage']:
+        """Renders the HTML. Returns None if it can't be rendered."""
+        from pictex import CropMode
+
+        canvas, root_element = self._translate(html)
+        try:
+            return canvas.render(root_element, crop_mode=CropMode.CONTENT_BOX, scale_factor=scale_factor)
+        except Exception:
+            return None
+
+    def measure(self, html: str, scale_factor: float) -> Optional[Tuple[int, int]]:
+        """
+        Returns the (width, height) of the image that render() would return, running only the layout and text shaping (nothing is painted).
+        Returns None if it can't be rendered.
+        """
+        from pictex import CropMode, FontSmoothing, Row
+        from pictex.models import RenderProps
+        from pictex.renderer import Renderer
+
+        canvas, root_element = self._translate(html)
+        try:
+            # same steps as Canvas.render() and Renderer.render_as_bitmap(), stopping before the surface is created.
+            # The tree was just built, so it's wrapped without the deep copy that Row(root_element) would make
+            element = Row()
+            element._children = [root_element]
+            element._style = canvas._style
+            root = element._to_node()
+            Renderer()._prepare_tree_for_rendering(root, RenderProps(False, CropMode.CONTENT_BOX, FontSmoothing.SUBPIXEL))
+            width, height = int(root.paint_bounds.width() * scale_factor), int(root.paint_bounds.height() * scale_factor)
+        except Exception:
+            return None
+        if width <= 0 or height <= 0:
+            return None
+        return width, height
+
+    def _translate(self, html: str):
+        from html2pic.warnings import reset_warnings
+
+        # html2pic collects the warnings globally, and Html2Pic clears them on each instance
+        reset_warnings()
+        styled_tree = self._style_engine.apply_styles(self._html_parser.parse(html), self._style_rules, self._font_registry)
+        return self._translator.translate(styled_tree, self._font_registry)
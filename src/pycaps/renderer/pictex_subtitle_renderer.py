@@ -1,12 +1,19 @@
 from pathlib import Path
-from typing import TYPE_CHECKING, Optional, Tuple
+from typing import TYPE_CHECKING, Optional, Tuple, List, Callable, Dict
 from ..common import Line, Word, ElementState, CacheStrategy, Tag
-from .subtitle_renderer import SubtitleRenderer
+from .subtitle_renderer import SubtitleRenderer, T
 from .rendered_image_cache import RenderedImageCache
+from .css_class_analyzer import CssClassAnalyzer
+from . import pictex_render_worker
+from .pictex_stylesheet import PictexStylesheet
+from .font_subsetter import FontSubsetter
+from pycaps.logger import logger
 import os
 
 if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
     from PIL.Image import Image
+    from .persistent_image_cache import PersistentImageCache
 
 class PictexSubtitleRenderer(SubtitleRenderer):
 
@@ -16,16 +23,35 @@ class PictexSubtitleRenderer(SubtitleRenderer):
     REFERENCE_VIDEO_HEIGHT: int = 1280
     MIN_SCALE_MODIFIER: float = 0.25
     MAX_SCALE_MODIFIER: float = 5.0
+    PERSISTENT_CACHE_BACKEND: str = "pictex"
     
-    def __init__(self):
+    def __init__(self, processes: int = 1):
+        """
+        Renders subtitles using html2pic (Skia), without a browser.
+
+        Args:
+            processes: (Optional) Number of worker processes. If it's greater than 1, the images of render_lines() and
+                preload_word_sizes() are rendered in parallel by a process pool (0 means one process per CPU core).
+        """
         super().__init__()
+        if processes < 0:
+            raise ValueError(f"Invalid number of processes: {processes}")
         self._custom_css: str = ""
+        # CSS with the URLs resolved against the resources dir, so no working directory change is needed to render it
+        self._resolved_css: str = ""
+        self._stylesheet: Optional[PictexStylesheet] = None
         self._current_line: Optional[Line] = None
         self._current_line_state: Optional[ElementState] = None
-        self._resources_dir: Optional[Path] = None
-        self._original_cwd: Optional[Path] = None
+        self._processes: int = processes or os.cpu_count() or 1
+        self._executor: Optional['ProcessPoolExecutor'] = None
         self._cache_strategy = CacheStrategy.CSS_CLASSES_AWARE
         self._image_cache: RenderedImageCache = None
+        # (width, height) measured without rendering, by text and CSS classes key
+        self._word_size_cache: Dict[str, Tuple[int, int]] = {}
+        self._css_class_analyzer: Optional[CssClassAnalyzer] = None
+        self._persistent_cache: Optional['PersistentImageCache'] = None
+        self._cache_budget: Optional[int] = None
+        self._rendered_text: Optional[str] = None
         self._scale_factor: float = self.BASE_SCALE_FACTOR
 
     def _calculate_scale_modifier(self, video_height: int) -> float:
@@ -36,12 +62,50 @@ class PictexSubtitleRenderer(SubtitleRenderer):
     def append_css(self, css: str):
         self._custom_css += css
 
+    def get_css(self) -> Optional[str]:
+        return self._custom_css
+
+    def set_persistent_cache(self, persistent_cache: Optional['PersistentImageCache']) -> None:
+        self._persistent_cache = persistent_cache
+
+    def set_cache_budget(self, max_bytes: Optional[int]) -> None:
+        self._cache_budget = max_bytes
+
+    def set_rendered_text(self, text: Optional[str]) -> None:
+        self._rendered_text = text
+
+    def set_processes(self, processes: int) -> None:
+        """Sets the number of worker processes (see the constructor). It must be called before open()."""
+        if processes < 0:
+            raise ValueError(f"Invalid number of processes: {processes}")
+        self._processes = processes or os.cpu_count() or 1
+
     def open(self, video_width: int, video_height: int, resources_dir: Optional[Path] = None, cache_strategy: CacheStrategy = CacheStrategy.CSS_CLASSES_AWARE):
         scale_modifier = self._calculate_scale_modifier(video_height)
         self._scale_factor = self.BASE_SCALE_FACTOR * scale_modifier
-        self._resources_dir = resources_dir
+        font_subsets = None
+        if self._rendered_text is not None:
+            font_subsets = FontSubsetter().subset_fonts(FontSubsetter.get_css_fonts(self._custom_css, resources_dir), self._rendered_text, self._custom_css)
+        self._resolved_css = pictex_render_worker.resolve_css_urls(self._custom_css, resources_dir, font_subsets)
+        self._stylesheet = PictexStylesheet(self._resolved_css)
+        self._css_class_analyzer = CssClassAnalyzer.get(self._custom_css)
+        self._word_size_cache = {}
+        if cache_strategy == CacheStrategy.AUTO:
+            # each word is rendered alone, so its position in the line never changes the image
+            logger().debug("Pictex renders each word alone: using the CSS classes aware cache strategy.")
+            cache_strategy = CacheStrategy.CSS_CLASSES_AWARE
         self._cache_strategy = cache_strategy
-        self._image_cache = RenderedImageCache(self._custom_css, self._cache_strategy)
+        persistent_namespace = None
+        if self._persistent_cache:
+            engine_version = self._persistent_cache.get_package_versions("pictex", "html2pic")
+            persistent_namespace = self._persistent_cache.get_namespace(self.PERSISTENT_CACHE_BACKEND, self._custom_css, resources_dir, self._scale_factor, engine_version)
+        self._image_cache = RenderedImageCache(self._custom_css, self._cache_strategy, self._persistent_cache, persistent_namespace, self._cache_budget)
+        if self._processes > 1:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # Skia isn't fork-safe, so the workers are started from scratch
+            self._executor = ProcessPoolExecutor(max_workers=self._processes, mp_context=multiprocessing.get_context("spawn"))
+            logger().debug(f"Rendering with {self._processes} pictex worker processes.")
 
     def open_line(self, line: Line, line_state: ElementState):
         if self._current_line:
@@ -51,9 +115,6 @@ class PictexSubtitleRenderer(SubtitleRenderer):
         self._current_line_state = line_state
    
     def render_word(self, index: int, word: Word, state: ElementState, first_n_letters: Optional[int] = None) -> Optional['Image']:
-        from pictex import CropMode
-        from html2pic import Html2Pic
-        
         if not self._current_line:
             raise RuntimeError("No line is open. Call open_line() first.")
         
@@ -63,63 +124,92 @@ class PictexSubtitleRenderer(SubtitleRenderer):
         if self._image_cache.has(index, word.text, all_css_classes, first_n_letters):
             return self._image_cache.get(index, word.text, all_css_classes, first_n_letters)
 
-        self._use_resources_dir_as_cwd()
         text = word.text[:first_n_letters] if first_n_letters else word.text
-        renderer = Html2Pic(self.get_html(line_css_classes, word_css_classes, text), self._custom_css)
-        canvas, root_element = renderer._translator.translate(renderer.styled_tree, renderer.font_registry)
-        try:
-            image = canvas.render(root_element, crop_mode=CropMode.CONTENT_BOX, scale_factor=self._scale_factor)
-            pillow_image = image.to_pillow()
-            self._image_cache.set(index, word.text, all_css_classes, first_n_letters, pillow_image)
-            self._go_to_original_cwd()
-            return pillow_image
-        except:
-            self._go_to_original_cwd()
+        image = self._stylesheet.render(self.get_html(line_css_classes, word_css_classes, text), self._scale_factor)
+        if image is None:
             return None
+        pillow_image = image.to_pillow()
+        self._image_cache.set(index, word.text, all_css_classes, first_n_letters, pillow_image)
+        return pillow_image
 
     def close_line(self):
         self._current_line = None
         self._current_line_state = None
  
     def get_word_size(self, word: Word, line_state: ElementState, word_state: ElementState) -> Tuple[int, int]:
-        from pictex import CropMode
-        from html2pic import Html2Pic
-        
         if self._current_line:
             raise RuntimeError("A line process is in progress. Call close_line() first.")
 
         line_css_classes = self.get_line_css_classes(word.get_segment().get_tags(), word.get_line().get_tags(), line_state)
         word_css_classes = self.get_word_css_classes(word.get_tags(), word_state=word_state)
-        all_css_classes = line_css_classes + " " + word_css_classes
-        if self._image_cache.has(-1, word.text, all_css_classes, None):
-            image = self._image_cache.get(-1, word.text, all_css_classes, None)
-            return (image.width, image.height)
-
-        self._use_resources_dir_as_cwd()
-        renderer = Html2Pic(self.get_html(line_css_classes, word_css_classes, word.text), self._custom_css)
-        canvas, root_element = renderer._translator.translate(renderer.styled_tree, renderer.font_registry)
-        try: 
-            image = canvas.render(root_element, crop_mode=CropMode.CONTENT_BOX, scale_factor=self._scale_factor)
-            self._image_cache.set(-1, word.text, all_css_classes, None, image.to_pillow())
-            self._go_to_original_cwd()
-            return (image.width, image.height)
-        except:
-            self._go_to_original_cwd()
-            return (0, 0)
-    
-    def _use_resources_dir_as_cwd(self):
-        if self._resources_dir:
-            self._original_cwd = os.getcwd()
-            os.chdir(self._resources_dir)
-
-    def _go_to_original_cwd(self):
-        if self._original_cwd:
-            os.chdir(self._original_cwd)
-        
-        self._original_cwd = None
+        key = self._get_word_size_key(word.text, line_css_classes + " " + word_css_classes)
+        if key not in self._word_size_cache:
+            # only the layout runs: the pixels are rendered by render_word(), when they are needed
+            size = self._stylesheet.measure(self.get_html(line_css_classes, word_css_classes, word.text), self._scale_factor)
+            self._word_size_cache[key] = size or (0, 0)
+        return self._word_size_cache[key]
+
+    def preload_word_sizes(self, words: List[Word]) -> None:
+        if not self._executor:
+            return
+
+        pending_jobs = {}
+        for word in words:
+            for line_state, word_state in ElementState.get_all_valid_states_combinations():
+                line_css_classes = self.get_line_css_classes(word.get_segment().get_tags(), word.get_line().get_tags(), line_state)
+                word_css_classes = self.get_word_css_classes(word.get_tags(), word_state=word_state)
+                key = self._get_word_size_key(word.text, line_css_classes + " " + word_css_classes)
+                if key not in pending_jobs and key not in self._word_size_cache:
+                    pending_jobs[key] = (self.get_html(line_css_classes, word_css_classes, word.text), self._resolved_css, self._scale_factor)
+        if not pending_jobs:
+            return
 
+        chunksize = max(1, len(pending_jobs) // (self._processes * 4))
+        for key, size in zip(pending_jobs.keys(), self._executor.map(pictex_render_worker.measure, pending_jobs.values(), chunksize=chunksize)):
+            self._word_size_cache[key] = size or (0, 0)
+
+    def _get_word_size_key(self, text: str, all_css_classes: str) -> str:
+        # the word position is not part of the key: get_word_size() doesn't receive it
+        return f"{text}|{self._css_class_analyzer.get_key(all_css_classes)}"
+
+    def render_lines(self, lines: List[Line], render_line_fn: Callable[[SubtitleRenderer, Line], T]) -> List[T]:
+        if self._executor:
+            # all the images are rendered in the worker processes first, so render_line_fn() gets them from the cache
+            jobs = []
+            for line in lines:
+                for line_state, word_state in ElementState.get_all_valid_states_combinations():
+                    line_css_classes = self.get_line_css_classes(line.get_segment().get_tags(), line.get_tags(), line_state)
+                    for index, word in enumerate(line.words):
+                        jobs.append((index, word.text, line_css_classes, self.get_word_css_classes(word.get_tags(), index, word_state)))
+            self._render_in_workers(jobs)
+        return super().render_lines(lines, render_line_fn)
+
+    def _render_in_workers(self, jobs: List[Tuple[int, str, str, str]]) -> None:
+        """Renders the (index, text, line css classes, word css classes) jobs not cached yet in the worker processes, and caches the images."""
+        pending_jobs = {}
+        for index, text, line_css_classes, word_css_classes in jobs:
+            all_css_classes = line_css_classes + " " + word_css_classes
+            key = self._image_cache.get_key(index, text, all_css_classes, None)
+            if key in pending_jobs or self._image_cache.has(index, text, all_css_classes, None):
+                continue
+            pending_jobs[key] = (index, text, all_css_classes, (self.get_html(line_css_classes, word_css_classes, text), self._resolved_css, self._scale_factor))
+        if not pending_jobs:
+            return
+
+        render_jobs = [render_job for _, _, _, render_job in pending_jobs.values()]
+        chunksize = max(1, len(render_jobs) // (self._processes * 4))
+        for (index, text, all_css_classes, _), shared_image in zip(pending_jobs.values(), self._executor.map(pictex_render_worker.render_to_shared_memory, render_jobs, chunksize=chunksize)):
+            # images that can't be rendered aren't cached, as in render_word()
+            if shared_image is not None:
+                self._image_cache.set(index, text, all_css_classes, None, pictex_render_worker.read_shared_memory(shared_image))
+    
     def close(self):
         self.close_line()
+        if self._cache_budget and self._image_cache:
+            self._image_cache.log_stats()
+        if self._executor:
+            self._executor.shutdown()
+            self._executor = None
 
     def get_html(self, line_css_classes, word_css_classes, word_text) -> str:
         return f"""
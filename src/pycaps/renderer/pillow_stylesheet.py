@@ -0,0 +1,507 @@
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# RGBA, 0-255
+Color = Tuple[int, int, int, int]
+# (value, unit): the unit is "px", "em", "rem" or "%"
+Length = Tuple[float, str]
+
+@dataclass(frozen=True)
+class TextShadow:
+    offset_x: float
+    offset_y: float
+    blur: float
+    # None means currentcolor (the color of the word)
+    color: Optional[Color]
+
+@dataclass(frozen=True)
+class FontFace:
+    family: str
+    weight: int
+    path: Path
+
+@dataclass(frozen=True)
+class WordStyle:
+    """Computed style of a word. The lengths are in CSS pixels."""
+    font_families: Tuple[str, ...]
+    font_size: float
+    font_weight: int
+    color: Color
+    background_color: Color
+    # top, right, bottom, left
+    padding: Tuple[float, float, float, float]
+    # top-left, top-right, bottom-right, bottom-left
+    border_radius: Tuple[float, float, float, float]
+    text_shadows: Tuple[TextShadow, ...]
+    stroke_width: float
+    stroke_color: Color
+    text_transform: str
+
+@dataclass(frozen=True)
+class _Compound:
+    tag: Optional[str]
+    ids: Tuple[str, ...]
+    classes: Tuple[str, ...]
+
+@dataclass(frozen=True)
+class _Element:
+    tag: str
+    id: Optional[str]
+    classes: frozenset
+
+@dataclass(frozen=True)
+class _Rule:
+    specificity: Tuple[int, int, int]
+    position: int
+    compounds: Tuple[_Compound, ...]
+    # combinators[i] joins compounds[i] and compounds[i + 1]: " " (descendant) or ">" (child)
+    combinators: Tuple[str, ...]
+    declarations: Dict[str, Any]
+
+class PillowStylesheet:
+    """
+    The CSS subset supported by PillowSubtitleRenderer, parsed once.
+
+    Supported:
+     - Selectors: tag, class and id selectors (and compounds like `.word.highlighted`), joined by descendant or child combinators.
+     - Properties: the ones in SUPPORTED_PROPERTIES. Lengths can be px, em or rem (and % in font-size).
+       Only the inherited properties (fonts, color, text-shadow, stroke, text-transform) can be set in the line or its containers.
+     - `@font-face` rules with url() sources, resolved against the resources dir.
+
+    Anything else (pseudo-classes, other at-rules, unsupported properties or values, !important...) is rejected when the stylesheet
+    is created: a ValueError lists everything that is not supported, so a template is never rendered with a wrong style.
+    """
+
+    SUPPORTED_PROPERTIES: Tuple[str, ...] = (
+        "font-family", "font-size", "font-weight", "color", "background-color", "background",
+        "padding", "padding-top", "padding-right", "padding-bottom", "padding-left",
+        "border-radius", "border-top-left-radius", "border-top-right-radius", "border-bottom-right-radius", "border-bottom-left-radius",
+        "text-shadow", "-webkit-text-stroke", "-webkit-text-stroke-width", "-webkit-text-stroke-color", "text-transform", "display",
+    )
+    # properties without effect on the image of a single word (they only move it inside the line), so they are ignored
+    IGNORED_PROPERTIES: Tuple[str, ...] = ("align-content", "align-items", "justify-content", "vertical-align")
+    INHERITED_PROPERTIES: Tuple[str, ...] = (
+        "font-family", "font-size", "font-weight", "color", "text-shadow", "-webkit-text-stroke-width", "-webkit-text-stroke-color", "text-transform",
+    )
+    SIDES: Tuple[str, ...] = ("top", "right", "bottom", "left")
+    CORNERS: Tuple[str, ...] = ("top-left", "top-right", "bottom-right", "bottom-left")
+    ROOT_FONT_SIZE: float = 16.0
+
+    _COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.DOTALL)
+    _BLOCK_PATTERN = re.compile(r"\s*([^{}]*?)\s*\{([^{}]*)\}", re.DOTALL)
+    _NAME_PATTERN = r"-?[_a-zA-Z][_a-zA-Z0-9-]*"
+    _COMPOUND_PATTERN = re.compile(rf"^(\*|[a-zA-Z][a-zA-Z0-9]*)?((?:[.#]{_NAME_PATTERN})*)$")
+    _COMPOUND_PART_PATTERN = re.compile(rf"([.#])({_NAME_PATTERN})")
+    _LENGTH_PATTERN = re.compile(r"^([+-]?(?:\d+\.?\d*|\.\d+))(px|em|rem|%)?$", re.IGNORECASE)
+    _RGB_PATTERN = re.compile(r"^rgba?\((.*)\)$", re.IGNORECASE)
+    _URL_PATTERN = re.compile(r"url\(\s*(['\"]?)(.*?)\1\s*\)")
+    _FONT_WEIGHTS: Dict[str, int] = {"normal": 400, "bold": 700}
+    _STROKE_WIDTHS: Dict[str, float] = {"thin": 1.0, "medium": 3.0, "thick": 5.0}
+    _TEXT_TRANSFORMS: Tuple[str, ...] = ("none", "uppercase", "lowercase", "capitalize")
+    _NON_WORD_CLASSES: Tuple[str, ...] = ("line", "line-being-narrated", "line-not-narrated-yet", "line-already-narrated")
+    _NON_WORD_TAGS: Tuple[str, ...] = ("html", "body", "div")
+
+    def __init__(self, css: str, resources_dir: Optional[Path] = None):
+        """Parses the CSS. Raises ValueError if it uses anything outside the supported subset."""
+        self._rules: List[_Rule] = []
+        self._font_faces: List[FontFace] = []
+        self._styles: Dict[Tuple[str, str], WordStyle] = {}
+        errors: List[str] = []
+        self._parse(self._COMMENT_PATTERN.sub("", css), Path(resources_dir) if resources_dir else None, errors)
+        if errors:
+            raise ValueError(
+                "The CSS uses features not supported by PillowSubtitleRenderer:\n"
+                + "".join(f" - {error}\n" for error in errors)
+                + f"Supported properties: {', '.join(self.SUPPORTED_PROPERTIES)}. "
+                + "Use CssSubtitleRenderer (or PictexSubtitleRenderer) to render this template."
+            )
+        self._rules.sort(key=lambda rule: (rule.specificity, rule.position))
+
+    def get_font_faces(self) -> List[FontFace]:
+        return list(self._font_faces)
+
+    def get_word_style(self, line_css_classes: str, word_css_classes: str) -> WordStyle:
+        """Returns the computed style of a word with the CSS classes (the cascade is resolved once per classes combination)."""
+        key = (line_css_classes, word_css_classes)
+        style = self._styles.get(key)
+        if style is None:
+            style = self._compute_word_style(line_css_classes, word_css_classes)
+            self._styles[key] = style
+        return style
+
+    def _parse(self, css: str, resources_dir: Optional[Path], errors: List[str]) -> None:
+        position = 0
+        rule_position = 0
+        while position < len(css):
+            match = self._BLOCK_PATTERN.match(css, position)
+            if not match:
+                rest = css[position:].strip()
+                if rest:
+                    errors.append(f"can't parse the CSS near '{rest[:50]}' (nested blocks, like @media, are not supported)")
+                return
+            position = match.end()
+
+            # at-rules without block (like @import) end with ";" before the next prelude
+            statements = match.group(1).split(";")
+            for statement in (s.strip() for s in statements[:-1]):
+                if statement and not statement.lower().startswith("@charset"):
+                    errors.append(f"unsupported at-rule: '{statement[:50]}'")
+            prelude = " ".join(statements[-1].split())
+            block = match.group(2)
+
+            if prelude.lower() == "@font-face":
+                self._parse_font_face(block, resources_dir, errors)
+            elif prelude.startswith("@"):
+                errors.append(f"unsupported at-rule: '{prelude[:50]}'")
+            else:
+                declarations = self._parse_declarations(block, errors)
+                for selector in self._split(prelude, ","):
+                    rule = self._parse_selector(selector, rule_position, declarations, errors)
+                    if rule:
+                        self._rules.append(rule)
+                rule_position += 1
+
+    def _parse_selector(self, selector: str, position: int, declarations: Dict[str, Any], errors: List[str]) -> Optional[_Rule]:
+        tokens = re.sub(r"\s*>\s*", " > ", selector.strip()).split()
+        compounds: List[_Compound] = []
+        combinators: List[str] = []
+        for token in tokens:
+            if token == ">":
+                if not compounds or len(combinators) == len(compounds):
+                    errors.append(f"unsupported selector: '{selector}'")
+                    return None
+                combinators.append(">")
+                continue
+            match = self._COMPOUND_PATTERN.match(token)
+            if not match or not token:
+                errors.append(f"unsupported selector: '{selector}' (only tag, class and id selectors, joined by descendant or child combinators, are supported)")
+                return None
+            if len(combinators) < len(compounds):
+                combinators.append(" ")
+            tag = match.group(1) if match.group(1) != "*" else None
+            parts = self._COMPOUND_PART_PATTERN.findall(match.group(2))
+            compounds.append(_Compound(
+                tag.lower() if tag else None,
+                tuple(name for kind, name in parts if kind == "#"),
+                tuple(name for kind, name in parts if kind == "."),
+            ))
+        if not compounds or len(combinators) != len(compounds) - 1:
+            errors.append(f"unsupported selector: '{selector}'")
+            return None
+
+        subject = compounds[-1]
+        if subject.ids or subject.tag in self._NON_WORD_TAGS or any(css_class in self._NON_WORD_CLASSES for css_class in subject.classes):
+            not_inherited = sorted(name for name in declarations if name not in self.INHERITED_PROPERTIES)
+            if not_inherited:
+                errors.append(f"'{selector}' sets {', '.join(not_inherited)}: only the inherited properties ({', '.join(self.INHERITED_PROPERTIES)}) can be set outside the words")
+                return None
+
+        specificity = (
+            sum(len(compound.ids) for compound in compounds),
+            sum(len(compound.classes) for compound in compounds),
+            sum(1 for compound in compounds if compound.tag),
+        )
+        return _Rule(specificity, position, tuple(compounds), tuple(combinators), declarations)
+
+    def _parse_declarations(self, block: str, errors: List[str]) -> Dict[str, Any]:
+        declarations: Dict[str, Any] = {}
+        for declaration in self._split(block, ";"):
+            if not declaration:
+                continue
+            name, separator, value = declaration.partition(":")
+            name, value = name.strip().lower(), " ".join(value.split())
+            if not separator or not value:
+                errors.append(f"invalid declaration: '{declaration[:50]}'")
+                continue
+            if name in self.IGNORED_PROPERTIES:
+                continue
+            if name not in self.SUPPORTED_PROPERTIES:
+                errors.append(f"unsupported property: '{name}'")
+                continue
+            if "!important" in value.lower():
+                errors.append(f"!important is not supported: '{name}: {value}'")
+                continue
+            try:
+                declarations.update(self._parse_property(name, value))
+            except ValueError as e:
+                errors.append(f"unsupported value of {name}: '{value}' ({e})")
+        return declarations
+
+    def _parse_property(self, name: str, value: str) -> Dict[str, Any]:
+        """Returns the parsed values of the property, with the shorthands expanded into their longhands."""
+        lowered = value.lower()
+        if lowered in ("inherit", "initial", "unset", "revert"):
+            raise ValueError("CSS-wide keywords are not supported")
+
+        if name == "font-family":
+            return {name: tuple(family.strip().strip("'\"") for family in self._split(value, ","))}
+        if name == "font-size":
+            return {name: self._parse_length(lowered, allow_percentage=True)}
+        if name == "font-weight":
+            if lowered in self._FONT_WEIGHTS:
+                return {name: self._FONT_WEIGHTS[lowered]}
+            if lowered.isdigit() and 1 <= int(lowered) <= 1000:
+                return {name: int(lowered)}
+            raise ValueError("use normal, bold or a number")
+        if name == "color":
+            return {name: self._parse_color(lowered)}
+        if name in ("background-color", "background"):
+            # the background shorthand is only supported with a color
+            return {"background-color": self._parse_color(lowered)}
+        if name == "padding":
+            return dict(zip((f"padding-{side}" for side in self.SIDES), self._expand_box([self._parse_length(token) for token in lowered.split()])))
+        if name.startswith("padding-"):
+            return {name: self._parse_length(lowered)}
+        if name == "border-radius":
+            if "/" in lowered:
+                raise ValueError("elliptical corners are not supported")
+            return dict(zip((f"border-{corner}-radius" for corner in self.CORNERS), self._expand_box([self._parse_length(token) for token in lowered.split()])))
+        if name.endswith("-radius"):
+            if len(lowered.split()) != 1:
+                raise ValueError("elliptical corners are not supported")
+            return {name: self._parse_length(lowered)}
+        if name == "text-shadow":
+            return {name: self._parse_text_shadows(lowered)}
+        if name == "-webkit-text-stroke":
+            tokens = self._split(lowered, " ")
+            if len(tokens) not in (1, 2):
+                raise ValueError("expected a width and a color")
+            result = {"-webkit-text-stroke-width": self._parse_stroke_width(tokens[0])}
+            result["-webkit-text-stroke-color"] = self._parse_color(tokens[1]) if len(tokens) == 2 else None
+            return result
+        if name == "-webkit-text-stroke-width":
+            return {name: self._parse_stroke_width(lowered)}
+        if name == "-webkit-text-stroke-color":
+            return {name: None if lowered == "currentcolor" else self._parse_color(lowered)}
+        if name == "text-transform":
+            if lowered not in self._TEXT_TRANSFORMS:
+                raise ValueError(f"use one of: {', '.join(self._TEXT_TRANSFORMS)}")
+            return {name: lowered}
+        if name == "display":
+            # the words are always rendered as inline boxes
+            if lowered not in ("inline", "inline-block"):
+                raise ValueError("only inline and inline-block are supported")
+            return {}
+        raise ValueError("unsupported property")
+
+    def _parse_font_face(self, block: str, resources_dir: Optional[Path], errors: List[str]) -> None:
+        descriptors = {}
+        for declaration in self._split(block, ";"):
+            name, _, value = declaration.partition(":")
+            descriptors[name.strip().lower()] = value.strip()
+
+        family = descriptors.get("font-family", "").strip("'\"")
+        weight = descriptors.get("font-weight", "normal").lower()
+        weight = self._FONT_WEIGHTS.get(weight, int(weight) if weight.isdigit() else 400)
+        if not family:
+            errors.append("@font-face without font-family")
+            return
+        if descriptors.get("font-style", "normal").lower() != "normal":
+            # italic faces are never selected, since font-style is not supported
+            return
+
+        for _, url in self._URL_PATTERN.findall(descriptors.get("src", "")):
+            path = Path(url)
+            if not path.is_absolute() and resources_dir:
+                path = resources_dir / url
+            if path.is_file():
+                self._font_faces.append(FontFace(family, weight, path))
+                return
+        errors.append(f"no font file found for @font-face '{family}' (src: {descriptors.get('src', '')})")
+
+    def _compute_word_style(self, line_css_classes: str, word_css_classes: str) -> WordStyle:
+        elements = [
+            _Element("html", None, frozenset()),
+            _Element("body", None, frozenset()),
+            _Element("div", "subtitle-container", frozenset()),
+            _Element("div", None, frozenset(line_css_classes.split())),
+            _Element("span", None, frozenset(word_css_classes.split())),
+        ]
+        # initial values, and the font-family of the renderer page (html, body { font-family: sans-serif; })
+        inherited: Dict[str, Any] = {
+            "font-family": ("sans-serif",),
+            "font-size": self.ROOT_FONT_SIZE,
+            "font-weight": 400,
+            "color": (0, 0, 0, 255),
+            "text-shadow": (),
+            "-webkit-text-stroke-width": 0.0,
+            "-webkit-text-stroke-color": None,
+            "text-transform": "none",
+        }
+
+        declared: Dict[str, Any] = {}
+        for index in range(len(elements)):
+            declared = {}
+            for rule in self._rules:
+                if self._matches(rule, elements, index):
+                    declared.update(rule.declarations)
+
+            if index < len(elements) - 1:
+                not_inherited = sorted(name for name in declared if name not in self.INHERITED_PROPERTIES)
+                if not_inherited:
+                    raise ValueError(f"PillowSubtitleRenderer only supports inherited properties outside the words, but the classes '{line_css_classes}' set: {', '.join(not_inherited)}")
+
+            # em in font-size is relative to the parent font size, and in the other properties to the element font size
+            if "font-size" in declared:
+                value, unit = declared["font-size"]
+                inherited["font-size"] = value / 100 * inherited["font-size"] if unit == "%" else self._resolve_length((value, unit), inherited["font-size"])
+            font_size = inherited["font-size"]
+            for name, value in declared.items():
+                if name == "font-size" or name not in self.INHERITED_PROPERTIES:
+                    continue
+                if name == "text-shadow":
+                    value = tuple(
+                        TextShadow(self._resolve_length(x, font_size), self._resolve_length(y, font_size), self._resolve_length(blur, font_size), color)
+                        for x, y, blur, color in value
+                    )
+                elif name == "-webkit-text-stroke-width":
+                    value = self._resolve_length(value, font_size)
+                inherited[name] = value
+
+        # the word is the last element: its declared values are the non-inherited ones
+        color = inherited["color"]
+        return WordStyle(
+            font_families=inherited["font-family"],
+            font_size=font_size,
+            font_weight=inherited["font-weight"],
+            color=color,
+            background_color=declared.get("background-color", (0, 0, 0, 0)),
+            padding=tuple(max(0.0, self._resolve_length(declared.get(f"padding-{side}", (0.0, "px")), font_size)) for side in self.SIDES),
+            border_radius=tuple(max(0.0, self._resolve_length(declared.get(f"border-{corner}-radius", (0.0, "px")), font_size)) for corner in self.CORNERS),
+            text_shadows=tuple(TextShadow(shadow.offset_x, shadow.offset_y, shadow.blur, shadow.color or color) for shadow in inherited["text-shadow"]),
+            stroke_width=inherited["-webkit-text-stroke-width"],
+            stroke_color=inherited["-webkit-text-stroke-color"] or color,
+            text_transform=inherited["text-transform"],
+        )
+
+    def _matches(self, rule: _Rule, elements: List[_Element], index: int) -> bool:
+        if not self._compound_matches(rule.compounds[-1], elements[index]):
+            return False
+        return self._ancestors_match(rule, len(rule.compounds) - 2, elements, index - 1)
+
+    def _ancestors_match(self, rule: _Rule, compound_index: int, elements: List[_Element], element_index: int) -> bool:
+        if compound_index < 0:
+            return True
+        compound = rule.compounds[compound_index]
+        if rule.combinators[compound_index] == ">":
+            return (
+                element_index >= 0
+                and self._compound_matches(compound, elements[element_index])
+                and self._ancestors_match(rule, compound_index - 1, elements, element_index - 1)
+            )
+        return any(
+            self._compound_matches(compound, elements[candidate]) and self._ancestors_match(rule, compound_index - 1, elements, candidate - 1)
+            for candidate in range(element_index, -1, -1)
+        )
+
+    def _compound_matches(self, compound: _Compound, element: _Element) -> bool:
+        return (
+            (compound.tag is None or compound.tag == element.tag)
+            and all(id == element.id for id in compound.ids)
+            and all(css_class in element.classes for css_class in compound.classes)
+        )
+
+    def _parse_text_shadows(self, value: str) -> Tuple[Tuple[Length, Length, Length, Optional[Color]], ...]:
+        if value == "none":
+            return ()
+        shadows = []
+        for shadow in self._split(value, ","):
+            lengths, color = [], None
+            for token in self._split(shadow, " "):
+                if self._LENGTH_PATTERN.match(token):
+                    lengths.append(self._parse_length(token))
+                elif color is None and token != "currentcolor":
+                    color = self._parse_color(token)
+                elif token != "currentcolor":
+                    raise ValueError(f"unexpected '{token}'")
+            if len(lengths) not in (2, 3):
+                raise ValueError("expected an x offset, a y offset, an optional blur and a color (spread and inset are not supported)")
+            shadows.append((lengths[0], lengths[1], lengths[2] if len(lengths) == 3 else (0.0, "px"), color))
+        return tuple(shadows)
+
+    def _parse_stroke_width(self, value: str) -> Length:
+        if value in self._STROKE_WIDTHS:
+            return (self._STROKE_WIDTHS[value], "px")
+        return self._parse_length(value)
+
+    def _parse_length(self, value: str, allow_percentage: bool = False) -> Length:
+        match = self._LENGTH_PATTERN.match(value)
+        if not match:
+            raise ValueError(f"'{value}' is not a supported length (px, em or rem)")
+        number, unit = float(match.group(1)), (match.group(2) or "").lower()
+        if not unit:
+            if number != 0:
+                raise ValueError(f"'{value}' has no unit")
+            unit = "px"
+        if unit == "%" and not allow_percentage:
+            raise ValueError(f"'{value}': percentages are not supported")
+        return (number, unit)
+
+    def _resolve_length(self, length: Length, font_size: float) -> float:
+        value, unit = length
+        if unit == "em":
+            return value * font_size
+        if unit == "rem":
+            return value * self.ROOT_FONT_SIZE
+        return value
+
+    def _parse_color(self, value: str) -> Color:
+        from PIL import ImageColor
+
+        if value == "transparent":
+            return (0, 0, 0, 0)
+        match = self._RGB_PATTERN.match(value)
+        if match:
+            parts = [part for part in re.split(r"[\s,/]+", match.group(1).strip()) if part]
+            if len(parts) not in (3, 4):
+                raise ValueError(f"invalid color '{value}'")
+            try:
+                rgb = [round(float(part[:-1]) * 2.55) if part.endswith("%") else round(float(part)) for part in parts[:3]]
+                alpha = 1.0 if len(parts) == 3 else (float(parts[3][:-1]) / 100 if parts[3].endswith("%") else float(parts[3]))
+            except ValueError:
+                raise ValueError(f"invalid color '{value}'")
+            return (*(min(255, max(0, channel)) for channel in rgb), round(min(1.0, max(0.0, alpha)) * 255))
+        try:
+            return ImageColor.getcolor(value, "RGBA")
+        except ValueError:
+            raise ValueError(f"'{value}' is not a supported color")
+
+    def _expand_box(self, values: List[Any]) -> List[Any]:
+        """Expands the 1-4 values of a box shorthand (padding, border-radius) to 4 values."""
+        if len(values) == 1:
+            return values * 4
+        if len(values) == 2:
+            return [values[0], values[1], values[0], values[1]]
+        if len(values) == 3:
+            return [values[0], values[1], values[2], values[1]]
+        if len(values) == 4:
+            return values
+        raise ValueError("expected 1 to 4 values")
+
+    def _split(self, value: str, separator: str) -> List[str]:
+        """Splits by the separator (" " means any whitespace), ignoring the separators inside parentheses and quotes."""
+        parts = []
+        current = ""
+        depth = 0
+        quote: Optional[str] = None
+        for character in value:
+            if quote:
+                if character == quote:
+                    quote = None
+            elif character in "\"'":
+                quote = character
+            elif character == "(":
+                depth += 1
+            elif character == ")":
+                depth -= 1
+            elif depth == 0 and (character == separator or (separator == " " and character.isspace())):
+                if current.strip():
+                    parts.append(current.strip())
+                current = ""
+                continue
+            current += character
+        if current.strip():
+            parts.append(current.strip())
+        return parts
@@ -0,0 +1,130 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Tuple, Dict
+from ..common import Line, Word, ElementState, CacheStrategy
+from .subtitle_renderer import SubtitleRenderer
+from .rendered_image_cache import RenderedImageCache
+from .css_class_analyzer import CssClassAnalyzer
+from .renderer_page import RendererPage
+from .pillow_stylesheet import PillowStylesheet
+from .pillow_word_painter import PillowWordPainter
+from pycaps.logger import logger
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+    from .persistent_image_cache import PersistentImageCache
+
+class PillowSubtitleRenderer(SubtitleRenderer):
+    """
+    Renders subtitles with Pillow (FreeType), without a browser or Skia.
+
+    It only supports a subset of CSS (see PillowStylesheet): fonts (from the template resources, @font-face or the system),
+    font-size, font-weight, color, text-shadow, -webkit-text-stroke, padding, background-color, border-radius and text-transform.
+    If the CSS uses anything else, open() raises a ValueError listing it, so the template must be rendered with another renderer.
+    """
+
+    BASE_SCALE_FACTOR: float = 2.0
+    REFERENCE_VIDEO_HEIGHT: int = 1280
+    MIN_SCALE_MODIFIER: float = 0.25
+    MAX_SCALE_MODIFIER: float = 5.0
+    PERSISTENT_CACHE_BACKEND: str = "pillow"
+
+    def __init__(self):
+        super().__init__()
+        self._custom_css: str = ""
+        self._renderer_page: RendererPage = RendererPage()
+        self._stylesheet: Optional[PillowStylesheet] = None
+        self._painter: Optional[PillowWordPainter] = None
+        self._current_line: Optional[Line] = None
+        self._current_line_state: Optional[ElementState] = None
+        self._image_cache: Optional[RenderedImageCache] = None
+        self._persistent_cache: Optional['PersistentImageCache'] = None
+        self._cache_budget: Optional[int] = None
+        # (width, height) by text and CSS classes key
+        self._word_size_cache: Dict[str, Tuple[int, int]] = {}
+        self._css_class_analyzer: Optional[CssClassAnalyzer] = None
+        self._scale_factor: float = self.BASE_SCALE_FACTOR
+
+    def _calculate_scale_modifier(self, video_height: int) -> float:
+        """Calculates a scale modifier based on video height relative to reference."""
+        modifier = video_height / self.REFERENCE_VIDEO_HEIGHT
+        return max(self.MIN_SCALE_MODIFIER, min(self.MAX_SCALE_MODIFIER, modifier))
+
+    def append_css(self, css: str):
+        self._custom_css += css
+
+    def get_css(self) -> Optional[str]:
+        return self._custom_css
+
+    def set_persistent_cache(self, persistent_cache: Optional['PersistentImageCache']) -> None:
+        self._persistent_cache = persistent_cache
+
+    def set_cache_budget(self, max_bytes: Optional[int]) -> None:
+        self._cache_budget = max_bytes
+
+    def copy(self) -> 'PillowSubtitleRenderer':
+        renderer = PillowSubtitleRenderer()
+        renderer.append_css(self._custom_css)
+        return renderer
+
+    def open(self, video_width: int, video_height: int, resources_dir: Optional[Path] = None, cache_strategy: CacheStrategy = CacheStrategy.CSS_CLASSES_AWARE):
+        # it fails here (before anything is rendered) if the CSS is not supported
+        self._stylesheet = PillowStylesheet(self._custom_css, resources_dir)
+        self._painter = PillowWordPainter(self._stylesheet.get_font_faces(), resources_dir)
+        self._scale_factor = self.BASE_SCALE_FACTOR * self._calculate_scale_modifier(video_height)
+        if cache_strategy == CacheStrategy.AUTO:
+            # each word is rendered alone, so its position in the line never changes the image
+            logger().debug("Pillow renders each word alone: using the CSS classes aware cache strategy.")
+            cache_strategy = CacheStrategy.CSS_CLASSES_AWARE
+        persistent_namespace = None
+        if self._persistent_cache:
+            from PIL import features
+            # the text is rasterized by FreeType, so its version changes the images too
+            engine_version = f"{self._persistent_cache.get_package_versions('Pillow')}|freetype={features.version('freetype2')}"
+            persistent_namespace = self._persistent_cache.get_namespace(self.PERSISTENT_CACHE_BACKEND, self._custom_css, resources_dir, self._scale_factor, engine_version)
+        self._image_cache = RenderedImageCache(self._custom_css, cache_strategy, self._persistent_cache, persistent_namespace, self._cache_budget)
+        self._css_class_analyzer = CssClassAnalyzer.get(self._custom_css)
+        self._word_size_cache = {}
+
+    def open_line(self, line: Line, line_state: ElementState):
+        if self._current_line:
+            raise RuntimeError("A line is already open. Call close_line() first.")
+
+        self._current_line = line
+        self._current_line_state = line_state
+
+    def render_word(self, index: int, word: Word, state: ElementState, first_n_letters: Optional[int] = None) -> Optional['Image']:
+        if not self._current_line:
+            raise RuntimeError("No line is open. Call open_line() first.")
+
+        line_css_classes = self._renderer_page.get_line_css_classes(self._current_line.get_segment().get_tags(), self._current_line.get_tags(), self._current_line_state)
+        word_css_classes = self._renderer_page.get_word_css_classes(word.get_tags(), index, state)
+        all_css_classes = line_css_classes + " " + word_css_classes
+        if self._image_cache.has(index, word.text, all_css_classes, first_n_letters):
+            return self._image_cache.get(index, word.text, all_css_classes, first_n_letters)
+
+        text = word.text[:first_n_letters] if first_n_letters else word.text
+        image = self._painter.paint(text, self._stylesheet.get_word_style(line_css_classes, word_css_classes), self._scale_factor)
+        self._image_cache.set(index, word.text, all_css_classes, first_n_letters, image)
+        return image
+
+    def close_line(self):
+        self._current_line = None
+        self._current_line_state = None
+
+    def get_word_size(self, word: Word, line_state: ElementState, word_state: ElementState) -> Tuple[int, int]:
+        if not self._painter:
+            raise RuntimeError("Renderer is not open. Call open() first.")
+        if self._current_line:
+            raise RuntimeError("A line process is in progress. Call close_line() first.")
+
+        line_css_classes = self._renderer_page.get_line_css_classes(word.get_segment().get_tags(), word.get_line().get_tags(), line_state)
+        word_css_classes = self._renderer_page.get_word_css_classes(word.get_tags(), word_state=word_state)
+        key = f"{word.text}|{self._css_class_analyzer.get_key(line_css_classes + ' ' + word_css_classes)}"
+        if key not in self._word_size_cache:
+            self._word_size_cache[key] = self._painter.measure(word.text, self._stylesheet.get_word_style(line_css_classes, word_css_classes), self._scale_factor)
+        return self._word_size_cache[key]
+
+    def close(self):
+        self.close_line()
+        if self._cache_budget and self._image_cache:
+            self._image_cache.log_stats()
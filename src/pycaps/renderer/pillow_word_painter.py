@@ -0,0 +1,292 @@
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+from pycaps.logger import logger
+from .pillow_stylesheet import Color, FontFace, WordStyle
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL.Image import Image
+    from PIL.ImageFont import FreeTypeFont
+
+# (font, key of the font used by the glyph cache, synthetic bold stroke)
+_LoadedFont = Tuple['FreeTypeFont', Tuple, float]
+
+class PillowWordPainter:
+    """
+    Paints the word images with Pillow (FreeType), as the browser paints an inline `span`:
+    the box is the text advance plus the padding, and it contains the background (with rounded corners), the text shadows,
+    the stroke and the text. Anything outside the box is clipped, like in the screenshots of CssSubtitleRenderer.
+
+    The glyph masks are cached by font, character and stroke: FreeType rasterizes each glyph once, and the words are composed from the cached masks.
+    """
+
+    # the rounded corners are drawn at this scale and downsampled, to antialias them
+    CORNER_SUPERSAMPLING: int = 4
+    # when a bold weight is requested and there is no bold font file, the glyphs are expanded by this fraction of the font size
+    SYNTHETIC_BOLD_RATIO: float = 1 / 48
+    FONT_EXTENSIONS: Tuple[str, ...] = (".ttf", ".otf", ".ttc")
+    # font files tried (by name, in the system font dirs) for the generic families: (regular, bold)
+    GENERIC_FONT_FILES: Dict[str, List[Tuple[str, str]]] = {
+        "sans-serif": [("DejaVuSans.ttf", "DejaVuSans-Bold.ttf"), ("LiberationSans-Regular.ttf", "LiberationSans-Bold.ttf"), ("arial.ttf", "arialbd.ttf"), ("Arial.ttf", "Arial Bold.ttf"), ("Helvetica.ttc", "Helvetica.ttc")],
+        "serif": [("DejaVuSerif.ttf", "DejaVuSerif-Bold.ttf"), ("LiberationSerif-Regular.ttf", "LiberationSerif-Bold.ttf"), ("times.ttf", "timesbd.ttf"), ("Times New Roman.ttf", "Times New Roman Bold.ttf")],
+        "monospace": [("DejaVuSansMono.ttf", "DejaVuSansMono-Bold.ttf"), ("LiberationMono-Regular.ttf", "LiberationMono-Bold.ttf"), ("consola.ttf", "consolab.ttf"), ("cour.ttf", "courbd.ttf"), ("Menlo.ttc", "Menlo.ttc")],
+    }
+    GENERIC_FONT_ALIASES: Dict[str, str] = {"system-ui": "sans-serif", "ui-sans-serif": "sans-serif", "ui-serif": "serif", "ui-monospace": "monospace"}
+    BOLD_SUFFIXES: Tuple[str, ...] = (" Bold", "-Bold", "Bold", "bd")
+    BOLD_WEIGHT: int = 600
+
+    def __init__(self, font_faces: List[FontFace], resources_dir: Optional[Path] = None):
+        self._font_faces: List[FontFace] = font_faces
+        self._resources_fonts: Dict[str, Path] = self._find_resources_fonts(resources_dir)
+        self._fonts: Dict[Tuple, _LoadedFont] = {}
+        self._font_sources: Dict[Tuple[str, bool], Optional[Tuple[str, bool]]] = {}
+        self._missing_fonts: Set[Tuple[str, ...]] = set()
+        self._glyphs: Dict[Tuple, Optional[Tuple['np.ndarray', int, int]]] = {}
+
+    def measure(self, text: str, style: WordStyle, scale: float) -> Tuple[int, int]:
+        """Returns the (width, height) of the image that paint() returns for the text, without painting it."""
+        font, _, _ = self._get_font(style, scale)
+        return self._get_box_size(font, self._transform(text, style), style, scale)
+
+    def paint(self, text: str, style: WordStyle, scale: float) -> Optional['Image']:
+        import numpy as np
+        from PIL import Image, ImageFilter
+
+        font, font_key, synthetic_bold = self._get_font(style, scale)
+        text = self._transform(text, style)
+        width, height = self._get_box_size(font, text, style, scale)
+        if width <= 0 or height <= 0:
+            return None
+
+        # the text masks have a margin, so the parts outside the box are still there when the shadows are moved and blurred
+        stroke_width = style.stroke_width * scale / 2 if style.stroke_width > 0 else 0.0
+        margin = math.ceil(max([abs(s.offset_x) + abs(s.offset_y) + s.blur * 1.5 for s in style.text_shadows], default=0) * scale) + 1
+        shape = (height + 2 * margin, width + 2 * margin)
+        left = margin + style.padding[3] * scale
+        baseline = margin + style.padding[0] * scale + font.getmetrics()[0]
+        fill_mask = self._compose_text_mask(font, font_key, text, synthetic_bold, left, baseline, shape)
+        stroke_mask = self._compose_text_mask(font, font_key, text, synthetic_bold + stroke_width, left, baseline, shape) if stroke_width else None
+
+        premultiplied = np.zeros((height, width, 4), dtype=np.float32)
+        if style.background_color[3]:
+            self._paint_over(premultiplied, self._get_background_mask(width, height, tuple(r * scale for r in style.border_radius)), style.background_color)
+        # the first shadow is on top
+        for shadow in reversed(style.text_shadows):
+            mask = self._shift(stroke_mask if stroke_mask is not None else fill_mask, round(shadow.offset_x * scale), round(shadow.offset_y * scale))
+            if shadow.blur > 0:
+                # the CSS blur radius is twice the standard deviation of the gaussian
+                mask = np.asarray(Image.fromarray(mask).filter(ImageFilter.GaussianBlur(shadow.blur * scale / 2)))
+            self._paint_over(premultiplied, mask[margin:margin + height, margin:margin + width], shadow.color)
+        if stroke_mask is not None:
+            self._paint_over(premultiplied, stroke_mask[margin:margin + height, margin:margin + width], style.stroke_color)
+        self._paint_over(premultiplied, fill_mask[margin:margin + height, margin:margin + width], style.color)
+
+        alpha = premultiplied[..., 3:]
+        rgb = np.divide(premultiplied[..., :3], alpha, out=np.zeros_like(premultiplied[..., :3]), where=alpha > 0)
+        rgba = (np.concatenate([rgb, alpha], axis=2) * 255 + 0.5).astype(np.uint8)
+        return Image.fromarray(rgba, "RGBA")
+
+    def _get_box_size(self, font: 'FreeTypeFont', text: str, style: WordStyle, scale: float) -> Tuple[int, int]:
+        ascent, descent = font.getmetrics()
+        top, right, bottom, left = style.padding
+        width = math.ceil((left + right) * scale + font.getlength(text))
+        height = math.ceil((top + bottom) * scale + ascent + descent)
+        return width, height
+
+    def _transform(self, text: str, style: WordStyle) -> str:
+        if style.text_transform == "uppercase":
+            return text.upper()
+        if style.text_transform == "lowercase":
+            return text.lower()
+        if style.text_transform == "capitalize":
+            return re.sub(r"(^|\s)(\w)", lambda match: match.group(1) + match.group(2).upper(), text)
+        return text
+
+    def _compose_text_mask(self, font: 'FreeTypeFont', font_key: Tuple, text: str, stroke_width: float, left: float, baseline: float, shape: Tuple[int, int]) -> 'np.ndarray':
+        import numpy as np
+
+        mask = np.zeros(shape, dtype=np.uint8)
+        for index, character in enumerate(text):
+            glyph = self._get_glyph(font, font_key, character, stroke_width)
+            if glyph is None:
+                continue
+            glyph_mask, glyph_left, glyph_top = glyph
+            # the advance of the prefix includes the kerning
+            x = round(left + font.getlength(text[:index])) + glyph_left
+            y = round(baseline) + glyph_top
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + glyph_mask.shape[1], shape[1]), min(y + glyph_mask.shape[0], shape[0])
+            if x0 >= x1 or y0 >= y1:
+                continue
+            region = mask[y0:y1, x0:x1]
+            np.maximum(region, glyph_mask[y0 - y:y1 - y, x0 - x:x1 - x], out=region)
+        return mask
+
+    def _get_glyph(self, font: 'FreeTypeFont', font_key: Tuple, character: str, stroke_width: float) -> Optional[Tuple['np.ndarray', int, int]]:
+        """Returns the mask of the glyph and its position relative to the pen position (on the baseline)."""
+        key = (font_key, character, stroke_width)
+        if key not in self._glyphs:
+            import numpy as np
+            from PIL import Image, ImageDraw
+
+            # the box has float coordinates when the stroke width is not an integer
+            left, top, right, bottom = font.getbbox(character, stroke_width=stroke_width, anchor="ls")
+            left, top, right, bottom = math.floor(left), math.floor(top), math.ceil(right), math.ceil(bottom)
+            if right <= left or bottom <= top:
+                self._glyphs[key] = None
+            else:
+                image = Image.new("L", (right - left, bottom - top))
+                ImageDraw.Draw(image).text((-left, -top), character, fill=255, font=font, anchor="ls", stroke_width=stroke_width, stroke_fill=255)
+                self._glyphs[key] = (np.asarray(image), left, top)
+        return self._glyphs[key]
+
+    def _paint_over(self, premultiplied: 'np.ndarray', mask: 'np.ndarray', color: Color) -> None:
+        """Paints the color over the image (premultiplied RGBA, 0-1), with the mask as coverage."""
+        import numpy as np
+
+        if not color[3]:
+            return
+        alpha = (mask.astype(np.float32) * (color[3] / 255 / 255))[..., None]
+        premultiplied[..., :3] = np.array(color[:3], dtype=np.float32) / 255 * alpha + premultiplied[..., :3] * (1 - alpha)
+        premultiplied[..., 3:] = alpha + premultiplied[..., 3:] * (1 - alpha)
+
+    @staticmethod
+    def _shift(mask: 'np.ndarray', dx: int, dy: int) -> 'np.ndarray':
+        import numpy as np
+
+        if dx == 0 and dy == 0:
+            return mask
+        height, width = mask.shape
+        shifted = np.zeros_like(mask)
+        if abs(dx) < width and abs(dy) < height:
+            shifted[max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)] = mask[max(-dy, 0):height - max(dy, 0), max(-dx, 0):width - max(dx, 0)]
+        return shifted
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _get_background_mask(width: int, height: int, radii: Tuple[float, float, float, float]) -> 'np.ndarray':
+        import numpy as np
+        from PIL import Image, ImageDraw
+
+        if not any(radii):
+            return np.full((height, width), 255, dtype=np.uint8)
+
+        top_left, top_right, bottom_right, bottom_left = radii
+        # as in CSS, the radii are reduced proportionally when adjacent corners overlap
+        factor = min(
+            1.0,
+            width / (top_left + top_right) if top_left + top_right else 1.0,
+            width / (bottom_left + bottom_right) if bottom_left + bottom_right else 1.0,
+            height / (top_left + bottom_left) if top_left + bottom_left else 1.0,
+            height / (top_right + bottom_right) if top_right + bottom_right else 1.0,
+        )
+        supersampling = PillowWordPainter.CORNER_SUPERSAMPLING
+        w, h = width * supersampling, height * supersampling
+        image = Image.new("L", (w, h), 255)
+        draw = ImageDraw.Draw(image)
+        # (radius, is right corner, is bottom corner, pieslice angles)
+        corners = [
+            (top_left, False, False, (180, 270)),
+            (top_right, True, False, (270, 360)),
+            (bottom_right, True, True, (0, 90)),
+            (bottom_left, False, True, (90, 180)),
+        ]
+        for radius, right, bottom, (start, end) in corners:
+            r = radius * factor * supersampling
+            if r <= 0:
+                continue
+            x0 = w - r if right else 0
+            y0 = h - r if bottom else 0
+            draw.rectangle([x0, y0, x0 + r - 1, y0 + r - 1], fill=0)
+            ellipse_x0 = w - 2 * r if right else 0
+            ellipse_y0 = h - 2 * r if bottom else 0
+            draw.pieslice([ellipse_x0, ellipse_y0, ellipse_x0 + 2 * r - 1, ellipse_y0 + 2 * r - 1], start, end, fill=255)
+        return np.asarray(image.resize((width, height), Image.BOX))
+
+    def _get_font(self, style: WordStyle, scale: float) -> _LoadedFont:
+        from PIL import ImageFont
+
+        size = style.font_size * scale
+        key = (style.font_families, style.font_weight, size)
+        if key not in self._fonts:
+            bold = style.font_weight >= self.BOLD_WEIGHT
+            source = self._find_font(style.font_families, bold)
+            if source:
+                path, is_bold = source
+                font = ImageFont.truetype(path, size)
+            else:
+                is_bold = False
+                font = ImageFont.load_default(size)
+            synthetic_bold = size * self.SYNTHETIC_BOLD_RATIO if bold and not is_bold else 0.0
+            self._fonts[key] = (font, key, synthetic_bold)
+        return self._fonts[key]
+
+    def _find_font(self, families: Tuple[str, ...], bold: bool) -> Optional[Tuple[str, bool]]:
+        """Returns the font file (and if it's bold) of the first family found, as the browser does with the font-family list."""
+        for family in families:
+            cache_key = (family.lower(), bold)
+            if cache_key not in self._font_sources:
+                source = self._find_font_face(family, bold) or self._find_resources_font(family, bold) or self._find_system_font(family, bold)
+                if source:
+                    logger().debug(f"Font for '{family}'{' (bold)' if bold else ''}: {source[0]}")
+                self._font_sources[cache_key] = source
+            if self._font_sources[cache_key]:
+                return self._font_sources[cache_key]
+
+        if families not in self._missing_fonts:
+            self._missing_fonts.add(families)
+            logger().warning(f"None of the fonts {', '.join(families)} was found: Pillow's default font is used instead.")
+        return None
+
+    def _find_font_face(self, family: str, bold: bool) -> Optional[Tuple[str, bool]]:
+        faces = [face for face in self._font_faces if face.family.lower() == family.lower()]
+        if not faces:
+            return None
+        face = min(faces, key=lambda face: abs(face.weight - (700 if bold else 400)))
+        return str(face.path), face.weight >= self.BOLD_WEIGHT
+
+    def _find_resources_font(self, family: str, bold: bool) -> Optional[Tuple[str, bool]]:
+        name = self._normalize_font_name(family)
+        if bold:
+            for suffix in ("bold", "bd"):
+                if name + suffix in self._resources_fonts:
+                    return str(self._resources_fonts[name + suffix]), True
+        for candidate in (name, name + "regular"):
+            if candidate in self._resources_fonts:
+                return str(self._resources_fonts[candidate]), False
+        return None
+
+    def _find_system_font(self, family: str, bold: bool) -> Optional[Tuple[str, bool]]:
+        """Looks for the font by file name in the system font dirs (Pillow searches them when the file is not found)."""
+        from PIL import ImageFont
+
+        generic_family = self.GENERIC_FONT_ALIASES.get(family.lower(), family.lower())
+        if generic_family in self.GENERIC_FONT_FILES:
+            candidates = [(bold_file, True) for _, bold_file in self.GENERIC_FONT_FILES[generic_family]] if bold else []
+            candidates += [(regular_file, False) for regular_file, _ in self.GENERIC_FONT_FILES[generic_family]]
+        else:
+            names = list(dict.fromkeys([family, family.replace(" ", ""), family.lower(), family.lower().replace(" ", "")]))
+            candidates = [(name + suffix + extension, True) for name in names for suffix in self.BOLD_SUFFIXES for extension in self.FONT_EXTENSIONS] if bold else []
+            candidates += [(name + extension, False) for name in names for extension in self.FONT_EXTENSIONS]
+
+        for file_name, is_bold in candidates:
+            try:
+                return ImageFont.truetype(file_name, 10).path, is_bold
+            except OSError:
+                continue
+        return None
+
+    def _find_resources_fonts(self, resources_dir: Optional[Path]) -> Dict[str, Path]:
+        if not resources_dir or not Path(resources_dir).is_dir():
+            return {}
+        return {
+            self._normalize_font_name(path.stem): path
+            for path in sorted(Path(resources_dir).rglob("*"))
+            if path.suffix.lower() in self.FONT_EXTENSIONS
+        }
+
+    def _normalize_font_name(self, name: str) -> str:
+        return re.sub(r"[^a-z0-9]", "", name.lower())
@@ -1,18 +1,59 @@
-from typing import Optional, TYPE_CHECKING
+from typing import Optional, TYPE_CHECKING, Any, Dict
 from pycaps.common import CacheStrategy
+from .lru_byte_cache import LruByteCache
+from .css_class_analyzer import CssClassAnalyzer
+from pycaps.logger import logger
 
 if TYPE_CHECKING:
     from PIL.Image import Image
+    from .persistent_image_cache import PersistentImageCache
+    from .cache_strategy_prober import CacheStrategyProber
 
 class RenderedImageCache:
-    def __init__(self, css_content: str, cache_strategy: CacheStrategy):
-        self._css_content = css_content
+    def __init__(
+            self,
+            css_content: str,
+            cache_strategy: CacheStrategy,
+            persistent_cache: Optional['PersistentImageCache'] = None,
+            persistent_namespace: Optional[str] = None,
+            max_bytes: Optional[int] = None,
+            cache_strategy_prober: Optional['CacheStrategyProber'] = None,
+            array_images: bool = False
+        ):
+        """
+        Args:
+            array_images: (Optional) If True, the images are BGRA arrays (see ImageArrayConverter) instead of PIL images,
+                and they are read from and written to the persistent cache as arrays.
+        """
+        self._css_class_analyzer = CssClassAnalyzer.get(css_content)
         self._cache_strategy = cache_strategy
-        self._cache = {}
+        # with CacheStrategy.AUTO, it decides if the position is part of the key (if there is no prober, it always is)
+        self._cache_strategy_prober = cache_strategy_prober
+        # the images can be PIL images or arrays (see ImageArrayConverter)
+        self._cache = LruByteCache(self.__get_image_size, max_bytes)
+        # The persistent cache is only used as a fallback of the in-memory one: found images are kept in memory too
+        self._persistent_cache = persistent_cache if cache_strategy != CacheStrategy.NONE else None
+        self._persistent_namespace = persistent_namespace
+        self._array_images = array_images
 
     def has(self, index: int, text: str, css_classes: str, first_n_letters: Optional[str]) -> bool:
         key = self.__build_key(index, text, css_classes, first_n_letters)
-        return key in self._cache
+        if key in self._cache:
+            return True
+        if not self._persistent_cache:
+            return False
+
+        if self._array_images:
+            found, image = self._persistent_cache.get_array(self._persistent_namespace, key)
+        else:
+            found, image = self._persistent_cache.get(self._persistent_namespace, key)
+        if found:
+            self._cache.set(key, image)
+        return found
+
+    def is_in_memory(self, index: int, text: str, css_classes: str, first_n_letters: Optional[str]) -> bool:
+        """Like has(), but without looking for the image in the persistent cache."""
+        return self.__build_key(index, text, css_classes, first_n_letters) in self._cache
 
     def get(self, index: int, text: str, css_classes: str, first_n_letters: Optional[str]) -> Optional['Image']:
         if not self.has(index, text, css_classes, first_n_letters):
@@ -26,10 +67,36 @@ class RenderedImageCache:
         if self._cache_strategy == CacheStrategy.NONE:
             return
         key = self.__build_key(index, text, css_classes, first_n_letters)
-        self._cache[key] = image
+        self._cache.set(key, image)
+        if self._persistent_cache and self._array_images:
+            self._persistent_cache.set_array(self._persistent_namespace, key, image)
+        elif self._persistent_cache:
+            self._persistent_cache.set(self._persistent_namespace, key, image)
+
+    def get_key(self, index: int, text: str, css_classes: str, first_n_letters: Optional[str]) -> str:
+        """Returns the key of the entry: two entries with the same key are the same image."""
+        return self.__build_key(index, text, css_classes, first_n_letters)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns the entries, bytes, evictions and re-renders (images rendered again after being evicted) of the cache."""
+        stats = self._cache.get_stats()
+        stats["re_renders"] = stats.pop("re_sets")
+        return stats
+
+    def log_stats(self) -> None:
+        stats = self.get_stats()
+        logger().info(f"Rendered images cache: {stats['entries']} images, {stats['bytes'] / 1024 / 1024:.1f} MB, {stats['evictions']} evictions, {stats['re_renders']} re-renders.")
+
+    def __get_image_size(self, key: str, image: Any) -> int:
+        if image is None:
+            return 0
+        if hasattr(image, "nbytes"):
+            return image.nbytes
+        return image.width * image.height * len(image.getbands())
 
     def __build_key(self, index: int, text: str, css_classes: str, first_n_letters: Optional[str]) -> str:
-        if self._cache_strategy == CacheStrategy.CSS_CLASSES_AWARE:
+        if self._cache_strategy == CacheStrategy.CSS_CLASSES_AWARE or (
+            self._cache_strategy == CacheStrategy.AUTO and self._cache_strategy_prober and not self._cache_strategy_prober.is_position_sensitive(css_classes)
+        ):
             index = -1
-        used_css_classes = [c for c in css_classes.split() if c in self._css_content]
-        return f"word:{text}|index:{index}|first_{first_n_letters or -1}_letters|css_classes:{','.join(used_css_classes)}"
+        return f"word:{text}|index:{index}|first_{first_n_letters or -1}_letters|css_classes:{self._css_class_analyzer.get_key(css_classes)}"
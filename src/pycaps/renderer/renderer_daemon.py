@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple, TYPE_CHECKING
+from pycaps.logger import logger
+from pycaps.utils import update_hash_with_files
+
+if TYPE_CHECKING:
+    from playwright.sync_api import Page, BrowserContext
+
+class RendererDaemon:
+    """
+    Long-lived headless Chromium shared by the renderers of different runs (and processes).
+
+    The daemon launches the browser with a local CDP endpoint and writes it in a state file.
+    When the state file exists and the endpoint answers, CssSubtitleRenderer connects to it instead of launching its own browser.
+
+    The template pages are kept loaded in the browser between runs: each page is keyed by a hash of its HTML (that includes the CSS)
+    and its resources. A renderer leases a free page with the same key (so it skips the page load), and releases it when it's closed.
+    Each lease has its own token, and the renderer runs its scripts through get_leased_script(), so every call checks that the
+    page is still its own and renews the lease: a page is only free (or idle) after its release, or when its renderer didn't
+    call it for PAGE_LEASE_TIMEOUT_SECONDS (it crashed). Idle pages are closed when there are more than `max_pages`.
+    """
+
+    DEFAULT_PORT: int = 9333
+    DEFAULT_MAX_PAGES: int = 8
+    STATE_FILE_NAME: str = "daemon.json"
+    PAGE_FILE_NAME: str = "renderer_base.html"
+    # a renderer that crashed never releases its page, so leases without heartbeats (calls from their renderer) for this long are ignored
+    PAGE_LEASE_TIMEOUT_SECONDS: int = 60 * 60
+    CONNECTION_TIMEOUT_SECONDS: float = 0.5
+    # max page directories kept on disk (the least recently used ones are removed)
+    MAX_PAGE_DIRS: int = 64
+
+    LEASE_PAGE_SCRIPT: str = """
+    ([token, timeout]) => {
+        const now = Date.now();
+        const lease = window.__pycapsLease;
+        if (lease && lease.token !== token && now - lease.heartbeatAt < timeout) {
+            return false;
+        }
+        window.__pycapsLease = {token, heartbeatAt: now};
+        return true;
+    }
+    """
+    RELEASE_PAGE_SCRIPT: str = """
+    (token) => {
+        if (window.__pycapsLease && window.__pycapsLease.token === token) {
+            window.__pycapsLease = null;
+        }
+        window.__pycapsLastUsedAt = Date.now();
+    }
+    """
+    PAGE_STATUS_SCRIPT: str = "() => [window.__pycapsLease ? window.__pycapsLease.heartbeatAt : 0, window.__pycapsLastUsedAt || 0]"
+    # runs a script of the renderer only if the page is still leased with its token, and renews the lease
+    LEASED_CALL_SCRIPT: str = """
+    ([token, arg]) => {
+        const lease = window.__pycapsLease;
+        if (!lease || lease.token !== token) {
+            throw new Error('The renderer daemon page is not leased by this renderer anymore');
+        }
+        lease.heartbeatAt = Date.now();
+        return (__SCRIPT__)(arg);
+    }
+    """
+    _leased_scripts: Dict[str, str] = {}
+
+    def __init__(self, port: int = DEFAULT_PORT, max_pages: int = DEFAULT_MAX_PAGES, state_dir: Optional[Path] = None):
+        """
+        Args:
+            port: (Optional) Local port of the CDP endpoint.
+            max_pages: (Optional) Max number of template pages kept loaded in the browser.
+            state_dir: (Optional) Directory of the state file and the template pages. By default, a folder in the user cache dir.
+        """
+        if max_pages < 1:
+            raise ValueError(f"Max pages must be greater than 0: {max_pages}")
+
+        self._port: int = port
+        self._max_pages: int = max_pages
+        self._state_dir: Path = Path(state_dir) if state_dir else self.get_default_dir()
+
+    @staticmethod
+    def get_default_dir() -> Path:
+        from platformdirs import user_cache_dir
+        return Path(user_cache_dir("pycaps")) / "renderer-daemon"
+
+    def run(self) -> None:
+        """Launches the browser and keeps it running until the process is interrupted."""
+        from playwright.sync_api import sync_playwright
+
+        state_path = self._state_dir / self.STATE_FILE_NAME
+        if self.find(self._state_dir):
+            raise RuntimeError(f"A renderer daemon is already running (state file: {state_path})")
+
+        with sync_playwright() as playwright:
+            browser = playwright.chromium.launch(args=[f"--remote-debugging-port={self._port}", "--remote-debugging-address=127.0.0.1"])
+            endpoint = f"http://127.0.0.1:{self._port}"
+            self._state_dir.mkdir(parents=True, exist_ok=True)
+            state = {"endpoint": endpoint, "pid": os.getpid(), "max_pages": self._max_pages}
+            state_path.write_text(json.dumps(state), encoding="utf-8")
+            logger().info(f"Renderer daemon listening on {endpoint} (state file: {state_path}). Press Ctrl+C to stop it.")
+            try:
+                while browser.is_connected():
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                state_path.unlink(missing_ok=True)
+                if browser.is_connected():
+                    browser.close()
+                logger().info("Renderer daemon stopped.")
+
+    @classmethod
+    def find(cls, state_dir: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+        """Returns the state of the running daemon (endpoint, pid and max pages), or None if there is no daemon answering."""
+        state_path = (Path(state_dir) if state_dir else cls.get_default_dir()) / cls.STATE_FILE_NAME
+        try:
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+            with urllib.request.urlopen(f"{state['endpoint']}/json/version", timeout=cls.CONNECTION_TIMEOUT_SECONDS):
+                pass
+            return state
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger().debug(f"Ignoring renderer daemon state file {state_path}: {e}")
+            return None
+
+    @classmethod
+    def get_page_dir(cls, html: str, resources_dir: Optional[Path], state_dir: Optional[Path] = None) -> Path:
+        """
+        Returns the directory with the HTML page and its resources, creating it if needed.
+        The directory name is a hash of the content, so pages with the same CSS and resources are shared.
+        When there are more than MAX_PAGE_DIRS directories, the least recently used ones are removed.
+        """
+        digest = hashlib.sha256(html.encode("utf-8"))
+        update_hash_with_files(digest, resources_dir)
+
+        pages_dir = (Path(state_dir) if state_dir else cls.get_default_dir()) / "pages"
+        page_dir = pages_dir / digest.hexdigest()
+        if page_dir.exists():
+            # the modification time marks the directory as recently used
+            os.utime(page_dir)
+            return page_dir
+
+        # the files are written in a temp dir and renamed, so a concurrent renderer never sees a partial page
+        pages_dir.mkdir(parents=True, exist_ok=True)
+        temp_dir = Path(tempfile.mkdtemp(dir=pages_dir))
+        try:
+            if resources_dir:
+                shutil.copytree(resources_dir, temp_dir, dirs_exist_ok=True)
+            (temp_dir / cls.PAGE_FILE_NAME).write_text(html, encoding="utf-8")
+            os.replace(temp_dir, page_dir)
+        except OSError:
+            # created by another renderer meanwhile
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            if not page_dir.exists():
+                raise
+        cls._remove_old_page_dirs(pages_dir)
+        return page_dir
+
+    @classmethod
+    def _remove_old_page_dirs(cls, pages_dir: Path) -> None:
+        """Removes the least recently used page directories until there are at most MAX_PAGE_DIRS."""
+        page_dirs = []
+        for path in pages_dir.iterdir():
+            try:
+                # the temp dirs of the pages being written start with "tmp"
+                if path.is_dir() and not path.name.startswith("tmp"):
+                    page_dirs.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        for _, path in sorted(page_dirs)[:max(0, len(page_dirs) - cls.MAX_PAGE_DIRS)]:
+            logger().debug(f"Removing unused renderer daemon page: {path}")
+            shutil.rmtree(path, ignore_errors=True)
+
+    @classmethod
+    def lease_page(cls, context: 'BrowserContext', page_dir: Path, max_pages: int = DEFAULT_MAX_PAGES) -> Tuple['Page', str]:
+        """
+        Returns a free page of the daemon browser with the page of the directory loaded (opening a new one if there isn't any),
+        and the token of the lease, needed by get_leased_script() and release_page().
+        """
+        url = (page_dir / cls.PAGE_FILE_NAME).as_uri()
+        timeout = cls.PAGE_LEASE_TIMEOUT_SECONDS * 1000
+        token = uuid.uuid4().hex
+        for page in context.pages:
+            if page.url == url and page.evaluate(cls.LEASE_PAGE_SCRIPT, [token, timeout]):
+                logger().debug(f"Reusing renderer daemon page: {url}")
+                return page, token
+
+        cls._close_idle_pages(context, max_pages - 1)
+        page = context.new_page()
+        page.goto(url)
+        page.wait_for_load_state('networkidle')
+        page.evaluate(cls.LEASE_PAGE_SCRIPT, [token, timeout])
+        return page, token
+
+    @classmethod
+    def get_leased_script(cls, script: str) -> str:
+        """
+        Wraps a page script (a function of one argument), so it receives [token, argument]: it fails if the lease of the token
+        isn't the current one of the page, and renews it.
+        """
+        leased_script = cls._leased_scripts.get(script)
+        if leased_script is None:
+            leased_script = cls.LEASED_CALL_SCRIPT.replace("__SCRIPT__", script.strip())
+            cls._leased_scripts[script] = leased_script
+        return leased_script
+
+    @classmethod
+    def release_page(cls, page: 'Page', token: str) -> None:
+        page.evaluate(cls.RELEASE_PAGE_SCRIPT, token)
+
+    @classmethod
+    def _close_idle_pages(cls, context: 'BrowserContext', max_pages: int) -> None:
+        """Closes the least recently used idle pages until there are at most `max_pages` pages."""
+        now = time.time() * 1000
+        idle_pages = []
+        for page in context.pages:
+            try:
+                heartbeat_at, last_used_at = page.evaluate(cls.PAGE_STATUS_SCRIPT)
+            except Exception:
+                # blank or closed pages
+                continue
+            # a leased page is renewed by each call of its renderer, so it's only idle if it was released or its renderer crashed
+            if not heartbeat_at or now - heartbeat_at >= cls.PAGE_LEASE_TIMEOUT_SECONDS * 1000:
+                idle_pages.append((last_used_at, page))
+
+        pages_to_close = len(context.pages) - max_pages
+        for _, page in sorted(idle_pages, key=lambda entry: entry[0])[:max(0, pages_to_close)]:
+            page.close()
@@ -1,11 +1,181 @@
-from pycaps.common import Tag, ElementState
-from typing import Optional
+import html
+import json
+from pycaps.common import Tag, ElementState, Word
+from typing import Optional, List, Tuple, Dict, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .letter_size_cache import LetterSizeCache
 
 class RendererPage:
 
     DEFAULT_CSS_CLASS_FOR_EACH_WORD: str = "word"
     DEFAULT_CSS_CLASS_FOR_EACH_LINE: str = "line"
 
+    # Why are we using a "remaining" span in renderWord (see RUNTIME_SCRIPT)?
+    # When the typewriting effect is applied, we need to render the word partially (first n letters).
+    # However, if we have some line background that depends on the size (like a gradient),
+    # since the word was cropped, the background will be incorrect.
+    # It can be specially noticeable in the last word of the line.
+    # The same would happen if we use border-radius, since we crop the word,
+    # it will show the rounded corners in each word fragment of the last word
+    # To fix this, we create a new span with the remaining part of the word and make it invisible.
+    # This way, the line is rendered with the final width it will have, and the background will be correct.
+
+    # Runtime injected in the page by get_html(), used by CssSubtitleRenderer and AsyncCssSubtitleRenderer through RUNTIME_CALL_SCRIPT.
+    # The lines are uploaded once (loadLines) and the calls only send indexes: line ids, word indexes and states (see get_state_index()).
+    # The line built in the page is kept between calls: the changes of each call are undone by the next one (pending changes),
+    # so they don't need their own call. The pending changes are [lineState, [wordIndex, wordState], lineWordsState], with nulls.
+    # The tiles are copies of lines (or states of the same line) stacked below the line, to be captured in a single screenshot.
+    RUNTIME_SCRIPT: str = """
+    window.pycapsRenderer = (() => {
+        const states = __STATES__;
+        // uploaded lines: [words, lineCssClasses, wordsCssClasses], the CSS classes without the states
+        let lines = [];
+        // the line built in the page
+        let current = {words: [], lineCssClasses: ''};
+
+        const getLine = () => document.querySelector('.__LINE_CLASS__');
+        const getWord = (index) => document.querySelector(`.word-${index}-in-line`);
+        const getBox = (element) => {
+            const box = element.getBoundingClientRect();
+            return {x: box.x, y: box.y, width: box.width, height: box.height};
+        };
+        const withState = (cssClasses, state) => cssClasses + ' ' + states[state];
+        const buildLine = (line, words, lineCssClasses, wordsCssClasses) => {
+            line.innerHTML = '';
+            line.className = lineCssClasses;
+            words.forEach((word, index) => {
+                const wordElement = document.createElement('span');
+                wordElement.textContent = word;
+                wordElement.className = wordsCssClasses[index];
+                line.appendChild(wordElement);
+            });
+        };
+        const openLine = (words, lineCssClasses, wordsCssClasses, lineState) => {
+            current = {words: words, lineCssClasses: lineCssClasses};
+            buildLine(getLine(), words, withState(lineCssClasses, lineState), wordsCssClasses);
+        };
+        const removeRemainingWord = (word) => {
+            if (word.dataset.isNextNodeRemaining) {
+                word.parentNode.removeChild(word.nextSibling);
+                delete word.dataset.isNextNodeRemaining;
+            }
+        };
+        const applyPendingChanges = ([lineState, pendingWord, lineWordsState]) => {
+            if (lineState !== null) {
+                getLine().className = withState(current.lineCssClasses, lineState);
+            }
+            if (pendingWord !== null) {
+                const [index, state] = pendingWord;
+                const word = getWord(index);
+                word.classList.remove(states[state]);
+                word.textContent = current.words[index];
+                removeRemainingWord(word);
+            }
+            if (lineWordsState !== null) {
+                getLine().querySelectorAll('.__WORD_CLASS__').forEach((word) => word.classList.remove(states[lineWordsState]));
+            }
+        };
+        const removeTiles = () => document.querySelectorAll('[data-tile]').forEach((tile) => tile.remove());
+
+        return {
+            loadLines: (newLines) => {
+                lines = newLines;
+            },
+            openLine: (lineId, lineState) => {
+                const [words, lineCssClasses, wordsCssClasses] = lines[lineId];
+                openLine(words, lineCssClasses, wordsCssClasses, lineState);
+            },
+            // for the lines that were not uploaded
+            openLineWords: openLine,
+            // see the "remaining" span above; firstNLetters is null to render the whole word
+            renderWord: (pendingChanges, index, state, firstNLetters) => {
+                applyPendingChanges(pendingChanges);
+                const word = getWord(index);
+                const wordCodePoints = Array.from(current.words[index]); // to avoid issues with multibyte characters
+                const lettersCount = firstNLetters === null ? wordCodePoints.length : firstNLetters;
+                word.textContent = wordCodePoints.slice(0, lettersCount).join('');
+                word.classList.add(states[state]);
+                if (lettersCount < wordCodePoints.length) {
+                    const remainingWord = word.dataset.isNextNodeRemaining ? word.nextSibling : document.createElement('span');
+                    remainingWord.textContent = wordCodePoints.slice(lettersCount).join('');
+                    remainingWord.className = word.className;
+                    remainingWord.style.visibility = 'hidden';
+                    if (!word.dataset.isNextNodeRemaining) {
+                        word.parentNode.insertBefore(remainingWord, word.nextSibling);
+                        word.dataset.isNextNodeRemaining = true;
+                    }
+                } else {
+                    removeRemainingWord(word);
+                }
+                return getBox(word);
+            },
+            addStateToLineWords: (pendingChanges, state) => {
+                applyPendingChanges(pendingChanges);
+                const words = current.words.map((_, index) => getWord(index));
+                words.forEach((word) => word.classList.add(states[state]));
+                return words.map(getBox);
+            },
+            // tiles: [lineId, lineState, wordState]. The height of the container is returned with the boxes:
+            // the page is centered, so the viewport must be at least that tall, or the first tiles would be above it.
+            tileLines: (tiles) => {
+                removeTiles();
+                const container = document.getElementById('subtitle-container');
+                const tileElements = tiles.map(([lineId, lineState, wordState]) => {
+                    const [words, lineCssClasses, wordsCssClasses] = lines[lineId];
+                    const line = document.createElement('div');
+                    buildLine(line, words, withState(lineCssClasses, lineState), wordsCssClasses.map((cssClasses) => withState(cssClasses, wordState)));
+                    line.dataset.tile = 'true';
+                    container.appendChild(line);
+                    return line;
+                });
+                return {
+                    height: container.getBoundingClientRect().height,
+                    boxes: tileElements.map((line) => Array.from(line.children).map(getBox)),
+                };
+            },
+            removeTiles: removeTiles,
+        };
+    })();
+    """.replace("__STATES__", json.dumps([state.value for state in ElementState])) \
+        .replace("__LINE_CLASS__", DEFAULT_CSS_CLASS_FOR_EACH_LINE) \
+        .replace("__WORD_CLASS__", DEFAULT_CSS_CLASS_FOR_EACH_WORD)
+    # The only script evaluated to call the runtime, so Chromium compiles it once
+    RUNTIME_CALL_SCRIPT: str = "([name, args]) => window.pycapsRenderer[name](...args)"
+
+    # All letters are measured without padding/borders/etc, the "NON_CONTENT_WIDTH" is used to measure the paddings/borders/etc
+    # So, each word must have the "NON_CONTENT_WIDTH" to include its padding/border/etc
+    NON_CONTENT_WIDTH_LETTER: str = "NON_CONTENT_WIDTH"
+    # It receives a list of [letters, lineCssClasses, wordCssClasses] groups, so several groups can be measured in one call
+    MEASURE_LETTERS_SCRIPT: str = f"""
+    (groups) => {{
+        const line = document.querySelector('.{DEFAULT_CSS_CLASS_FOR_EACH_LINE}');
+        const groups_letters_size = [];
+        for (const [letters, lineCssClasses, wordCssClasses] of groups) {{
+            line.innerHTML = '';
+            line.className = lineCssClasses;
+            const wordElement = document.createElement('span');
+            wordElement.textContent = '';
+            wordElement.className = wordCssClasses;
+            line.appendChild(wordElement);
+            const emptyWidth = wordElement.getBoundingClientRect().width;
+            const letters_size = {{}};
+            for (const letter of letters) {{
+                wordElement.textContent = letter === "{NON_CONTENT_WIDTH_LETTER}" ? "" : letter;
+                const box = wordElement.getBoundingClientRect();
+                // we exclude the extra width (paddings, borders, etc) for each letter
+                // it is only taken into account when we want to measure the "{NON_CONTENT_WIDTH_LETTER}"
+                const width = letter === "{NON_CONTENT_WIDTH_LETTER}" ? box.width : box.width - emptyWidth
+                letters_size[letter] = {{width: width, height: box.height}};
+            }}
+            groups_letters_size.push(letters_size);
+        }}
+        return groups_letters_size;
+    }}
+    """
+    # Max number of groups sent in each MEASURE_LETTERS_SCRIPT call
+    MEASURE_LETTERS_BATCH_SIZE: int = 200
+
     def get_html(
             self,
             custom_css: str = "",
@@ -15,15 +185,20 @@ class RendererPage:
             line_state: ElementState = ElementState.LINE_NOT_NARRATED_YET,
             words: list[str] = [],
             word_tags: list[list[Tag]] = [],
-            word_states: list[ElementState] = []
+            word_states: list[ElementState] = [],
+            preload_fonts: list[str] = []
         ) -> str:
         base_tag = f'<base href="{base_url}">' if base_url else ""
+        # the fonts are requested with the page, instead of when the first word using them is laid out
+        preload_tags = "".join(f'<link rel="preload" href="{html.escape(font)}" as="font" crossorigin>' for font in preload_fonts)
         return f"""
         <!DOCTYPE html>
         <html>
         <head>
             <meta charset="UTF-8">
             {base_tag}
+            {preload_tags}
+            <script>{self.RUNTIME_SCRIPT}</script>
             <style>
                 html, body {{
                     margin: 0;
@@ -59,12 +234,23 @@ class RendererPage:
         </html>
         """
     
-    def get_line_css_classes(self, segment_tags: list[Tag], line_tags: list[Tag], line_state: ElementState) -> str:
+    def get_line_css_classes(self, segment_tags: list[Tag], line_tags: list[Tag], line_state: Optional[ElementState] = None) -> str:
         css_classes = [self.DEFAULT_CSS_CLASS_FOR_EACH_LINE]
         css_classes.extend([tag.name for tag in segment_tags])
         css_classes.extend([tag.name for tag in line_tags])
-        css_classes.append(line_state.value)
+        if line_state:
+            css_classes.append(line_state.value)
         return " ".join(css_classes)
+
+    @staticmethod
+    def get_state_index(state: ElementState) -> int:
+        """Index of the state in the page runtime (see RUNTIME_SCRIPT)."""
+        return list(ElementState).index(state)
+
+    @staticmethod
+    def get_empty_line_changes() -> List:
+        """Pending changes of the page runtime (see RUNTIME_SCRIPT): [line state, [word index, word state], state of all the line words]."""
+        return [None, None, None]
     
     def get_word_css_classes(self, word_tags: list[Tag], index: Optional[int] = None, word_state: Optional[ElementState] = None) -> str:
         css_classes = [self.DEFAULT_CSS_CLASS_FOR_EACH_WORD]
@@ -77,4 +263,31 @@ class RendererPage:
     
     def get_word_html(self, index: int, word: str, word_tags: list[Tag], word_state: ElementState) -> str:
         return f"<span class=\"{self.get_word_css_classes(word_tags, index, word_state)}\">{word}</span>"
-    
\ No newline at end of file
+    
+
+    def get_letters_to_measure(self, words: List[Word], letter_size_cache: 'LetterSizeCache') -> List[Tuple[List[str], str, str]]:
+        """
+        Collects the letters of the words that are not in the cache, for all the valid states combinations.
+        Letters are grouped by their effective CSS classes (the ones used by the CSS), so each distinct pair is measured only once.
+        Returns a list of (letters, line css classes, word css classes) groups, as expected by MEASURE_LETTERS_SCRIPT.
+        """
+        groups: Dict[str, Tuple[List[str], str, str]] = {}
+        seen_letters: Dict[str, set] = {}
+        for word in words:
+            segment_tags, line_tags, word_tags = word.get_segment().get_tags(), word.get_line().get_tags(), word.get_tags()
+            for line_state, word_state in ElementState.get_all_valid_states_combinations():
+                line_css_classes = self.get_line_css_classes(segment_tags, line_tags, line_state)
+                word_css_classes = self.get_word_css_classes(word_tags, word_state=word_state)
+                key = letter_size_cache.get_css_classes_key(line_css_classes + " " + word_css_classes)
+                if key not in groups:
+                    groups[key] = ([], line_css_classes, word_css_classes)
+                    seen_letters[key] = set()
+                letters, _, _ = groups[key]
+                for letter in list(word.text) + [self.NON_CONTENT_WIDTH_LETTER]:
+                    if letter in seen_letters[key] or letter_size_cache.has(letter, line_css_classes + " " + word_css_classes):
+                        continue
+                    seen_letters[key].add(letter)
+                    letters.append(letter)
+
+        return [group for group in groups.values() if group[0]]
+
@@ -1,10 +1,14 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Optional, Tuple, TYPE_CHECKING
+from typing import Optional, Tuple, TYPE_CHECKING, Callable, List, TypeVar
 from pycaps.common import Word, ElementState, Line, CacheStrategy
 
 if TYPE_CHECKING:
+    import numpy as np
     from PIL.Image import Image
+    from .persistent_image_cache import PersistentImageCache
+
+T = TypeVar("T")
 
 class SubtitleRenderer(ABC):
     @abstractmethod
@@ -34,3 +38,64 @@ class SubtitleRenderer(ABC):
     @abstractmethod
     def close(self):
         pass
+
+    def render_word_array(self, index: int, word: Word, state: ElementState, first_n_letters: Optional[int] = None) -> Optional['np.ndarray']:
+        """
+        Same as render_word(), but the image is returned as a BGRA array (see ImageArrayConverter), ready to be used by the video clips.
+        The array returned can be shared (cache), so it must not be modified.
+        Renderers able to produce the array without a PIL image in the middle can override this method.
+        """
+        from .image_array_converter import ImageArrayConverter
+
+        image = self.render_word(index, word, state, first_n_letters)
+        return ImageArrayConverter.from_pil(image) if image else None
+
+    def preload_word_sizes(self, words: List[Word]) -> None:
+        """
+        Called before get_word_size() is called for all the valid states combinations of the words.
+        Renderers can override it to measure everything in a few calls, so the following get_word_size() calls are served from their cache.
+        """
+        pass
+
+    def render_lines(self, lines: List[Line], render_line_fn: Callable[['SubtitleRenderer', Line], T]) -> List[T]:
+        """
+        Calls render_line_fn(renderer, line) for each line and returns the results in the same order.
+        The renderer received by render_line_fn is the one that must be used for the open_line/render_word/close_line calls of that line.
+        Renderers able to work on several lines at the same time can override this method.
+        """
+        return [render_line_fn(self, line) for line in lines]
+
+    def copy(self) -> 'SubtitleRenderer':
+        """
+        Returns a new (not opened) renderer with the same configuration (CSS included).
+        It's used to create the workers when rendering in parallel.
+        """
+        raise NotImplementedError(f"{type(self).__name__} can't be copied, so it can't be used with several render workers.")
+
+    def get_css(self) -> Optional[str]:
+        """
+        Returns all the CSS appended to the renderer, or None if the renderer doesn't know it.
+        It's used to analyze the styles actually rendered (e.g. the CSS given to a custom renderer directly).
+        """
+        return None
+
+    def set_persistent_cache(self, persistent_cache: Optional['PersistentImageCache']) -> None:
+        """
+        Sets an on-disk cache used to reuse the rendered images between runs. It must be called before open().
+        Renderers that don't support it just ignore it.
+        """
+        pass
+
+    def set_cache_budget(self, max_bytes: Optional[int]) -> None:
+        """
+        Sets the max memory (in bytes) used by each in-memory cache of the renderer. It must be called before open().
+        When a cache exceeds it, the least recently used entries are evicted. Renderers without caches just ignore it.
+        """
+        pass
+
+    def set_rendered_text(self, text: Optional[str]) -> None:
+        """
+        Sets all the text that will be rendered (the words of the document), when it's known before open(). It must be called before open().
+        Renderers can use it to prepare their fonts (see FontSubsetter), so no other text should be rendered after it. The rest just ignore it.
+        """
+        pass
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple, TYPE_CHECKING, Callable, List
+from pycaps.common import Word, ElementState, Line, CacheStrategy
+from .subtitle_renderer import SubtitleRenderer, T
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL.Image import Image
+    from .persistent_image_cache import PersistentImageCache
+
+class SubtitleRendererPool(SubtitleRenderer):
+    """
+    Spreads the lines received by render_lines() across several copies of a renderer.
+
+    The lines are split in contiguous batches (one per worker), and each batch goes through the render_lines() of its worker,
+    so the batch optimizations of the renderers (uploading the lines at once, tiling them, etc) still apply.
+
+    Each worker is a renderer with its own browser/page (its line session), and it's always used from the same thread,
+    since Playwright sync objects can't be shared between threads.
+    The first worker is the original renderer and it runs in the calling thread, so the rest of the calls
+    (get_word_size, render_word from effects, etc) are delegated to it as usual.
+    """
+
+    def __init__(self, renderer: SubtitleRenderer, workers: int):
+        if workers < 1:
+            raise ValueError(f"Invalid number of render workers: {workers}")
+
+        self._renderers: List[SubtitleRenderer] = [renderer] + [renderer.copy() for _ in range(workers - 1)]
+        self._executors: List[ThreadPoolExecutor] = []
+
+    @property
+    def _main_renderer(self) -> SubtitleRenderer:
+        return self._renderers[0]
+
+    def append_css(self, css: str):
+        for renderer in self._renderers:
+            renderer.append_css(css)
+
+    def get_css(self) -> Optional[str]:
+        return self._main_renderer.get_css()
+
+    def set_persistent_cache(self, persistent_cache: Optional['PersistentImageCache']) -> None:
+        for renderer in self._renderers:
+            renderer.set_persistent_cache(persistent_cache)
+
+    def set_cache_budget(self, max_bytes: Optional[int]) -> None:
+        for renderer in self._renderers:
+            renderer.set_cache_budget(max_bytes)
+
+    def set_rendered_text(self, text: Optional[str]) -> None:
+        for renderer in self._renderers:
+            renderer.set_rendered_text(text)
+
+    def open(self, video_width: int, video_height: int, resources_dir: Optional[Path] = None, cache_strategy: CacheStrategy = CacheStrategy.CSS_CLASSES_AWARE):
+        self._executors = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"pycaps-render-worker-{i}") for i in range(1, len(self._renderers))]
+        futures = [
+            executor.submit(renderer.open, video_width, video_height, resources_dir, cache_strategy)
+            for executor, renderer in zip(self._executors, self._renderers[1:])
+        ]
+        self._main_renderer.open(video_width, video_height, resources_dir, cache_strategy)
+        for future in futures:
+            future.result()
+
+    def open_line(self, line: Line, line_state: ElementState):
+        self._main_renderer.open_line(line, line_state)
+
+    def render_word(self, index: int, word: Word, state: ElementState, first_n_letters: Optional[int] = None) -> Optional['Image']:
+        return self._main_renderer.render_word(index, word, state, first_n_letters)
+
+    def render_word_array(self, index: int, word: Word, state: ElementState, first_n_letters: Optional[int] = None) -> Optional['np.ndarray']:
+        return self._main_renderer.render_word_array(index, word, state, first_n_letters)
+
+    def close_line(self):
+        self._main_renderer.close_line()
+
+    def get_word_size(self, word: Word, line_state: ElementState, word_state: ElementState) -> Tuple[int, int]:
+        return self._main_renderer.get_word_size(word, line_state, word_state)
+
+    def preload_word_sizes(self, words: List[Word]) -> None:
+        self._main_renderer.preload_word_sizes(words)
+
+    def render_lines(self, lines: List[Line], render_line_fn: Callable[[SubtitleRenderer, Line], T]) -> List[T]:
+        if not self._executors:
+            return self._main_renderer.render_lines(lines, render_line_fn)
+
+        batches = self._split_in_batches(lines)
+        futures = [
+            executor.submit(renderer.render_lines, batch, render_line_fn)
+            for executor, renderer, batch in zip(self._executors, self._renderers[1:], batches[1:])
+        ]
+        try:
+            results = self._main_renderer.render_lines(batches[0], render_line_fn)
+        finally:
+            batch_results = [future.result() for future in futures]
+
+        for batch_result in batch_results:
+            results.extend(batch_result)
+        return results
+
+    def _split_in_batches(self, lines: List[Line]) -> List[List[Line]]:
+        """Splits the lines in one contiguous batch per worker, with similar lengths (the last ones can be empty)."""
+        workers = len(self._renderers)
+        batch_size, remainder = divmod(len(lines), workers)
+        batches = []
+        start = 0
+        for index in range(workers):
+            end = start + batch_size + (1 if index < remainder else 0)
+            batches.append(lines[start:end])
+            start = end
+        return batches
+
+    def close(self):
+        futures = [executor.submit(renderer.close) for executor, renderer in zip(self._executors, self._renderers[1:])]
+        self._main_renderer.close()
+        for future in futures:
+            future.result()
+        for executor in self._executors:
+            executor.shutdown()
+        self._executors = []
@@ -1,7 +1,11 @@
 from .script_utils import ScriptUtils
 from .time_utils import times_intersect
+from .size_utils import parse_size
+from .hash_utils import update_hash_with_files
 
 __all__ = [
     "ScriptUtils",
     "times_intersect",
+    "parse_size",
+    "update_hash_with_files",
 ]
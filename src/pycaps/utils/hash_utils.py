@@ -0,0 +1,13 @@
+from pathlib import Path
+from typing import Any, Optional
+
+def update_hash_with_files(digest: Any, directory: Optional[Path]) -> None:
+    """
+    Updates a hashlib digest with the relative path and content of each file of the directory (recursively, in a stable order).
+    Nothing is added if the directory is None or doesn't exist.
+    """
+    if not directory or not directory.is_dir():
+        return
+    for path in sorted(p for p in directory.rglob("*") if p.is_file()):
+        digest.update(b"|" + path.relative_to(directory).as_posix().encode("utf-8") + b"|")
+        digest.update(path.read_bytes())
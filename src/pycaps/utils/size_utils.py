@@ -0,0 +1,21 @@
+import re
+from typing import Union
+
+_SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+_SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?B)?\s*$", re.IGNORECASE)
+
+def parse_size(value: Union[str, int]) -> int:
+    """Parses a size like "512MB", "1.5GB" or 1024 (bytes) into bytes. Units are multiples of 1024."""
+    if isinstance(value, int):
+        if value <= 0:
+            raise ValueError(f"Invalid size: {value}")
+        return value
+
+    match = _SIZE_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Invalid size: '{value}'. Expected a number followed by B, KB, MB or GB (e.g. 512MB).")
+    number, unit = match.groups()
+    size = int(float(number) * _SIZE_UNITS[(unit or "B").upper()])
+    if size <= 0:
+        raise ValueError(f"Invalid size: '{value}'")
+    return size
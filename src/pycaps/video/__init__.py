@@ -1,7 +1,23 @@
 from .subtitle_clips_generator import SubtitleClipsGenerator
 from .video_generator import VideoGenerator
+from .image_clip_factory import ImageClipFactory
+from .sprite_trimmer import SpriteTrimmer
+from .sprite_registry import SpriteRegistry
+from .sprite_atlas import SpriteAtlas
+from .line_clips_compositor import LineClipsCompositor
+from .overlay_planner import OverlayPlanner
+from .pipelined_video_writer import PipelinedVideoWriter
+from .chunked_video_writer import ChunkedVideoWriter
 
 __all__ = [
     "SubtitleClipsGenerator",
     "VideoGenerator",
+    "ImageClipFactory",
+    "SpriteTrimmer",
+    "SpriteRegistry",
+    "SpriteAtlas",
+    "LineClipsCompositor",
+    "OverlayPlanner",
+    "PipelinedVideoWriter",
+    "ChunkedVideoWriter",
 ]
@@ -0,0 +1,27 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+class BgraBlender:
+    @staticmethod
+    def blend(canvas: 'np.ndarray', image: 'np.ndarray', x: int, y: int, opacity: float = 1.0) -> None:
+        '''
+        Blends a BGRA uint8 image over a transparent BGRA float32 canvas (straight alpha, from 0 to 255), with its top left corner at (x, y).
+        It's the blending used by movielite over BGRA backgrounds, so the canvas can replace the images when it's composited over the video.
+        The image must be inside the canvas.
+        '''
+        import numpy as np
+
+        region = canvas[y:y + image.shape[0], x:x + image.shape[1]]
+        if opacity == 1.0 and not region[..., 3].any():
+            # nothing below the image: blending it over the transparent pixels gives the same pixels
+            region[...] = image
+            return
+
+        image_alpha = image[..., 3:4].astype(np.float32) / 255.0 * opacity
+        region_alpha = region[..., 3:4] / 255.0
+        alpha = image_alpha + region_alpha * (1.0 - image_alpha)
+        color = (image[..., :3] * image_alpha + region[..., :3] * region_alpha * (1.0 - image_alpha)) / np.maximum(alpha, 1e-6)
+        region[..., :3] = np.clip(color, 0.0, 255.0)
+        region[..., 3:4] = alpha * 255.0
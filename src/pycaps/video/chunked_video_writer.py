@@ -0,0 +1,210 @@
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import List, Optional, Sequence, Tuple, TYPE_CHECKING
+from pycaps.logger import logger
+
+if TYPE_CHECKING:
+    import numpy as np
+    from movielite import GraphicClip, VideoQuality, VideoWriter
+
+# the writer whose chunks are rendered by the forked worker processes
+_chunked_writer: Optional['ChunkedVideoWriter'] = None
+
+def _render_chunk(index: int, start_frame: int, end_frame: int, output_path: str, video_quality: 'VideoQuality') -> str:
+    _chunked_writer._render_chunk(index, start_frame, end_frame, output_path, video_quality)
+    return output_path
+
+class ChunkedVideoWriter:
+    '''
+    Writes the video of a movielite VideoWriter in time chunks rendered in parallel, each one in its own process and encoder.
+
+    The timeline is split in chunks of similar length. The cuts are aligned with the keyframes of the input video (so each
+    process starts decoding at a keyframe instead of decoding from the previous one), and preferably placed where no subtitle
+    clip is on screen, so a seam between two encodings never falls on a subtitle. The chunks are concatenated with FFmpeg's
+    concat demuxer without re-encoding, and the audio is mixed and muxed once for the whole timeline.
+
+    The worker processes are forked, so they inherit the clips (their functions and images can't be pickled). On platforms
+    without fork, the chunks are rendered one after the other. Only the calling thread survives a fork, so the subtitles must be
+    rendered and the renderer closed (browser connection, render worker threads) before writing (CapsPipeline does it).
+    '''
+
+    def __init__(
+            self,
+            writer: 'VideoWriter',
+            chunks: int,
+            jobs: Optional[int] = None,
+            keyframe_times: Optional[Sequence[float]] = None,
+            pipelined: bool = False,
+            subtitle_clips: Sequence['GraphicClip'] = ()
+        ):
+        '''
+        Args:
+            writer: The movielite writer with the clips to write (it must have a size and a duration).
+            chunks: Number of chunks of the timeline.
+            jobs: (Optional) Max chunks rendered at the same time. By default, the number of chunks (up to the number of CPUs).
+            keyframe_times: (Optional) Times of the keyframes of the input video, in the writer timeline. Without them, the cuts aren't aligned.
+            pipelined: If True, each chunk is rendered with a PipelinedVideoWriter.
+            subtitle_clips: (Optional) The subtitle clips of the writer (not the input video). Without them, the cuts don't avoid the subtitles.
+        '''
+        if chunks < 1:
+            raise ValueError(f"Invalid number of chunks: {chunks}")
+        if jobs is not None and jobs < 1:
+            raise ValueError(f"Invalid number of jobs: {jobs}")
+        self._writer: 'VideoWriter' = writer
+        self._chunks: int = chunks
+        self._jobs: int = jobs if jobs else min(chunks, os.cpu_count() or 1)
+        self._keyframe_times: List[float] = sorted(keyframe_times) if keyframe_times else []
+        self._pipelined: bool = pipelined
+        self._subtitle_clips: List['GraphicClip'] = list(subtitle_clips)
+
+    @staticmethod
+    def get_keyframe_times(video_path: str) -> List[float]:
+        '''Returns the times of the keyframes of the video (read with ffprobe), or an empty list if they can't be read.'''
+        command = [
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-skip_frame", "nokey",
+            "-show_entries", "frame=pts_time",
+            "-of", "csv=p=0",
+            video_path,
+        ]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger().debug(f"Can't read the keyframes of {video_path}: {e}")
+            return []
+
+        times: List[float] = []
+        for line in result.stdout.splitlines():
+            try:
+                times.append(float(line.strip().strip(",")))
+            except ValueError:
+                continue
+        return sorted(times)
+
+    def get_chunk_ranges(self, total_frames: int) -> List[Tuple[int, int]]:
+        '''Returns the [start, end) frames of each chunk. There can be fewer chunks than requested if the video is too short.'''
+        fps = self._writer._fps
+        if self._keyframe_times:
+            candidates = sorted({math.ceil(time * fps - 1e-6) for time in self._keyframe_times} & set(range(1, total_frames)))
+        else:
+            candidates = list(range(1, total_frames))
+        spanned = self._get_spanned_frames(total_frames)
+        clean_candidates = [frame for frame in candidates if not spanned[frame]]
+
+        cuts: List[int] = []
+        chunk_length = total_frames / self._chunks
+        for index in range(1, self._chunks):
+            target = round(index * chunk_length)
+            previous = cuts[-1] if cuts else 0
+            # a cut without subtitles on screen is preferred if it's within half a chunk of the target
+            cut = self._get_nearest(clean_candidates, target, previous, chunk_length / 2)
+            if cut is None:
+                cut = self._get_nearest(candidates, target, previous, chunk_length)
+            if cut is not None:
+                cuts.append(cut)
+
+        boundaries = [0, *cuts, total_frames]
+        return list(zip(boundaries, boundaries[1:]))
+
+    def write(self, video_quality: Optional['VideoQuality'] = None) -> None:
+        '''Renders the chunks, concatenates them and muxes the audio clips of the whole timeline.'''
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        global _chunked_writer
+
+        writer = self._writer
+        if writer._size is None or writer._duration is None:
+            raise ValueError("The video writer must have a size and a duration to be rendered in chunks.")
+        if writer._duration <= 0:
+            raise ValueError(f"Invalid duration: {writer._duration}")
+
+        if video_quality is None:
+            from movielite import VideoQuality
+            video_quality = VideoQuality.MIDDLE
+        ranges = self.get_chunk_ranges(int(writer._duration * writer._fps))
+        logger().info(f"Rendering the video in {len(ranges)} chunks ({self._jobs} at the same time): frames {', '.join(f'{start}-{end}' for start, end in ranges)}.")
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            chunk_paths = [os.path.join(temp_dir, f"chunk_{index}.mp4") for index in range(len(ranges))]
+            jobs = [(index, start, end, chunk_paths[index], video_quality) for index, (start, end) in enumerate(ranges)]
+            if self._jobs > 1 and len(ranges) > 1 and "fork" in multiprocessing.get_all_start_methods():
+                _chunked_writer = self
+                try:
+                    with ProcessPoolExecutor(max_workers=min(self._jobs, len(ranges)), mp_context=multiprocessing.get_context("fork")) as executor:
+                        futures = [executor.submit(_render_chunk, *job) for job in jobs]
+                        try:
+                            for future in futures:
+                                future.result()
+                        except BaseException:
+                            for future in futures:
+                                future.cancel()
+                            raise
+                finally:
+                    _chunked_writer = None
+            else:
+                for job in jobs:
+                    self._render_chunk(*job)
+
+            video_path = os.path.join(temp_dir, "video.mp4")
+            self._concatenate(chunk_paths, video_path)
+            writer._mux_audio(video_path, writer._output)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        logger().debug(f"Video saved to: {writer._output}")
+
+    def _render_chunk(self, index: int, start_frame: int, end_frame: int, output_path: str, video_quality: 'VideoQuality') -> None:
+        logger().debug(f"Rendering chunk {index}: frames {start_frame}-{end_frame}")
+        if self._pipelined:
+            from .pipelined_video_writer import PipelinedVideoWriter
+            PipelinedVideoWriter(self._writer).encode(start_frame, end_frame, output_path, video_quality)
+        else:
+            self._writer._render_range(start_frame, end_frame, output_path, video_quality, False)
+        if not os.path.exists(output_path):
+            raise RuntimeError(f"The chunk {index} (frames {start_frame}-{end_frame}) wasn't rendered.")
+
+    def _concatenate(self, chunk_paths: List[str], output_path: str) -> None:
+        '''Joins the chunks with the concat demuxer, copying the streams (they are encoded with the same settings).'''
+        list_path = os.path.join(os.path.dirname(output_path), "chunks.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in chunk_paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+
+        command = [
+            "ffmpeg", "-y",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", list_path,
+            "-c", "copy",
+            "-movflags", "+faststart",
+            output_path,
+            "-loglevel", "error",
+            "-hide_banner",
+        ]
+        subprocess.run(command, check=True)
+
+    def _get_spanned_frames(self, total_frames: int) -> 'np.ndarray':
+        '''Returns, for each frame, whether a subtitle clip is on screen both in it and in the previous frame (a cut there would split it).'''
+        import numpy as np
+
+        fps = self._writer._fps
+        counts = np.zeros(total_frames + 1, dtype=np.int32)
+        # the background (the input video) is always on screen, so only the subtitle clips over it matter
+        for clip in self._subtitle_clips:
+            first = min(total_frames, max(0, math.ceil(clip.start * fps - 1e-6)))
+            end = min(total_frames, max(0, math.ceil(clip.end * fps - 1e-6)))
+            if end - first > 1:
+                counts[first + 1] += 1
+                counts[end] -= 1
+        return np.cumsum(counts)[:total_frames] > 0
+
+    def _get_nearest(self, candidates: List[int], target: int, previous: int, max_distance: float) -> Optional[int]:
+        '''Returns the candidate after the previous cut that is nearest to the target (at most max_distance frames away).'''
+        valid = [frame for frame in candidates if frame > previous and abs(frame - target) <= max_distance]
+        return min(valid, key=lambda frame: (abs(frame - target), frame)) if valid else None
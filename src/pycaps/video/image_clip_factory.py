@@ -0,0 +1,25 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    from movielite import ImageClip
+
+class ImageClipFactory:
+    @staticmethod
+    def from_bgra(image: 'np.ndarray', start: float, duration: float) -> 'ImageClip':
+        '''
+        Creates a movielite ImageClip from a BGRA array (the format used internally by movielite) without copying it.
+        ImageClip(array) always copies the array and converts it from RGBA to BGRA, which isn't needed for the arrays returned by the renderers.
+        The array is shared with the clip, so it must not be modified after that.
+        '''
+        from movielite import ImageClip, GraphicClip
+
+        if image.ndim != 3 or image.shape[2] != 4:
+            raise ValueError(f"Invalid BGRA image shape: {image.shape}")
+
+        clip = ImageClip.__new__(ImageClip)
+        GraphicClip.__init__(clip, start, duration)
+        clip._image = image
+        clip._size = (image.shape[1], image.shape[0])
+        clip._original_image = image
+        return clip
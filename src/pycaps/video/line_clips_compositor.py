@@ -0,0 +1,127 @@
+from typing import List, Optional, Tuple, TYPE_CHECKING
+from pycaps.common import Document, ElementState, Line, WordClip
+from pycaps.logger import logger
+from .image_clip_factory import ImageClipFactory
+from .sprite_registry import SpriteRegistry
+from .bgra_blender import BgraBlender
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# (start, end, image, x, y) of a line sprite
+LineSprite = Tuple[float, float, 'np.ndarray', int, int]
+
+class LineClipsCompositor:
+    '''
+    Replaces the word clips of each line with a single line-wide clip per line state, when the words don't change inside it.
+
+    It must run after the positions are calculated, and only when nothing changes the word clips later (animations and clip effects).
+    A line state is static when every word shows the same pixels at the same position during the whole state (the word states
+    are styled identically), and all the words cover the same interval. The word images are then composited in a single sprite,
+    and consecutive line states with the same sprite are merged in one clip.
+
+    The word clips keep their layout (so the sizes and positions are still available), but their media clip is removed: the
+    line clips are in Line.media_clips. Lines with any non-static state are left untouched.
+    '''
+
+    # max difference (in seconds) between the end of a clip and the start of the next one for them to be contiguous
+    TIME_TOLERANCE: float = 1e-6
+
+    def __init__(self):
+        self._sprite_registry = SpriteRegistry()
+
+    def composite(self, document: Document) -> None:
+        lines = document.get_lines()
+        composited_lines = 0
+        word_clips_count = 0
+        line_clips_count = 0
+        for line in lines:
+            sprites = self._get_line_sprites(line)
+            if sprites is None:
+                continue
+
+            word_clips = [clip for clip in line.get_word_clips() if clip.media_clip is not None]
+            for clip in word_clips:
+                clip.media_clip = None
+            line.media_clips = [ImageClipFactory.from_bgra(image, start, end - start).set_position((x, y)) for start, end, image, x, y in sprites]
+            composited_lines += 1
+            word_clips_count += len(word_clips)
+            line_clips_count += len(sprites)
+
+        logger().info(f"Line compositing: {composited_lines} of {len(lines)} lines composited, {word_clips_count} word clips replaced by {line_clips_count} line clips.")
+        self._sprite_registry.clear()
+
+    def _get_line_sprites(self, line: Line) -> Optional[List[LineSprite]]:
+        '''Returns the sprites of the line, sorted by time, or None if any of its states isn't static.'''
+        sprites: List[LineSprite] = []
+        for line_state in ElementState.get_all_line_states():
+            words_clips = [[clip for clip in word.clips if clip.has_state(line_state) and clip.media_clip is not None] for word in line.words]
+            words_clips = [clips for clips in words_clips if clips]
+            if not words_clips:
+                continue
+
+            interval: Optional[Tuple[float, float]] = None
+            for clips in words_clips:
+                word_interval = self._get_static_interval(clips)
+                if word_interval is None or (interval and not self._is_same_interval(interval, word_interval)):
+                    return None
+                interval = word_interval
+
+            sprite = self._composite_words([clips[0] for clips in words_clips])
+            sprites.append((interval[0], interval[1], *sprite))
+
+        return self._merge_sprites(sorted(sprites, key=lambda sprite: sprite[0]))
+
+    def _get_static_interval(self, clips: List[WordClip]) -> Optional[Tuple[float, float]]:
+        '''Returns the interval covered by the clips of a word, or None if they aren't contiguous or don't show the same pixels at the same position.'''
+        import numpy as np
+
+        clips = sorted(clips, key=lambda clip: clip.media_clip.start)
+        first = clips[0].media_clip
+        first_image, first_position = first.get_frame(0), self._get_position(first)
+        for previous, clip in zip(clips, clips[1:]):
+            image = clip.media_clip.get_frame(0)
+            if abs(clip.media_clip.start - previous.media_clip.end) > self.TIME_TOLERANCE:
+                return None
+            if self._get_position(clip.media_clip) != first_position:
+                return None
+            if image is not first_image and (image.shape != first_image.shape or not np.array_equal(image, first_image)):
+                return None
+        return first.start, clips[-1].media_clip.end
+
+    def _is_same_interval(self, interval: Tuple[float, float], other: Tuple[float, float]) -> bool:
+        return abs(interval[0] - other[0]) <= self.TIME_TOLERANCE and abs(interval[1] - other[1]) <= self.TIME_TOLERANCE
+
+    def _get_position(self, media_clip) -> Tuple[int, int]:
+        # the same rounding used by movielite when the clip is rendered
+        x, y = media_clip.position(0)
+        return round(x), round(y)
+
+    def _composite_words(self, clips: List[WordClip]) -> Tuple['np.ndarray', int, int]:
+        '''Blends the images of the word clips (in order, like the video writer does) in a single sprite. Returns the sprite and its position.'''
+        import numpy as np
+
+        placed = [(clip.media_clip.get_frame(0), *self._get_position(clip.media_clip)) for clip in clips]
+        left = min(x for _, x, _ in placed)
+        top = min(y for _, _, y in placed)
+        right = max(x + image.shape[1] for image, x, _ in placed)
+        bottom = max(y + image.shape[0] for image, _, y in placed)
+
+        canvas = np.zeros((bottom - top, right - left, 4), dtype=np.float32)
+        for image, x, y in placed:
+            BgraBlender.blend(canvas, image, x - left, y - top)
+
+        sprite = np.round(canvas).astype(np.uint8)
+        return self._sprite_registry.get(sprite), left, top
+
+    def _merge_sprites(self, sprites: List[LineSprite]) -> List[LineSprite]:
+        '''Merges the consecutive sprites with the same image and position (line states styled identically).'''
+        merged: List[LineSprite] = []
+        for sprite in sprites:
+            if merged:
+                start, end, image, x, y = merged[-1]
+                if image is sprite[2] and (x, y) == sprite[3:] and abs(sprite[0] - end) <= self.TIME_TOLERANCE:
+                    merged[-1] = (start, sprite[1], image, x, y)
+                    continue
+            merged.append(sprite)
+        return merged
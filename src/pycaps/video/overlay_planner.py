@@ -0,0 +1,179 @@
+import math
+from typing import Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+from .image_clip_factory import ImageClipFactory
+from .bgra_blender import BgraBlender
+
+if TYPE_CHECKING:
+    import numpy as np
+    from movielite import GraphicClip
+
+class OverlayPlanner:
+    '''
+    Replaces the static subtitle clips with pre-composited overlays, so each frame blends a few overlays instead of every clip.
+
+    A clip is static when its pixels, position, scale and opacity don't change with time (an image without animations,
+    transforms or masks). The frames of the video are split in intervals where the set of active clips doesn't change,
+    and in each interval every run of consecutive static clips (in compositing order) is composited once in a cropped BGRA
+    overlay. The animated clips are kept as they are, so only the frames where an animation is running composite several
+    layers, and the runs of static clips before and after them keep their order.
+
+    The intervals are computed with the frame times used by movielite, so each overlay is active in exactly the same frames
+    as the clips it replaces. Overlays of the same run in consecutive intervals are merged in one clip.
+    '''
+
+    def __init__(self, fps: float, duration: float):
+        if fps <= 0:
+            raise ValueError(f"Invalid fps: {fps}")
+        self._fps: float = fps
+        # the frames rendered by movielite's VideoWriter
+        self._total_frames: int = int(duration * fps)
+        self._constant_function_codes: Optional[Set] = None
+        self._stats: Dict[str, int] = {}
+
+    def plan(self, clips: List['GraphicClip']) -> List['GraphicClip']:
+        '''Returns the clips to composite (overlays and animated clips), in compositing order.'''
+        static = [self._is_static(clip) for clip in clips]
+        frame_ranges = [self._get_frame_range(clip) for clip in clips]
+
+        # (first frame, end frame) of the overlay of each run of static clips (by the indexes of its clips)
+        overlay_ranges: List[Tuple[Tuple[int, ...], int, int]] = []
+        last_overlay_by_run: Dict[Tuple[int, ...], int] = {}
+        intervals = 0
+        for first_frame, end_frame, active in self._get_intervals(frame_ranges):
+            intervals += 1
+            for run in self._get_static_runs(active, static):
+                previous = last_overlay_by_run.get(run)
+                if previous is not None and overlay_ranges[previous][2] == first_frame:
+                    overlay_ranges[previous] = (run, overlay_ranges[previous][1], end_frame)
+                    continue
+                last_overlay_by_run[run] = len(overlay_ranges)
+                overlay_ranges.append((run, first_frame, end_frame))
+
+        # each overlay takes the place of its first clip, and the animated clips keep theirs (a run is composited only once)
+        planned: List[Tuple[int, 'GraphicClip']] = [(index, clip) for index, clip in enumerate(clips) if not static[index]]
+        overlays: Dict[Tuple[int, ...], Optional[Tuple['np.ndarray', int, int]]] = {}
+        for run, first_frame, end_frame in overlay_ranges:
+            if run not in overlays:
+                overlays[run] = self._composite_run([clips[index] for index in run])
+            if overlays[run] is None:
+                continue
+            image, x, y = overlays[run]
+            # half a frame of margin at both ends, so the overlay is active in exactly [first frame, end frame)
+            overlay = ImageClipFactory.from_bgra(image, (first_frame - 0.5) / self._fps, (end_frame - first_frame) / self._fps)
+            planned.append((run[0], overlay.set_position((x, y))))
+        planned.sort(key=lambda item: item[0])
+
+        self._stats = {
+            "clips": len(clips),
+            "static_clips": sum(static),
+            "intervals": intervals,
+            "overlays": len(planned) - (len(clips) - sum(static)),
+            "unique_overlays": sum(1 for overlay in overlays.values() if overlay is not None),
+        }
+        return [clip for _, clip in planned]
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+    def _is_static(self, clip: 'GraphicClip') -> bool:
+        from movielite import ImageClip
+
+        if type(clip) is not ImageClip:
+            return False
+        if getattr(clip, "_pixel_transforms", None) != [] or getattr(clip, "_frame_transforms", None) != [] or getattr(clip, "_mask", True) is not None:
+            return False
+        constant_codes = self._get_constant_function_codes()
+        return all(getattr(function, "__code__", None) in constant_codes for function in (clip.position, clip.opacity, clip.scale))
+
+    def _get_constant_function_codes(self) -> Set:
+        '''The code of the functions movielite uses for the default and the constant values: any other function can change with time.'''
+        if self._constant_function_codes is None:
+            from movielite import ImageClip, GraphicClip
+
+            clip = ImageClip.__new__(ImageClip)
+            GraphicClip.__init__(clip, 0, 1)
+            self._constant_function_codes = {clip.position.__code__, clip.opacity.__code__, clip.scale.__code__, clip._save_as_function(0).__code__}
+        return self._constant_function_codes
+
+    def _is_active(self, clip: 'GraphicClip', frame: int) -> bool:
+        # the same check used by movielite's VideoWriter
+        return 0 <= (frame / self._fps - clip.start) < clip.duration
+
+    def _get_frame_range(self, clip: 'GraphicClip') -> Tuple[int, int]:
+        '''Returns the [first, end) frames where the clip is active.'''
+        first = min(self._total_frames, max(0, math.floor(clip.start * self._fps) - 1))
+        while first < self._total_frames and not self._is_active(clip, first) and first / self._fps < clip.start:
+            first += 1
+        end = min(self._total_frames, max(first, math.ceil(clip.end * self._fps) + 1))
+        while end > first and not self._is_active(clip, end - 1):
+            end -= 1
+        return first, end
+
+    def _get_intervals(self, frame_ranges: List[Tuple[int, int]]) -> List[Tuple[int, int, List[int]]]:
+        '''Returns the (first frame, end frame, active clip indexes) of the intervals where the active clips don't change.'''
+        starts: Dict[int, List[int]] = {}
+        ends: Dict[int, List[int]] = {}
+        for index, (first, end) in enumerate(frame_ranges):
+            if first < end:
+                starts.setdefault(first, []).append(index)
+                ends.setdefault(end, []).append(index)
+
+        intervals: List[Tuple[int, int, List[int]]] = []
+        active: Set[int] = set()
+        boundaries = sorted(set(starts) | set(ends))
+        for boundary, next_boundary in zip(boundaries, boundaries[1:]):
+            active.difference_update(ends.get(boundary, []))
+            active.update(starts.get(boundary, []))
+            if active:
+                intervals.append((boundary, next_boundary, sorted(active)))
+        return intervals
+
+    def _get_static_runs(self, active: List[int], static: List[bool]) -> List[Tuple[int, ...]]:
+        '''Splits the active clips (in compositing order) in runs of static clips, separated by the animated ones.'''
+        runs: List[Tuple[int, ...]] = []
+        run: List[int] = []
+        for index in active:
+            if static[index]:
+                run.append(index)
+                continue
+            if run:
+                runs.append(tuple(run))
+            run = []
+        if run:
+            runs.append(tuple(run))
+        return runs
+
+    def _composite_run(self, clips: List['GraphicClip']) -> Optional[Tuple['np.ndarray', int, int]]:
+        '''Composites the static clips in a cropped overlay. Returns it with its position, or None if it's fully transparent.'''
+        import numpy as np
+
+        placed = []
+        for clip in clips:
+            # the frame as movielite renders it (resized and scaled), and its position with the same rounding
+            frame = clip._apply_transforms(clip.get_frame(0), 0)
+            x, y = clip.position(0)
+            placed.append((frame, round(x), round(y), clip.opacity(0)))
+
+        if len(placed) == 1 and placed[0][0].ndim == 3 and placed[0][0].shape[2] == 4 and placed[0][3] == 1:
+            # a single clip is its own overlay, without copying its pixels
+            frame, x, y, _ = placed[0]
+            return frame, x, y
+
+        left = min(x for _, x, _, _ in placed)
+        top = min(y for _, _, y, _ in placed)
+        right = max(x + frame.shape[1] for frame, x, _, _ in placed)
+        bottom = max(y + frame.shape[0] for frame, _, y, _ in placed)
+        canvas = np.zeros((bottom - top, right - left, 4), dtype=np.float32)
+        for frame, x, y, opacity in placed:
+            if frame.ndim != 3 or frame.shape[2] != 4:
+                frame = np.dstack([frame, np.full(frame.shape[:2], 255, dtype=np.uint8)])
+            BgraBlender.blend(canvas, frame, x - left, y - top, opacity)
+
+        # only the visible pixels are kept
+        visible_rows = np.flatnonzero(canvas[..., 3].max(axis=1) >= 0.5)
+        visible_columns = np.flatnonzero(canvas[..., 3].max(axis=0) >= 0.5)
+        if len(visible_rows) == 0:
+            return None
+        canvas = canvas[visible_rows[0]:visible_rows[-1] + 1, visible_columns[0]:visible_columns[-1] + 1]
+        overlay = np.rint(canvas, out=np.empty_like(canvas)).astype(np.uint8)
+        return overlay, left + int(visible_columns[0]), top + int(visible_rows[0])
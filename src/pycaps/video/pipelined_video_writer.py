@@ -0,0 +1,232 @@
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+from pycaps.logger import logger
+
+if TYPE_CHECKING:
+    import numpy as np
+    from movielite import GraphicClip, VideoQuality, VideoWriter
+
+class PipelinedVideoWriter:
+    '''
+    Writes the video of a movielite VideoWriter with the decoding, the compositing and the encoding in separate threads.
+
+    movielite renders each frame sequentially: it decodes the background (the input video), blends the active clips over it,
+    and writes it to the FFmpeg encoder, so each frame takes the sum of the three steps. Here each step is a stage in its own
+    thread, connected by bounded queues (when a stage is slower, the previous ones wait instead of buffering frames without
+    limit), so the throughput approaches the one of the slowest stage. The frames are exactly the same as the ones rendered by
+    VideoWriter.write(), and the audio is muxed by it too.
+
+    The decoding (OpenCV) and the encoder feed (pipe writes) release the GIL, so they overlap with the compositing.
+    '''
+
+    STAGES = ("decode", "composite", "encode")
+    # max seconds a stage waits for a queue before checking if the other stages failed
+    _POLL_INTERVAL: float = 0.1
+
+    def __init__(self, writer: 'VideoWriter', queue_size: int = 8):
+        '''
+        Args:
+            writer: The movielite writer with the clips to write (it must have a size and a duration).
+            queue_size: Max frames waiting between two stages.
+        '''
+        if queue_size <= 0:
+            raise ValueError(f"Invalid queue size: {queue_size}")
+        self._writer: 'VideoWriter' = writer
+        self._queue_size: int = queue_size
+        self._stats: Dict[str, float] = {}
+
+    def write(self, video_quality: Optional['VideoQuality'] = None) -> None:
+        '''Renders and encodes the video, and muxes the audio clips (like VideoWriter.write() with a single process).'''
+        from movielite import VideoQuality
+
+        writer = self._writer
+        if writer._size is None or writer._duration is None:
+            raise ValueError("The video writer must have a size and a duration to be pipelined.")
+        if writer._duration <= 0:
+            raise ValueError(f"Invalid duration: {writer._duration}")
+
+        total_frames = int(writer._duration * writer._fps)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            video_path = os.path.join(temp_dir, "partial.mp4")
+            self.encode(0, total_frames, video_path, video_quality or VideoQuality.MIDDLE)
+            writer._mux_audio(video_path, writer._output)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        logger().debug(f"Video saved to: {writer._output}")
+
+    def encode(self, start_frame: int, end_frame: int, output_path: str, video_quality: 'VideoQuality') -> None:
+        '''Renders the frames in [start_frame, end_frame) and encodes them (without audio) in the output path.'''
+        process = subprocess.Popen(self._get_encoder_command(output_path, video_quality), stdin=subprocess.PIPE)
+        try:
+            self.render_frames(start_frame, end_frame, lambda frame: self._write_to_encoder(process, frame))
+        finally:
+            process.stdin.close()
+            process.wait()
+        if process.returncode != 0:
+            raise RuntimeError(f"FFmpeg failed to encode the video (exit code {process.returncode}).")
+
+    def render_frames(self, start_frame: int, end_frame: int, write_frame: Callable[['np.ndarray'], None]) -> None:
+        '''
+        Renders the frames in [start_frame, end_frame) and passes each one (BGR uint8, in order) to write_frame from the encode stage.
+        If any stage fails, the others are stopped and its exception is raised.
+        '''
+        from tqdm import tqdm
+
+        decoded: queue.Queue = queue.Queue(self._queue_size)
+        composited: queue.Queue = queue.Queue(self._queue_size)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        busy = {stage: 0.0 for stage in self.STAGES}
+        # the clips that are still active when the last frame is decoded
+        remaining: List['GraphicClip'] = []
+
+        def decode() -> None:
+            remaining.extend(self._writer._graphic_clips)
+            for frame_index in range(start_frame, end_frame):
+                started = time.perf_counter()
+                item = self._decode_frame(frame_index, remaining)
+                busy["decode"] += time.perf_counter() - started
+                if not self._put(decoded, item, stop):
+                    return
+            self._put(decoded, None, stop)
+
+        def composite() -> None:
+            while (item := self._get(decoded, stop)) is not None:
+                started = time.perf_counter()
+                current_time, frame, clips, finished_clips = item
+                for clip in clips:
+                    frame = clip.render(frame, current_time)
+                if frame.dtype.name != "uint8":
+                    frame = frame.astype("uint8")
+                # the finished clips are closed after their last frame is composited
+                for clip in finished_clips:
+                    clip.close()
+                busy["composite"] += time.perf_counter() - started
+                if not self._put(composited, frame, stop):
+                    return
+            self._put(composited, None, stop)
+
+        def encode() -> None:
+            with tqdm(total=end_frame - start_frame, desc="Rendering video frames") as progress:
+                while (frame := self._get(composited, stop)) is not None:
+                    started = time.perf_counter()
+                    write_frame(frame)
+                    busy["encode"] += time.perf_counter() - started
+                    progress.update(1)
+
+        def run(stage: Callable[[], None]) -> None:
+            try:
+                stage()
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=run, args=(stage,), name=f"pycaps-writer-{name}", daemon=True) for name, stage in zip(self.STAGES, (decode, composite, encode))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        for clip in remaining:
+            clip.close()
+        if errors:
+            raise errors[0]
+
+        frames = end_frame - start_frame
+        self._stats = {"frames": frames, "seconds": elapsed, "fps": frames / elapsed if elapsed > 0 else 0.0}
+        self._stats.update({f"{stage}_utilization": busy[stage] / elapsed if elapsed > 0 else 0.0 for stage in self.STAGES})
+        utilization = ", ".join(f"{stage} {self._stats[f'{stage}_utilization']:.0%}" for stage in self.STAGES)
+        logger().info(f"Pipelined writer: {frames} frames in {elapsed:.2f}s ({self._stats['fps']:.1f} fps). Stage utilization: {utilization}.")
+
+    def get_stats(self) -> Dict[str, float]:
+        '''Returns the frames, seconds and fps of the last render, and the fraction of the time each stage was busy (<stage>_utilization).'''
+        return dict(self._stats)
+
+    def _decode_frame(self, frame_index: int, remaining: List['GraphicClip']) -> tuple:
+        '''
+        Renders the background of the frame (the first active clip, like VideoWriter) and returns it with the clips to blend over it
+        and the clips that finish in this frame. The finished clips are removed from the remaining ones.
+        '''
+        import numpy as np
+        from movielite.core import empty_frame
+
+        current_time = frame_index / self._writer._fps
+        width, height = self._writer._size
+        active = [clip for clip in remaining if 0 <= (current_time - clip.start) < clip.duration]
+        if active:
+            frame = active[0].render_as_background(current_time, width, height, len(active) > 1, False)
+            if self._is_shared_frame(frame, empty_frame):
+                # movielite reuses (and clears) the same buffer in each frame, but this one is used later by the other stages
+                frame = frame.copy()
+            empty_frame.clean_all()
+        else:
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+
+        finished = [clip for clip in remaining if current_time >= clip.end]
+        for clip in finished:
+            remaining.remove(clip)
+        return current_time, frame, active[1:], finished
+
+    def _is_shared_frame(self, frame: 'np.ndarray', empty_frame: Any) -> bool:
+        return any(frame is buffer.frame for buffer in empty_frame._empty_frames.values())
+
+    def _put(self, target: queue.Queue, item: Any, stop: threading.Event) -> bool:
+        '''Puts the item in the queue, waiting while it's full. Returns False if the pipeline was stopped.'''
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=self._POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue, stop: threading.Event) -> Any:
+        '''Gets the next item of the queue, waiting while it's empty. Returns None at the end or if the pipeline was stopped.'''
+        while not stop.is_set():
+            try:
+                return source.get(timeout=self._POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
+
+    def _write_to_encoder(self, process: subprocess.Popen, frame: 'np.ndarray') -> None:
+        import numpy as np
+
+        try:
+            # the frame buffer is written directly, without copying it to bytes
+            process.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            raise RuntimeError("FFmpeg process died early.")
+
+    def _get_encoder_command(self, output_path: str, video_quality: 'VideoQuality') -> List[str]:
+        '''The FFmpeg command used by movielite's VideoWriter to encode the raw frames.'''
+        from movielite.core.video_writer import _get_ffmpeg_libx264_preset, _get_ffmpeg_libx264_crf
+
+        width, height = self._writer._size
+        return [
+            "ffmpeg", "-y",
+            "-f", "rawvideo",
+            "-vcodec", "rawvideo",
+            "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}",
+            "-r", str(self._writer._fps),
+            "-i", "pipe:0",
+            "-c:v", "libx264",
+            "-preset", _get_ffmpeg_libx264_preset(video_quality),
+            "-crf", _get_ffmpeg_libx264_crf(video_quality),
+            "-movflags", "+faststart",
+            "-pix_fmt", "yuv420p",
+            output_path,
+            "-loglevel", "error",
+            "-hide_banner",
+        ]
@@ -0,0 +1,192 @@
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, TYPE_CHECKING
+from pycaps.logger import logger
+
+if TYPE_CHECKING:
+    import numpy as np
+
+class AtlasEntry(NamedTuple):
+    '''Image of a word clip stored in the atlas: the sprite, the size of the clip layout, and the sprite offset inside it (see WordClip.media_offset).'''
+    sprite: int
+    width: int
+    height: int
+    offset_x: int
+    offset_y: int
+
+class SpriteAtlas:
+    '''
+    Packs the word images in a few large BGRA pages, so the clips use views of the pages instead of one array per image.
+
+    The sprites are packed with a shelf packer (sorted by height, each shelf is filled left to right), after all of them are rendered.
+    Sprites larger than the page size get a page of their own, and the pages are cropped to the space used.
+
+    The atlas also keeps the entries: the sprite of each rendered word (by a key built from what changes its image).
+    It can be saved in a single file and loaded for the next renders of the same subtitles: the entries found are not rendered again.
+    The fingerprint identifies what the images depend on (CSS, renderer, video size...), so an atlas is only loaded with the same one.
+    Only the entries used since it was created or loaded are saved, with their sprites repacked, so the file doesn't keep
+    the images of previous renders that aren't needed anymore.
+    '''
+
+    DEFAULT_PAGE_SIZE: int = 2048
+    FILE_SUFFIX: str = ".atlas.npz"
+
+    def __init__(self, page_size: int = DEFAULT_PAGE_SIZE, fingerprint: str = ""):
+        if page_size < 1:
+            raise ValueError(f"Invalid atlas page size: {page_size}")
+        self._page_size: int = page_size
+        self._fingerprint: str = fingerprint
+        self._lock = threading.Lock()
+        self._pages: List['np.ndarray'] = []
+        # sprite index -> (page, x, y, width, height)
+        self._rects: List[Tuple[int, int, int, int, int]] = []
+        self._entries: Dict[str, AtlasEntry] = {}
+        # keys of the entries found or set since the atlas was created or loaded
+        self._used_keys: Set[str] = set()
+
+    def pack(self, images: List['np.ndarray']) -> List[int]:
+        '''
+        Copies the images in new pages and returns the index of the sprite of each one.
+        The same array received several times is packed once.
+        '''
+        import numpy as np
+
+        unique_images: Dict[int, 'np.ndarray'] = {}
+        for image in images:
+            unique_images.setdefault(id(image), image)
+        placements = self._place(list(unique_images.values()))
+
+        with self._lock:
+            first_page = len(self._pages)
+            page_sizes: Dict[int, Tuple[int, int]] = {}
+            for page, x, y, width, height in placements:
+                page_width, page_height = page_sizes.get(page, (0, 0))
+                page_sizes[page] = (max(page_width, x + width), max(page_height, y + height))
+            pages = [np.zeros((page_sizes[page][1], page_sizes[page][0], 4), dtype=np.uint8) for page in sorted(page_sizes)]
+
+            sprite_indexes: Dict[int, int] = {}
+            for (image_id, image), (page, x, y, width, height) in zip(unique_images.items(), placements):
+                pages[page][y:y + height, x:x + width] = image
+                sprite_indexes[image_id] = len(self._rects)
+                self._rects.append((first_page + page, x, y, width, height))
+            for page in pages:
+                page.setflags(write=False)
+            self._pages.extend(pages)
+
+        return [sprite_indexes[id(image)] for image in images]
+
+    def get_sprite(self, sprite: int) -> 'np.ndarray':
+        '''Returns the (read-only) view of the sprite in its page.'''
+        page, x, y, width, height = self._rects[sprite]
+        return self._pages[page][y:y + height, x:x + width]
+
+    def set_entry(self, key: str, entry: AtlasEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._used_keys.add(key)
+
+    def get_entry(self, key: str) -> Optional[AtlasEntry]:
+        entry = self._entries.get(key)
+        if entry:
+            with self._lock:
+                self._used_keys.add(key)
+        return entry
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pages": len(self._pages),
+                "sprites": len(self._rects),
+                "entries": len(self._entries),
+                "bytes": sum(page.nbytes for page in self._pages),
+                "sprite_bytes": sum(width * height * 4 for _, _, _, width, height in self._rects),
+            }
+
+    def save(self, path: str) -> None:
+        '''Saves the used entries and their sprites in a single (compressed) file.'''
+        import numpy as np
+
+        with self._lock:
+            entries = {key: self._entries[key] for key in self._entries if key in self._used_keys}
+            used_sprites = sorted({entry.sprite for entry in entries.values()})
+            if len(used_sprites) == len(self._rects):
+                pages, rects = self._pages, self._rects
+            else:
+                # the sprites of the unused entries are left out, and the used ones are packed again
+                atlas = SpriteAtlas(self._page_size)
+                new_sprites = dict(zip(used_sprites, atlas.pack([self.get_sprite(sprite).copy() for sprite in used_sprites])))
+                entries = {key: entry._replace(sprite=new_sprites[entry.sprite]) for key, entry in entries.items()}
+                pages, rects = atlas._pages, atlas._rects
+
+            arrays = {f"page_{index}": page for index, page in enumerate(pages)}
+            np.savez_compressed(
+                path,
+                fingerprint=np.array(self._fingerprint),
+                page_size=np.array(self._page_size),
+                page_count=np.array(len(pages)),
+                rects=np.array(rects, dtype=np.int32).reshape(-1, 5),
+                entry_keys=np.array(list(entries.keys()), dtype=str),
+                entry_values=np.array(list(entries.values()), dtype=np.int32).reshape(-1, 5),
+                **arrays,
+            )
+
+    @staticmethod
+    def load(path: str, fingerprint: str) -> Optional['SpriteAtlas']:
+        '''Loads a saved atlas. Returns None if the file doesn't exist, can't be read, or was saved with another fingerprint.'''
+        import numpy as np
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["fingerprint"]) != fingerprint:
+                    logger().info(f"Ignoring sprite atlas {path}: it was generated with other styles or settings.")
+                    return None
+                atlas = SpriteAtlas(int(data["page_size"]), fingerprint)
+                atlas._pages = [data[f"page_{index}"] for index in range(int(data["page_count"]))]
+                atlas._rects = [tuple(int(value) for value in rect) for rect in data["rects"]]
+                atlas._entries = {str(key): AtlasEntry(*(int(value) for value in values)) for key, values in zip(data["entry_keys"], data["entry_values"])}
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger().warning(f"Ignoring sprite atlas {path}: {e}")
+            return None
+
+        for page in atlas._pages:
+            page.setflags(write=False)
+        return atlas
+
+    def _place(self, images: List['np.ndarray']) -> List[Tuple[int, int, int, int, int]]:
+        '''Returns the (page, x, y, width, height) of each image, with the pages numbered from 0.'''
+        placements: List[Optional[Tuple[int, int, int, int, int]]] = [None] * len(images)
+        # each page is a list of shelves: [y, height, used width]
+        pages: List[List[List[int]]] = []
+        # used height of each page (None for the pages of a single large sprite)
+        page_heights: List[Optional[int]] = []
+
+        order = sorted(range(len(images)), key=lambda index: (-images[index].shape[0], -images[index].shape[1]))
+        for index in order:
+            height, width = images[index].shape[:2]
+            if width > self._page_size or height > self._page_size:
+                placements[index] = (len(pages), 0, 0, width, height)
+                pages.append([])
+                page_heights.append(None)
+                continue
+            placements[index] = self._place_in_shelves(pages, page_heights, width, height)
+        return placements
+
+    def _place_in_shelves(self, pages: List[List[List[int]]], page_heights: List[Optional[int]], width: int, height: int) -> Tuple[int, int, int, int, int]:
+        for page_index, shelves in enumerate(pages):
+            if page_heights[page_index] is None:
+                continue
+            for shelf in shelves:
+                shelf_y, shelf_height, used_width = shelf
+                if height <= shelf_height and used_width + width <= self._page_size:
+                    shelf[2] += width
+                    return (page_index, used_width, shelf_y, width, height)
+            if page_heights[page_index] + height <= self._page_size:
+                shelf_y = page_heights[page_index]
+                shelves.append([shelf_y, height, width])
+                page_heights[page_index] += height
+                return (page_index, 0, shelf_y, width, height)
+
+        pages.append([[0, height, width]])
+        page_heights.append(height)
+        return (len(pages) - 1, 0, 0, width, height)
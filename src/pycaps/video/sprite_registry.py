@@ -0,0 +1,65 @@
+import hashlib
+import threading
+import weakref
+from typing import Dict, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+class SpriteRegistry:
+    '''
+    Keeps a single copy of each distinct image used by the clips.
+    Images are identified by their content (shape + pixels hash), so pixel-identical images rendered separately
+    (cache disabled, several render workers, trimmed copies, etc) end up sharing the same read-only array.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sprites: Dict[Tuple, 'np.ndarray'] = {}
+        # arrays already registered, by id. Only a weak reference is kept (to check that the id isn't reused), so the
+        # registered arrays, and the strips their views belong to, can be freed once their copies are made
+        self._known_arrays: Dict[int, Tuple['weakref.ref', 'np.ndarray']] = {}
+        self._total_count: int = 0
+        self._total_bytes: int = 0
+
+    def get(self, image: 'np.ndarray') -> 'np.ndarray':
+        '''Returns the shared read-only array with the same content as the image received.'''
+        with self._lock:
+            self._total_count += 1
+            self._total_bytes += image.nbytes
+            known = self._known_arrays.get(id(image))
+            if known and known[0]() is image:
+                return known[1]
+
+        import numpy as np
+
+        # views (like the slices of a line strip) are copied, so the shared array doesn't keep the whole strip alive
+        contiguous_image = np.ascontiguousarray(image)
+        key = (image.shape, image.dtype.str, hashlib.blake2b(memoryview(contiguous_image).cast("B"), digest_size=16).digest())
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is None:
+                contiguous_image.setflags(write=False)
+                sprite = contiguous_image
+                self._sprites[key] = sprite
+            self._known_arrays[id(image)] = (weakref.ref(image), sprite)
+            return sprite
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            unique_bytes = sum(sprite.nbytes for sprite in self._sprites.values())
+            return {
+                "total": self._total_count,
+                "unique": len(self._sprites),
+                "total_bytes": self._total_bytes,
+                "unique_bytes": unique_bytes,
+                "saved_bytes": self._total_bytes - unique_bytes,
+            }
+
+    def clear(self) -> None:
+        '''Forgets the registered images (the clips keep using them).'''
+        with self._lock:
+            self._sprites = {}
+            self._known_arrays = {}
+            self._total_count = 0
+            self._total_bytes = 0
@@ -0,0 +1,27 @@
+from typing import Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+class SpriteTrimmer:
+    @staticmethod
+    def trim(image: 'np.ndarray') -> Tuple['np.ndarray', int, int]:
+        '''
+        Removes the fully transparent borders of a BGRA image (paddings, text-shadow space, etc).
+        Returns the trimmed image and the (x, y) offset of the trimmed image inside the original one.
+        The trimmed image is a contiguous copy, so the original one can be released (a view would keep it alive),
+        and the compositing loops work over contiguous memory. Images without transparent borders (or fully transparent) are returned as they are.
+        '''
+        import numpy as np
+
+        alpha = image[:, :, 3]
+        visible_rows = np.flatnonzero(alpha.any(axis=1))
+        if visible_rows.size == 0:
+            return image, 0, 0
+        visible_columns = np.flatnonzero(alpha.any(axis=0))
+
+        top, bottom = int(visible_rows[0]), int(visible_rows[-1]) + 1
+        left, right = int(visible_columns[0]), int(visible_columns[-1]) + 1
+        if (top, left, bottom, right) == (0, 0, image.shape[0], image.shape[1]):
+            return image, 0, 0
+        return np.ascontiguousarray(image[top:bottom, left:right]), left, top
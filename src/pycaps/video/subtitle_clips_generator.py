@@ -1,103 +1,180 @@
-from typing import Optional, Callable
+from typing import Optional, Callable, List, Tuple
 from pycaps.common import Document, Word, WordClip, ElementState, Line
 from pycaps.renderer import SubtitleRenderer
+from pycaps.renderer.renderer_page import RendererPage
 from tqdm import tqdm
 from pycaps.logger import logger
+from .image_clip_factory import ImageClipFactory
+from .sprite_trimmer import SpriteTrimmer
+from .sprite_registry import SpriteRegistry
+from .sprite_atlas import SpriteAtlas, AtlasEntry
 
 class SubtitleClipsGenerator:
 
-    def __init__(self, renderer: SubtitleRenderer):
+    # (line state, word state, start time of the clip, end time of the clip)
+    LINE_PASSES: List[Tuple[ElementState, ElementState, Callable[[Word], float], Callable[[Word], float]]] = [
+        (
+            ElementState.LINE_NOT_NARRATED_YET,
+            ElementState.WORD_NOT_NARRATED_YET,
+            lambda word: word.get_segment().time.start,
+            lambda word: word.get_line().time.start,
+        ),
+        (
+            ElementState.LINE_BEING_NARRATED,
+            ElementState.WORD_NOT_NARRATED_YET,
+            lambda word: word.get_line().time.start,
+            lambda word: word.time.start,
+        ),
+        (
+            ElementState.LINE_BEING_NARRATED,
+            ElementState.WORD_BEING_NARRATED,
+            lambda word: word.time.start,
+            lambda word: word.time.end,
+        ),
+        (
+            ElementState.LINE_BEING_NARRATED,
+            ElementState.WORD_ALREADY_NARRATED,
+            lambda word: word.time.end,
+            lambda word: word.get_line().time.end,
+        ),
+        (
+            ElementState.LINE_ALREADY_NARRATED,
+            ElementState.WORD_ALREADY_NARRATED,
+            lambda word: word.get_line().time.end,
+            lambda word: word.get_segment().time.end,
+        ),
+    ]
+
+    def __init__(self, renderer: SubtitleRenderer, trim_images: bool = False, atlas: Optional[SpriteAtlas] = None):
+        """
+        Args:
+            renderer: Renderer used to generate the word images.
+            trim_images: (Optional) If True, the fully transparent borders of the word images are removed.
+                The clip layout keeps the original size, and the image is placed inside it using WordClip.media_offset,
+                so the visible pixels end up in the same place, but less pixels are stored and composited.
+            atlas: (Optional) If received, the unique word images are packed in its pages and the clips use views of them.
+                The words already in the atlas (loaded from a previous run) are not rendered again.
+        """
         self._renderer = renderer
+        self._trim_images = trim_images
+        self._atlas = atlas
+        self._sprite_registry = SpriteRegistry()
+        self._renderer_page = RendererPage()
 
     def generate(self, document: Document) -> None:
         """
         Adds the MediaClip for each word in the document received.
         """
 
-        total_lines = len(document.get_lines())
-        total_steps = total_lines * 5 
+        lines = document.get_lines()
+        total_steps = len(lines) * len(self.LINE_PASSES)
 
         with tqdm(total=total_steps, desc="Generating subtitle images") as pbar:
-            for segment in document.segments:
-                for line in segment.lines:
-                    self.__generate_word_clips_for_line(
-                        line,
-                        ElementState.LINE_NOT_NARRATED_YET,
-                        ElementState.WORD_NOT_NARRATED_YET,
-                        lambda _: segment.time.start,
-                        lambda _: line.time.start,
-                        pbar
-                    )
-                    
-                    self.__generate_word_clips_for_line(
-                        line,
-                        ElementState.LINE_BEING_NARRATED,
-                        ElementState.WORD_NOT_NARRATED_YET,
-                        lambda _: line.time.start,
-                        lambda word: word.time.start,
-                        pbar
-                    )
-
-                    self.__generate_word_clips_for_line(
-                        line,
-                        ElementState.LINE_BEING_NARRATED,
-                        ElementState.WORD_BEING_NARRATED,
-                        lambda word: word.time.start,
-                        lambda word: word.time.end,
-                        pbar
-                    )
-
-                    self.__generate_word_clips_for_line(
-                        line,
-                        ElementState.LINE_BEING_NARRATED,
-                        ElementState.WORD_ALREADY_NARRATED,
-                        lambda word: word.time.end,
-                        lambda _: line.time.end,
-                        pbar
-                    )
-
-                    self.__generate_word_clips_for_line(
-                        line,
-                        ElementState.LINE_ALREADY_NARRATED,
-                        ElementState.WORD_ALREADY_NARRATED,
-                        lambda _: line.time.end,
-                        lambda _: segment.time.end,
-                        pbar
-                    )
+            def generate_word_clips_for_line(renderer: SubtitleRenderer, line: Line) -> List[Tuple[Word, WordClip]]:
+                word_clips = []
+                for line_state, word_state, start_fn, end_fn in self.LINE_PASSES:
+                    word_clips.extend(self.__generate_word_clips_for_line(renderer, line, line_state, word_state, start_fn, end_fn))
+                    pbar.update(1)
+                return word_clips
+
+            # The renderer can process the lines in parallel, but the clips are always added to the words in order
+            all_word_clips: List[WordClip] = []
+            for word_clips in self._renderer.render_lines(lines, generate_word_clips_for_line):
+                for word, word_clip in word_clips:
+                    word.clips.add(word_clip)
+                    all_word_clips.append(word_clip)
+
+        if self._atlas:
+            self.__create_media_clips_from_atlas(lines, all_word_clips)
+
+        original_pixels = 0
+        trimmed_pixels = 0
+        for word_clip in all_word_clips:
+            original_pixels += word_clip.layout.size.width * word_clip.layout.size.height
+            trimmed_pixels += word_clip.media_clip.size[0] * word_clip.media_clip.size[1]
+
+        to_mb = lambda bytes: bytes / 1024 / 1024
+        if self._trim_images and original_pixels > 0:
+            logger().info(f"Trimmed word images: {to_mb(original_pixels * 4):.2f} MB -> {to_mb(trimmed_pixels * 4):.2f} MB ({1 - trimmed_pixels / original_pixels:.1%} less pixels to composite).")
+        stats = self._sprite_registry.get_stats()
+        logger().info(f"Word images: {stats['unique']} unique of {stats['total']} clips, {to_mb(stats['unique_bytes']):.2f} MB in memory ({to_mb(stats['saved_bytes']):.2f} MB saved by sharing them).")
+        if self._atlas:
+            atlas_stats = self._atlas.get_stats()
+            logger().info(f"Sprite atlas: {atlas_stats['sprites']} sprites in {atlas_stats['pages']} pages, {to_mb(atlas_stats['bytes']):.2f} MB ({to_mb(atlas_stats['sprite_bytes']):.2f} MB of sprites).")
+        self._sprite_registry.clear()
 
     def __generate_word_clips_for_line(
             self,
+            renderer: SubtitleRenderer,
             line: Line,
             line_state: ElementState,
             word_state: ElementState,
             start_fn: Callable[[Word], float],
             end_fn: Callable[[Word], float],
-            pbar: tqdm
-        ) -> None:
-        self._renderer.open_line(line, line_state)
+        ) -> List[Tuple[Word, WordClip]]:
+        renderer.open_line(line, line_state)
 
+        word_clips = []
         for i, word in enumerate(line.words):
-            word_clip = self.__create_word_clip(i, word, word_state, start_fn(word), end_fn(word))
+            word_clip = self.__create_word_clip(renderer, line_state, i, word, word_state, start_fn(word), end_fn(word))
             if word_clip:
                 word_clip.states = [line_state, word_state]
-                word.clips.add(word_clip)
+                word_clips.append((word, word_clip))
                 
-        self._renderer.close_line()
-        pbar.update(1)
+        renderer.close_line()
+        return word_clips
 
-    def __create_word_clip(self, word_index: int, word: Word, word_state: ElementState, start: float, end: float) -> Optional[WordClip]:
-        from movielite import ImageClip
-        import numpy as np
-        
+    def __create_word_clip(self, renderer: SubtitleRenderer, line_state: ElementState, word_index: int, word: Word, word_state: ElementState, start: float, end: float) -> Optional[WordClip]:
         if end <= start:
             return None
-    
-        image = self._renderer.render_word(word_index, word, word_state)
-        if not image:
+
+        if self._atlas:
+            entry = self._atlas.get_entry(self.__get_atlas_key(line_state, word_index, word, word_state))
+            if entry:
+                word_clip = WordClip(_parent=word)
+                word_clip.layout.size.width = entry.width
+                word_clip.layout.size.height = entry.height
+                word_clip.media_offset.x = entry.offset_x
+                word_clip.media_offset.y = entry.offset_y
+                word_clip.media_clip = ImageClipFactory.from_bgra(self._atlas.get_sprite(entry.sprite), start, end-start)
+                return word_clip
+
+        image = renderer.render_word_array(word_index, word, word_state)
+        if image is None:
             return None
         
-        image_element = ImageClip(np.array(image), start, end-start)
-        word_clip = WordClip(media_clip=image_element, _parent=word)
-        word_clip.layout.size.width = image.width
-        word_clip.layout.size.height = image.height
+        word_clip = WordClip(_parent=word)
+        word_clip.layout.size.width = image.shape[1]
+        word_clip.layout.size.height = image.shape[0]
+        if self._trim_images:
+            image, word_clip.media_offset.x, word_clip.media_offset.y = SpriteTrimmer.trim(image)
+
+        # identical images share the same (read-only) array
+        word_clip.media_clip = ImageClipFactory.from_bgra(self._sprite_registry.get(image), start, end-start)
         return word_clip
+
+    def __create_media_clips_from_atlas(self, lines: List[Line], word_clips: List[WordClip]) -> None:
+        '''Packs the images of the new clips in the atlas, and replaces them with views of its pages.'''
+        word_indexes = {id(word): index for line in lines for index, word in enumerate(line.words)}
+        new_word_clips: List[Tuple[WordClip, str]] = []
+        for word_clip in word_clips:
+            word = word_clip.get_word()
+            key = self.__get_atlas_key(word_clip.states[0], word_indexes[id(word)], word, word_clip.states[1])
+            if not self._atlas.get_entry(key):
+                new_word_clips.append((word_clip, key))
+        if not new_word_clips:
+            return
+
+        # the images are shared by the SpriteRegistry, so each distinct image is packed once
+        sprites = self._atlas.pack([word_clip.media_clip.get_frame(0) for word_clip, _ in new_word_clips])
+        for (word_clip, key), sprite in zip(new_word_clips, sprites):
+            media_clip = word_clip.media_clip
+            word_clip.media_clip = ImageClipFactory.from_bgra(self._atlas.get_sprite(sprite), media_clip.start, media_clip.duration)
+            self._atlas.set_entry(key, AtlasEntry(sprite, word_clip.layout.size.width, word_clip.layout.size.height, word_clip.media_offset.x, word_clip.media_offset.y))
+
+    def __get_atlas_key(self, line_state: ElementState, word_index: int, word: Word, word_state: ElementState) -> str:
+        '''Everything that changes the image of a word, except what the atlas fingerprint already covers (CSS, renderer, etc).'''
+        line = word.get_line()
+        line_css_classes = self._renderer_page.get_line_css_classes(line.get_segment().get_tags(), line.get_tags(), line_state)
+        word_css_classes = self._renderer_page.get_word_css_classes(word.get_tags(), word_index, word_state)
+        return f"{word.text}|{line_css_classes}|{word_css_classes}"
@@ -1,8 +1,11 @@
-from typing import Optional, Tuple, TYPE_CHECKING
+from typing import List, Optional, Tuple, TYPE_CHECKING
 import os
 import tempfile
 from pycaps.common import Document, VideoQuality as PyCapsVideoQuality
 from pycaps.logger import logger
+from .overlay_planner import OverlayPlanner
+from .pipelined_video_writer import PipelinedVideoWriter
+from .chunked_video_writer import ChunkedVideoWriter
 
 if TYPE_CHECKING:
     from movielite import VideoQuality, VideoWriter, VideoClip
@@ -19,12 +22,33 @@ class VideoGenerator:
         self._input_video_clip: Optional['VideoClip'] = None
         self._video_quality: Optional['VideoQuality'] = None
         self._fragment_time: Optional[tuple[float, float]] = None
+        self._overlay_planning: bool = False
+        self._pipelined_writing: bool = False
+        self._chunks: int = 1
+        self._jobs: Optional[int] = None
 
     def set_video_quality(self, quality: PyCapsVideoQuality):
         from movielite import VideoQuality
 
         self._video_quality = VideoQuality(quality.value)
 
+    def set_overlay_planning(self, enabled: bool):
+        """If enabled, the static subtitle clips are pre-composited in overlays before writing the video (see OverlayPlanner)."""
+        self._overlay_planning = enabled
+
+    def set_pipelined_writing(self, enabled: bool):
+        """If enabled, the frames are decoded, composited and encoded in parallel stages (see PipelinedVideoWriter)."""
+        self._pipelined_writing = enabled
+
+    def set_chunked_rendering(self, chunks: int, jobs: Optional[int] = None):
+        """Renders the video in chunks in parallel processes, concatenated without re-encoding (see ChunkedVideoWriter)."""
+        if chunks < 1:
+            raise ValueError(f"Invalid number of chunks: {chunks}")
+        if jobs is not None and jobs < 1:
+            raise ValueError(f"Invalid number of jobs: {jobs}")
+        self._chunks = chunks
+        self._jobs = jobs
+
     def set_fragment_time(self, fragment_time: tuple[float, float]):
         self._fragment_time = fragment_time
 
@@ -103,6 +127,11 @@ class VideoGenerator:
         clips = document.get_media_clips()
         if not clips:
             logger().warning("No subtitle clips were generated. The original video (or with external audio if provided) will be saved.")
+        elif self._overlay_planning:
+            planner = OverlayPlanner(self._input_video_clip.fps, self._input_video_clip.duration)
+            clips = planner.plan(clips)
+            stats = planner.get_stats()
+            logger().info(f"Overlay planning: {stats['clips']} clips ({stats['static_clips']} static) composited as {len(clips)} clips ({stats['overlays']} overlays, {stats['unique_overlays']} unique) in {stats['intervals']} intervals.")
 
         self._video_writer.add_clip(self._input_video_clip)
         for clip in clips:
@@ -112,8 +141,19 @@ class VideoGenerator:
 
         logger().debug(f"Writing final video to: {self._output_video_path}")
         video_quality = self._video_quality if self._video_quality else VideoQuality.MIDDLE
-        self._video_writer.write(video_quality=video_quality)
+        if self._chunks > 1:
+            keyframe_times = self._get_keyframe_times()
+            ChunkedVideoWriter(self._video_writer, self._chunks, self._jobs, keyframe_times, self._pipelined_writing, subtitle_clips=clips).write(video_quality)
+        elif self._pipelined_writing:
+            PipelinedVideoWriter(self._video_writer).write(video_quality)
+        else:
+            self._video_writer.write(video_quality=video_quality)
         
+    def _get_keyframe_times(self) -> List[float]:
+        """Returns the keyframe times of the input video in the output timeline (they are relative to the fragment start)."""
+        offset = self._fragment_time[0] if self._fragment_time else 0.0
+        return [time - offset for time in ChunkedVideoWriter.get_keyframe_times(self._input_video_path) if time >= offset]
+
     def close(self):
         self._remove_audio_file_if_needed()
         self._has_video_generation_started = False
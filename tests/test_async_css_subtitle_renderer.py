@@ -0,0 +1,64 @@
+import asyncio
+import unittest
+
+from pycaps.common import CacheStrategy, Document, ElementState, Line, Segment, TimeFragment, Word
+from pycaps.renderer import AsyncCssSubtitleRenderer
+from pycaps.renderer.rendered_image_cache import RenderedImageCache
+from pycaps.renderer.renderer_page import RendererPage
+
+STATE = {state: RendererPage.get_state_index(state) for state in ElementState}
+
+
+class _FakeAsyncPage:
+    def __init__(self):
+        self.calls = []
+
+    async def evaluate(self, script, arg):
+        if script != RendererPage.RUNTIME_CALL_SCRIPT:
+            self.calls.append((script, arg))
+            return None
+        name, args = arg
+        self.calls.append((name, args))
+        # hidden words: nothing is captured
+        return {"x": 0, "y": 0, "width": 0, "height": 0} if name == "renderWord" else None
+
+
+def _make_line(*texts):
+    document = Document()
+    segment = Segment(time=TimeFragment(0, 1))
+    line = Line(time=TimeFragment(0, 1))
+    for index, text in enumerate(texts):
+        line.words.add(Word(text=text, time=TimeFragment(index / len(texts), (index + 1) / len(texts))))
+    segment.lines.add(line)
+    document.segments.add(segment)
+    return line
+
+
+class AsyncCssSubtitleRendererTest(unittest.TestCase):
+    def setUp(self):
+        self.renderer = AsyncCssSubtitleRenderer(pages=1)
+        self.renderer._image_cache = RenderedImageCache("", CacheStrategy.NONE)
+
+    def test_the_lines_are_rendered_through_the_page_runtime(self):
+        page = _FakeAsyncPage()
+        line = _make_line("hello", "world")
+
+        async def render():
+            await self.renderer.open_line(page, line, ElementState.LINE_BEING_NARRATED)
+            for index, word in enumerate(line.words):
+                await self.renderer.render_word(page, line, ElementState.LINE_BEING_NARRATED, index, word, ElementState.WORD_BEING_NARRATED, 2)
+            await self.renderer.open_line(page, line, ElementState.LINE_ALREADY_NARRATED)
+            await self.renderer.render_word(page, line, ElementState.LINE_ALREADY_NARRATED, 0, line.words[0], ElementState.WORD_ALREADY_NARRATED)
+
+        asyncio.run(render())
+
+        self.assertEqual([name for name, _ in page.calls], ["openLineWords", "renderWord", "renderWord", "openLineWords", "renderWord"])
+        self.assertEqual(page.calls[0][1], [["hello", "world"], "line", ["word word-0-in-line", "word word-1-in-line"], STATE[ElementState.LINE_BEING_NARRATED]])
+        # the state of each word is undone with the next call, and the line built again undoes everything
+        self.assertEqual(page.calls[1][1], [[None, None, None], 0, STATE[ElementState.WORD_BEING_NARRATED], 2])
+        self.assertEqual(page.calls[2][1], [[None, [0, STATE[ElementState.WORD_BEING_NARRATED]], None], 1, STATE[ElementState.WORD_BEING_NARRATED], 2])
+        self.assertEqual(page.calls[4][1], [[None, None, None], 0, STATE[ElementState.WORD_ALREADY_NARRATED], None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import unittest
+
+from pycaps.common import Line, TimeFragment, Word
+from pycaps.renderer import AsyncSubtitleRendererAdapter
+
+
+class _FakeAsyncRenderer:
+    pages_count = 3
+
+    def __init__(self):
+        self.loop_threads = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.free_pages = None
+
+    def _track(self):
+        self.loop_threads.add(threading.get_ident())
+
+    async def open(self, *_args):
+        self._track()
+        self.free_pages = asyncio.Queue()
+        for page in range(self.pages_count):
+            self.free_pages.put_nowait(page)
+
+    async def acquire_page(self):
+        self._track()
+        return await self.free_pages.get()
+
+    def release_page(self, page):
+        self._track()
+        self.free_pages.put_nowait(page)
+
+    async def open_line(self, page, line, line_state):
+        self._track()
+
+    async def render_word(self, page, line, line_state, index, word, state, first_n_letters=None):
+        self._track()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return (page, word.text)
+
+    async def get_word_size(self, word, line_state, word_state):
+        self._track()
+        return (len(word.text), 1)
+
+    async def close(self):
+        self._track()
+
+
+async def _get_size(queue):
+    # lets the release callbacks scheduled before this coroutine run first
+    await asyncio.sleep(0)
+    return queue.qsize()
+
+
+def _make_lines(count):
+    lines = []
+    for i in range(count):
+        line = Line(time=TimeFragment(start=i, end=i + 1))
+        line.words.add(Word(text=f"word{i}", time=TimeFragment(start=i, end=i + 1)))
+        lines.append(line)
+    return lines
+
+
+class AsyncSubtitleRendererAdapterTests(unittest.TestCase):
+    def test_lines_are_rendered_concurrently_and_in_order(self):
+        async_renderer = _FakeAsyncRenderer()
+        adapter = AsyncSubtitleRendererAdapter(async_renderer)
+        adapter.open(100, 100)
+
+        def render_line(session, line):
+            session.open_line(line, None)
+            result = session.render_word(0, line.words[0], None)
+            session.close_line()
+            return result[1]
+
+        results = adapter.render_lines(_make_lines(12), render_line)
+        adapter.close()
+
+        self.assertEqual(results, [f"word{i}" for i in range(12)])
+        self.assertGreater(async_renderer.max_in_flight, 1)
+        self.assertLessEqual(async_renderer.max_in_flight, async_renderer.pages_count)
+        self.assertEqual(len(async_renderer.loop_threads), 1)
+        self.assertNotIn(threading.get_ident(), async_renderer.loop_threads)
+
+    def test_blocking_calls_use_the_event_loop(self):
+        adapter = AsyncSubtitleRendererAdapter(_FakeAsyncRenderer())
+        adapter.open(100, 100)
+        line = _make_lines(1)[0]
+
+        adapter.open_line(line, None)
+        rendered = adapter.render_word(0, line.words[0], None)
+        adapter.close_line()
+        size = adapter.get_word_size(line.words[0], None, None)
+        adapter.close()
+
+        self.assertEqual(rendered[1], "word0")
+        self.assertEqual(size, (5, 1))
+
+    def test_the_page_is_released_when_the_line_can_not_be_opened(self):
+        async_renderer = _FakeAsyncRenderer()
+        adapter = AsyncSubtitleRendererAdapter(async_renderer)
+        adapter.open(100, 100)
+        line = _make_lines(1)[0]
+
+        async def failing_open_line(page, line, line_state):
+            raise ValueError("broken line")
+
+        original_open_line = async_renderer.open_line
+        async_renderer.open_line = failing_open_line
+        with self.assertRaisesRegex(ValueError, "broken line"):
+            adapter.open_line(line, None)
+        async_renderer.open_line = original_open_line
+
+        # the session can open a line again, and all the pages are free
+        adapter.open_line(line, None)
+        adapter.close_line()
+        free_pages = adapter.run(_get_size(async_renderer.free_pages))
+        adapter.close()
+
+        self.assertEqual(free_pages, async_renderer.pages_count)
+
+    def test_calls_before_open_fail(self):
+        adapter = AsyncSubtitleRendererAdapter(_FakeAsyncRenderer())
+
+        with self.assertRaises(RuntimeError):
+            adapter.get_word_size(_make_lines(1)[0].words[0], None, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
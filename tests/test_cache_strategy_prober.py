@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+
+from pycaps.common import CacheStrategy
+from pycaps.renderer.cache_strategy_prober import CacheStrategyProber
+from pycaps.renderer.rendered_image_cache import RenderedImageCache
+
+
+CSS = ".word { color: white; } .word-being-narrated { color: yellow; } .line { background: linear-gradient(red, blue); }"
+
+
+class CacheStrategyProberTest(unittest.TestCase):
+    def test_identical_images_ignore_the_position(self):
+        prober = CacheStrategyProber(CSS)
+        image = np.full((4, 6, 4), 255, dtype=np.uint8)
+
+        is_position_sensitive = prober.decide("line word word-0-in-line", [image, image.copy(), image.copy()])
+
+        self.assertFalse(is_position_sensitive)
+        self.assertTrue(prober.is_decided("line word word-2-in-line"))
+        self.assertFalse(prober.is_position_sensitive("line word word-5-in-line"))
+
+    def test_different_images_use_the_position(self):
+        prober = CacheStrategyProber(CSS)
+        image = np.full((4, 6, 4), 255, dtype=np.uint8)
+        other_image = image.copy()
+        other_image[0, 0] = [0, 0, 0, 255]
+
+        self.assertTrue(prober.decide("line word word-being-narrated", [image, other_image, image]))
+        self.assertTrue(prober.is_position_sensitive("line word word-being-narrated word-1-in-line"))
+
+    def test_hidden_in_some_positions_uses_the_position(self):
+        prober = CacheStrategyProber(CSS)
+        image = np.zeros((4, 6, 4), dtype=np.uint8)
+
+        self.assertTrue(prober.decide("line word", [None, image, image]))
+        self.assertFalse(prober.decide("line word word-being-narrated", [None, None, None]))
+
+    def test_classes_without_decision_use_the_position(self):
+        prober = CacheStrategyProber(CSS)
+
+        self.assertFalse(prober.is_decided("line word"))
+        self.assertTrue(prober.is_position_sensitive("line word"))
+        self.assertEqual(prober.get_decisions(), {})
+
+
+class RenderedImageCacheAutoStrategyTest(unittest.TestCase):
+    def test_position_is_only_part_of_the_key_for_position_sensitive_classes(self):
+        prober = CacheStrategyProber(CSS)
+        cache = RenderedImageCache(CSS, CacheStrategy.AUTO, cache_strategy_prober=prober)
+        image = np.zeros((2, 2, 4), dtype=np.uint8)
+        prober.decide("line word", [image, image])
+        prober.decide("line word word-being-narrated", [image, np.ones((2, 2, 4), dtype=np.uint8)])
+
+        cache.set(0, "hello", "line word word-0-in-line", None, image)
+        cache.set(0, "hello", "line word word-being-narrated word-0-in-line", None, image)
+
+        self.assertTrue(cache.has(3, "hello", "line word word-3-in-line", None))
+        self.assertTrue(cache.has(0, "hello", "line word word-being-narrated word-0-in-line", None))
+        self.assertFalse(cache.has(3, "hello", "line word word-being-narrated word-3-in-line", None))
+
+    def test_without_prober_the_position_is_part_of_the_key(self):
+        cache = RenderedImageCache(CSS, CacheStrategy.AUTO)
+        cache.set(0, "hello", "line word", None, np.zeros((2, 2, 4), dtype=np.uint8))
+
+        self.assertTrue(cache.has(0, "hello", "line word", None))
+        self.assertFalse(cache.has(1, "hello", "line word", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from pycaps.video import ChunkedVideoWriter
+
+FPS = 10
+
+
+def _clip(start, duration):
+    return SimpleNamespace(start=start, duration=duration, end=start + duration)
+
+
+class _FakeWriter:
+    '''The attributes of movielite's VideoWriter used by ChunkedVideoWriter. Each chunk is "encoded" as a text file with its frames.'''
+    def __init__(self, duration, failing_frame=None):
+        self._fps = FPS
+        self._size = (40, 30)
+        self._duration = duration
+        self._output = "output.mp4"
+        # the input video: the subtitle clips are received by ChunkedVideoWriter
+        self._graphic_clips = [_clip(0, duration)]
+        self._failing_frame = failing_frame
+        self.muxed_video = None
+
+    def _render_range(self, start_frame, end_frame, part_path, video_quality, high_precision_blending):
+        if self._failing_frame is not None and start_frame <= self._failing_frame < end_frame:
+            return
+        Path(part_path).write_text(f"{start_frame}-{end_frame}", encoding="utf-8")
+
+    def _mux_audio(self, video_path, output_path):
+        self.muxed_video = video_path
+
+
+class ChunkedVideoWriterTest(unittest.TestCase):
+    def test_the_chunks_cover_the_video_with_similar_lengths(self):
+        writer = ChunkedVideoWriter(_FakeWriter(10.0), chunks=4)
+
+        self.assertEqual(writer.get_chunk_ranges(100), [(0, 25), (25, 50), (50, 75), (75, 100)])
+
+    def test_the_cuts_are_aligned_with_the_keyframes(self):
+        writer = ChunkedVideoWriter(_FakeWriter(10.0), chunks=3, keyframe_times=[0, 2, 4, 6, 8])
+
+        self.assertEqual(writer.get_chunk_ranges(100), [(0, 40), (40, 60), (60, 100)])
+
+    def test_the_cuts_avoid_the_subtitles_on_screen(self):
+        # a subtitle is on screen from 4.5 to 5.5, so the cut at 5 would split it
+        writer = ChunkedVideoWriter(_FakeWriter(10.0), chunks=2, keyframe_times=[0, 3, 5, 7], subtitle_clips=[_clip(4.5, 1.0)])
+
+        self.assertEqual(writer.get_chunk_ranges(100), [(0, 30), (30, 100)])
+
+    def test_a_cut_can_split_a_subtitle_when_there_is_no_other_keyframe(self):
+        writer = ChunkedVideoWriter(_FakeWriter(10.0), chunks=2, keyframe_times=[0, 5], subtitle_clips=[_clip(0, 10.0)])
+
+        self.assertEqual(writer.get_chunk_ranges(100), [(0, 50), (50, 100)])
+
+    def test_short_videos_have_fewer_chunks(self):
+        writer = ChunkedVideoWriter(_FakeWriter(10.0), chunks=4, keyframe_times=[0, 5])
+
+        self.assertEqual(writer.get_chunk_ranges(100), [(0, 50), (50, 100)])
+
+    def test_the_chunks_are_concatenated_in_order_and_the_audio_is_muxed_once(self):
+        fake_writer = _FakeWriter(2.0)
+        concatenated = []
+
+        def run(command, check):
+            list_path = Path(command[command.index("-i") + 1])
+            chunk_paths = [line[len("file '"):-1] for line in list_path.read_text(encoding="utf-8").splitlines()]
+            concatenated.extend(Path(path).read_text(encoding="utf-8") for path in chunk_paths)
+            self.assertIn("copy", command)
+
+        with mock.patch("pycaps.video.chunked_video_writer.subprocess.run", side_effect=run):
+            ChunkedVideoWriter(fake_writer, chunks=3, jobs=2).write("quality")
+
+        self.assertEqual(concatenated, ["0-7", "7-13", "13-20"])
+        self.assertTrue(fake_writer.muxed_video.endswith("video.mp4"))
+
+    def test_a_chunk_that_is_not_rendered_fails(self):
+        with mock.patch("pycaps.video.chunked_video_writer.subprocess.run") as run:
+            with self.assertRaises(RuntimeError):
+                ChunkedVideoWriter(_FakeWriter(2.0, failing_frame=10), chunks=2, jobs=1).write("quality")
+        run.assert_not_called()
+
+    def test_invalid_chunks_and_jobs(self):
+        with self.assertRaises(ValueError):
+            ChunkedVideoWriter(_FakeWriter(1.0), chunks=0)
+        with self.assertRaises(ValueError):
+            ChunkedVideoWriter(_FakeWriter(1.0), chunks=2, jobs=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
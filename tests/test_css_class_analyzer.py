@@ -0,0 +1,87 @@
+import unittest
+
+from pycaps.renderer.css_class_analyzer import CssClassAnalyzer
+
+
+class CssClassAnalyzerTest(unittest.TestCase):
+    def test_classes_only_mentioned_in_comments_are_ignored(self):
+        analyzer = CssClassAnalyzer("""
+            /* .highlight is not used anymore */
+            .word { color: white; }
+        """)
+
+        self.assertEqual(analyzer.get_key("word highlight"), "word")
+
+    def test_class_names_are_matched_completely(self):
+        analyzer = CssClassAnalyzer(".word-big { color: red; }")
+
+        self.assertEqual(analyzer.get_key("word word-big"), "word-big")
+
+    def test_unused_states_are_removed(self):
+        analyzer = CssClassAnalyzer(".word { color: white; } .word-being-narrated { color: yellow; }")
+
+        self.assertEqual(analyzer.get_key("line line-being-narrated word word-not-narrated-yet"), "word")
+        self.assertEqual(analyzer.get_key("line line-being-narrated word word-already-narrated"), "word")
+        self.assertEqual(analyzer.get_key("line line-being-narrated word word-being-narrated"), "word,word-being-narrated")
+
+    def test_states_with_the_same_rules_are_merged(self):
+        analyzer = CssClassAnalyzer("""
+            .word { color: white; }
+            .word-not-narrated-yet, .word-already-narrated { opacity: 0.5; }
+            .word-being-narrated { color: yellow; }
+        """)
+
+        self.assertEqual(analyzer.get_key("word word-already-narrated"), analyzer.get_key("word word-not-narrated-yet"))
+        self.assertNotEqual(analyzer.get_key("word word-being-narrated"), analyzer.get_key("word word-not-narrated-yet"))
+
+    def test_states_with_different_rules_are_not_merged(self):
+        analyzer = CssClassAnalyzer("""
+            .word-not-narrated-yet { opacity: 0.5; }
+            .word-already-narrated { opacity: 0.6; }
+            .line-being-narrated .word-already-narrated { opacity: 0.5; }
+        """)
+
+        self.assertNotEqual(analyzer.get_key("word word-already-narrated"), analyzer.get_key("word word-not-narrated-yet"))
+
+    def test_same_declarations_in_different_positions_are_not_merged(self):
+        # the cascade order matters: ".word" overrides the first rule, but not the last one
+        analyzer = CssClassAnalyzer("""
+            .word-not-narrated-yet { color: red; }
+            .word { color: white; }
+            .word-already-narrated { color: red; }
+        """)
+
+        self.assertNotEqual(analyzer.get_key("word word-already-narrated"), analyzer.get_key("word word-not-narrated-yet"))
+
+    def test_rules_inside_media_queries_and_strings_with_braces(self):
+        analyzer = CssClassAnalyzer("""
+            @import url("fonts.css");
+            @font-face { font-family: 'Custom'; src: url('font.ttf'); }
+            @keyframes pulse { from { opacity: 0; } to { opacity: 1; } }
+            .word::after { content: "} .fake {"; }
+            @media (min-width: 100px) { .emphasis { color: red; } }
+        """)
+
+        self.assertEqual(analyzer.get_key("word emphasis fake pulse"), "word,emphasis")
+
+    def test_class_attribute_selectors_use_all_classes(self):
+        analyzer = CssClassAnalyzer("[class*='narrated'] { color: red; }")
+
+        self.assertEqual(analyzer.get_key("word word-being-narrated"), "word,word-being-narrated")
+
+    def test_invalid_css_uses_all_classes(self):
+        analyzer = CssClassAnalyzer(".word { color: red; ")
+
+        self.assertEqual(analyzer.get_key("word word-not-narrated-yet word-already-narrated"), "word,word-not-narrated-yet,word-already-narrated")
+
+    def test_word_states_styled_identically(self):
+        self.assertTrue(CssClassAnalyzer(".word { color: red; } .line-being-narrated .word { color: blue; }").has_equivalent_word_states())
+        self.assertFalse(CssClassAnalyzer(".word { color: red; } .word-being-narrated { color: blue; }").has_equivalent_word_states())
+        self.assertFalse(CssClassAnalyzer("[class*='narrated'] { color: red; }").has_equivalent_word_states())
+
+    def test_same_stylesheet_is_analyzed_once(self):
+        self.assertIs(CssClassAnalyzer.get(".word { color: red; }"), CssClassAnalyzer.get(".word { color: red; }"))
+
+
+if __name__ == "__main__":
+    unittest.main()
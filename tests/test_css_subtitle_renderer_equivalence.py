@@ -0,0 +1,101 @@
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from pycaps.common import CacheStrategy, Document, ElementState, Line, Segment, TimeFragment, Word
+from pycaps.renderer import CssSubtitleRenderer
+
+PRESET_DIR = Path(__file__).resolve().parents[1] / "src" / "pycaps" / "template" / "preset" / "default"
+STATE_PASSES = [
+    (ElementState.LINE_NOT_NARRATED_YET, ElementState.WORD_NOT_NARRATED_YET),
+    (ElementState.LINE_BEING_NARRATED, ElementState.WORD_NOT_NARRATED_YET),
+    (ElementState.LINE_BEING_NARRATED, ElementState.WORD_BEING_NARRATED),
+    (ElementState.LINE_BEING_NARRATED, ElementState.WORD_ALREADY_NARRATED),
+    (ElementState.LINE_ALREADY_NARRATED, ElementState.WORD_ALREADY_NARRATED),
+]
+# max difference of a channel: the slices of a larger capture can be antialiased slightly differently
+MAX_CHANNEL_DIFFERENCE = 2
+
+
+def _launch_chromium():
+    '''Returns (playwright, browser), or None if Playwright or its Chromium browser aren't installed.'''
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        return None
+    playwright = sync_playwright().start()
+    try:
+        return playwright, playwright.chromium.launch()
+    except Exception:
+        playwright.stop()
+        return None
+
+
+def _make_lines(*lines_texts):
+    document = Document()
+    segment = Segment(time=TimeFragment(0, len(lines_texts)))
+    for line_index, texts in enumerate(lines_texts):
+        line = Line(time=TimeFragment(line_index, line_index + 1))
+        for index, text in enumerate(texts):
+            line.words.add(Word(text=text, time=TimeFragment(line_index + index / len(texts), line_index + (index + 1) / len(texts))))
+        segment.lines.add(line)
+    document.segments.add(segment)
+    return list(segment.lines)
+
+
+def _render_all_states(renderer, line):
+    images = []
+    for line_state, word_state in STATE_PASSES:
+        renderer.open_line(line, line_state)
+        images.extend(renderer.render_word_array(index, word, word_state) for index, word in enumerate(line.words))
+        renderer.close_line()
+    return images
+
+
+class CssSubtitleRendererEquivalenceTest(unittest.TestCase):
+    '''The line strips and the tiles must produce the same word images as the per word render.'''
+
+    @classmethod
+    def setUpClass(cls):
+        launched = _launch_chromium()
+        if not launched:
+            raise unittest.SkipTest("Playwright Chromium is not installed")
+        cls._playwright, cls._browser = launched
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._browser.close()
+        cls._playwright.stop()
+
+    def _render(self, lines, **kwargs):
+        renderer = CssSubtitleRenderer(browser=self._browser, use_renderer_daemon=False, **kwargs)
+        renderer.append_css((PRESET_DIR / "styles.css").read_text(encoding="utf-8"))
+        renderer.open(720, 1280, PRESET_DIR / "resources", CacheStrategy.NONE)
+        try:
+            return renderer.render_lines(lines, _render_all_states)
+        finally:
+            renderer.close()
+
+    def _assert_same_images(self, expected_lines, actual_lines):
+        for line_index, (expected_images, actual_images) in enumerate(zip(expected_lines, actual_lines)):
+            self.assertEqual(len(actual_images), len(expected_images))
+            for index, (expected, actual) in enumerate(zip(expected_images, actual_images)):
+                with self.subTest(line=line_index, image=index):
+                    self.assertEqual(actual is None, expected is None)
+                    if expected is None:
+                        continue
+                    self.assertEqual(actual.shape, expected.shape)
+                    difference = np.abs(actual.astype(np.int16) - expected.astype(np.int16))
+                    self.assertLessEqual(int(difference.max()), MAX_CHANNEL_DIFFERENCE)
+
+    def test_line_strip_and_tiles_match_the_per_word_render(self):
+        lines = _make_lines(["Hello", "world,", "how"], ["are", "you", "doing?"], ["Fine!"])
+        expected = self._render(lines)
+
+        self._assert_same_images(expected, self._render(lines, line_strip=True))
+        self._assert_same_images(expected, self._render(lines, tile_lines=2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,268 @@
+import base64
+import io
+import unittest
+
+from PIL import Image
+
+from pycaps.common import CacheStrategy, Document, ElementState, Line, Segment, Tag, TimeFragment, Word
+from pycaps.renderer import CssSubtitleRenderer
+from pycaps.renderer.renderer_page import RendererPage
+
+STATE = {state: RendererPage.get_state_index(state) for state in ElementState}
+
+
+def _png_base64():
+    output = io.BytesIO()
+    Image.new("RGBA", (64, 128), (255, 0, 0, 255)).save(output, format="PNG")
+    return base64.b64encode(output.getvalue()).decode("ascii")
+
+
+class _FakePage:
+    def __init__(self):
+        self.calls = []
+        # height (CSS pixels) of each tile
+        self.tile_height = 2
+        self.lines = []
+        self.words = []
+        self.cdp_session = _FakeCdpSession()
+
+    def goto(self, *_args):
+        pass
+
+    def wait_for_load_state(self, *_args):
+        pass
+
+    def evaluate(self, script, arg):
+        if script != RendererPage.RUNTIME_CALL_SCRIPT:
+            self.calls.append((script, arg))
+            if script == RendererPage.MEASURE_LETTERS_SCRIPT:
+                return [{letter: {"width": 1, "height": 2} for letter in letters} for letters, _, _ in arg]
+            return None
+
+        # the page runtime: the lines uploaded and the words of the line in the page
+        name, args = arg
+        self.calls.append((name, args))
+        if name == "loadLines":
+            self.lines = args[0]
+        elif name == "openLine":
+            self.words = self.lines[args[0]][0]
+        elif name == "openLineWords":
+            self.words = args[0]
+        elif name == "renderWord":
+            return {"x": 0, "y": 0, "width": 4, "height": 2}
+        elif name == "addStateToLineWords":
+            return [{"x": index * 4, "y": 0, "width": 4, "height": 2} for index in range(len(self.words))]
+        elif name == "tileLines":
+            boxes = [[{"x": index * 4, "y": tile * 2, "width": 4, "height": 2} for index in range(len(self.lines[line_id][0]))] for tile, (line_id, _, _) in enumerate(args[0])]
+            return {"height": len(args[0]) * self.tile_height, "boxes": boxes}
+        return None
+
+
+class _FakeCdpSession:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, method, params=None):
+        self.sent.append((method, params))
+        return {"data": _png_base64()} if method == "Page.captureScreenshot" else {}
+
+
+class _FakeContext:
+    def __init__(self, page):
+        self._page = page
+
+    def new_page(self):
+        return self._page
+
+    def new_cdp_session(self, _page):
+        return self._page.cdp_session
+
+
+class _FakeBrowser:
+    def __init__(self, page):
+        self._page = page
+
+    def new_context(self, **_kwargs):
+        return _FakeContext(self._page)
+
+
+def _make_line(*texts, segment_tags=()):
+    document = Document()
+    segment = Segment(time=TimeFragment(0, len(texts)), structure_tags={Tag(name) for name in segment_tags})
+    line = Line(time=TimeFragment(0, len(texts)))
+    for index, text in enumerate(texts):
+        line.words.add(Word(text=text, time=TimeFragment(index, index + 1)))
+    segment.lines.add(line)
+    document.segments.add(segment)
+    return line
+
+
+class CssSubtitleRendererLineDomTest(unittest.TestCase):
+    STATE_PASSES = [
+        (ElementState.LINE_NOT_NARRATED_YET, ElementState.WORD_NOT_NARRATED_YET),
+        (ElementState.LINE_BEING_NARRATED, ElementState.WORD_NOT_NARRATED_YET),
+        (ElementState.LINE_BEING_NARRATED, ElementState.WORD_BEING_NARRATED),
+        (ElementState.LINE_BEING_NARRATED, ElementState.WORD_ALREADY_NARRATED),
+        (ElementState.LINE_ALREADY_NARRATED, ElementState.WORD_ALREADY_NARRATED),
+    ]
+
+    def _open_renderer(self, **kwargs):
+        page = _FakePage()
+        renderer = CssSubtitleRenderer(browser=_FakeBrowser(page), use_renderer_daemon=False, **kwargs)
+        renderer.open(720, 1280, cache_strategy=CacheStrategy.NONE)
+        self.addCleanup(renderer.close)
+        return renderer, page
+
+    def _scripts(self, page, script):
+        return [arg for called_script, arg in page.calls if called_script == script]
+
+    def test_the_line_is_built_once_for_all_its_states(self):
+        renderer, page = self._open_renderer()
+        line = _make_line("hello", "world")
+
+        for line_state, word_state in self.STATE_PASSES:
+            renderer.open_line(line, line_state)
+            for index, word in enumerate(line.words):
+                self.assertIsNotNone(renderer.render_word_array(index, word, word_state))
+            renderer.close_line()
+
+        self.assertEqual(self._scripts(page, "openLineWords"), [[["hello", "world"], "line", ["word word-0-in-line", "word word-1-in-line"], STATE[ElementState.LINE_NOT_NARRATED_YET]]])
+        renders = self._scripts(page, "renderWord")
+        self.assertEqual(len(renders), 10)
+        # each render undoes the previous one, and the line state is updated with the first render of each state
+        self.assertEqual(renders[0], [[None, None, None], 0, STATE[ElementState.WORD_NOT_NARRATED_YET], None])
+        self.assertEqual(renders[1][0], [None, [0, STATE[ElementState.WORD_NOT_NARRATED_YET]], None])
+        self.assertEqual(renders[2][0], [STATE[ElementState.LINE_BEING_NARRATED], [1, STATE[ElementState.WORD_NOT_NARRATED_YET]], None])
+        # 1 line build + 1 transparent background + 10 x (render + capture)
+        self.assertEqual(renderer.get_round_trip_stats(), {"round_trips": 22, "line_opens": 5, "line_loads": 1})
+
+    def test_the_line_is_built_again_after_other_scripts_replace_it(self):
+        renderer, page = self._open_renderer()
+        line = _make_line("hello", "world")
+
+        renderer.open_line(line, ElementState.LINE_NOT_NARRATED_YET)
+        renderer.render_word_array(0, line.words[0], ElementState.WORD_NOT_NARRATED_YET)
+        renderer.close_line()
+        renderer.get_word_size(line.words[0], ElementState.LINE_BEING_NARRATED, ElementState.WORD_BEING_NARRATED)
+        renderer.open_line(line, ElementState.LINE_BEING_NARRATED)
+        renderer.render_word_array(0, line.words[0], ElementState.WORD_BEING_NARRATED)
+        renderer.close_line()
+        renderer.open_line(_make_line("other", "words"), ElementState.LINE_BEING_NARRATED)
+        renderer.close_line()
+
+        self.assertEqual(len(self._scripts(page, "openLineWords")), 3)
+        # the measure replaced the line, so there is nothing to undo in the new one
+        self.assertEqual(self._scripts(page, "renderWord")[1][0], [None, None, None])
+
+    def test_lines_with_the_same_words_and_other_tags_are_built_again(self):
+        renderer, page = self._open_renderer()
+        line = _make_line("hello", "world")
+        tagged_line = _make_line("hello", "world", segment_tags=["custom-tag"])
+
+        for current_line in (line, tagged_line):
+            renderer.open_line(current_line, ElementState.LINE_BEING_NARRATED)
+            renderer.render_word_array(0, current_line.words[0], ElementState.WORD_BEING_NARRATED)
+            renderer.close_line()
+
+        self.assertEqual([args[1] for args in self._scripts(page, "openLineWords")], ["line", "line custom-tag"])
+
+    def test_line_strip_state_is_undone_with_the_next_script(self):
+        renderer, page = self._open_renderer(line_strip=True)
+        line = _make_line("hello", "world")
+
+        for line_state, word_state in self.STATE_PASSES[1:3]:
+            renderer.open_line(line, line_state)
+            for index, word in enumerate(line.words):
+                renderer.render_word_array(index, word, word_state)
+            renderer.close_line()
+
+        strips = self._scripts(page, "addStateToLineWords")
+        self.assertEqual(len(strips), 2)
+        self.assertEqual(strips[1][0], [STATE[ElementState.LINE_BEING_NARRATED], None, STATE[ElementState.WORD_NOT_NARRATED_YET]])
+
+
+
+class CssSubtitleRendererTilesTest(unittest.TestCase):
+    def _open_renderer(self, tile_lines):
+        page = _FakePage()
+        renderer = CssSubtitleRenderer(browser=_FakeBrowser(page), use_renderer_daemon=False, tile_lines=tile_lines)
+        renderer.open(720, 1280, cache_strategy=CacheStrategy.NONE)
+        self.addCleanup(renderer.close)
+        return renderer, page
+
+    def _render_all_states(self, renderer, line):
+        arrays = []
+        for line_state, word_state in CssSubtitleRendererLineDomTest.STATE_PASSES:
+            renderer.open_line(line, line_state)
+            arrays.extend(renderer.render_word_array(index, word, word_state) for index, word in enumerate(line.words))
+            renderer.close_line()
+        return arrays
+
+    def _scripts(self, page, script):
+        return [arg for called_script, arg in page.calls if called_script == script]
+
+    def _count(self, page, script):
+        return len(self._scripts(page, script))
+
+    def _captures(self, page):
+        return sum(1 for method, _ in page.cdp_session.sent if method == "Page.captureScreenshot")
+
+    def test_groups_of_lines_are_captured_in_a_single_screenshot(self):
+        renderer, page = self._open_renderer(tile_lines=2)
+        lines = [_make_line("one", "two"), _make_line("three"), _make_line("four", "five")]
+
+        results = renderer.render_lines(lines, self._render_all_states)
+
+        self.assertEqual([len(arrays) for arrays in results], [10, 5, 10])
+        self.assertTrue(all(array is not None and array.shape == (4, 8, 4) for arrays in results for array in arrays))
+        self.assertEqual(self._count(page, "tileLines"), 2)
+        self.assertEqual(self._captures(page), 2)
+        self.assertEqual(self._count(page, "renderWord"), 0)
+        self.assertEqual(self._count(page, "removeTiles"), 1)
+        # the lines are uploaded once, and referenced by index
+        self.assertEqual(self._count(page, "loadLines"), 1)
+        second_group_tiles = self._scripts(page, "tileLines")[1][0]
+        self.assertEqual(second_group_tiles[0], [2, STATE[ElementState.LINE_NOT_NARRATED_YET], STATE[ElementState.WORD_NOT_NARRATED_YET]])
+
+    def test_the_viewport_grows_to_fit_the_tiles(self):
+        renderer, page = self._open_renderer(tile_lines=4)
+        page.tile_height = 100
+        viewport_height = renderer._viewport_height
+
+        renderer.render_lines([_make_line("one"), _make_line("two")], self._render_all_states)
+
+        overrides = [params for method, params in page.cdp_session.sent if method == "Emulation.setDeviceMetricsOverride"]
+        # and it's restored after the tiles are removed
+        self.assertEqual([params["height"] for params in overrides], [1000, viewport_height])
+        self.assertEqual(renderer._viewport_height, viewport_height)
+        self.assertEqual(self._count(page, "tileLines"), 2)
+        self.assertEqual(self._captures(page), 1)
+
+    def test_groups_too_tall_are_split(self):
+        renderer, page = self._open_renderer(tile_lines=2)
+        # 5 tiles of a line fit in the max capture height (16384 device pixels at scale 2), 10 tiles don't
+        page.tile_height = 1000
+
+        results = renderer.render_lines([_make_line("one"), _make_line("two")], self._render_all_states)
+
+        self.assertTrue(all(array is not None for arrays in results for array in arrays))
+        # both lines, then each line alone (the first one grows the viewport and lays out the tiles again)
+        self.assertEqual(self._count(page, "tileLines"), 4)
+        self.assertEqual(self._captures(page), 2)
+
+    def test_the_tiles_are_removed_before_rendering_the_words_of_a_line_too_tall(self):
+        renderer, page = self._open_renderer(tile_lines=2)
+        # the 5 tiles of a line don't fit in the max capture height
+        page.tile_height = 2000
+
+        results = renderer.render_lines([_make_line("one")], self._render_all_states)
+
+        self.assertTrue(all(array is not None for arrays in results for array in arrays))
+        names = [name for name, _ in page.calls]
+        self.assertEqual(self._count(page, "tileLines"), 1)
+        self.assertIn("removeTiles", names[names.index("tileLines"):names.index("renderWord")])
+        self.assertEqual(self._captures(page), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
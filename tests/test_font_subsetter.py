@@ -0,0 +1,166 @@
+import importlib.util
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pycaps.common import CacheStrategy
+from pycaps.renderer import CssSubtitleRenderer, FontSubsetter
+from pycaps.renderer.pictex_render_worker import resolve_css_urls
+
+RESOURCES_DIR = Path(__file__).resolve().parents[1] / "src" / "pycaps" / "template" / "preset" / "default" / "resources"
+FONT = RESOURCES_DIR / "black.ttf"
+HAS_FONTTOOLS = importlib.util.find_spec("fontTools") is not None
+CSS = "@font-face { font-family: 'CustomFont'; src: url('black.ttf') format('truetype'); } .word { font-family: 'CustomFont'; }"
+
+
+@unittest.skipUnless(HAS_FONTTOOLS, "fontTools is not installed")
+class FontSubsetterTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_dir = Path(temp_dir.name)
+        self.subsetter = FontSubsetter(self.cache_dir)
+
+    def test_the_subset_maps_the_same_characters(self):
+        from fontTools.ttLib import TTFont
+
+        characters = FontSubsetter.get_characters("Hello world")
+
+        subset_path = self.subsetter.subset(FONT, characters)
+
+        self.assertIsNotNone(subset_path)
+        self.assertLess(subset_path.stat().st_size, FONT.stat().st_size)
+        original_cmap = TTFont(FONT).getBestCmap()
+        subset_cmap = TTFont(subset_path).getBestCmap()
+        for character in characters:
+            self.assertEqual(ord(character) in subset_cmap, ord(character) in original_cmap)
+        self.assertNotIn(ord("z"), subset_cmap)
+
+    def test_subsets_are_cached_by_font_and_characters(self):
+        first = self.subsetter.subset(FONT, FontSubsetter.get_characters("hello"))
+
+        with mock.patch("fontTools.subset.Subsetter") as subsetter:
+            second = self.subsetter.subset(FONT, FontSubsetter.get_characters("hello"))
+        subsetter.assert_not_called()
+        other = self.subsetter.subset(FONT, FontSubsetter.get_characters("world"))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_the_original_font_is_kept_when_the_subset_does_not_cover_the_characters(self):
+        with mock.patch.object(FontSubsetter, "_covers_same_characters", return_value=False) as covers:
+            self.assertIsNone(self.subsetter.subset(FONT, "abc"))
+            self.assertIsNone(self.subsetter.subset(FONT, "abc"))
+
+        # the rejection is cached too
+        self.assertEqual(covers.call_count, 1)
+        self.assertEqual([path.suffix for path in self.cache_dir.iterdir()], [FontSubsetter.REJECTED_EXTENSION])
+
+    def test_the_least_recently_used_subsets_are_evicted_when_the_cache_is_too_big(self):
+        old = self.subsetter.subset(FONT, FontSubsetter.get_characters("old"))
+        used = self.subsetter.subset(FONT, FontSubsetter.get_characters("used"))
+        os.utime(old, (time.time() - 120, time.time() - 120))
+        os.utime(used, (time.time() - 60, time.time() - 60))
+        # a hit refreshes the subset, so the old one is the least recently used
+        self.subsetter.subset(FONT, FontSubsetter.get_characters("used"))
+        new = self.subsetter.subset(FONT, FontSubsetter.get_characters("new"))
+        kept_size = used.stat().st_size + new.stat().st_size
+        subsetter = FontSubsetter(self.cache_dir, max_size=int(kept_size / FontSubsetter.EVICTION_TARGET_RATIO) + 1)
+
+        self.assertEqual(subsetter.evict(), 1)
+
+        self.assertFalse(old.exists())
+        self.assertTrue(used.exists())
+        self.assertTrue(new.exists())
+
+    def test_invalid_cache_size(self):
+        with self.assertRaises(ValueError):
+            FontSubsetter(self.cache_dir, max_size=0)
+
+    def test_characters_include_case_variants_and_css_content(self):
+        characters = FontSubsetter.get_characters("Hi", ".word::after { content: '!\\201C'; }")
+
+        for character in "HIhi!“ ":
+            self.assertIn(character, characters)
+
+    def test_only_the_fonts_of_the_resources_used_by_the_css_are_found(self):
+        css = CSS + " .line { background: url('missing.ttf'), url('https://example.com/font.ttf'), url('../other.ttf'); }"
+
+        self.assertEqual(FontSubsetter.get_css_fonts(css, RESOURCES_DIR), [FONT])
+        self.assertEqual(FontSubsetter.get_css_fonts(css, None), [])
+
+    def test_pictex_css_urls_use_the_subsets(self):
+        subset_path = self.subsetter.subset(FONT, FontSubsetter.get_characters("hello"))
+
+        css = resolve_css_urls(CSS, RESOURCES_DIR, {FONT: subset_path})
+
+        self.assertIn(f"url('{subset_path.as_posix()}')", css)
+
+
+class _FakePage:
+    def __init__(self):
+        self.url = None
+
+    def goto(self, url):
+        self.url = url
+
+    def wait_for_load_state(self, *_args):
+        pass
+
+
+class _FakeContext:
+    def __init__(self, page):
+        self._page = page
+
+    def new_page(self):
+        return self._page
+
+    def new_cdp_session(self, _page):
+        return None
+
+
+class _FakeBrowser:
+    def __init__(self, page):
+        self._page = page
+
+    def new_context(self, **_kwargs):
+        return _FakeContext(self._page)
+
+
+class CssSubtitleRendererFontsTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        patcher = mock.patch.object(FontSubsetter, "get_default_dir", return_value=Path(temp_dir.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _open_renderer(self, text):
+        page = _FakePage()
+        renderer = CssSubtitleRenderer(browser=_FakeBrowser(page), use_renderer_daemon=False)
+        renderer.append_css(CSS)
+        renderer.set_rendered_text(text)
+        renderer.open(720, 1280, RESOURCES_DIR, CacheStrategy.NONE)
+        self.addCleanup(renderer.close)
+        page_dir = Path(renderer._tempdir.name)
+        return page_dir, (page_dir / "renderer_base.html").read_text(encoding="utf-8")
+
+    @unittest.skipUnless(HAS_FONTTOOLS, "fontTools is not installed")
+    def test_the_page_loads_the_subset_of_the_fonts(self):
+        page_dir, html = self._open_renderer("hello world")
+
+        self.assertLess((page_dir / "black.ttf").stat().st_size, FONT.stat().st_size)
+        self.assertIn('<link rel="preload" href="black.ttf" as="font" crossorigin>', html)
+
+    def test_the_original_fonts_are_used_without_the_text(self):
+        page_dir, html = self._open_renderer(None)
+
+        self.assertEqual((page_dir / "black.ttf").read_bytes(), FONT.read_bytes())
+        self.assertIn('<link rel="preload" href="black.ttf" as="font" crossorigin>', html)
+
+
+if __name__ == "__main__":
+    unittest.main()
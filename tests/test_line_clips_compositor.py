@@ -0,0 +1,108 @@
+import unittest
+
+import numpy as np
+
+from pycaps.common import Document, ElementState, Line, Segment, TimeFragment, Word, WordClip
+from pycaps.video import ImageClipFactory, LineClipsCompositor
+from pycaps.video.subtitle_clips_generator import SubtitleClipsGenerator
+
+try:
+    import movielite  # noqa: F401
+    HAS_MOVIELITE = True
+except Exception:
+    # movielite can't be imported without FFmpeg
+    HAS_MOVIELITE = False
+
+
+def _image(height, width, value, alpha=255):
+    image = np.full((height, width, 4), value, dtype=np.uint8)
+    image[..., 3] = alpha
+    return image
+
+
+def _make_document(*texts):
+    document = Document()
+    segment = Segment(time=TimeFragment(0, len(texts) + 2))
+    line = Line(time=TimeFragment(1, len(texts) + 1))
+    for index, text in enumerate(texts):
+        line.words.add(Word(text=text, time=TimeFragment(index + 1, index + 2)))
+    segment.lines.add(line)
+    document.segments.add(segment)
+    return document, line
+
+
+def _add_clips(line, image_fn):
+    '''Adds the clips of all the states (like SubtitleClipsGenerator), placed side by side.'''
+    for index, word in enumerate(line.words):
+        for line_state, word_state, start_fn, end_fn in SubtitleClipsGenerator.LINE_PASSES:
+            start, end = start_fn(word), end_fn(word)
+            if end <= start:
+                continue
+            image = image_fn(index, line_state, word_state)
+            clip = WordClip(_parent=word, states=[line_state, word_state])
+            clip.layout.size.width, clip.layout.size.height = image.shape[1], image.shape[0]
+            clip.layout.position.x, clip.layout.position.y = 10 + index * 6, 20
+            clip.media_clip = ImageClipFactory.from_bgra(image, start, end - start).set_position((clip.layout.position.x, clip.layout.position.y))
+            word.clips.add(clip)
+
+
+@unittest.skipUnless(HAS_MOVIELITE, "movielite can't be imported (FFmpeg is not installed)")
+class LineClipsCompositorTest(unittest.TestCase):
+    def test_a_line_without_state_changes_is_a_single_clip(self):
+        document, line = _make_document("one", "two", "three")
+        images = [_image(4, 5, value) for value in (10, 20, 30)]
+        _add_clips(line, lambda index, *_: images[index])
+        word_clips_count = len(document.get_media_clips())
+
+        LineClipsCompositor().composite(document)
+
+        self.assertEqual(word_clips_count, 13)
+        self.assertEqual(document.get_media_clips(), line.media_clips)
+        self.assertEqual(len(line.media_clips), 1)
+        clip = line.media_clips[0]
+        self.assertEqual((clip.start, clip.end), (0, 5))
+        self.assertEqual(clip.position(0), (10, 20))
+        sprite = clip.get_frame(0)
+        self.assertEqual(sprite.shape, (4, 17, 4))
+        # the words are placed where their clips were, with transparent space between them
+        np.testing.assert_array_equal(sprite[:, 12:17], images[2])
+        self.assertEqual(sprite[0, 5, 3], 0)
+        # the word clips keep their layout
+        self.assertTrue(all(word_clip.media_clip is None and word_clip.layout.size.width == 5 for word_clip in line.get_word_clips()))
+
+    def test_each_line_state_gets_its_clip(self):
+        document, line = _make_document("one", "two")
+        values = {ElementState.LINE_NOT_NARRATED_YET: 10, ElementState.LINE_BEING_NARRATED: 20, ElementState.LINE_ALREADY_NARRATED: 30}
+        _add_clips(line, lambda _, line_state, __: _image(4, 5, values[line_state]))
+
+        LineClipsCompositor().composite(document)
+
+        self.assertEqual([(clip.start, clip.end) for clip in line.media_clips], [(0, 1), (1, 3), (3, 4)])
+        self.assertEqual([int(clip.get_frame(0)[0, 0, 0]) for clip in line.media_clips], [10, 20, 30])
+
+    def test_lines_with_word_state_changes_keep_their_word_clips(self):
+        document, line = _make_document("one", "two")
+        _add_clips(line, lambda _, __, word_state: _image(4, 5, 99 if word_state == ElementState.WORD_BEING_NARRATED else 10))
+        media_clips = document.get_media_clips()
+
+        LineClipsCompositor().composite(document)
+
+        self.assertEqual(line.media_clips, [])
+        self.assertEqual(document.get_media_clips(), media_clips)
+
+    def test_overlapping_words_are_blended_in_order(self):
+        document, line = _make_document("one", "two")
+        # the second word is half transparent, and overlaps the first one (the words are placed 6 pixels apart)
+        images = [_image(2, 8, 100), _image(2, 8, 200, alpha=128)]
+        _add_clips(line, lambda index, *_: images[index])
+
+        LineClipsCompositor().composite(document)
+
+        sprite = line.media_clips[0].get_frame(0)
+        self.assertEqual(sprite.shape, (2, 14, 4))
+        np.testing.assert_array_equal(sprite[0, 6], [150, 150, 150, 255])
+        np.testing.assert_array_equal(sprite[0, 10], [200, 200, 200, 128])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+from pycaps.renderer.lru_byte_cache import LruByteCache
+from pycaps.utils import parse_size
+
+
+class LruByteCacheTest(unittest.TestCase):
+    def _create_cache(self, max_bytes=None):
+        return LruByteCache(lambda key, value: len(value) if value is not None else 0, max_bytes)
+
+    def test_without_budget_nothing_is_evicted(self):
+        cache = self._create_cache()
+        for i in range(100):
+            cache.set(i, "x" * 10)
+
+        self.assertEqual(cache.get_stats(), {"entries": 100, "bytes": 1000, "evictions": 0, "re_sets": 0})
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = self._create_cache(max_bytes=30)
+        cache.set("a", "x" * 10)
+        cache.set("b", "x" * 10)
+        cache.set("c", "x" * 10)
+        cache.get("a")
+        cache.set("d", "x" * 10)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertIn("d", cache)
+        self.assertEqual(cache.get_stats()["bytes"], 30)
+        self.assertEqual(cache.get_stats()["evictions"], 1)
+
+    def test_entries_without_size_are_kept(self):
+        cache = self._create_cache(max_bytes=10)
+        cache.set("hidden", None)
+        cache.set("a", "x" * 10)
+        cache.set("b", "x" * 10)
+
+        self.assertIn("hidden", cache)
+        self.assertNotIn("a", cache)
+        self.assertIn("b", cache)
+
+    def test_entry_bigger_than_budget_is_kept_until_next_set(self):
+        cache = self._create_cache(max_bytes=10)
+        cache.set("big", "x" * 50)
+        self.assertIn("big", cache)
+
+        cache.set("a", "x" * 5)
+        self.assertNotIn("big", cache)
+        self.assertEqual(cache.get_stats()["bytes"], 5)
+
+    def test_counts_entries_set_again_after_eviction(self):
+        cache = self._create_cache(max_bytes=10)
+        cache.set("a", "x" * 10)
+        cache.set("b", "x" * 10)
+        cache.set("a", "x" * 10)
+        cache.set("a", "x" * 10)
+
+        self.assertEqual(cache.get_stats()["re_sets"], 1)
+
+    def test_invalid_budget(self):
+        with self.assertRaises(ValueError):
+            self._create_cache(max_bytes=0)
+
+
+class ParseSizeTest(unittest.TestCase):
+    def test_units(self):
+        self.assertEqual(parse_size("100"), 100)
+        self.assertEqual(parse_size("100B"), 100)
+        self.assertEqual(parse_size("2KB"), 2048)
+        self.assertEqual(parse_size("512MB"), 512 * 1024 * 1024)
+        self.assertEqual(parse_size("1.5gb"), int(1.5 * 1024 ** 3))
+        self.assertEqual(parse_size(4096), 4096)
+
+    def test_invalid_values(self):
+        for value in ["", "MB", "-1MB", "10TB", "0", 0]:
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_size(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import inspect
+import unittest
+
+import numpy as np
+
+try:
+    import movielite  # noqa: F401
+    HAS_MOVIELITE = True
+except Exception:
+    # movielite can't be imported without FFmpeg
+    HAS_MOVIELITE = False
+
+
+def _parameters(function):
+    return list(inspect.signature(function).parameters)
+
+
+@unittest.skipUnless(HAS_MOVIELITE, "movielite can't be imported (FFmpeg is not installed)")
+class MovieliteInternalsTest(unittest.TestCase):
+    '''
+    The video writers and the clip helpers use some private parts of movielite (see the movielite version range in pyproject.toml).
+    If any of these tests fails after upgrading movielite, those helpers must be updated before widening the range.
+    '''
+
+    def test_video_writer(self):
+        from movielite import VideoWriter
+
+        writer = VideoWriter("unused.mp4", fps=10, size=(4, 2), duration=1.0)
+
+        self.assertEqual((writer._fps, writer._size, writer._duration, writer._output), (10, (4, 2), 1.0, "unused.mp4"))
+        self.assertEqual(writer._graphic_clips, [])
+        self.assertEqual(_parameters(writer._render_range)[:5], ["start_frame", "end_frame", "part_path", "video_quality", "high_precision_blending"])
+        self.assertEqual(_parameters(writer._mux_audio)[:2], ["video_path", "output_path"])
+
+    def test_encoder_settings(self):
+        from movielite import VideoQuality
+        from movielite.core.video_writer import _get_ffmpeg_libx264_preset, _get_ffmpeg_libx264_crf
+
+        self.assertIsInstance(_get_ffmpeg_libx264_preset(VideoQuality.MIDDLE), str)
+        self.assertIsInstance(_get_ffmpeg_libx264_crf(VideoQuality.MIDDLE), str)
+
+    def test_empty_frames(self):
+        from movielite.core import empty_frame
+
+        self.assertIsInstance(empty_frame._empty_frames, dict)
+        self.assertTrue(callable(empty_frame.clean_all))
+
+    def test_image_clip(self):
+        from movielite import ImageClip
+
+        image = np.zeros((2, 4, 4), dtype=np.uint8)
+        clip = ImageClip(image, start=0, duration=1)
+
+        self.assertEqual(clip._size, (4, 2))
+        self.assertEqual(clip._image.shape, (2, 4, 4))
+        self.assertEqual(clip._original_image.shape, (2, 4, 4))
+        self.assertEqual((clip._pixel_transforms, clip._frame_transforms, clip._mask), ([], [], None))
+
+    def test_graphic_clip(self):
+        from movielite import GraphicClip, ImageClip
+
+        clip = ImageClip(np.zeros((2, 4, 4), dtype=np.uint8), start=0, duration=1)
+
+        self.assertTrue(callable(clip._save_as_function(0)))
+        self.assertEqual(_parameters(GraphicClip._apply_transforms)[1:], ["frame", "t_rel"])
+        self.assertEqual(_parameters(GraphicClip.render)[1:], ["bg", "t_global"])
+        self.assertEqual(_parameters(GraphicClip.render_as_background)[1:6], ["t_global", "target_width", "target_height", "will_need_blending", "high_precision_blending"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+import numpy as np
+
+from pycaps.video import ImageClipFactory, OverlayPlanner
+
+try:
+    import movielite  # noqa: F401
+    HAS_MOVIELITE = True
+except Exception:
+    # movielite can't be imported without FFmpeg
+    HAS_MOVIELITE = False
+
+FPS = 10
+SIZE = (40, 30)
+
+
+def _clip(value, start, duration, position, alpha=255, size=(6, 4)):
+    image = np.full((size[1], size[0], 4), value, dtype=np.uint8)
+    image[..., 3] = alpha
+    return ImageClipFactory.from_bgra(image, start, duration).set_position(position)
+
+
+def _render_frames(clips, frames):
+    '''Composites the clips on each frame, like movielite's VideoWriter does.'''
+    rendered = []
+    for frame in range(frames):
+        time = frame / FPS
+        background = np.full((SIZE[1], SIZE[0], 3), 50, dtype=np.uint8)
+        for clip in clips:
+            if 0 <= time - clip.start < clip.duration:
+                background = clip.render(background, time)
+        rendered.append(background)
+    return rendered
+
+
+@unittest.skipUnless(HAS_MOVIELITE, "movielite can't be imported (FFmpeg is not installed)")
+class OverlayPlannerTest(unittest.TestCase):
+    def _assert_same_frames(self, clips, planned, duration):
+        frames = int(duration * FPS)
+        for frame, (expected, actual) in enumerate(zip(_render_frames(clips, frames), _render_frames(planned, frames))):
+            # the overlays are blended once, so the overlapping half transparent pixels can differ in the rounding
+            self.assertLessEqual(int(np.abs(expected.astype(int) - actual.astype(int)).max()), 1, f"frame {frame}")
+
+    def test_static_clips_are_composited_in_one_overlay_per_interval(self):
+        clips = [
+            _clip(100, 0, 2, (2, 2)),
+            _clip(200, 0.5, 1, (6, 3), alpha=128),
+            _clip(150, 0.5, 1.5, (20, 20)),
+        ]
+        planner = OverlayPlanner(FPS, 3)
+
+        planned = planner.plan(clips)
+
+        # [0, 0.5): the first clip alone, [0.5, 1.5): the three clips, [1.5, 2): the first and the last one
+        self.assertEqual(len(planned), 3)
+        self.assertEqual(planner.get_stats()["intervals"], 3)
+        self.assertIs(planned[0].get_frame(0), clips[0].get_frame(0))
+        self._assert_same_frames(clips, planned, 3)
+
+    def test_animated_clips_keep_their_place_between_the_static_ones(self):
+        animated = _clip(220, 0, 2, (0, 0)).set_position(lambda t: (int(t * 10), 3))
+        clips = [_clip(100, 0, 2, (2, 2)), animated, _clip(30, 0, 2, (4, 4), alpha=200)]
+        planner = OverlayPlanner(FPS, 2)
+
+        planned = planner.plan(clips)
+
+        self.assertEqual(len(planned), 3)
+        self.assertIs(planned[1], animated)
+        self.assertEqual(planner.get_stats()["static_clips"], 2)
+        self._assert_same_frames(clips, planned, 2)
+
+    def test_the_overlay_of_a_run_spans_the_consecutive_intervals(self):
+        animated = _clip(220, 0.5, 0.5, (0, 0)).set_opacity(lambda t: 0.5)
+        clips = [_clip(100, 0, 2, (2, 2)), animated]
+
+        planned = OverlayPlanner(FPS, 2).plan(clips)
+
+        self.assertEqual(len(planned), 2)
+        self.assertAlmostEqual(planned[0].start, -0.05)
+        self.assertAlmostEqual(planned[0].duration, 2)
+        self._assert_same_frames(clips, planned, 2)
+
+    def test_fully_transparent_runs_are_skipped(self):
+        clips = [_clip(100, 0, 1, (2, 2), alpha=0), _clip(100, 0, 1, (4, 4), alpha=0)]
+
+        self.assertEqual(OverlayPlanner(FPS, 1).plan(clips), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
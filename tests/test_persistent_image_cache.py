@@ -0,0 +1,132 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from pycaps.common import CacheStrategy
+from pycaps.renderer import PersistentImageCache
+from pycaps.renderer.image_array_converter import ImageArrayConverter
+from pycaps.renderer.rendered_image_cache import RenderedImageCache
+
+
+class PersistentImageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self._tempdir.name) / "cache"
+
+    def tearDown(self):
+        self._tempdir.cleanup()
+
+    def test_images_and_hidden_words_are_shared_between_instances(self):
+        image = Image.new("RGBA", (4, 3), (255, 0, 0, 128))
+        PersistentImageCache(self.cache_dir).set("ns", "visible", image)
+        PersistentImageCache(self.cache_dir).set("ns", "hidden", None)
+
+        cache = PersistentImageCache(self.cache_dir)
+        found, cached_image = cache.get("ns", "visible")
+        self.assertTrue(found)
+        self.assertEqual(cached_image.size, (4, 3))
+        self.assertEqual(cached_image.getpixel((0, 0)), (255, 0, 0, 128))
+        self.assertEqual(cache.get("ns", "hidden"), (True, None))
+        self.assertEqual(cache.get("other-ns", "visible"), (False, None))
+        self.assertEqual(cache.get_stats(), {"hits": 2, "misses": 1, "writes": 0, "evictions": 0})
+        self.assertFalse(list(self.cache_dir.rglob("*.tmp")))
+
+    def test_namespace_depends_on_resources_content(self):
+        resources_dir = Path(self._tempdir.name) / "resources"
+        resources_dir.mkdir()
+        font_path = resources_dir / "font.ttf"
+        font_path.write_bytes(b"font v1")
+        cache = PersistentImageCache(self.cache_dir)
+
+        namespace = cache.get_namespace("backend", ".word {}", resources_dir, 2.0)
+        self.assertEqual(namespace, cache.get_namespace("backend", ".word {}", resources_dir, 2.0))
+        self.assertNotEqual(namespace, cache.get_namespace("backend", ".word { color: red; }", resources_dir, 2.0))
+        self.assertNotEqual(namespace, cache.get_namespace("backend", ".word {}", resources_dir, 1.0))
+        self.assertNotEqual(namespace, cache.get_namespace("other-backend", ".word {}", resources_dir, 2.0))
+        font_path.write_bytes(b"font v2")
+        self.assertNotEqual(namespace, cache.get_namespace("backend", ".word {}", resources_dir, 2.0))
+
+    def test_namespace_depends_on_the_engine_version(self):
+        cache = PersistentImageCache(self.cache_dir)
+
+        namespace = cache.get_namespace("backend", ".word {}", None, 2.0, "chromium=120.0")
+
+        self.assertEqual(namespace, cache.get_namespace("backend", ".word {}", None, 2.0, "chromium=120.0"))
+        self.assertNotEqual(namespace, cache.get_namespace("backend", ".word {}", None, 2.0, "chromium=121.0"))
+
+    def test_package_versions(self):
+        versions = PersistentImageCache.get_package_versions("Pillow", "not-installed-package")
+
+        self.assertEqual(versions, f"Pillow={Image.__version__}|not-installed-package=unknown")
+
+    def test_evict_removes_least_recently_used_entries(self):
+        image = Image.new("RGBA", (32, 32), (0, 255, 0, 255))
+        cache = PersistentImageCache(self.cache_dir)
+        for i in range(4):
+            cache.set("ns", f"key-{i}", image)
+        entry_size = next(self.cache_dir.rglob("*.png")).stat().st_size
+        now = time.time()
+        for i in range(4):
+            image_path, _ = cache._get_paths("ns", f"key-{i}")
+            os.utime(image_path, (now - 100 + i, now - 100 + i))
+        cache.get("ns", "key-0")
+
+        limited_cache = PersistentImageCache(self.cache_dir, max_size=entry_size * 3)
+        self.assertEqual(limited_cache.evict(), 2)
+        self.assertTrue(limited_cache.get("ns", "key-0")[0])
+        self.assertFalse(limited_cache.get("ns", "key-1")[0])
+        self.assertFalse(limited_cache.get("ns", "key-2")[0])
+        self.assertTrue(limited_cache.get("ns", "key-3")[0])
+
+    def test_rendered_image_cache_falls_back_to_persistent_cache(self):
+        image = Image.new("RGBA", (2, 2))
+        css = ".word.word-being-narrated { color: red; }"
+        first_run = RenderedImageCache(css, CacheStrategy.CSS_CLASSES_AWARE, PersistentImageCache(self.cache_dir), "ns")
+        first_run.set(0, "hello", "line word word-being-narrated", None, image)
+
+        second_run = RenderedImageCache(css, CacheStrategy.CSS_CLASSES_AWARE, PersistentImageCache(self.cache_dir), "ns")
+        self.assertTrue(second_run.has(3, "hello", "line word word-being-narrated", None))
+        self.assertEqual(second_run.get(3, "hello", "line word word-being-narrated", None).size, (2, 2))
+        self.assertFalse(second_run.has(0, "hello", "line word", None))
+
+        no_cache_run = RenderedImageCache(css, CacheStrategy.NONE, PersistentImageCache(self.cache_dir), "ns")
+        self.assertFalse(no_cache_run.has(0, "hello", "line word word-being-narrated", None))
+
+    def test_arrays_share_the_entries_with_the_images(self):
+        image = Image.new("RGBA", (4, 3), (255, 0, 0, 128))
+        cache = PersistentImageCache(self.cache_dir)
+        cache.set_array("ns", "visible", ImageArrayConverter.from_pil(image))
+        cache.set_array("ns", "hidden", None)
+
+        found, read_image = cache.get("ns", "visible")
+        self.assertTrue(found)
+        self.assertEqual(list(read_image.convert("RGBA").getdata()), list(image.getdata()))
+        self.assertEqual(cache.get("ns", "hidden"), (True, None))
+
+        cache.set("ns", "other", image)
+        found, array = cache.get_array("ns", "other")
+        self.assertTrue(found)
+        np.testing.assert_array_equal(array, ImageArrayConverter.from_pil(image))
+        self.assertEqual(cache.get_array("ns", "hidden"), (True, None))
+        self.assertEqual(cache.get_array("ns", "missing"), (False, None))
+
+    def test_rendered_array_cache_writes_arrays_to_persistent_cache(self):
+        array = ImageArrayConverter.from_pil(Image.new("RGBA", (2, 2), (0, 0, 255, 255)))
+        css = ".word.word-being-narrated { color: red; }"
+        first_run = RenderedImageCache(css, CacheStrategy.CSS_CLASSES_AWARE, PersistentImageCache(self.cache_dir), "ns", array_images=True)
+        first_run.set(0, "hello", "line word word-being-narrated", None, array)
+
+        second_run = RenderedImageCache(css, CacheStrategy.CSS_CLASSES_AWARE, PersistentImageCache(self.cache_dir), "ns", array_images=True)
+        self.assertFalse(second_run.is_in_memory(0, "hello", "line word word-being-narrated", None))
+        self.assertTrue(second_run.has(0, "hello", "line word word-being-narrated", None))
+        self.assertTrue(second_run.is_in_memory(0, "hello", "line word word-being-narrated", None))
+        np.testing.assert_array_equal(second_run.get(0, "hello", "line word word-being-narrated", None), array)
+
+
+if __name__ == "__main__":
+    unittest.main()
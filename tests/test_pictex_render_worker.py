@@ -0,0 +1,49 @@
+import tempfile
+import unittest
+from multiprocessing import shared_memory
+from pathlib import Path
+
+from pycaps.renderer import pictex_render_worker
+
+
+class ResolveCssUrlsTest(unittest.TestCase):
+    def test_relative_urls_are_resolved_against_the_resources_dir(self):
+        with tempfile.TemporaryDirectory() as resources_dir:
+            base = Path(resources_dir).resolve().as_posix()
+            css = "@font-face { src: url('black.ttf'); } .a { background: url(img/bg.png); } .b { background: url(\"x.png\"); }"
+
+            resolved = pictex_render_worker.resolve_css_urls(css, Path(resources_dir))
+
+            self.assertIn(f"url('{base}/black.ttf')", resolved)
+            self.assertIn(f"url({base}/img/bg.png)", resolved)
+            self.assertIn(f"url(\"{base}/x.png\")", resolved)
+
+    def test_absolute_urls_are_kept(self):
+        css = ".a { background: url('/abs/a.png'); } .b { background: url(https://example.com/b.png); } .c { background: url(data:image/png;base64,AAAA); }"
+
+        self.assertEqual(pictex_render_worker.resolve_css_urls(css, Path("/resources")), css)
+
+    def test_without_resources_dir_the_css_is_not_changed(self):
+        css = "@font-face { src: url('black.ttf'); }"
+
+        self.assertEqual(pictex_render_worker.resolve_css_urls(css, None), css)
+
+
+class ReadSharedMemoryTest(unittest.TestCase):
+    def test_bgra_pixels_are_read_as_rgba_and_the_block_is_freed(self):
+        block = shared_memory.SharedMemory(create=True, size=2 * 4)
+        block.buf[:8] = bytes([1, 2, 3, 255, 10, 20, 30, 128])
+        name = block.name
+        block.close()
+
+        image = pictex_render_worker.read_shared_memory((name, 2, 1))
+
+        self.assertEqual(image.mode, "RGBA")
+        self.assertEqual(image.getpixel((0, 0)), (3, 2, 1, 255))
+        self.assertEqual(image.getpixel((1, 0)), (30, 20, 10, 128))
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+if __name__ == "__main__":
+    unittest.main()
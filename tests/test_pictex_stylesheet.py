@@ -0,0 +1,46 @@
+import importlib.util
+import unittest
+
+HAS_HTML2PIC = importlib.util.find_spec("html2pic") is not None
+
+
+@unittest.skipUnless(HAS_HTML2PIC, "html2pic is not installed (fast install profile)")
+class PictexStylesheetTest(unittest.TestCase):
+    CSS = ".word { font-size: 20px; color: white; padding: 2px 4px; } .word-being-narrated { background-color: #f76f00; }"
+
+    def test_renders_the_same_pixels_as_html2pic(self):
+        import numpy as np
+        from html2pic import Html2Pic
+        from pictex import CropMode
+        from pycaps.renderer.pictex_stylesheet import PictexStylesheet
+
+        stylesheet = PictexStylesheet(self.CSS)
+        for html in ['<span class="word">hello</span>', '<span class="word word-being-narrated">world</span>']:
+            with self.subTest(html=html):
+                renderer = Html2Pic(html, self.CSS)
+                canvas, root_element = renderer._translator.translate(renderer.styled_tree, renderer.font_registry)
+                expected = canvas.render(root_element, crop_mode=CropMode.CONTENT_BOX, scale_factor=1.0)
+
+                image = stylesheet.render(html, 1.0)
+
+                self.assertTrue(np.array_equal(image.to_numpy(), expected.to_numpy()))
+
+    def test_measures_the_size_of_the_rendered_image(self):
+        from pycaps.renderer.pictex_stylesheet import PictexStylesheet
+
+        stylesheet = PictexStylesheet(self.CSS + " .shadow { text-shadow: 3px 3px 2px black; }")
+        for html in ['<span class="word">hello</span>', '<span class="word word-being-narrated">world</span>', '<span class="word shadow">shadow</span>']:
+            for scale_factor in [1.0, 1.37]:
+                with self.subTest(html=html, scale_factor=scale_factor):
+                    image = stylesheet.render(html, scale_factor)
+
+                    self.assertEqual(stylesheet.measure(html, scale_factor), (image.width, image.height))
+
+    def test_same_css_is_compiled_once(self):
+        from pycaps.renderer.pictex_stylesheet import PictexStylesheet
+
+        self.assertIs(PictexStylesheet.get(self.CSS), PictexStylesheet.get(self.CSS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import json
+import unittest
+from pathlib import Path
+
+from pycaps.common import Document, ElementState, Line, Segment, TimeFragment, Word
+from pycaps.renderer import PillowSubtitleRenderer
+from pycaps.renderer.pillow_stylesheet import PillowStylesheet
+
+PRESETS_DIR = Path(__file__).resolve().parents[1] / "src" / "pycaps" / "template" / "preset"
+LINE = "line line-being-narrated"
+WORD = "word word-0-in-line word-being-narrated"
+
+
+def _make_line(*texts):
+    document = Document()
+    segment = Segment(time=TimeFragment(0, len(texts)))
+    line = Line(time=TimeFragment(0, len(texts)))
+    for index, text in enumerate(texts):
+        line.words.add(Word(text=text, time=TimeFragment(index, index + 1)))
+    segment.lines.add(line)
+    document.segments.add(segment)
+    return line
+
+
+class PillowStylesheetTests(unittest.TestCase):
+    def test_plain_presets_are_supported(self):
+        for preset in ["minimalist", "classic", "neo-minimal"]:
+            with self.subTest(preset=preset):
+                config = json.loads((PRESETS_DIR / preset / "pycaps.template.json").read_text(encoding="utf-8"))
+                PillowStylesheet((PRESETS_DIR / preset / config["css"]).read_text(encoding="utf-8"))
+
+    def test_unsupported_css_fails_listing_everything(self):
+        css = ".word { color: red; transform: rotate(3deg); } .word:hover { color: blue; } @keyframes pop { from { opacity: 0; } }"
+
+        with self.assertRaises(ValueError) as context:
+            PillowStylesheet(css)
+
+        message = str(context.exception)
+        self.assertIn("transform", message)
+        self.assertIn(".word:hover", message)
+        self.assertIn("@keyframes", message)
+
+    def test_non_inherited_properties_are_only_supported_in_the_words(self):
+        with self.assertRaises(ValueError) as context:
+            PillowStylesheet(".line-being-narrated { background-color: red; }")
+
+        self.assertIn("background-color", str(context.exception))
+
+    def test_cascade_follows_specificity_and_order(self):
+        stylesheet = PillowStylesheet(
+            ".word-being-narrated.word { color: blue; }"
+            ".word { color: red; padding: 1px 2px; font-size: 10px; }"
+            ".word-being-narrated { color: green; padding-left: 0.5em; }"
+        )
+
+        style = stylesheet.get_word_style(LINE, WORD)
+
+        self.assertEqual(style.color, (0, 0, 255, 255))
+        self.assertEqual(style.padding, (1.0, 2.0, 1.0, 5.0))
+
+    def test_inherited_properties_come_from_the_line(self):
+        stylesheet = PillowStylesheet(
+            ".line-being-narrated { color: rgba(255, 0, 0, 0.5); font-size: 20px; text-shadow: 1px 2px 3px; }"
+            ".word { font-size: 1.5em; background-color: #000; }"
+        )
+
+        style = stylesheet.get_word_style(LINE, WORD)
+
+        self.assertEqual(style.color, (255, 0, 0, 128))
+        self.assertEqual(style.font_size, 30.0)
+        self.assertEqual(style.background_color, (0, 0, 0, 255))
+        # the shadow without color uses the color of the word
+        self.assertEqual(style.text_shadows[0].color, (255, 0, 0, 128))
+        self.assertEqual(stylesheet.get_word_style("line line-not-narrated-yet", WORD).color, (0, 0, 0, 255))
+
+
+class PillowSubtitleRendererTests(unittest.TestCase):
+    CSS = ".word { font-size: 20px; color: white; background-color: rgb(0, 0, 255); padding: 4px 6px; border-radius: 6px; }"
+
+    def _open_renderer(self, css=CSS):
+        renderer = PillowSubtitleRenderer()
+        renderer.append_css(css)
+        renderer.open(720, 1280)
+        self.addCleanup(renderer.close)
+        return renderer
+
+    def test_word_size_is_the_size_of_the_rendered_image(self):
+        renderer = self._open_renderer()
+        line = _make_line("hello", "world")
+
+        renderer.open_line(line, ElementState.LINE_BEING_NARRATED)
+        images = [renderer.render_word(index, word, ElementState.WORD_BEING_NARRATED) for index, word in enumerate(line.words)]
+        renderer.close_line()
+
+        for word, image in zip(line.words, images):
+            self.assertEqual(renderer.get_word_size(word, ElementState.LINE_BEING_NARRATED, ElementState.WORD_BEING_NARRATED), image.size)
+
+    def test_background_and_rounded_corners(self):
+        renderer = self._open_renderer()
+        line = _make_line("hello")
+
+        renderer.open_line(line, ElementState.LINE_BEING_NARRATED)
+        image = renderer.render_word(0, line.words[0], ElementState.WORD_BEING_NARRATED)
+        renderer.close_line()
+
+        # inside the left padding, in the middle: the background
+        self.assertEqual(image.getpixel((2, image.height // 2)), (0, 0, 255, 255))
+        # the corners are rounded, so they are transparent
+        self.assertEqual(image.getpixel((0, 0))[3], 0)
+        self.assertEqual(image.getpixel((image.width - 1, image.height - 1))[3], 0)
+
+    def test_partial_words_are_narrower(self):
+        renderer = self._open_renderer()
+        line = _make_line("typewriter")
+
+        renderer.open_line(line, ElementState.LINE_BEING_NARRATED)
+        partial = renderer.render_word(0, line.words[0], ElementState.WORD_BEING_NARRATED, first_n_letters=4)
+        full = renderer.render_word(0, line.words[0], ElementState.WORD_BEING_NARRATED)
+        renderer.close_line()
+
+        self.assertLess(partial.width, full.width)
+        self.assertEqual(partial.height, full.height)
+
+    def test_open_fails_with_unsupported_css(self):
+        renderer = PillowSubtitleRenderer()
+        renderer.append_css(".word { filter: blur(2px); }")
+
+        with self.assertRaises(ValueError):
+            renderer.open(720, 1280)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import patch
+
+from pycaps.pipeline.caps_pipeline import CapsPipeline
+from pycaps.renderer import PillowSubtitleRenderer, SubtitleRenderer, SubtitleRendererPool
+
+WORD_STATES_CSS = ".word { color: white; } .word-being-narrated { color: yellow; }"
+
+
+class _RendererWithoutCss(SubtitleRenderer):
+    def append_css(self, css):
+        pass
+
+    def open(self, video_width, video_height, resources_dir=None, cache_strategy=None):
+        pass
+
+    def open_line(self, line, line_state):
+        pass
+
+    def render_word(self, index, word, state, first_n_letters=None):
+        return None
+
+    def close_line(self):
+        pass
+
+    def get_word_size(self, word, line_state, word_state):
+        return (0, 0)
+
+    def close(self):
+        pass
+
+
+class PipelineLineCompositingTest(unittest.TestCase):
+    @patch("pycaps.pipeline.caps_pipeline.check_dependencies", return_value=None)
+    def _make_pipeline(self, renderer, _mock_dependencies):
+        pipeline = CapsPipeline()
+        pipeline._renderer = renderer
+        return pipeline
+
+    def test_the_css_given_to_the_renderer_directly_is_analyzed(self):
+        renderer = PillowSubtitleRenderer()
+        renderer.append_css(".word { color: white; }")
+        self.assertTrue(self._make_pipeline(renderer)._can_composite_lines())
+
+        renderer.append_css(WORD_STATES_CSS)
+        self.assertFalse(self._make_pipeline(renderer)._can_composite_lines())
+        self.assertFalse(self._make_pipeline(SubtitleRendererPool(renderer, 1))._can_composite_lines())
+
+    def test_renderers_with_unknown_css_are_not_composited(self):
+        self.assertFalse(self._make_pipeline(_RendererWithoutCss())._can_composite_lines())
+
+
+if __name__ == "__main__":
+    unittest.main()
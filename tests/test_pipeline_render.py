@@ -0,0 +1,34 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from pycaps.common import Document
+from pycaps.pipeline.caps_pipeline import CapsPipeline
+
+
+class PipelineRenderTest(unittest.TestCase):
+    @patch("pycaps.pipeline.caps_pipeline.check_dependencies", return_value=None)
+    def _make_prepared_pipeline(self, _mock_dependencies):
+        pipeline = CapsPipeline()
+        pipeline._renderer = MagicMock()
+        pipeline._video_generator = MagicMock()
+        pipeline._clips_generator = MagicMock()
+        pipeline._layout_updater = MagicMock()
+        pipeline._positions_calculator = MagicMock()
+        pipeline._is_renderer_open = True
+        pipeline._is_prepared = True
+        return pipeline
+
+    def test_the_renderer_is_closed_once_before_writing_the_video(self):
+        pipeline = self._make_prepared_pipeline()
+        closed_renderer_calls = []
+        pipeline._video_generator.generate.side_effect = lambda _document: closed_renderer_calls.append(pipeline._renderer.close.call_count)
+
+        pipeline.render(Document())
+
+        # the chunked writer forks processes: the browser and the render threads must be gone by then
+        self.assertEqual(closed_renderer_calls, [1])
+        self.assertEqual(pipeline._renderer.close.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
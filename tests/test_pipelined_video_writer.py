@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from pycaps.video import ImageClipFactory, PipelinedVideoWriter
+
+try:
+    import movielite  # noqa: F401
+    HAS_MOVIELITE = True
+except Exception:
+    # movielite can't be imported without FFmpeg
+    HAS_MOVIELITE = False
+
+FPS = 10
+SIZE = (40, 30)
+
+
+class _FakeEncoder:
+    '''Collects the frames written to FFmpeg's stdin by movielite's VideoWriter.'''
+    def __init__(self, frames):
+        self._frames = frames
+        self.stdin = self
+
+    def write(self, data):
+        self._frames.append(np.frombuffer(bytes(data), dtype=np.uint8).reshape(SIZE[1], SIZE[0], 3))
+
+    def close(self):
+        pass
+
+    def wait(self):
+        return 0
+
+
+def _clip(value, start, duration, position, size=(6, 4)):
+    image = np.full((size[1], size[0], 4), value, dtype=np.uint8)
+    image[..., 3] = 200
+    return ImageClipFactory.from_bgra(image, start, duration).set_position(position)
+
+
+def _build_writer(duration):
+    from movielite import VideoWriter
+
+    writer = VideoWriter("unused.mp4", fps=FPS, size=SIZE, duration=duration)
+    background = np.full((SIZE[1], SIZE[0], 4), 255, dtype=np.uint8)
+    background[..., :3] = np.arange(SIZE[0], dtype=np.uint8)[None, :, None]
+    # the background ends before the video, so the last frames don't have any clip
+    writer.add_clip(ImageClipFactory.from_bgra(background, 0, duration - 0.3))
+    writer.add_clip(_clip(80, 0.2, 1.0, (3, 4)))
+    writer.add_clip(_clip(160, 0.5, 0.5, (5, 6)).set_opacity(lambda t: 1 - t))
+    writer.add_clip(_clip(240, 0.8, 0.9, (-2, 20)).set_position(lambda t: (round(t * 20), 10)))
+    return writer
+
+
+@unittest.skipUnless(HAS_MOVIELITE, "movielite can't be imported (FFmpeg is not installed)")
+class PipelinedVideoWriterTest(unittest.TestCase):
+    def test_the_frames_are_the_same_as_the_ones_of_the_video_writer(self):
+        duration = 2.0
+        expected = []
+        writer = _build_writer(duration)
+        with mock.patch("movielite.core.video_writer.subprocess.Popen", return_value=_FakeEncoder(expected)):
+            writer._render_range(0, int(duration * FPS), "unused.mp4", None, False)
+
+        frames = []
+        PipelinedVideoWriter(_build_writer(duration), queue_size=2).render_frames(0, int(duration * FPS), lambda frame: frames.append(frame.copy()))
+
+        self.assertEqual(len(frames), len(expected))
+        for index, (frame, expected_frame) in enumerate(zip(frames, expected)):
+            np.testing.assert_array_equal(frame, expected_frame, err_msg=f"frame {index}")
+
+    def test_a_failing_stage_stops_the_pipeline(self):
+        writer = _build_writer(2.0)
+        broken = _clip(10, 0.5, 1.0, (0, 0))
+        broken.render = mock.Mock(side_effect=ValueError("broken clip"))
+        writer.add_clip(broken)
+        frames = []
+
+        with self.assertRaisesRegex(ValueError, "broken clip"):
+            PipelinedVideoWriter(writer, queue_size=1).render_frames(0, 20, frames.append)
+        self.assertLessEqual(len(frames), 5)
+
+    def test_the_utilization_of_each_stage_is_reported(self):
+        writer = PipelinedVideoWriter(_build_writer(1.0))
+
+        writer.render_frames(0, 10, lambda frame: None)
+
+        stats = writer.get_stats()
+        self.assertEqual(stats["frames"], 10)
+        for stage in PipelinedVideoWriter.STAGES:
+            self.assertGreaterEqual(stats[f"{stage}_utilization"], 0.0)
+            self.assertLessEqual(stats[f"{stage}_utilization"], 1.0)
+
+    def test_invalid_queue_size(self):
+        with self.assertRaises(ValueError):
+            PipelinedVideoWriter(_build_writer(1.0), queue_size=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
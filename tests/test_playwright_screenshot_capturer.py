@@ -0,0 +1,96 @@
+import base64
+import io
+import unittest
+
+from PIL import Image
+
+from pycaps.renderer.playwright_screenshot_capturer import PlaywrightScreenshotCapturer
+
+
+class _FakePage:
+    def __init__(self, device_scale_factor: float):
+        self.device_scale_factor = device_scale_factor
+        self.clips = []
+
+    def screenshot(self, clip, **_kwargs):
+        self.clips.append(clip)
+        return self._build_png(clip)
+
+    def send(self, method, params):
+        # it also works as a fake CDP session
+        self.clips.append(params["clip"])
+        return {"data": base64.b64encode(self._build_png(params["clip"])).decode("ascii")}
+
+    def _build_png(self, clip):
+        width = int(round(clip["width"] * self.device_scale_factor))
+        height = int(round(clip["height"] * self.device_scale_factor))
+        image = Image.new("RGBA", (width, height))
+        for x in range(width):
+            for y in range(height):
+                image.putpixel((x, y), (x % 256, y % 256, 0, 255))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+class CaptureManyTests(unittest.TestCase):
+    def test_slices_each_box_from_a_single_screenshot(self):
+        page = _FakePage(device_scale_factor=2.0)
+        boxes = [
+            {"x": 10.2, "y": 5.0, "width": 20.0, "height": 10.0},
+            {"x": 30.4, "y": 5.0, "width": 15.3, "height": 10.0},
+        ]
+
+        images = PlaywrightScreenshotCapturer.capture_many(page, boxes, 2.0)
+
+        self.assertEqual(len(page.clips), 1)
+        self.assertEqual(page.clips[0], {"x": 10, "y": 5, "width": 36, "height": 10})
+        self.assertEqual(images[0].size, (40, 20))
+        self.assertEqual(images[1].size, (32, 20))
+        # second word starts 20 css px after the strip origin
+        self.assertEqual(images[1].getpixel((0, 0)), (40, 0, 0, 255))
+
+    def test_hidden_boxes_produce_none(self):
+        page = _FakePage(device_scale_factor=1.0)
+        boxes = [
+            {"x": 0.0, "y": 0.0, "width": 0.0, "height": 10.0},
+            {"x": 5.0, "y": 0.0, "width": 10.0, "height": 10.0},
+        ]
+
+        images = PlaywrightScreenshotCapturer.capture_many(page, boxes, 1.0)
+
+        self.assertIsNone(images[0])
+        self.assertEqual(images[1].size, (10, 10))
+
+    def test_no_visible_boxes_skips_the_screenshot(self):
+        page = _FakePage(device_scale_factor=1.0)
+
+        images = PlaywrightScreenshotCapturer.capture_many(page, [{"x": 0, "y": 0, "width": 0, "height": 0}], 1.0)
+
+        self.assertEqual(images, [None])
+        self.assertEqual(page.clips, [])
+
+
+class CaptureManyArraysTests(unittest.TestCase):
+    def test_slices_bgra_views_from_a_single_screenshot(self):
+        cdp_session = _FakePage(device_scale_factor=2.0)
+        boxes = [
+            {"x": 10.2, "y": 5.0, "width": 20.0, "height": 10.0},
+            {"x": 0.0, "y": 0.0, "width": 0.0, "height": 0.0},
+            {"x": 30.4, "y": 5.0, "width": 15.3, "height": 10.0},
+        ]
+
+        arrays = PlaywrightScreenshotCapturer.capture_many_arrays(cdp_session, boxes, 2.0)
+
+        self.assertEqual(len(cdp_session.clips), 1)
+        self.assertEqual(cdp_session.clips[0]["scale"], 1)
+        self.assertEqual(arrays[0].shape, (20, 40, 4))
+        self.assertIsNone(arrays[1])
+        self.assertEqual(arrays[2].shape, (20, 32, 4))
+        # BGRA: red channel (x offset) is the third one
+        self.assertEqual(tuple(arrays[2][0, 0]), (0, 0, 40, 255))
+        self.assertIs(arrays[0].base, arrays[2].base)
+
+
+if __name__ == "__main__":
+    unittest.main()
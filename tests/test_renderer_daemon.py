@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pycaps.renderer import RendererDaemon
+
+
+class _NodePage:
+    """A page whose scripts are run by Node.js, with the window state kept between calls."""
+    def __init__(self, url=None):
+        self.url = url
+        self.closed = False
+        self._window = {}
+
+    def goto(self, url):
+        self.url = url
+
+    def wait_for_load_state(self, *_args):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def evaluate(self, script, arg=None):
+        program = (
+            "const window = JSON.parse(process.argv[1]);"
+            f"const result = ({script})(JSON.parse(process.argv[2]));"
+            "console.log(JSON.stringify({window, result: result === undefined ? null : result}));"
+        )
+        completed = subprocess.run(["node", "-e", program, json.dumps(self._window), json.dumps(arg)], capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr)
+        output = json.loads(completed.stdout)
+        self._window = output["window"]
+        return output["result"]
+
+
+class _Context:
+    def __init__(self):
+        self.pages = []
+
+    def new_page(self):
+        page = _NodePage()
+        self.pages.append(page)
+        return page
+
+
+class RendererDaemonTest(unittest.TestCase):
+    def test_no_daemon_without_state_file(self):
+        with tempfile.TemporaryDirectory() as state_dir:
+            self.assertIsNone(RendererDaemon.find(Path(state_dir)))
+
+    def test_state_file_of_a_daemon_not_answering_is_ignored(self):
+        with tempfile.TemporaryDirectory() as state_dir:
+            state_path = Path(state_dir) / RendererDaemon.STATE_FILE_NAME
+            state_path.write_text('{"endpoint": "http://127.0.0.1:1", "pid": 1, "max_pages": 8}', encoding="utf-8")
+
+            self.assertIsNone(RendererDaemon.find(Path(state_dir)))
+
+    def test_page_dir_is_shared_by_pages_with_the_same_content(self):
+        with tempfile.TemporaryDirectory() as state_dir, tempfile.TemporaryDirectory() as resources_dir:
+            resources = Path(resources_dir)
+            (resources / "font.ttf").write_bytes(b"font")
+
+            page_dir = RendererDaemon.get_page_dir("<html>a</html>", resources, Path(state_dir))
+
+            self.assertEqual(RendererDaemon.get_page_dir("<html>a</html>", resources, Path(state_dir)), page_dir)
+            self.assertEqual((page_dir / RendererDaemon.PAGE_FILE_NAME).read_text(encoding="utf-8"), "<html>a</html>")
+            self.assertEqual((page_dir / "font.ttf").read_bytes(), b"font")
+            self.assertNotEqual(RendererDaemon.get_page_dir("<html>b</html>", resources, Path(state_dir)), page_dir)
+
+            (resources / "font.ttf").write_bytes(b"other font")
+            self.assertNotEqual(RendererDaemon.get_page_dir("<html>a</html>", resources, Path(state_dir)), page_dir)
+
+    def test_the_least_recently_used_page_dirs_are_removed(self):
+        with tempfile.TemporaryDirectory() as state_dir, mock.patch.object(RendererDaemon, "MAX_PAGE_DIRS", 2):
+            first = RendererDaemon.get_page_dir("<html>1</html>", None, Path(state_dir))
+            second = RendererDaemon.get_page_dir("<html>2</html>", None, Path(state_dir))
+            os.utime(first, (time.time() - 60, time.time() - 60))
+            os.utime(second, (time.time() - 120, time.time() - 120))
+            # the first one is used again, so the second one is the least recently used
+            RendererDaemon.get_page_dir("<html>1</html>", None, Path(state_dir))
+            third = RendererDaemon.get_page_dir("<html>3</html>", None, Path(state_dir))
+
+            self.assertTrue(first.exists())
+            self.assertFalse(second.exists())
+            self.assertTrue(third.exists())
+
+    def test_invalid_max_pages(self):
+        with self.assertRaises(ValueError):
+            RendererDaemon(max_pages=0)
+
+
+
+@unittest.skipUnless(shutil.which("node"), "Node.js is needed to run the page scripts")
+class RendererDaemonLeaseTest(unittest.TestCase):
+    def setUp(self):
+        self.page_dir = Path(tempfile.gettempdir()) / "pycaps-page"
+        self.context = _Context()
+
+    def test_a_leased_page_is_not_leased_again_while_its_renderer_uses_it(self):
+        with mock.patch.object(RendererDaemon, "PAGE_LEASE_TIMEOUT_SECONDS", 1):
+            page, token = RendererDaemon.lease_page(self.context, self.page_dir)
+            for _ in range(3):
+                # each call renews the lease, so it doesn't expire while the renderer is using the page
+                time.sleep(0.4)
+                self.assertEqual(page.evaluate(RendererDaemon.get_leased_script("(value) => value + 1"), [token, 1]), 2)
+
+            other_page, other_token = RendererDaemon.lease_page(self.context, self.page_dir)
+
+        self.assertIsNot(other_page, page)
+        self.assertNotEqual(other_token, token)
+
+    def test_a_page_is_reused_after_its_release(self):
+        page, token = RendererDaemon.lease_page(self.context, self.page_dir)
+        RendererDaemon.release_page(page, token)
+
+        other_page, other_token = RendererDaemon.lease_page(self.context, self.page_dir)
+
+        self.assertIs(other_page, page)
+        # the calls of the previous lease fail
+        with self.assertRaisesRegex(RuntimeError, "not leased by this renderer"):
+            page.evaluate(RendererDaemon.get_leased_script("() => 1"), [token, None])
+        self.assertEqual(page.evaluate(RendererDaemon.get_leased_script("() => 1"), [other_token, None]), 1)
+
+    def test_the_lease_of_a_renderer_without_calls_expires(self):
+        with mock.patch.object(RendererDaemon, "PAGE_LEASE_TIMEOUT_SECONDS", 0.2):
+            page, token = RendererDaemon.lease_page(self.context, self.page_dir)
+            time.sleep(0.3)
+            other_page, _ = RendererDaemon.lease_page(self.context, self.page_dir)
+
+        self.assertIs(other_page, page)
+        with self.assertRaisesRegex(RuntimeError, "not leased by this renderer"):
+            page.evaluate(RendererDaemon.get_leased_script("() => 1"), [token, None])
+
+    def test_leased_pages_are_not_closed_as_idle(self):
+        leased_page, _ = RendererDaemon.lease_page(self.context, self.page_dir, max_pages=1)
+        released_page = self.context.new_page()
+        released_page.goto("file:///other")
+        RendererDaemon.release_page(released_page, "unknown")
+
+        RendererDaemon.lease_page(self.context, Path(tempfile.gettempdir()) / "pycaps-other-page", max_pages=1)
+
+        self.assertFalse(leased_page.closed)
+        self.assertTrue(released_page.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
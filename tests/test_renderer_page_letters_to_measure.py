@@ -0,0 +1,45 @@
+import unittest
+
+from pycaps.common import Document, Line, Segment, Size, TimeFragment, Word
+from pycaps.renderer.letter_size_cache import LetterSizeCache
+from pycaps.renderer.renderer_page import RendererPage
+
+
+def _build_document(*texts):
+    document = Document()
+    segment = Segment(time=TimeFragment(0, len(texts)))
+    line = Line(time=TimeFragment(0, len(texts)))
+    for index, text in enumerate(texts):
+        line.words.add(Word(text=text, time=TimeFragment(index, index + 1)))
+    segment.lines.add(line)
+    document.segments.add(segment)
+    return document
+
+
+class LettersToMeasureTest(unittest.TestCase):
+    def test_groups_distinct_letters_by_effective_css_classes(self):
+        document = _build_document("aab", "ba", "c")
+        # only the narrated word state changes the letters size
+        cache = LetterSizeCache(".word-being-narrated { font-size: 40px; }")
+
+        groups = RendererPage().get_letters_to_measure(document.get_words(), cache)
+
+        self.assertEqual(len(groups), 2)
+        for letters, line_css_classes, word_css_classes in groups:
+            self.assertEqual(letters, ["a", "b", RendererPage.NON_CONTENT_WIDTH_LETTER, "c"])
+            self.assertIn("word", word_css_classes.split())
+            self.assertIn("line", line_css_classes.split())
+        self.assertEqual(sum("word-being-narrated" in group[2].split() for group in groups), 1)
+
+    def test_skips_cached_letters(self):
+        document = _build_document("ab")
+        cache = LetterSizeCache("")
+        cache.set_all({"a": Size(1, 1), RendererPage.NON_CONTENT_WIDTH_LETTER: Size(0, 1)}, "line word")
+
+        groups = RendererPage().get_letters_to_measure(document.get_words(), cache)
+
+        self.assertEqual([group[0] for group in groups], [["b"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from pycaps.video import SpriteAtlas
+from pycaps.video.sprite_atlas import AtlasEntry
+
+
+def _image(height, width, value):
+    return np.full((height, width, 4), value, dtype=np.uint8)
+
+
+class SpriteAtlasTest(unittest.TestCase):
+    def test_sprites_are_read_only_views_of_the_pages(self):
+        atlas = SpriteAtlas(page_size=64)
+        images = [_image(10, 20, 1), _image(12, 30, 2), _image(5, 40, 3)]
+
+        sprites = atlas.pack(images)
+
+        for image, sprite in zip(images, sprites):
+            view = atlas.get_sprite(sprite)
+            np.testing.assert_array_equal(view, image)
+            self.assertIsNotNone(view.base)
+            self.assertFalse(view.flags.writeable)
+        self.assertEqual(atlas.get_stats()["pages"], 1)
+
+    def test_sprites_do_not_overlap(self):
+        atlas = SpriteAtlas(page_size=40)
+        images = [_image(4 + index % 7, 6 + index % 11, index + 1) for index in range(60)]
+
+        sprites = atlas.pack(images)
+
+        # each image has a distinct value, so any overlap would overwrite some pixels
+        for image, sprite in zip(images, sprites):
+            np.testing.assert_array_equal(atlas.get_sprite(sprite), image)
+        stats = atlas.get_stats()
+        self.assertGreater(stats["pages"], 1)
+        self.assertLessEqual(stats["sprite_bytes"], stats["bytes"])
+
+    def test_the_same_array_is_packed_once(self):
+        atlas = SpriteAtlas(page_size=64)
+        image = _image(4, 4, 9)
+
+        sprites = atlas.pack([image, _image(4, 4, 9), image])
+
+        self.assertEqual(sprites[0], sprites[2])
+        self.assertNotEqual(sprites[0], sprites[1])
+        self.assertEqual(atlas.get_stats()["sprites"], 2)
+
+    def test_sprites_larger_than_a_page_get_their_own_page(self):
+        atlas = SpriteAtlas(page_size=16)
+
+        sprites = atlas.pack([_image(4, 40, 1), _image(4, 4, 2)])
+
+        self.assertEqual(atlas.get_sprite(sprites[0]).shape, (4, 40, 4))
+        self.assertEqual(atlas.get_stats()["pages"], 2)
+
+    def test_save_and_load(self):
+        atlas = SpriteAtlas(page_size=32, fingerprint="abc")
+        sprites = atlas.pack([_image(3, 5, 1), _image(6, 2, 2)])
+        atlas.set_entry("hello|line|word", AtlasEntry(sprites[1], 10, 12, 4, 3))
+        atlas.set_entry("bye|line|word", AtlasEntry(sprites[0], 5, 3, 0, 0))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = str(Path(temp_dir) / f"video{SpriteAtlas.FILE_SUFFIX}")
+            atlas.save(path)
+
+            self.assertIsNone(SpriteAtlas.load(path, "other"))
+            self.assertIsNone(SpriteAtlas.load(str(Path(temp_dir) / "missing.atlas.npz"), "abc"))
+            loaded = SpriteAtlas.load(path, "abc")
+
+        entry = loaded.get_entry("hello|line|word")
+        self.assertEqual(entry, AtlasEntry(sprites[1], 10, 12, 4, 3))
+        np.testing.assert_array_equal(loaded.get_sprite(entry.sprite), _image(6, 2, 2))
+        self.assertIsNone(loaded.get_entry("missing"))
+        self.assertEqual(loaded.get_stats(), atlas.get_stats())
+
+    def test_only_the_used_entries_and_their_sprites_are_saved_again(self):
+        atlas = SpriteAtlas(page_size=32, fingerprint="abc")
+        sprites = atlas.pack([_image(3, 5, 1), _image(6, 2, 2)])
+        atlas.set_entry("old|line|word", AtlasEntry(sprites[0], 5, 3, 0, 0))
+        atlas.set_entry("kept|line|word", AtlasEntry(sprites[1], 2, 6, 0, 0))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = str(Path(temp_dir) / f"video{SpriteAtlas.FILE_SUFFIX}")
+            atlas.save(path)
+            # the next render only uses one of the saved entries, and adds a new one
+            rendered_again = SpriteAtlas.load(path, "abc")
+            kept = rendered_again.get_entry("kept|line|word")
+            new_sprite = rendered_again.pack([_image(4, 4, 3)])[0]
+            rendered_again.set_entry("new|line|word", AtlasEntry(new_sprite, 4, 4, 0, 0))
+            rendered_again.save(path)
+            loaded = SpriteAtlas.load(path, "abc")
+
+        self.assertIsNone(loaded.get_entry("old|line|word"))
+        np.testing.assert_array_equal(loaded.get_sprite(loaded.get_entry("kept|line|word").sprite), rendered_again.get_sprite(kept.sprite))
+        np.testing.assert_array_equal(loaded.get_sprite(loaded.get_entry("new|line|word").sprite), _image(4, 4, 3))
+        self.assertEqual(loaded.get_stats()["sprites"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
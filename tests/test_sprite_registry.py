@@ -0,0 +1,53 @@
+import gc
+import unittest
+import weakref
+
+import numpy as np
+
+from pycaps.video import SpriteRegistry
+
+
+class SpriteRegistryTest(unittest.TestCase):
+    def test_identical_images_share_a_read_only_array(self):
+        registry = SpriteRegistry()
+        image = np.full((2, 3, 4), 7, dtype=np.uint8)
+        same_content = image.copy()
+        other_content = np.full((2, 3, 4), 8, dtype=np.uint8)
+
+        sprite = registry.get(image)
+
+        self.assertIs(registry.get(same_content), sprite)
+        self.assertIs(registry.get(image), sprite)
+        self.assertIsNot(registry.get(other_content), sprite)
+        self.assertFalse(sprite.flags.writeable)
+        self.assertEqual(registry.get_stats(), {"total": 4, "unique": 2, "total_bytes": 96, "unique_bytes": 48, "saved_bytes": 48})
+
+    def test_non_contiguous_views_are_compared_by_content(self):
+        registry = SpriteRegistry()
+        strip = np.zeros((2, 6, 4), dtype=np.uint8)
+        strip[:, :3] = 5
+        image = np.full((2, 3, 4), 5, dtype=np.uint8)
+
+        self.assertIs(registry.get(strip[:, :3]), registry.get(image))
+
+    def test_the_registered_views_do_not_keep_their_strip_alive(self):
+        registry = SpriteRegistry()
+        strip = np.full((2, 6, 4), 5, dtype=np.uint8)
+        strip_reference = weakref.ref(strip)
+
+        sprite = registry.get(strip[:, :3])
+        del strip
+        gc.collect()
+
+        self.assertIsNone(strip_reference())
+        np.testing.assert_array_equal(sprite, np.full((2, 3, 4), 5, dtype=np.uint8))
+
+    def test_images_with_the_same_bytes_but_different_shape_are_different(self):
+        registry = SpriteRegistry()
+        image = np.zeros((2, 3, 4), dtype=np.uint8)
+
+        self.assertIsNot(registry.get(image), registry.get(np.zeros((3, 2, 4), dtype=np.uint8)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+
+from pycaps.animation import SlideInPrimitive
+from pycaps.common import ElementType, WordClip
+from pycaps.video import SpriteTrimmer
+
+
+class _FakeMediaClip:
+    def __init__(self):
+        self.position = lambda t: (0, 0)
+        self.scale = lambda t: 1.0
+
+    def set_position(self, value):
+        self.position = value if callable(value) else (lambda t: value)
+
+    def set_scale(self, value):
+        self.scale = value if callable(value) else (lambda t: value)
+
+
+class SpriteTrimmerTest(unittest.TestCase):
+    def test_trims_transparent_borders(self):
+        image = np.zeros((10, 20, 4), dtype=np.uint8)
+        image[3:6, 4:15, 3] = 255
+        image[7, 5, 3] = 1
+
+        trimmed, x, y = SpriteTrimmer.trim(image)
+
+        self.assertEqual((x, y), (4, 3))
+        self.assertEqual(trimmed.shape, (5, 11, 4))
+        self.assertTrue(trimmed.flags.c_contiguous)
+        self.assertEqual(trimmed[4, 1, 3], 1)
+
+    def test_keeps_fully_transparent_images(self):
+        image = np.zeros((4, 4, 4), dtype=np.uint8)
+
+        trimmed, x, y = SpriteTrimmer.trim(image)
+
+        self.assertIs(trimmed, image)
+        self.assertEqual((x, y), (0, 0))
+
+
+class MediaOffsetTest(unittest.TestCase):
+    def test_animations_keep_the_media_offset(self):
+        clip = WordClip(media_clip=_FakeMediaClip())
+        clip.layout.position.x, clip.layout.position.y = 100, 50
+        clip.media_offset.x, clip.media_offset.y = 3, 2
+        clip.media_clip.set_position(clip.get_media_position(100, 50))
+
+        SlideInPrimitive(duration=1.0, distance=10).run(clip, 0.0, ElementType.WORD)
+
+        self.assertEqual(clip.media_clip.position(1.0), (103, 52))
+        self.assertEqual(clip.media_clip.position(0.0), (93, 52))
+        self.assertEqual(clip.media_clip.position(2.0), (103, 52))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import threading
+import unittest
+
+from pycaps.common import Line, TimeFragment, Word
+from pycaps.renderer import SubtitleRenderer, SubtitleRendererPool
+
+
+class _FakeRenderer(SubtitleRenderer):
+    def __init__(self):
+        self.css = ""
+        self.batches = []
+        self.threads = set()
+        self.opened = False
+        self.closed = False
+
+    def _track_thread(self):
+        self.threads.add(threading.get_ident())
+
+    def append_css(self, css):
+        self.css += css
+
+    def open(self, video_width, video_height, resources_dir=None, cache_strategy=None):
+        self._track_thread()
+        self.opened = True
+
+    def open_line(self, line, line_state):
+        self._track_thread()
+
+    def render_word(self, index, word, state, first_n_letters=None):
+        self._track_thread()
+        return None
+
+    def close_line(self):
+        self._track_thread()
+
+    def get_word_size(self, word, line_state, word_state):
+        self._track_thread()
+        return (len(word.text), 1)
+
+    def close(self):
+        self._track_thread()
+        self.closed = True
+
+    def render_lines(self, lines, render_line_fn):
+        self.batches.append([line.words[0].text for line in lines])
+        return super().render_lines(lines, render_line_fn)
+
+    def copy(self):
+        renderer = _FakeRenderer()
+        renderer.append_css(self.css)
+        return renderer
+
+
+def _make_lines(count):
+    lines = []
+    for i in range(count):
+        line = Line(time=TimeFragment(start=i, end=i + 1))
+        line.words.add(Word(text=f"word{i}", time=TimeFragment(start=i, end=i + 1)))
+        lines.append(line)
+    return lines
+
+
+class SubtitleRendererPoolTests(unittest.TestCase):
+    def test_results_are_returned_in_line_order(self):
+        renderer = _FakeRenderer()
+        renderer.append_css(".word { color: red; }")
+        pool = SubtitleRendererPool(renderer, 3)
+        pool.open(100, 100)
+        lines = _make_lines(20)
+
+        results = pool.render_lines(lines, lambda worker, line: line.words[0].text)
+        pool.close()
+
+        self.assertEqual(results, [f"word{i}" for i in range(20)])
+        self.assertTrue(all(worker.opened and worker.closed for worker in pool._renderers))
+        self.assertTrue(all(worker.css == ".word { color: red; }" for worker in pool._renderers))
+
+    def test_each_worker_renders_a_contiguous_batch_through_its_render_lines(self):
+        pool = SubtitleRendererPool(_FakeRenderer(), 3)
+        pool.open(100, 100)
+
+        pool.render_lines(_make_lines(8), lambda worker, line: None)
+        pool.close()
+
+        self.assertEqual([worker.batches for worker in pool._renderers], [
+            [["word0", "word1", "word2"]],
+            [["word3", "word4", "word5"]],
+            [["word6", "word7"]],
+        ])
+
+    def test_each_worker_is_always_used_from_the_same_thread(self):
+        pool = SubtitleRendererPool(_FakeRenderer(), 4)
+        pool.open(100, 100)
+
+        def render_line(worker, line):
+            worker.open_line(line, None)
+            worker.close_line()
+
+        pool.render_lines(_make_lines(50), render_line)
+        pool.close()
+
+        for worker in pool._renderers:
+            self.assertEqual(len(worker.threads), 1)
+        self.assertIn(threading.get_ident(), pool._renderers[0].threads)
+
+    def test_other_calls_are_delegated_to_the_original_renderer(self):
+        renderer = _FakeRenderer()
+        pool = SubtitleRendererPool(renderer, 2)
+        pool.open(100, 100)
+        word = _make_lines(1)[0].words[0]
+
+        size = pool.get_word_size(word, None, None)
+        pool.close()
+
+        self.assertEqual(size, (5, 1))
+        self.assertEqual(renderer.threads, {threading.get_ident()})
+
+    def test_errors_are_propagated(self):
+        pool = SubtitleRendererPool(_FakeRenderer(), 2)
+        pool.open(100, 100)
+
+        def render_line(worker, line):
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            pool.render_lines(_make_lines(5), render_line)
+        pool.close()
+
+    def test_renderers_without_copy_support_are_rejected(self):
+        class _NotCopiableRenderer(_FakeRenderer):
+            def copy(self):
+                return SubtitleRenderer.copy(self)
+
+        with self.assertRaises(NotImplementedError):
+            SubtitleRendererPool(_NotCopiableRenderer(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()